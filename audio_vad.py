@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基于能量的语音活动检测（VAD）模块
+通过管道让FFmpeg直接输出16kHz单声道PCM到NumPy数组（不生成临时WAV），按帧向量化计算RMS能量，
+相对最大能量超过阈值的帧视为有声，合并短静音、去掉过短片段后得到语音区间；
+用于动态字幕的逐词时间估算和自动匹配时长前的首尾静音裁剪，替代librosa
+"""
+
+import subprocess
+
+import numpy as np
+
+# 默认采样率
+DEFAULT_SAMPLE_RATE = 16000
+
+
+def decode_pcm(audio_path, sample_rate=DEFAULT_SAMPLE_RATE, timeout=60):
+    """
+    使用FFmpeg将音频解码为单声道float32采样（范围-1~1）
+
+    返回:
+        numpy数组，失败返回None
+    """
+    cmd = [
+        'ffmpeg', '-v', 'error', '-nostdin',
+        '-i', str(audio_path),
+        '-vn', '-ac', '1', '-ar', str(sample_rate),
+        '-f', 's16le', '-acodec', 'pcm_s16le', 'pipe:1'
+    ]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"【VAD】解码音频失败: {e}")
+        return None
+    if result.returncode != 0:
+        print(f"【VAD】解码音频失败: {result.stderr.decode('utf-8', errors='ignore').strip()}")
+        return None
+    return np.frombuffer(result.stdout, dtype='<i2').astype(np.float32) / 32768.0
+
+
+def detect_speech_intervals(samples, sample_rate=DEFAULT_SAMPLE_RATE, top_db=20, frame_ms=20,
+                            min_silence=0.15, min_speech=0.05):
+    """
+    检测语音区间
+
+    参数:
+        samples: 单声道采样数组
+        sample_rate: 采样率
+        top_db: 低于最大帧能量多少分贝视为静音（与 librosa.effects.split 的 top_db 含义相同）
+        frame_ms: 帧长（毫秒）
+        min_silence: 短于该时长（秒）的静音合并到前后语音中
+        min_speech: 短于该时长（秒）的语音片段丢弃
+
+    返回:
+        [(开始秒, 结束秒), ...]
+    """
+    frame_length = max(1, int(sample_rate * frame_ms / 1000))
+    frame_count = len(samples) // frame_length
+    if frame_count == 0:
+        return []
+
+    frames = np.asarray(samples[:frame_count * frame_length], dtype=np.float32).reshape(frame_count, frame_length)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    peak = rms.max()
+    if peak <= 0:
+        return []
+    voiced = 20.0 * np.log10(np.maximum(rms, 1e-10) / peak) > -top_db
+
+    # 有声帧的起止边界
+    edges = np.diff(np.concatenate(([0], voiced.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if len(starts) == 0:
+        return []
+
+    frame_seconds = frame_length / sample_rate
+    intervals = []
+    for start, end in zip(starts * frame_seconds, ends * frame_seconds):
+        if intervals and start - intervals[-1][1] < min_silence:
+            intervals[-1][1] = end
+        else:
+            intervals.append([start, end])
+    return [(round(float(start), 3), round(float(end), 3)) for start, end in intervals if end - start >= min_speech]
+
+
+def get_speech_intervals(audio_path, sample_rate=DEFAULT_SAMPLE_RATE, **kwargs):
+    """
+    解码音频并检测语音区间
+
+    返回:
+        (语音区间列表, 音频时长)，解码失败返回None
+    """
+    samples = decode_pcm(audio_path, sample_rate)
+    if samples is None or len(samples) == 0:
+        return None
+    return detect_speech_intervals(samples, sample_rate, **kwargs), len(samples) / sample_rate
+
+
+def detect_speech_bounds(audio_path, padding=0.05, top_db=35):
+    """
+    检测音频中首个语音开始和最后一个语音结束的时间（用于裁剪首尾静音）
+
+    参数:
+        audio_path: 音频路径
+        padding: 在语音前后保留的余量（秒）
+        top_db: 静音阈值，比逐词分析更宽松以免裁掉弱音
+
+    返回:
+        (开始秒, 结束秒)，失败或没有检测到语音时返回None
+    """
+    detected = get_speech_intervals(audio_path, top_db=top_db)
+    if not detected or not detected[0]:
+        return None
+    intervals, duration = detected
+    start = max(0.0, intervals[0][0] - padding)
+    end = min(duration, intervals[-1][1] + padding)
+    return round(start, 3), round(end, 3)
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量并行调度模块
+使用进程池同时处理多个视频任务：每个任务在工作进程中依次完成预处理和精处理，
+不同任务之间的预处理与最终编码相互重叠；进度和结果按排序后的文件索引依次提交，
+保证背景音乐、字幕等按video_index匹配的逻辑与串行处理一致
+"""
+
+import os
+import time
+import queue
+import shutil
+import traceback
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# 工作进程中的进度队列（由进程池初始化函数设置）
+_progress_queue = None
+
+
+def get_cpu_count():
+    """获取可用的CPU核数"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def default_worker_count(cpu_count=None):
+    """
+    计算默认的并行任务数
+
+    单个1080x1920的libx264编码大约能有效利用8个线程，
+    因此按每个任务8个核心估算并行数
+    """
+    cpu_count = cpu_count or get_cpu_count()
+    return max(1, cpu_count // 8)
+
+
+def compute_thread_budget(max_workers, cpu_count=None):
+    """
+    根据CPU核数和并行任务数计算每个FFmpeg任务的线程数
+
+    参数:
+        max_workers: 并行任务数
+        cpu_count: CPU核数，为None时自动检测
+
+    返回:
+        每个任务可使用的FFmpeg线程数（至少为1）
+    """
+    cpu_count = cpu_count or get_cpu_count()
+    return max(1, cpu_count // max(1, max_workers))
+
+
+def _init_worker(ffmpeg_threads, progress_queue, preprocess_cache=None, intermediate_profile=None, streaming=None,
+                 timeline_split=None):
+    """工作进程初始化：设置FFmpeg线程预算、进度队列、预处理缓存、中间文件档位、流式管道模式和分时段渲染"""
+    global _progress_queue
+    _progress_queue = progress_queue
+
+    from utils import set_ffmpeg_threads
+    set_ffmpeg_threads(ffmpeg_threads)
+
+    if preprocess_cache:
+        from preprocess_cache import set_preprocess_cache
+        set_preprocess_cache(preprocess_cache.get('enabled'), preprocess_cache.get('max_size_mb'))
+
+    if intermediate_profile:
+        from intermediate_codec import set_intermediate_profile
+        set_intermediate_profile(intermediate_profile)
+
+    if streaming is not None:
+        from stream_pipeline import set_streaming
+        set_streaming(streaming)
+
+    if timeline_split is not None:
+        from static_plate import set_timeline_split
+        set_timeline_split(timeline_split)
+
+
+def _report_progress(index, stage, percent):
+    """从工作进程向调度线程发送进度"""
+    if _progress_queue is None:
+        return
+    try:
+        _progress_queue.put_nowait((index, stage, float(percent)))
+    except Exception:
+        pass
+
+
+def job_stream_kind(job):
+    """
+    流式管道模式下传给process_video的stream_kind（任务类型），不使用流式管道时返回None
+
+    单次渲染优先：单次渲染本身已不产生中间文件，只有分步处理的任务使用流式管道
+    """
+    from stream_pipeline import is_streaming_enabled
+
+    single_pass = (job.get('process_kwargs') or {}).get('single_pass', False) and job['kind'] != 'folder'
+    if single_pass or not is_streaming_enabled():
+        return None
+    return job['kind']
+
+
+def preprocess_job(job, temp_dir):
+    """
+    执行任务的预处理阶段（串行流水线与并行模式共用）
+
+    参数:
+        job: 任务字典（见run_batch_job）
+        temp_dir: 预处理中间文件所在的临时目录
+
+    返回:
+        (预处理后的视频路径, 是否单次渲染)，预处理失败时路径为None；
+        单次渲染和流式管道模式下预处理并入精处理，直接返回原始路径
+    """
+    from video_core import preprocess_video_for_kind
+
+    kind = job['kind']
+    path = job['path']
+    process_kwargs = job.get('process_kwargs') or {}
+    single_pass = process_kwargs.get('single_pass', False) and kind != 'folder'
+
+    if single_pass or job_stream_kind(job):
+        preprocessed_path = path
+    else:
+        # 与单次渲染和流式管道模式使用同一去水印缩放系数
+        preprocessed_path = preprocess_video_for_kind(path, kind, temp_dir,
+                                                      scale_factor=process_kwargs.get('scale_factor', 1.1))
+
+    if not preprocessed_path or not Path(preprocessed_path).exists():
+        return None, single_pass
+    return str(preprocessed_path), single_pass
+
+
+def run_batch_job(job):
+    """
+    在工作进程中执行单个任务：预处理 + 精处理
+
+    参数:
+        job: 任务字典，包含以下键
+            index: 在排序文件列表中的索引（同时作为video_index）
+            kind: 任务类型 folder/short/long
+            path: 输入文件或文件夹路径
+            output_path: 输出文件路径
+            process_kwargs: 传递给process_video的参数字典
+
+    返回:
+        结果字典: index, name, success, output_path, elapsed, error, encode（最终编码统计，见utils.get_last_encode_stats）
+    """
+    from video_core import process_video
+    from utils import pop_encode_stats
+    from intermediate_codec import make_intermediate_temp_dir
+
+    index = job['index']
+    kind = job['kind']
+    path = job['path']
+    process_kwargs = dict(job.get('process_kwargs') or {})
+
+    start_time = time.time()
+    # 原始帧中间文件放在tmpfs中
+    temp_dir = make_intermediate_temp_dir()
+    result = {
+        'index': index,
+        'name': Path(path).name,
+        'kind': kind,
+        'success': False,
+        'output_path': None,
+        'elapsed': 0.0,
+        'error': None,
+        'encode': None
+    }
+
+    try:
+        _report_progress(index, "预处理", 0.0)
+
+        # 1. 预处理（单次渲染模式下并入精处理）
+        preprocessed_path, single_pass = preprocess_job(job, temp_dir)
+        if not preprocessed_path:
+            result['error'] = "预处理失败"
+            return result
+
+        # 2. 精处理
+        def progress_callback(stage, percent):
+            _report_progress(index, stage, percent)
+
+        process_kwargs['single_pass'] = single_pass
+        process_kwargs['reverse_effect'] = single_pass and kind == 'short'
+        process_kwargs['stream_kind'] = job_stream_kind(job)
+        pop_encode_stats()
+        output = process_video(
+            preprocessed_path,
+            job['output_path'],
+            progress_callback=progress_callback,
+            video_index=index,
+            **process_kwargs
+        )
+
+        result['encode'] = pop_encode_stats()
+        result['success'] = bool(output)
+        result['output_path'] = str(output) if output else None
+        if not output:
+            result['error'] = "精处理失败"
+        return result
+    except Exception as e:
+        result['error'] = str(e)
+        traceback.print_exc()
+        return result
+    finally:
+        result['elapsed'] = time.time() - start_time
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def run_parallel_batch(jobs, max_workers, ffmpeg_threads=None, on_progress=None, on_result=None,
+                       should_stop=None, poll_interval=0.2, preprocess_cache=None, intermediate_profile=None,
+                       streaming=None, timeline_split=None):
+    """
+    使用进程池并行处理一批任务
+
+    参数:
+        jobs: 任务列表（见run_batch_job），按index升序排列
+        max_workers: 并行任务数
+        ffmpeg_threads: 每个任务的FFmpeg线程数，为None时按CPU核数自动分配
+        on_progress: 进度回调 on_progress(index, stage, percent)，在调用线程中执行
+        on_result: 结果回调 on_result(result)，按index顺序依次调用
+        should_stop: 返回True时取消尚未开始的任务
+        poll_interval: 轮询进度队列的间隔（秒）
+        preprocess_cache: 预处理缓存设置 {'enabled': bool, 'max_size_mb': int}，为None时使用默认设置
+        intermediate_profile: 中间文件编码档位（见intermediate_codec），为None时使用默认设置
+        streaming: 是否使用流式管道模式（见stream_pipeline），为None时使用默认设置
+        timeline_split: 是否使用分时段渲染（见static_plate），为None时使用默认设置
+
+    返回:
+        按index排序的结果列表
+    """
+    if not jobs:
+        return []
+
+    max_workers = max(1, min(int(max_workers), len(jobs)))
+    if not ffmpeg_threads:
+        ffmpeg_threads = compute_thread_budget(max_workers)
+    print(f"【并行调度】任务数: {len(jobs)}, 并行数: {max_workers}, 每任务FFmpeg线程: {ffmpeg_threads}")
+
+    context = multiprocessing.get_context()
+    progress_queue = context.Queue()
+
+    results = {}
+    next_index_pos = 0
+    ordered_indexes = [job['index'] for job in jobs]
+    ordered_results = []
+
+    def drain_progress():
+        while True:
+            try:
+                index, stage, percent = progress_queue.get_nowait()
+            except queue.Empty:
+                return
+            except Exception:
+                return
+            if on_progress:
+                on_progress(index, stage, percent)
+
+    def release_in_order():
+        # 按排序索引依次提交已完成的结果
+        nonlocal next_index_pos
+        while next_index_pos < len(ordered_indexes) and ordered_indexes[next_index_pos] in results:
+            result = results[ordered_indexes[next_index_pos]]
+            ordered_results.append(result)
+            if on_result:
+                on_result(result)
+            next_index_pos += 1
+
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                             initializer=_init_worker,
+                             initargs=(ffmpeg_threads, progress_queue, preprocess_cache,
+                                       intermediate_profile, streaming, timeline_split)) as executor:
+        future_to_job = {executor.submit(run_batch_job, job): job for job in jobs}
+        pending = set(future_to_job)
+
+        while pending:
+            done, pending = wait(pending, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            drain_progress()
+
+            for future in done:
+                job = future_to_job[future]
+                if future.cancelled():
+                    result = {'index': job['index'], 'name': Path(job['path']).name, 'kind': job['kind'],
+                              'success': False, 'output_path': None, 'elapsed': 0.0, 'error': "已取消"}
+                else:
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {'index': job['index'], 'name': Path(job['path']).name, 'kind': job['kind'],
+                                  'success': False, 'output_path': None, 'elapsed': 0.0, 'error': str(e)}
+                results[result['index']] = result
+
+            release_in_order()
+
+            if should_stop and should_stop():
+                print("【并行调度】收到停止请求，取消尚未开始的任务")
+                for future in pending:
+                    future.cancel()
+
+        drain_progress()
+        release_in_order()
+
+    return ordered_results
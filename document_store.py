@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字幕文档存储模块
+用户文档（CSV/Excel/Markdown/TXT）或默认字幕配置每个批次只读取和解析一次，
+按语言预先筛选出有效的字幕标题和配音文本，处理每个视频时按视频索引直接取值；
+文档按 路径+大小+修改时间 缓存，文件被修改后自动重新加载
+"""
+
+import threading
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+
+import pandas as pd
+
+from utils import get_data_path, load_subtitle_config
+
+# 字幕标题所在列（与GUI中的语言选项对应）
+SUBTITLE_COLUMNS = {
+    "chinese": "zn",
+    "malay": "malay_title",
+    "thai": "title_thai"
+}
+
+# 配音文本所在列
+TTS_COLUMNS = {
+    "chinese": "cn_prompt",
+    "malay": "malay_prompt",
+    "thai": "thai_prompt"
+}
+
+# 文档中没有对应列或列中没有有效数据时使用的默认字幕
+DEFAULT_SUBTITLES = {
+    "chinese": "特价促销\n现在下单立即享受优惠",
+    "malay": "Grab cepat\nStok laris seperti roti canai",
+    "thai": "ราคาพิเศษ\nซื้อเลยอย่ารอช้า"
+}
+
+# 默认字幕配置为空时使用的内置数据
+_FALLBACK_DATA = {
+    'name': ['default'],
+    'title': ['特价促销\n现在下单立即享受优惠'],
+    'cn_prompt': ['特价促销\n现在下单立即享受优惠'],
+    'malay_prompt': ['Grab cepat\nStok laris seperti roti canai'],
+    'thai_prompt': ['ราคาพิเศษ\nซื้อเลยอย่ารอช้า']
+}
+
+# 缓存的文档数量上限
+_MAX_CACHED_DOCUMENTS = 8
+
+_DocumentFields = namedtuple('_DocumentFields', ['source', 'columns', 'row_count', 'titles', 'prompts'])
+
+
+class SubtitleDocument(_DocumentFields):
+    """
+    预先索引好的字幕文档（不可变，可在进程间传递）
+
+    titles / prompts 为 语言 -> 该语言列中所有有效文本的元组（按文档顺序），
+    文档中没有对应列时该语言不在字典中
+    """
+    __slots__ = ()
+
+    @staticmethod
+    def _pick(texts, video_index):
+        # 视频索引超出范围时使用最后一个
+        if not texts:
+            return None
+        if 0 <= video_index < len(texts):
+            return texts[video_index]
+        return texts[-1]
+
+    def subtitle_text(self, language, video_index=0):
+        """获取视频对应的字幕标题，没有对应列或有效数据时返回None"""
+        return self._pick(self.titles.get(language), video_index)
+
+    def tts_text(self, language, video_index=0):
+        """获取视频对应的配音文本，没有对应列或有效数据时返回None"""
+        if language not in TTS_COLUMNS:
+            language = "chinese"
+        return self._pick(self.prompts.get(language), video_index)
+
+
+_lock = threading.Lock()
+_documents = OrderedDict()
+
+
+def _parse_markdown_table(document_path):
+    """简单的Markdown表格解析，找不到表格返回None"""
+    with open(document_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    lines = content.strip().split('\n')
+    # 查找表格开始
+    table_started = False
+    headers = []
+    data_rows = []
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if '|' in line and not table_started:
+            # 表头行
+            headers = [h.strip() for h in line.split('|') if h.strip()]
+            table_started = True
+        elif '|' in line and table_started and not line.startswith('|---'):
+            # 数据行（跳过分隔符行）
+            if not all(c in '-|: ' for c in line):  # 不是分隔符行
+                row_data = [d.strip() for d in line.split('|') if d.strip() or d.strip() == '']
+                if len(row_data) >= len(headers):  # 确保数据列数够
+                    data_rows.append(row_data[:len(headers)])
+
+    if headers and data_rows:
+        df = pd.DataFrame(data_rows, columns=pd.Index(headers))
+        print(f"成功解析Markdown表格: {len(df)} 条记录")
+        return df
+    print("Markdown文件中未找到有效的表格格式")
+    return None
+
+
+def read_document(document_path):
+    """
+    读取用户文档为DataFrame
+
+    参数:
+        document_path: 文档路径，支持 .csv / .xlsx / .xls / .md / .txt
+
+    返回:
+        DataFrame，不支持的格式或解析失败返回None
+    """
+    try:
+        file_ext = Path(document_path).suffix.lower()
+        if file_ext == '.csv':
+            return pd.read_csv(document_path)
+        if file_ext in ['.xlsx', '.xls']:
+            return pd.read_excel(document_path)
+        if file_ext == '.md':
+            return _parse_markdown_table(document_path)
+        if file_ext == '.txt':
+            # 尝试作为CSV或制表符分隔的文件读取
+            try:
+                return pd.read_csv(document_path, delimiter='\t')  # 先尝试制表符
+            except Exception:
+                return pd.read_csv(document_path)  # 再尝试逗号
+        print(f"不支持的文档格式: {file_ext}")
+    except Exception as e:
+        print(f"加载用户文档失败: {e}")
+    return None
+
+
+def _valid_texts(df, column):
+    """筛选列中的有效文本（非空且非空字符串），返回元组"""
+    values = df[column]
+    valid = values[values.notna() & (values != "")]
+    return tuple(str(value) for value in valid.tolist())
+
+
+def build_document(df, source=None):
+    """
+    将DataFrame编译为 SubtitleDocument
+
+    参数:
+        df: 字幕数据
+        source: 数据来源（文档路径或 default），仅用于日志
+    """
+    columns = tuple(str(col) for col in df.columns)
+    titles = {}
+    for language, column in SUBTITLE_COLUMNS.items():
+        if column in df.columns:
+            texts = _valid_texts(df, column)
+            if language == "thai":
+                # 替换下划线为空格（如果泰文使用下划线占位）
+                texts = tuple(text.replace("_", " ") for text in texts)
+            titles[language] = texts
+    prompts = {}
+    for language, column in TTS_COLUMNS.items():
+        if column in df.columns:
+            prompts[language] = _valid_texts(df, column)
+    return SubtitleDocument(
+        source=str(source) if source is not None else None,
+        columns=columns,
+        row_count=len(df),
+        titles=titles,
+        prompts=prompts
+    )
+
+
+def _file_signature(path):
+    try:
+        stat = Path(path).stat()
+        return (str(Path(path).resolve()), stat.st_size, stat.st_mtime_ns)
+    except OSError:
+        return None
+
+
+def _load_default_frame():
+    """加载默认字幕配置，为空或失败时使用内置数据"""
+    try:
+        df = load_subtitle_config()
+        if df is not None and not df.empty:
+            print(f"成功加载默认字幕配置: {len(df)} 条记录")
+            print(f"默认配置列名: {list(df.columns)}")
+            return df
+        print("默认字幕配置为空或不存在")
+    except Exception as e:
+        print(f"加载默认字幕配置失败: {e}")
+    print("使用默认字幕数据")
+    return pd.DataFrame(_FALLBACK_DATA)
+
+
+def load_document_store(document_path=None):
+    """
+    加载字幕文档（按文件签名缓存，同一批次中只解析一次）
+
+    参数:
+        document_path: 用户选择的文档路径，为None、不存在或无法解析时使用默认字幕配置
+
+    返回:
+        SubtitleDocument
+    """
+    if document_path and Path(document_path).exists():
+        source = document_path
+        signature = _file_signature(document_path)
+    else:
+        source = "default"
+        signature = _file_signature(get_data_path("config") / "subtitle_utf-8.csv")
+
+    cache_key = (source == "default", signature)
+    if signature is not None:
+        with _lock:
+            document = _documents.get(cache_key)
+            if document is not None:
+                _documents.move_to_end(cache_key)
+                return document
+
+    df = None
+    if source != "default":
+        print(f"使用用户选择的文档文件: {document_path}")
+        df = read_document(document_path)
+        if df is not None:
+            print(f"成功加载用户文档: {len(df)} 条记录")
+            print(f"文档列名: {list(df.columns)}")
+        else:
+            print("无法解析用户选择的文档文件，使用默认字幕配置")
+    if df is None:
+        df = _load_default_frame()
+
+    document = build_document(df, source)
+    print(f"【字幕文档】已索引 {document.row_count} 条记录，"
+          f"字幕语言: {list(document.titles.keys())}，配音语言: {list(document.prompts.keys())}")
+
+    if signature is not None:
+        with _lock:
+            _documents[cache_key] = document
+            while len(_documents) > _MAX_CACHED_DOCUMENTS:
+                _documents.popitem(last=False)
+    return document
+
+
+def clear_document_store():
+    """清空已缓存的字幕文档"""
+    with _lock:
+        _documents.clear()
@@ -16,6 +16,9 @@ import pandas as pd
 from PIL import Image, ImageDraw, ImageFont
 import subprocess
 from log_manager import log_with_capture
+from font_registry import load_font
+from tts_backend import load_word_timings
+from tts_cache import get_tts_duration, scale_timings
 
 
 class DynamicSubtitleSystem:
@@ -275,7 +278,8 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
             return False
     
     @log_with_capture
-    def create_dynamic_subtitle(self, text, width=800, height=500, font_size=70, output_path=None, tts_audio_path=None):
+    def create_dynamic_subtitle(self, text, width=800, height=500, font_size=70, output_path=None, tts_audio_path=None,
+                                tts_tempo=None):
         """
         创建动态字幕文件（ASS格式）
         
@@ -285,7 +289,8 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
             height: 视频高度
             font_size: 字体大小
             output_path: 输出路径
-            tts_audio_path: TTS音频文件路径，用于同步分析
+            tts_audio_path: TTS音频文件路径，用于同步分析（优先使用合成时保存的逐词边界时间）
+            tts_tempo: 配音在最终编码中的裁剪/变速（tts_cache.TtsTempo），逐词时间和时长按其换算
             
         Returns:
             生成的字幕文件路径
@@ -296,15 +301,23 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
             audio_duration = 5.0  # 默认时长
             
             if tts_audio_path and os.path.exists(tts_audio_path):
-                word_timings = self._analyze_audio_timing(tts_audio_path, text)
+                # TTS合成时保存的逐词边界时间是精确值，没有时才分析音频
+                word_timings = load_word_timings(tts_audio_path)
+                if word_timings:
+                    print(f"[动态字幕] 使用TTS逐词边界时间: {len(word_timings)} 个词")
+                else:
+                    word_timings = self._analyze_audio_timing(tts_audio_path, text)
                 # 获取音频时长
-                try:
-                    import librosa
-                    y, sr = librosa.load(tts_audio_path)
-                    audio_duration = librosa.get_duration(y=y, sr=sr)
-                except:
+                audio_duration = get_tts_duration(tts_audio_path)
+                if not audio_duration:
                     # 估算时长
-                    audio_duration = len(text) / 3.0
+                    audio_duration = word_timings[-1]['end'] if word_timings else len(text) / 3.0
+                if tts_tempo:
+                    # 配音在最终编码时才裁剪和变速，逐词时间按同样的方式换算
+                    if word_timings:
+                        word_timings = scale_timings(word_timings, tts_tempo.factor, tts_tempo.offset)
+                    audio_duration = tts_tempo.duration
+                    print(f"[动态字幕] 按配音变速换算逐词时间: 系数 {tts_tempo.factor:.3f}, 裁剪开头 {tts_tempo.offset:.2f}秒")
             else:
                 # 估算时长
                 audio_duration = len(text) / 3.0
@@ -316,7 +329,7 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
                 output_path = output_path.replace('.png', '.ass')
             
             # 生成ASS字幕文件
-            ass_content = self._generate_ass_subtitle(text, audio_duration, width, height, font_size)
+            ass_content = self._generate_ass_subtitle(text, audio_duration, width, height, font_size, word_timings)
             
             # 写入文件
             with open(output_path, 'w', encoding='utf-8') as f:
@@ -329,7 +342,7 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
             print(f"创建动态字幕失败: {e}")
             return None
     
-    def _generate_ass_subtitle(self, text, duration, width, height, font_size):
+    def _generate_ass_subtitle(self, text, duration, width, height, font_size, word_timings=None):
         """
         生成ASS格式的动态字幕内容
         
@@ -339,6 +352,7 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
             width: 视频宽度
             height: 视频高度
             font_size: 字体大小
+            word_timings: 逐词时间 [{'word', 'start', 'end'}]，为None时按词数平均分配时长
             
         Returns:
             ASS字幕文件内容
@@ -365,20 +379,21 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
 """
         
         # 分析文本并生成事件
-        words = self._split_text_to_words(text)
-        if not words:
-            words = [text]
-        
-        word_duration = duration / len(words)
+        if word_timings:
+            timed_words = [(timing['word'], timing['start'], timing['end']) for timing in word_timings]
+        else:
+            words = self._split_text_to_words(text)
+            if not words:
+                words = [text]
+            
+            word_duration = duration / len(words)
+            timed_words = [(word, i * word_duration, (i + 1) * word_duration) for i, word in enumerate(words)]
         events = []
         
         # 获取动画样式
         animation_style = getattr(self, 'animation_style', '高亮放大')
         
-        for i, word in enumerate(words):
-            start_time = i * word_duration
-            end_time = (i + 1) * word_duration
-            
+        for word, start_time, end_time in timed_words:
             start_ass = self._seconds_to_ass_time(start_time)
             end_ass = self._seconds_to_ass_time(end_time)
             
@@ -448,14 +463,13 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
             单词时间戳列表
         """
         try:
-            import librosa
-            import numpy as np
-            
-            # 加载音频文件
-            y, sr = librosa.load(audio_path)
+            from audio_vad import get_speech_intervals
             
-            # 检测语音活动区域
-            intervals = librosa.effects.split(y, top_db=20)
+            # 解码音频并检测语音活动区域
+            detected = get_speech_intervals(audio_path, top_db=20)
+            if detected is None:
+                raise RuntimeError("无法解码音频")
+            intervals, audio_duration = detected
             
             # 分割文本为单词/字符
             words = self._split_text_to_words(text)
@@ -464,7 +478,7 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
             
             if len(intervals) > 0 and len(words) > 0:
                 # 将语音区间分配给单词
-                total_speech_duration = sum([(end - start) / sr for start, end in intervals])
+                total_speech_duration = sum([end - start for start, end in intervals])
                 
                 # 计算每个单词的时间分配
                 word_durations = []
@@ -477,7 +491,7 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
                     word_durations.append(max(duration, 0.1))  # 最小0.1秒
                 
                 # 分配时间戳
-                current_time = intervals[0][0] / sr if len(intervals) > 0 else 0
+                current_time = intervals[0][0] if len(intervals) > 0 else 0
                 
                 for i, (word, duration) in enumerate(zip(words, word_durations)):
                     timing_info.append({
@@ -488,14 +502,8 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
                     current_time += duration
             else:
                 # 回退到简单时间分割
-                duration = librosa.get_duration(y=y, sr=sr)
-                return self.analyze_text_timing(text, duration, 'chinese')
+                return self.analyze_text_timing(text, audio_duration, 'chinese')
                     
-        except ImportError:
-            print("警告: librosa未安装，使用估算时间")
-            # 估算音频时长（假设每秒3个字符）
-            estimated_duration = len(text) / 3.0
-            return self.analyze_text_timing(text, estimated_duration, 'chinese')
         except Exception as e:
             print(f"音频时间分析失败: {e}")
             # 回退到简单时间分割
@@ -543,15 +551,15 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
     
     def _load_font(self, font_size: int):
         """
-        加载字体
+        加载字体（通过字体注册表共享已加载的字体对象）
         """
         try:
             # 尝试加载系统字体
-            return ImageFont.truetype("arial.ttf", font_size)
+            return load_font("arial.ttf", font_size)
         except:
             try:
                 # 尝试加载中文字体
-                return ImageFont.truetype("simhei.ttf", font_size)
+                return load_font("simhei.ttf", font_size)
             except:
                 # 使用默认字体
                 return ImageFont.load_default()
@@ -574,7 +582,7 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
                     # 当前朗读单词：放大并高亮
                     highlight_font_size = int(font.size * getattr(self, 'animation_intensity', 1.5))
                     try:
-                        highlight_font = ImageFont.truetype(font.path, highlight_font_size)
+                        highlight_font = load_font(font.path, highlight_font_size)
                     except:
                         highlight_font = font
                     
@@ -795,7 +803,8 @@ class DynamicSubtitleProcessor:
             
         return subtitle_events
     
-    def create_dynamic_subtitle(self, text, width=800, height=500, font_size=70, output_path=None, tts_audio_path=None):
+    def create_dynamic_subtitle(self, text, width=800, height=500, font_size=70, output_path=None, tts_audio_path=None,
+                                tts_tempo=None):
         """
         创建动态字幕
         """
@@ -810,7 +819,8 @@ class DynamicSubtitleProcessor:
             height=height,
             font_size=font_size,
             output_path=output_path,
-            tts_audio_path=tts_audio_path
+            tts_audio_path=tts_audio_path,
+            tts_tempo=tts_tempo
         )
 
 
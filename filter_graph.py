@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FFmpeg滤镜图构建模块
+原来的滤镜图由字符串片段拼接而成，输入序号、中间标签和最终的 null[v] 都要手工维护，同一个素材还可能被重复计数。
+这里用节点和连线描述滤镜图：输入按路径去重并自动编号，中间标签自动分配，生成 -filter_complex 字符串前
+由优化器删除无效节点（null、没有参数的trim、scale=iw*1.0:ih*1.0 等）和输出未被使用的节点，并检查连线是否完整。
+
+用法:
+    graph = FilterGraph()
+    source = graph.input(video_path)
+    logo = graph.input(logo_path)
+    base = graph.filter(['scale=1080:1920', 'format=yuv420p'], source.video)
+    video = graph.filter('overlay=x=10:y=10', base, graph.filter('format=yuva420p', logo.video))
+    cmd = ['ffmpeg', '-y'] + graph.input_args() + ['-filter_complex', graph.render({'v': video}), '-map', '[v]']
+"""
+
+import re
+from collections import namedtuple
+
+# 滤镜图中的一个连接端点：输入流（如 "0:v"）或滤镜输出标签
+Pad = namedtuple('Pad', ['label'])
+
+# 滤镜节点：按顺序串联的滤镜列表、输入端点列表、输出端点列表
+Node = namedtuple('Node', ['filters', 'inputs', 'outputs'])
+
+# 无参数时不改变画面或声音的滤镜
+_NOOP_FILTERS = {'null', 'anull', 'copy', 'acopy'}
+
+# scale 的宽高参数保持原尺寸（iw、iw*1、iw*1.0 等）
+_IDENTITY_SCALE = re.compile(r"^(w=)?iw(\*1(\.0*)?)?:(h=)?ih(\*1(\.0*)?)?(:flags=\w+)?$")
+
+
+class Input(namedtuple('Input', ['index'])):
+    """滤镜图的一个输入文件"""
+
+    @property
+    def video(self):
+        return Pad(f"{self.index}:v")
+
+    @property
+    def audio(self):
+        return Pad(f"{self.index}:a")
+
+    def stream(self, specifier):
+        """指定的流，如 stream('a:0')"""
+        return Pad(f"{self.index}:{specifier}")
+
+
+def is_noop_filter(filter_text):
+    """滤镜是否不改变输入（可以在优化时删除）"""
+    name, _, args = filter_text.partition('=')
+    name = name.strip()
+    args = args.strip()
+    if name in _NOOP_FILTERS:
+        return True
+    if name in ('trim', 'atrim'):
+        # 没有参数或只从0开始的trim不裁剪任何内容
+        return not args or args in ('start=0', 'start=0.0')
+    if name in ('setpts', 'asetpts'):
+        return args == 'PTS'
+    if name == 'scale':
+        return bool(_IDENTITY_SCALE.match(args))
+    return False
+
+
+class FilterGraph:
+    """
+    FFmpeg滤镜图
+
+    输入按（输入选项, 路径）去重，序号按添加顺序分配；filter() 返回输出端点，
+    render() 优化并生成 -filter_complex 字符串，最终输出使用调用方指定的标签名
+    """
+
+    def __init__(self, label_prefix="n"):
+        self._inputs = []
+        self._nodes = []
+        self._label_prefix = label_prefix
+        self._next_label = 0
+
+    @property
+    def input_count(self):
+        return len(self._inputs)
+
+    def input(self, path, options=()):
+        """
+        添加输入文件（相同路径和选项只添加一次）
+
+        参数:
+            path: 输入文件路径
+            options: 写在 -i 之前的输入选项，如 ('-stream_loop', '-1')
+
+        返回:
+            Input
+        """
+        key = (tuple(str(option) for option in options), str(path))
+        if key in self._inputs:
+            return Input(self._inputs.index(key))
+        self._inputs.append(key)
+        return Input(len(self._inputs) - 1)
+
+    def input_args(self):
+        """所有输入的命令行参数（-i 及其输入选项）"""
+        args = []
+        for options, path in self._inputs:
+            args.extend(options)
+            args.extend(['-i', path])
+        return args
+
+    def _new_pad(self):
+        pad = Pad(f"{self._label_prefix}{self._next_label}")
+        self._next_label += 1
+        return pad
+
+    def filter(self, filters, *inputs, outputs=1):
+        """
+        添加滤镜节点
+
+        参数:
+            filters: 滤镜（字符串）或按顺序串联的滤镜列表
+            inputs: 输入端点
+            outputs: 输出端点数量（如 split 为2）
+
+        返回:
+            输出端点；outputs大于1时返回端点元组
+        """
+        if isinstance(filters, str):
+            filters = [filters]
+        filters = [text for text in filters if text]
+        output_pads = tuple(self._new_pad() for _ in range(outputs))
+        self._nodes.append(Node(list(filters), list(inputs), list(output_pads)))
+        return output_pads[0] if outputs == 1 else output_pads
+
+    def _optimize(self, outputs):
+        """删除无效滤镜、空节点和输出未被使用的节点，返回 (节点列表, 端点重命名表)"""
+        nodes = [Node([text for text in node.filters if not is_noop_filter(text)], list(node.inputs), list(node.outputs))
+                 for node in self._nodes]
+        requested = {pad.label for pad in outputs.values()}
+
+        # 没有剩余滤镜的单输入单输出节点：下游直接连接到它的输入
+        alias = {}
+        kept = []
+        for node, original in zip(nodes, self._nodes):
+            inputs = [Pad(alias.get(pad.label, pad.label)) for pad in node.inputs]
+            node = Node(node.filters, inputs, node.outputs)
+            if not node.filters and len(node.inputs) == 1 and len(node.outputs) == 1:
+                source = node.inputs[0].label
+                # 最终输出直接来自输入文件时，需要保留一个null节点才能使用输出标签
+                if not (node.outputs[0].label in requested and self._is_input_stream(source)):
+                    alias[node.outputs[0].label] = source
+                    continue
+                node = Node(['anull' if self._is_audio(source, original.filters) else 'null'], node.inputs, node.outputs)
+            kept.append(node)
+
+        outputs = {name: Pad(alias.get(pad.label, pad.label)) for name, pad in outputs.items()}
+
+        # 从最终输出反向保留被用到的节点
+        needed = {pad.label for pad in outputs.values()}
+        live = []
+        for node in reversed(kept):
+            if any(pad.label in needed for pad in node.outputs):
+                live.append(node)
+                needed.update(pad.label for pad in node.inputs)
+        live.reverse()
+        return live, outputs
+
+    @staticmethod
+    def _is_input_stream(label):
+        return bool(re.match(r"^\d+:", label))
+
+    @staticmethod
+    def _is_audio(label, filters):
+        """端点是否为音频：输入的音频流，或被删除的滤镜是音频滤镜（anull、atrim等）"""
+        if re.match(r"^\d+:a", label):
+            return True
+        return any(text.partition('=')[0].strip() in ('anull', 'acopy', 'atrim', 'asetpts') for text in filters)
+
+    def render(self, outputs):
+        """
+        生成 -filter_complex 字符串
+
+        参数:
+            outputs: {输出标签名: 端点}，如 {'v': video, 'aout': audio}，命令中用 -map '[v]' 引用
+
+        返回:
+            滤镜图字符串
+
+        异常:
+            ValueError: 连线不完整（使用了不存在的端点、端点被多次使用或输出未连接）
+        """
+        nodes, outputs = self._optimize(outputs)
+
+        rename = {}
+        for name, pad in outputs.items():
+            if self._is_input_stream(pad.label):
+                raise ValueError(f"输出 {name} 直接来自输入流 {pad.label}")
+            if pad.label in rename:
+                raise ValueError(f"输出 {name} 与 {rename[pad.label]} 使用同一个端点")
+            rename[pad.label] = name
+
+        produced = set()
+        consumed = set()
+        parts = []
+        for node in nodes:
+            for pad in node.inputs:
+                if not self._is_input_stream(pad.label):
+                    if pad.label not in produced:
+                        raise ValueError(f"端点 {pad.label} 在使用前没有被任何滤镜输出")
+                    if pad.label in consumed:
+                        raise ValueError(f"端点 {pad.label} 被多次使用（需要split）")
+                    consumed.add(pad.label)
+                elif int(pad.label.split(':')[0]) >= len(self._inputs):
+                    raise ValueError(f"输入流 {pad.label} 不存在")
+            produced.update(pad.label for pad in node.outputs)
+            inputs = "".join(f"[{rename.get(pad.label, pad.label)}]" for pad in node.inputs)
+            output_labels = "".join(f"[{rename.get(pad.label, pad.label)}]" for pad in node.outputs)
+            parts.append(f"{inputs}{','.join(node.filters)}{output_labels}")
+
+        unused = produced - consumed - set(rename)
+        if unused:
+            raise ValueError(f"端点没有连接: {', '.join(sorted(unused))}")
+        return ";".join(parts)
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字体注册表模块
+启动后只扫描一次应用字体目录（data/fonts、data/fonts/new）和系统字体目录，按文件名和字体族建立索引；
+字体路径的解析结果和已加载的 FreeTypeFont 对象（按 路径+字号 缓存）在各处共享，
+应用字体目录的修改时间变化（例如用户往字体目录中添加了字体）时自动重建索引并清空缓存
+"""
+
+import os
+import sys
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from PIL import ImageFont
+
+from utils import get_app_path, get_data_path, ensure_dir
+
+# 字体文件扩展名
+_FONT_SUFFIXES = ('.ttf', '.otf', '.ttc')
+
+# 已加载字体对象的缓存上限
+_MAX_LOADED_FONTS = 64
+
+# 系统字体目录中优先使用的常见字体
+_COMMON_FONTS = [
+    'Arial.ttf',
+    'Helvetica.ttf',
+    'DejaVuSans.ttf',
+    'FreeSans.ttf',
+    'NotoSans-Regular.ttf',
+    'OpenSans-Regular.ttf',
+    'LiberationSans-Regular.ttf',
+    'Times.ttf',
+    'TimesNewRoman.ttf',
+    'Georgia.ttf',
+    'Verdana.ttf',
+    'Tahoma.ttf',
+    'Calibri.ttf',
+    'SFPro.ttf',
+    'SFProText-Regular.ttf',
+    'SFProDisplay-Regular.ttf',
+    'PingFang.ttc',
+    'PingFangSC-Regular.ttf',
+    'STHeiti-Light.ttc',
+    'STHeiti-Regular.ttc',
+    'Menlo-Regular.ttf',
+    'Monaco.ttf',
+    'Consolas.ttf',
+    'CourierNew.ttf'
+]
+
+_lock = threading.RLock()
+_index = None
+_signature = None
+_resolved_paths = {}
+_loaded_fonts = OrderedDict()
+
+
+def _app_font_dirs():
+    """应用字体目录（按优先级排列，去重）"""
+    candidates = [
+        Path(get_data_path()) / "fonts",
+        Path(get_data_path()) / "fonts/new",  # 新增字体目录
+        get_app_path() / "data/fonts",
+        get_app_path() / "data/fonts/new",
+        Path.cwd() / "data/fonts",
+        Path.cwd() / "data/fonts/new",
+        Path.cwd() / "VideoApp/data/fonts",
+        Path.cwd() / "VideoApp/data/fonts/new",
+    ]
+    dirs = []
+    seen = set()
+    for directory in candidates:
+        try:
+            key = str(directory.resolve())
+        except OSError:
+            key = str(directory)
+        if key not in seen:
+            seen.add(key)
+            dirs.append(directory)
+    return dirs
+
+
+def _system_font_dirs():
+    """系统字体目录"""
+    if sys.platform == 'darwin':
+        return [
+            Path('/System/Library/Fonts'),
+            Path('/Library/Fonts'),
+            Path.home() / 'Library/Fonts'
+        ]
+    if sys.platform == 'win32':
+        windir = Path(os.environ.get('WINDIR', 'C:\\Windows'))
+        return [windir / 'Fonts']
+    return [
+        Path('/usr/share/fonts'),
+        Path('/usr/local/share/fonts'),
+        Path.home() / '.fonts'
+    ]
+
+
+def _family_of(file_name):
+    """根据文件名推断字体族，如 Kanit-Bold.ttf -> kanit"""
+    stem = Path(file_name).stem
+    return stem.split('-')[0].split('_')[0].lower()
+
+
+def _dirs_signature():
+    """应用字体目录的修改时间签名，用于判断索引是否失效"""
+    signature = []
+    for directory in _app_font_dirs():
+        try:
+            signature.append((str(directory), directory.stat().st_mtime_ns))
+        except OSError:
+            signature.append((str(directory), None))
+    return tuple(signature)
+
+
+def _list_fonts(directory, recursive=False):
+    """列出目录中的字体文件（保持目录遍历顺序）"""
+    try:
+        entries = directory.rglob('*') if recursive else directory.iterdir()
+        return [f for f in entries if f.is_file() and f.suffix.lower() in _FONT_SUFFIXES]
+    except OSError as e:
+        print(f"【字体注册表】读取字体目录失败 {directory}: {e}")
+        return []
+
+
+def build_font_index():
+    """
+    扫描应用字体目录和系统字体目录，建立字体索引
+
+    返回:
+        索引字典:
+            app_dirs: [(目录, [字体文件...])]，按优先级排列
+            system_dirs: [(目录, [字体文件...])]，只包含目录第一层的字体
+            by_name: 小写文件名 -> 路径（应用字体优先于系统字体）
+            by_family: 字体族 -> [路径...]
+    """
+    app_dirs = []
+    for directory in _app_font_dirs():
+        if directory.exists():
+            app_dirs.append((directory, _list_fonts(directory)))
+
+    system_dirs = []
+    system_fonts = []
+    for directory in _system_font_dirs():
+        if directory.exists():
+            system_dirs.append((directory, _list_fonts(directory)))
+            system_fonts.extend(_list_fonts(directory, recursive=True))
+
+    by_name = {}
+    by_family = {}
+    for font_file in [f for _, fonts in app_dirs for f in fonts] + system_fonts:
+        by_name.setdefault(font_file.name.lower(), font_file)
+        by_family.setdefault(_family_of(font_file.name), []).append(font_file)
+
+    print(f"【字体注册表】已索引 {len(by_name)} 个字体文件（应用目录 {len(app_dirs)} 个，系统目录 {len(system_dirs)} 个）")
+    return {
+        'app_dirs': app_dirs,
+        'system_dirs': system_dirs,
+        'by_name': by_name,
+        'by_family': by_family
+    }
+
+
+def _get_index():
+    """获取字体索引，应用字体目录变化时重建并清空解析和加载缓存"""
+    global _index, _signature
+    with _lock:
+        signature = _dirs_signature()
+        if _index is None or signature != _signature:
+            if _index is not None:
+                print("【字体注册表】检测到字体目录变化，重新建立索引")
+            _index = build_font_index()
+            _signature = signature
+            _resolved_paths.clear()
+            _loaded_fonts.clear()
+        return _index
+
+
+def invalidate_font_registry():
+    """强制下次使用时重建字体索引"""
+    global _index
+    with _lock:
+        _index = None
+
+
+def _copy_to_app_fonts(font_path):
+    """将系统字体复制到应用程序字体目录，失败时返回原路径"""
+    try:
+        app_fonts_dir = Path(get_data_path()) / "fonts"
+        ensure_dir(str(app_fonts_dir))
+        dest_path = app_fonts_dir / font_path.name
+        if not dest_path.exists():
+            shutil.copy2(str(font_path), str(dest_path))
+            print(f"已将系统字体复制到应用程序目录: {dest_path}")
+        return str(dest_path)
+    except Exception as e:
+        print(f"复制字体失败: {e}")
+        return str(font_path)
+
+
+def _search_font_file(font_path, index):
+    """按 find_font_file 的查找顺序，在索引中查找字体文件"""
+    # 如果是绝对路径且文件存在，直接返回
+    font_path_obj = Path(font_path)
+    if font_path_obj.is_absolute() and font_path_obj.exists():
+        return str(font_path)
+
+    # 尝试不同的基础路径
+    possible_paths = [
+        font_path_obj,  # 原始路径
+        get_app_path() / font_path,  # 相对于应用程序路径
+        Path.cwd() / font_path,  # 相对于当前工作目录
+        Path(get_data_path()) / font_path,  # 相对于数据目录
+        get_app_path() / "VideoApp" / font_path,  # VideoApp子目录
+        Path.cwd() / "VideoApp" / font_path,  # 当前目录下的VideoApp子目录
+        Path(__file__).parent.parent / font_path,
+        Path(__file__).parent / font_path,
+    ]
+    for path in possible_paths:
+        if path.exists():
+            return str(path)
+
+    # 在应用字体目录中查找：精确匹配 > 粗体字体 > 任意字体
+    font_filename = font_path_obj.name
+    for directory, fonts in index['app_dirs']:
+        for font_file in fonts:
+            if font_file.name == font_filename:
+                return str(font_file)
+        if fonts:
+            bold_fonts = [f for f in fonts if 'bold' in f.name.lower()]
+            selected_font = bold_fonts[0] if bold_fonts else fonts[0]
+            print(f"找不到指定字体，使用{'粗体' if bold_fonts else '可用'}字体: {selected_font}")
+            return str(selected_font)
+
+    # 在系统字体目录中查找常见字体，其次使用目录中的第一个字体
+    for directory, fonts in index['system_dirs']:
+        names = {f.name: f for f in fonts}
+        for font_name in _COMMON_FONTS:
+            if font_name in names:
+                print(f"找到系统字体: {names[font_name]}")
+                return _copy_to_app_fonts(names[font_name])
+        if fonts:
+            print(f"使用系统中找到的第一个字体: {fonts[0]}")
+            return _copy_to_app_fonts(fonts[0])
+
+    return None
+
+
+def find_font(font_path):
+    """
+    查找字体文件（结果缓存，字体目录变化时失效）
+
+    参数:
+        font_path: 字体路径，可以是相对路径或绝对路径
+
+    返回:
+        找到的字体文件路径，如果没找到则返回None
+    """
+    index = _get_index()
+    key = str(font_path)
+    with _lock:
+        if key in _resolved_paths:
+            return _resolved_paths[key]
+
+    resolved = _search_font_file(font_path, index)
+    if resolved:
+        print(f"找到字体文件: {resolved}")
+    else:
+        print(f"找不到字体文件: {font_path}")
+
+    with _lock:
+        _resolved_paths[key] = resolved
+    return resolved
+
+
+def lookup_font(name):
+    """
+    按文件名或字体族在索引中查找字体（不回退到其他字体）
+
+    参数:
+        name: 字体文件名（如 arial.ttf，不区分大小写）或字体族（如 Kanit）
+
+    返回:
+        字体文件路径，未找到返回None
+    """
+    index = _get_index()
+    font_file = index['by_name'].get(Path(name).name.lower())
+    if font_file is None:
+        candidates = index['by_family'].get(_family_of(name))
+        if candidates:
+            bold = [f for f in candidates if 'bold' in f.name.lower()]
+            font_file = bold[0] if bold else candidates[0]
+    return str(font_file) if font_file else None
+
+
+def load_font(font, size):
+    """
+    加载字体对象（按 路径+字号 缓存）
+
+    参数:
+        font: 字体文件路径或字体名称（如 arial.ttf）
+        size: 字号
+
+    返回:
+        FreeTypeFont 对象，加载失败时抛出与 ImageFont.truetype 相同的异常
+    """
+    _get_index()
+    font_path = str(font)
+    if not Path(font_path).exists():
+        # 按名称在索引中查找，找不到时交给FreeType按名称查找系统字体
+        font_path = lookup_font(font_path) or font_path
+
+    key = (font_path, int(size))
+    with _lock:
+        cached = _loaded_fonts.get(key)
+        if cached is not None:
+            _loaded_fonts.move_to_end(key)
+            return cached
+
+    loaded = ImageFont.truetype(font_path, int(size))
+
+    with _lock:
+        _loaded_fonts[key] = loaded
+        while len(_loaded_fonts) > _MAX_LOADED_FONTS:
+            _loaded_fonts.popitem(last=False)
+    return loaded
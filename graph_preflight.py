@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+滤镜图预检模块
+最终编码的滤镜图有误（语法错误、引用了不存在的音频流、素材格式无法读取等）时，原来要等编码器处理完一部分画面
+才报错，之后备用方案又从头开始编码。预检用完全相同的输入、滤镜图和编码参数只处理几帧并输出到 -f null，
+有问题的配置在正式编码前就会失败，调用方可以直接选择回退路径。
+
+预检通过的滤镜图按"结构"记录到磁盘：结构只包含滤镜图和参数的形状（数字和路径被归一化）、各输入的类型
+以及被引用的音频流是否存在，同一批次中只有字幕文字、位置、时长不同的任务不再重复预检。
+
+可通过 set_graph_preflight 或环境变量 VIDEO_GRAPH_PREFLIGHT=0 关闭
+"""
+
+import os
+import re
+import time
+import uuid
+import shutil
+import hashlib
+import subprocess
+from pathlib import Path
+
+from utils import get_data_path, has_audio_stream, _apply_thread_budget
+
+# 结构格式版本，结构的计算方式发生变化时需要递增，使旧记录失效
+_SHAPE_VERSION = 1
+
+# 预检处理的帧数
+PREFLIGHT_FRAMES = 3
+
+# 预检超时（秒），超时视为无法判断，由正式编码决定
+PREFLIGHT_TIMEOUT = 60
+
+# 输出封装参数：预检输出到 -f null，这些MP4封装参数不适用
+_MUXER_OPTIONS = {'-movflags', '-brand', '-f'}
+
+_NUMBER = re.compile(r"-?\d+(\.\d+)?")
+
+_preflight_enabled = os.environ.get("VIDEO_GRAPH_PREFLIGHT", "1") != "0"
+
+
+def set_graph_preflight(enabled):
+    """开启或关闭滤镜图预检"""
+    global _preflight_enabled
+    _preflight_enabled = bool(enabled)
+
+
+def is_graph_preflight_enabled():
+    """是否在正式编码前预检滤镜图"""
+    return _preflight_enabled
+
+
+def get_preflight_cache_dir():
+    """获取预检记录目录"""
+    return get_data_path("cache/graph_preflight")
+
+
+def _split_command(command):
+    """
+    拆分FFmpeg命令为 (输入列表 [(输入选项, 路径)], 其他参数)
+
+    与FFmpeg的规则一致：上一个输入路径之后、下一个 -i 之前的所有参数（可以有多组选项）都是下一个输入的选项，
+    最后一个输入之后的参数和 -y 属于其他参数
+    """
+    inputs = []
+    others = []
+    pending = []
+    args = list(command[1:])
+    index = 0
+    while index < len(args):
+        arg = str(args[index])
+        if arg == '-i' and index + 1 < len(args):
+            inputs.append((pending, str(args[index + 1])))
+            pending = []
+            index += 2
+            continue
+        if arg == '-y':
+            others.append(arg)
+        else:
+            pending.append(arg)
+        index += 1
+    return inputs, others + pending
+
+
+def graph_shape_key(command):
+    """
+    计算FFmpeg命令（不含输出路径）的结构哈希
+
+    返回:
+        结构哈希字符串，无法计算时返回None
+    """
+    try:
+        inputs, others = _split_command(command)
+        text = " ".join(others)
+        ffmpeg_path = shutil.which(str(command[0])) or str(command[0])
+        ffmpeg_mtime = int(os.path.getmtime(ffmpeg_path)) if os.path.exists(ffmpeg_path) else 0
+        shape = [f"v{_SHAPE_VERSION}", f"{ffmpeg_path}@{ffmpeg_mtime}"]
+        for input_index, (options, path) in enumerate(inputs):
+            suffix = Path(path).suffix.lower()
+            audio = ""
+            if re.search(rf"(^|[\[\s]){input_index}:a", text):
+                audio = "+a" if has_audio_stream(path) else "-a"
+            shape.append(f"{' '.join(options)}|{suffix}{audio}")
+        shape.append(_NUMBER.sub("#", text))
+        return hashlib.blake2b("\n".join(shape).encode('utf-8'), digest_size=20).hexdigest()
+    except Exception as e:
+        print(f"【滤镜预检】计算结构哈希失败: {e}")
+        return None
+
+
+def _shape_entry(key):
+    return get_preflight_cache_dir() / f"{key}.ok"
+
+
+def is_known_good(key):
+    """该结构的滤镜图是否已预检通过"""
+    return bool(key) and _shape_entry(key).exists()
+
+
+def mark_known_good(key):
+    """记录预检通过的结构（先写临时文件再原子替换）"""
+    if not key:
+        return
+    entry = _shape_entry(key)
+    temp_entry = entry.with_name(f"{key}.{uuid.uuid4().hex}.tmp")
+    try:
+        temp_entry.write_text(time.strftime("%Y-%m-%d %H:%M:%S"), encoding='utf-8')
+        os.replace(temp_entry, entry)
+    except OSError as e:
+        print(f"【滤镜预检】写入记录失败: {e}")
+        try:
+            temp_entry.unlink()
+        except OSError:
+            pass
+
+
+def _null_output_command(command, frames=PREFLIGHT_FRAMES):
+    """把正式编码命令（不含输出路径）改为只处理几帧并输出到 -f null"""
+    inputs, _ = _split_command(command)
+    input_count = len(inputs)
+    probe_cmd = []
+    args = list(command)
+    index = 0
+    seen_inputs = 0
+    while index < len(args):
+        arg = str(args[index])
+        if arg == '-i':
+            seen_inputs += 1
+        elif seen_inputs >= input_count and arg in _MUXER_OPTIONS and index + 1 < len(args):
+            index += 2
+            continue
+        probe_cmd.append(args[index])
+        index += 1
+    return _apply_thread_budget(probe_cmd + ['-frames:v', str(frames), '-f', 'null', '-'])
+
+
+def preflight_graph(command, frames=PREFLIGHT_FRAMES, timeout=PREFLIGHT_TIMEOUT):
+    """
+    用正式编码的命令只处理几帧，检查滤镜图和编码参数能否正常运行
+
+    参数:
+        command: 正式编码的FFmpeg命令列表（输入、滤镜图、映射和编码参数，不含输出路径）
+        frames: 处理的帧数
+        timeout: 超时（秒）
+
+    返回:
+        bool: 预检失败返回False；通过、已知结构、未启用或无法判断（超时、无法启动）时返回True
+    """
+    if not _preflight_enabled:
+        return True
+    key = graph_shape_key(command)
+    if is_known_good(key):
+        print("【滤镜预检】滤镜图结构已验证，跳过预检")
+        return True
+
+    probe_cmd = _null_output_command(command, frames)
+    start_time = time.time()
+    try:
+        result = subprocess.run(probe_cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, text=True, errors='ignore', timeout=timeout)
+    except subprocess.TimeoutExpired:
+        print(f"【滤镜预检】预检超时（{timeout}秒），由正式编码决定")
+        return True
+    except OSError as e:
+        print(f"【滤镜预检】无法执行预检: {e}")
+        return True
+    elapsed = time.time() - start_time
+
+    if result.returncode != 0:
+        error_text = (result.stderr or "").strip()
+        print(f"【滤镜预检】预检失败（{elapsed:.2f}秒），跳过正式编码")
+        if error_text:
+            print(f"错误信息: {error_text[-1000:]}")
+        return False
+
+    print(f"【滤镜预检】预检通过（{elapsed:.2f}秒）")
+    mark_known_good(key)
+    return True
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+叠加图片缓存模块
+字幕图片和圆角矩形背景只取决于文本、样式、字体和尺寸参数，同一批次中大量视频会生成完全相同的图片，
+因此按参数生成缓存键，渲染结果同时保存在进程内存（PNG字节）和磁盘缓存目录中，命中时直接写出到目标路径
+"""
+
+import os
+import json
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+
+from utils import get_data_path
+
+# 渲染版本，字幕或背景的绘制逻辑发生变化时需要递增，使旧缓存失效
+_RENDER_VERSION = 2
+
+# 内存缓存条目上限
+_MAX_MEMORY_ENTRIES = 256
+
+# 磁盘缓存文件数量上限
+_MAX_DISK_ENTRIES = 2000
+
+_memory_cache = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def get_image_cache_dir():
+    """获取图片缓存目录"""
+    return get_data_path("cache/images")
+
+
+def make_image_cache_key(kind, **params):
+    """
+    根据图片类型和渲染参数生成缓存键
+
+    参数:
+        kind: 图片类型，如 subtitle / background
+        params: 影响渲染结果的全部参数（需可JSON序列化，元组会转换为列表）
+
+    返回:
+        十六进制缓存键
+    """
+    payload = json.dumps({'kind': kind, 'version': _RENDER_VERSION, 'params': params},
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=20).hexdigest()
+
+
+def _remember(key, data):
+    with _memory_lock:
+        _memory_cache[key] = data
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > _MAX_MEMORY_ENTRIES:
+            _memory_cache.popitem(last=False)
+
+
+def fetch_cached_image(key, output_path):
+    """
+    查找缓存的图片，命中时写出到output_path
+
+    返回:
+        命中返回output_path，未命中返回None
+    """
+    if not key:
+        return None
+
+    with _memory_lock:
+        data = _memory_cache.get(key)
+        if data is not None:
+            _memory_cache.move_to_end(key)
+
+    entry = get_image_cache_dir() / f"{key}.png"
+    if data is None:
+        try:
+            data = entry.read_bytes()
+        except OSError:
+            return None
+        _remember(key, data)
+        try:
+            # 更新修改时间，作为淘汰依据
+            os.utime(entry, None)
+        except OSError:
+            pass
+
+    try:
+        Path(output_path).write_bytes(data)
+    except OSError as e:
+        print(f"【图片缓存】写出缓存图片失败: {e}")
+        return None
+    print(f"【图片缓存】命中缓存: {Path(output_path).name}")
+    return output_path
+
+
+def store_cached_image(key, image_path):
+    """将渲染好的图片写入内存和磁盘缓存"""
+    if not key or not image_path:
+        return
+    try:
+        data = Path(image_path).read_bytes()
+    except OSError as e:
+        print(f"【图片缓存】读取图片失败: {e}")
+        return
+    _remember(key, data)
+
+    entry = get_image_cache_dir() / f"{key}.png"
+    temp_entry = entry.with_name(f"{key}.{uuid.uuid4().hex}.tmp")
+    try:
+        temp_entry.write_bytes(data)
+        os.replace(temp_entry, entry)
+    except OSError as e:
+        print(f"【图片缓存】写入磁盘缓存失败: {e}")
+        try:
+            temp_entry.unlink()
+        except OSError:
+            pass
+        return
+    _evict_disk_cache(_MAX_DISK_ENTRIES)
+
+
+def _evict_disk_cache(max_entries):
+    """磁盘缓存文件超出上限时，删除最久未使用的文件"""
+    try:
+        entries = list(get_image_cache_dir().glob("*.png"))
+        if len(entries) <= max_entries:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - max_entries]:
+            try:
+                entry.unlink()
+            except OSError:
+                pass
+    except Exception as e:
+        print(f"【图片缓存】清理缓存失败: {e}")
+
+
+def clear_image_cache():
+    """清空图片缓存（内存和磁盘）"""
+    with _memory_lock:
+        _memory_cache.clear()
+    removed = 0
+    for entry in get_image_cache_dir().iterdir():
+        if entry.suffix in (".png", ".tmp"):
+            try:
+                entry.unlink()
+                removed += 1
+            except OSError:
+                pass
+    return removed
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+中间文件编码档位模块
+无法使用单次渲染时（如文件夹拼接、单次渲染失败回退），预处理结果需要先写成中间文件再进行最终编码。
+默认的 libx264 ultrafast 有损中间文件会让画面经历两次有损压缩，这里提供几种可选的中间文件档位：
+
+    h264           libx264 ultrafast（原有参数，文件小、与旧缓存兼容，但有损）
+    x264_lossless  libx264 -qp 0 ultrafast（无损，编码快，文件约为有损的数倍）
+    ffv1           FFV1 帧内无损（解码快、CPU占用低，文件较大）
+    nut            原始YUV帧封装在NUT中（几乎不占CPU，但每秒约90MB），写到tmpfs（/dev/shm）
+
+可通过 set_intermediate_profile 或环境变量 VIDEO_INTERMEDIATE 选择；
+命令行 python intermediate_codec.py benchmark [视频] 对比各档位的编码/解码耗时、CPU时间和文件大小
+"""
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+from pathlib import Path
+
+# 默认档位（与原有行为一致）
+DEFAULT_PROFILE = "h264"
+
+# tmpfs目录及写入前需要保留的剩余空间
+TMPFS_DIR = "/dev/shm"
+TMPFS_RESERVE_BYTES = 512 * 1024 * 1024
+
+# 估算原始帧大小时使用的默认帧率
+DEFAULT_FPS = 30
+
+# 中间文件的音频编码：后续步骤在没有背景音乐时会直接复制音频流到MP4，因此使用AAC而不是PCM
+_AUDIO_ARGS = ['-c:a', 'aac', '-b:a', '192k']
+
+INTERMEDIATE_PROFILES = {
+    "h264": {
+        "label": "H.264 ultrafast（有损）",
+        "suffix": ".mp4",
+        # None表示沿用调用方原有的编码参数
+        "video": None,
+        "audio": [],
+        "tmpfs": False,
+        "cacheable": True
+    },
+    "x264_lossless": {
+        "label": "H.264 无损（-qp 0）",
+        "suffix": ".mkv",
+        "video": ['-c:v', 'libx264', '-preset', 'ultrafast', '-qp', '0', '-pix_fmt', 'yuv420p'],
+        "audio": _AUDIO_ARGS,
+        "tmpfs": False,
+        "cacheable": True
+    },
+    "ffv1": {
+        "label": "FFV1 无损",
+        "suffix": ".mkv",
+        "video": ['-c:v', 'ffv1', '-level', '3', '-g', '1', '-slices', '16', '-slicecrc', '0', '-pix_fmt', 'yuv420p'],
+        "audio": _AUDIO_ARGS,
+        "tmpfs": False,
+        "cacheable": True
+    },
+    "nut": {
+        "label": "原始帧 NUT（tmpfs）",
+        "suffix": ".nut",
+        "video": ['-c:v', 'rawvideo', '-pix_fmt', 'yuv420p'],
+        "audio": _AUDIO_ARGS,
+        "tmpfs": True,
+        # 原始帧体积过大，不写入预处理缓存
+        "cacheable": False
+    }
+}
+
+_profile = os.environ.get("VIDEO_INTERMEDIATE", DEFAULT_PROFILE)
+if _profile not in INTERMEDIATE_PROFILES:
+    _profile = DEFAULT_PROFILE
+
+
+def set_intermediate_profile(profile):
+    """
+    设置当前进程使用的中间文件档位
+
+    参数:
+        profile: 档位名称（见 INTERMEDIATE_PROFILES），None表示恢复默认
+    """
+    global _profile
+    profile = profile or DEFAULT_PROFILE
+    if profile not in INTERMEDIATE_PROFILES:
+        raise ValueError(f"未知的中间文件档位: {profile}")
+    _profile = profile
+
+
+def get_intermediate_profile(profile=None):
+    """返回档位名称：指定时校验后返回，否则返回当前设置"""
+    if profile is None:
+        return _profile
+    if profile not in INTERMEDIATE_PROFILES:
+        print(f"【中间文件】未知的档位 {profile}，使用 {_profile}")
+        return _profile
+    return profile
+
+
+def intermediate_suffix(profile=None):
+    """中间文件扩展名"""
+    return INTERMEDIATE_PROFILES[get_intermediate_profile(profile)]["suffix"]
+
+
+def intermediate_path(temp_dir, stem, profile=None):
+    """中间文件路径：<临时目录>/<stem><扩展名>"""
+    return Path(temp_dir) / f"{stem}{intermediate_suffix(profile)}"
+
+
+def intermediate_encode_args(default_args, profile=None, with_audio=True):
+    """
+    中间文件的编码参数
+
+    参数:
+        default_args: 调用方原有的视频编码参数（h264档位直接使用）
+        with_audio: 输出是否包含音频（需要为非默认档位指定音频编码）
+    """
+    settings = INTERMEDIATE_PROFILES[get_intermediate_profile(profile)]
+    if settings["video"] is None:
+        return list(default_args)
+    return list(settings["video"]) + (list(settings["audio"]) if with_audio else [])
+
+
+def is_cacheable_profile(profile=None):
+    """该档位的预处理结果是否写入预处理缓存"""
+    return INTERMEDIATE_PROFILES[get_intermediate_profile(profile)]["cacheable"]
+
+
+def estimate_raw_bytes(width=1080, height=1920, duration=10.0, fps=DEFAULT_FPS):
+    """估算yuv420p原始帧的总大小（字节）"""
+    return int(width * height * 1.5 * fps * max(duration, 0.0))
+
+
+def make_intermediate_temp_dir(profile=None, required_bytes=None):
+    """
+    创建存放预处理中间文件的临时目录（调用方负责删除）
+
+    原始帧档位在tmpfs剩余空间足够时放到tmpfs中，否则与其他档位一样使用系统临时目录
+
+    参数:
+        required_bytes: 预计写入的字节数，为None时按10秒1080x1920估算
+    """
+    settings = INTERMEDIATE_PROFILES[get_intermediate_profile(profile)]
+    if settings["tmpfs"] and Path(TMPFS_DIR).is_dir():
+        if required_bytes is None:
+            required_bytes = estimate_raw_bytes()
+        try:
+            free_bytes = shutil.disk_usage(TMPFS_DIR).free
+        except OSError:
+            free_bytes = 0
+        if free_bytes - TMPFS_RESERVE_BYTES >= required_bytes:
+            return Path(tempfile.mkdtemp(prefix="intermediate_", dir=TMPFS_DIR))
+        print(f"【中间文件】tmpfs剩余空间不足（{free_bytes / 1024 / 1024:.0f}MB），使用磁盘临时目录")
+    return Path(tempfile.mkdtemp())
+
+
+def _make_test_clip(output_path, duration=10.0, width=1080, height=1920):
+    """生成与标准素材相同规格的测试视频（1080x1920 30fps，带音频）"""
+    from utils import run_ffmpeg_command
+    cmd = [
+        'ffmpeg', '-y',
+        '-f', 'lavfi', '-i', f'testsrc2=size={width}x{height}:rate={DEFAULT_FPS}:duration={duration}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+        '-c:v', 'libx264', '-preset', 'medium', '-crf', '20', '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac', '-shortest',
+        str(output_path)
+    ]
+    return run_ffmpeg_command(cmd, quiet=True)
+
+
+def _children_cpu_seconds():
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def benchmark_profiles(video_path=None, profiles=None, duration=10.0):
+    """
+    对比各中间文件档位：去水印预处理（process_normal_video）的编码耗时、FFmpeg CPU时间、文件大小和解码耗时
+
+    参数:
+        video_path: 测试视频，为None时生成1080x1920测试视频
+        profiles: 参与对比的档位列表，为None时对比全部档位
+
+    返回:
+        结果字典列表
+    """
+    import subprocess
+    from video_core import process_normal_video
+
+    profiles = profiles or list(INTERMEDIATE_PROFILES.keys())
+    work_dir = Path(tempfile.mkdtemp(prefix="intermediate_bench_"))
+    results = []
+    try:
+        if video_path is None:
+            video_path = work_dir / "clip_1080x1920.mp4"
+            print(f"【中间文件】生成测试视频: {duration}秒 1080x1920")
+            if not _make_test_clip(video_path, duration):
+                print("【中间文件】生成测试视频失败")
+                return results
+
+        for profile in profiles:
+            temp_dir = make_intermediate_temp_dir(profile)
+            try:
+                cpu_start = _children_cpu_seconds()
+                start_time = time.time()
+                output = process_normal_video(str(video_path), temp_dir, intermediate_profile=profile)
+                encode_seconds = time.time() - start_time
+                encode_cpu = _children_cpu_seconds() - cpu_start
+                if not output or str(output) == str(video_path) or not Path(output).exists():
+                    print(f"【中间文件】{profile} 编码失败")
+                    results.append({'profile': profile, 'error': "编码失败"})
+                    continue
+
+                # 解码一遍，模拟最终编码读取中间文件的开销
+                cpu_start = _children_cpu_seconds()
+                start_time = time.time()
+                subprocess.run(['ffmpeg', '-v', 'error', '-i', str(output), '-f', 'null', '-'],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                decode_seconds = time.time() - start_time
+                decode_cpu = _children_cpu_seconds() - cpu_start
+
+                results.append({
+                    'profile': profile,
+                    'encode_seconds': round(encode_seconds, 2),
+                    'encode_cpu': round(encode_cpu, 2),
+                    'decode_seconds': round(decode_seconds, 2),
+                    'decode_cpu': round(decode_cpu, 2),
+                    'size_mb': round(Path(output).stat().st_size / 1024 / 1024, 1),
+                    'location': "tmpfs" if str(temp_dir).startswith(TMPFS_DIR) else "disk"
+                })
+            finally:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{'档位':<15}{'编码耗时':>10}{'编码CPU':>10}{'解码耗时':>10}{'解码CPU':>10}{'大小(MB)':>10}  位置")
+    for result in results:
+        if result.get('error'):
+            print(f"{result['profile']:<15}{result['error']}")
+            continue
+        print(f"{result['profile']:<15}{result['encode_seconds']:>10}{result['encode_cpu']:>10}"
+              f"{result['decode_seconds']:>10}{result['decode_cpu']:>10}{result['size_mb']:>10}  {result['location']}")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="中间文件编码档位")
+    subparsers = parser.add_subparsers(dest="command")
+    bench_parser = subparsers.add_parser("benchmark", help="对比各档位的CPU/磁盘开销")
+    bench_parser.add_argument("video", nargs="?", default=None, help="测试视频，默认生成1080x1920测试视频")
+    bench_parser.add_argument("--profile", action="append", choices=list(INTERMEDIATE_PROFILES.keys()),
+                              help="参与对比的档位，可重复指定")
+    bench_parser.add_argument("--duration", type=float, default=10.0, help="生成的测试视频时长（秒）")
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        bench_results = benchmark_profiles(args.video, args.profile, args.duration)
+        sys.exit(0 if bench_results and not any(r.get('error') for r in bench_results) else 1)
+    else:
+        parser.print_help()
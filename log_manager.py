@@ -9,6 +9,7 @@ import os
 import sys
 import logging
 import datetime
+import threading
 from pathlib import Path
 import contextlib
 
@@ -147,46 +148,74 @@ class LogManager:
     
     @contextlib.contextmanager
     def capture_output(self):
-        """上下文管理器，用于捕获print输出到日志"""
-        import io
-        
-        # 创建字符串缓冲区
-        stdout_buffer = io.StringIO()
-        stderr_buffer = io.StringIO()
-        
-        # 保存原始的stdout和stderr
-        original_stdout = sys.stdout
-        original_stderr = sys.stderr
-        
+        """
+        上下文管理器，用于捕获print输出到日志
+
+        只捕获当前线程的输出：进程的stdout/stderr只在第一个捕获开始时替换一次（最后一个结束时恢复），
+        由替换后的输出流按线程判断是否记录到日志，因此多个线程同时捕获时不会互相覆盖或恢复到失效的输出流
+        """
+        _install_tee()
+        _capture_state.depth = getattr(_capture_state, 'depth', 0) + 1
         try:
-            # 创建组合输出流
-            class TeeOutput:
-                def __init__(self, original, buffer, logger_func):
-                    self.original = original
-                    self.buffer = buffer
-                    self.logger_func = logger_func
-                
-                def write(self, text):
-                    self.original.write(text)
-                    self.buffer.write(text)
-                    # 如果不是空行，记录到日志
-                    if text.strip():
-                        self.logger_func(text.rstrip())
-                
-                def flush(self):
-                    self.original.flush()
-                    self.buffer.flush()
-            
-            # 替换stdout和stderr
-            sys.stdout = TeeOutput(original_stdout, stdout_buffer, logging.info)
-            sys.stderr = TeeOutput(original_stderr, stderr_buffer, logging.error)
-            
             yield
-            
         finally:
-            # 恢复原始输出流
-            sys.stdout = original_stdout
-            sys.stderr = original_stderr
+            _capture_state.depth -= 1
+            _uninstall_tee()
+
+
+# 输出捕获状态：各线程的捕获层数，以及替换stdout/stderr的引用计数
+_capture_state = threading.local()
+_tee_lock = threading.Lock()
+_tee_users = 0
+_original_streams = None
+
+
+class TeeOutput:
+    """组合输出流：始终写入原输出流，正在捕获输出的线程同时记录到日志"""
+
+    def __init__(self, original, logger_func):
+        self.original = original
+        self.logger_func = logger_func
+
+    def write(self, text):
+        result = self.original.write(text)
+        # 如果不是空行，记录到日志（日志处理器写回输出流时不再重复记录）
+        if getattr(_capture_state, 'depth', 0) > 0 and not getattr(_capture_state, 'logging', False) and text.strip():
+            _capture_state.logging = True
+            try:
+                self.logger_func(text.rstrip())
+            finally:
+                _capture_state.logging = False
+        return result
+
+    def flush(self):
+        self.original.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.original, name)
+
+
+def _install_tee():
+    global _tee_users, _original_streams
+    with _tee_lock:
+        if _tee_users == 0:
+            _original_streams = (sys.stdout, sys.stderr)
+            sys.stdout = TeeOutput(sys.stdout, logging.info)
+            sys.stderr = TeeOutput(sys.stderr, logging.error)
+        _tee_users += 1
+
+
+def _uninstall_tee():
+    global _tee_users, _original_streams
+    with _tee_lock:
+        _tee_users -= 1
+        if _tee_users == 0:
+            # 恢复原始输出流（期间被其他代码替换时保留替换后的输出流）
+            if isinstance(sys.stdout, TeeOutput):
+                sys.stdout = _original_streams[0]
+            if isinstance(sys.stderr, TeeOutput):
+                sys.stderr = _original_streams[1]
+            _original_streams = None
 
 # 全局日志管理器实例
 _log_manager = None
@@ -8,6 +8,7 @@
 """
 
 import sys
+import multiprocessing
 from pathlib import Path
 
 # 添加当前目录到Python路径
@@ -63,4 +64,6 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
+    # 打包后的程序使用进程池并行处理时需要
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+媒体探测模块
+MP4/MOV 文件直接解析 moov 文件头，其他容器每个文件只调用一次 ffprobe（-show_streams -show_format JSON），
+结果按 (路径, 大小, 修改时间) 缓存，为 get_video_info、get_audio_duration、音频流检测等调用方统一提供宽高、时长、帧率、音频和编码信息
+"""
+
+import json
+import math
+import struct
+import platform
+import subprocess
+import threading
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+
+# 媒体信息（不可变）
+# width/height: 第一个视频流的尺寸；duration: 时长（秒）；fps: 帧率
+# has_video/has_audio: 是否包含视频/音频流；video_codec/audio_codec: 编码名称；rotation: 旋转角度
+MediaInfo = namedtuple('MediaInfo', [
+    'path', 'width', 'height', 'duration', 'fps',
+    'has_video', 'has_audio', 'video_codec', 'audio_codec', 'rotation', 'format_name'
+])
+
+# 缓存条目上限，超出后淘汰最久未使用的条目
+_MAX_CACHE_ENTRIES = 4096
+
+_probe_cache = OrderedDict()
+_probe_lock = threading.Lock()
+
+
+def _file_key(media_path):
+    """生成缓存键 (绝对路径, 文件大小, 修改时间)，文件不存在返回None"""
+    try:
+        path = Path(media_path).resolve()
+        stat = path.stat()
+        return str(path), stat.st_size, stat.st_mtime_ns
+    except OSError:
+        return None
+
+
+def _parse_rate(rate):
+    """解析 "30000/1001" 形式的帧率"""
+    try:
+        if not rate or rate in ("0/0", "N/A"):
+            return None
+        if '/' in rate:
+            num, den = rate.split('/', 1)
+            den = float(den)
+            return float(num) / den if den else None
+        return float(rate)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_float(value):
+    try:
+        value = float(value)
+        return value if value > 0 else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _run_ffprobe(media_path):
+    """执行一次 ffprobe，返回解析后的JSON数据，失败返回None"""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-show_streams', '-show_format',
+        '-of', 'json', str(media_path)
+    ]
+    kwargs = {}
+    if platform.system() == "Windows":
+        # Windows上使用creationflags来避免控制台窗口闪烁
+        kwargs['creationflags'] = subprocess.CREATE_NO_WINDOW
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', **kwargs)
+    except Exception as e:
+        print(f"【媒体探测】执行ffprobe失败: {e}")
+        return None
+    if result.returncode != 0:
+        print(f"【媒体探测】ffprobe返回错误: {result.stderr.strip() if result.stderr else '未知错误'}")
+        return None
+    try:
+        return json.loads(result.stdout or "{}")
+    except ValueError as e:
+        print(f"【媒体探测】解析ffprobe输出失败: {e}")
+        return None
+
+
+def _media_info_from_ffprobe(media_path, data):
+    """将 ffprobe JSON 数据转换为 MediaInfo"""
+    streams = data.get('streams', []) or []
+    format_info = data.get('format', {}) or {}
+
+    video_stream = None
+    audio_stream = None
+    for stream in streams:
+        codec_type = stream.get('codec_type')
+        if codec_type == 'video' and video_stream is None:
+            # 跳过封面图等附加图片流
+            if stream.get('disposition', {}).get('attached_pic'):
+                continue
+            video_stream = stream
+        elif codec_type == 'audio' and audio_stream is None:
+            audio_stream = stream
+
+    width = height = fps = None
+    rotation = 0
+    if video_stream:
+        width = video_stream.get('width')
+        height = video_stream.get('height')
+        fps = _parse_rate(video_stream.get('avg_frame_rate')) or _parse_rate(video_stream.get('r_frame_rate'))
+        try:
+            rotation = int(float(video_stream.get('tags', {}).get('rotate', 0)))
+        except (TypeError, ValueError):
+            rotation = 0
+        for side_data in video_stream.get('side_data_list', []) or []:
+            if 'rotation' in side_data:
+                try:
+                    # 显示矩阵的旋转角度为逆时针方向，与rotate标签方向相反
+                    rotation = -int(float(side_data['rotation']))
+                except (TypeError, ValueError):
+                    pass
+
+    # 时长：优先使用容器时长，其次使用流时长，最后用帧数/帧率估算
+    duration = _parse_float(format_info.get('duration'))
+    if duration is None or duration <= 0.1:
+        for stream in (video_stream, audio_stream):
+            if stream and _parse_float(stream.get('duration')):
+                duration = _parse_float(stream.get('duration'))
+                break
+    if (duration is None or duration <= 0.1) and video_stream and fps:
+        frames = _parse_float(video_stream.get('nb_frames'))
+        if frames:
+            duration = frames / fps
+
+    return MediaInfo(
+        path=str(media_path),
+        width=int(width) if width else None,
+        height=int(height) if height else None,
+        duration=duration,
+        fps=fps,
+        has_video=video_stream is not None,
+        has_audio=audio_stream is not None,
+        video_codec=video_stream.get('codec_name') if video_stream else None,
+        audio_codec=audio_stream.get('codec_name') if audio_stream else None,
+        rotation=rotation % 360,
+        format_name=format_info.get('format_name')
+    )
+
+
+# ==================== MP4/MOV 文件头解析 ====================
+# 只读取 moov 盒子中的 mvhd/tkhd/mdhd/hdlr/stsd/stts，无需启动 ffprobe 进程
+
+# 尝试使用文件头解析的扩展名
+_MP4_SUFFIXES = {'.mp4', '.mov', '.m4v', '.m4a', '.3gp'}
+
+# moov 盒子读取上限（超出视为异常文件，交给 ffprobe 处理）
+_MAX_MOOV_SIZE = 64 * 1024 * 1024
+
+# 可以出现在文件顶层的盒子类型，用于判断文件是否为 MP4/MOV 结构
+_TOP_LEVEL_BOXES = {b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide', b'pnot', b'uuid', b'meta', b'styp'}
+
+# 样本描述 fourcc 到 ffprobe 编码名称的映射
+_FOURCC_CODECS = {
+    b'avc1': 'h264', b'avc3': 'h264',
+    b'hvc1': 'hevc', b'hev1': 'hevc',
+    b'mp4v': 'mpeg4', b'av01': 'av1', b'vp09': 'vp9',
+    b'mp4a': 'aac', b'Opus': 'opus', b'ac-3': 'ac3', b'ec-3': 'eac3',
+    b'.mp3': 'mp3', b'alac': 'alac', b'fLaC': 'flac',
+}
+
+# 容器内部的盒子，需要递归查找子盒子
+_CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+
+
+def _iter_boxes(data, start, end):
+    """遍历 data[start:end] 中的盒子，生成 (类型, 内容起点, 内容终点)"""
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, pos)
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                return
+            size = struct.unpack_from('>Q', data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            return
+        yield box_type, pos + header, pos + size
+        pos += size
+
+
+def _find_box(data, start, end, box_type):
+    """在指定范围内查找第一个指定类型的盒子"""
+    for child_type, child_start, child_end in _iter_boxes(data, start, end):
+        if child_type == box_type:
+            return child_start, child_end
+    return None
+
+
+def _read_moov(file_obj, file_size):
+    """通过少量seek定位并读取 moov 盒子，失败返回None"""
+    pos = 0
+    first = True
+    while pos + 8 <= file_size:
+        file_obj.seek(pos)
+        header = file_obj.read(16)
+        if len(header) < 8:
+            return None
+        size, box_type = struct.unpack_from('>I4s', header, 0)
+        header_size = 8
+        if size == 1:
+            if len(header) < 16:
+                return None
+            size = struct.unpack_from('>Q', header, 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - pos
+        if first and box_type not in _TOP_LEVEL_BOXES:
+            return None
+        first = False
+        if size < header_size:
+            return None
+        if box_type == b'moov':
+            if size > _MAX_MOOV_SIZE or pos + size > file_size:
+                return None
+            file_obj.seek(pos)
+            data = file_obj.read(size)
+            return data if len(data) == size else None
+        pos += size
+    return None
+
+
+def _parse_header_duration(data, start):
+    """解析 mvhd/mdhd 的 (timescale, duration)"""
+    version = data[start]
+    if version == 1:
+        timescale, duration = struct.unpack_from('>IQ', data, start + 20)
+    else:
+        timescale, duration = struct.unpack_from('>II', data, start + 12)
+        if duration == 0xFFFFFFFF:
+            duration = 0
+    return timescale, duration
+
+
+def _parse_tkhd_rotation(data, start):
+    """从 tkhd 的变换矩阵计算旋转角度（顺时针，与rotate标签一致）"""
+    version = data[start]
+    matrix_offset = start + (36 if version == 1 else 24) + 16
+    a, b = struct.unpack_from('>ii', data, matrix_offset)
+    if a == 0 and b == 0:
+        return 0
+    return int(round(math.degrees(math.atan2(b / 65536.0, a / 65536.0)))) % 360
+
+
+def _parse_stts_fps(data, start, timescale):
+    """根据 stts 的样本数和总时长计算平均帧率"""
+    entry_count = struct.unpack_from('>I', data, start + 4)[0]
+    total_samples = 0
+    total_delta = 0
+    pos = start + 8
+    for _ in range(entry_count):
+        count, delta = struct.unpack_from('>II', data, pos)
+        total_samples += count
+        total_delta += count * delta
+        pos += 8
+    if total_samples and total_delta and timescale:
+        return total_samples * timescale / float(total_delta)
+    return None
+
+
+def _parse_trak(data, start, end):
+    """解析单个 trak，返回轨道信息字典，无法识别返回None"""
+    track = {'handler': None, 'codec': None, 'width': None, 'height': None,
+             'rotation': 0, 'duration': None, 'fps': None}
+
+    tkhd = _find_box(data, start, end, b'tkhd')
+    if tkhd:
+        track['rotation'] = _parse_tkhd_rotation(data, tkhd[0])
+
+    mdia = _find_box(data, start, end, b'mdia')
+    if not mdia:
+        return None
+
+    timescale = 0
+    mdhd = _find_box(data, mdia[0], mdia[1], b'mdhd')
+    if mdhd:
+        timescale, duration = _parse_header_duration(data, mdhd[0])
+        if timescale and duration:
+            track['duration'] = duration / float(timescale)
+
+    hdlr = _find_box(data, mdia[0], mdia[1], b'hdlr')
+    if hdlr:
+        track['handler'] = bytes(data[hdlr[0] + 8:hdlr[0] + 12])
+
+    minf = _find_box(data, mdia[0], mdia[1], b'minf')
+    stbl = _find_box(data, minf[0], minf[1], b'stbl') if minf else None
+    if stbl:
+        stsd = _find_box(data, stbl[0], stbl[1], b'stsd')
+        if stsd:
+            entries = list(_iter_boxes(data, stsd[0] + 8, stsd[1]))
+            if entries:
+                fourcc, entry_start, entry_end = entries[0]
+                track['codec'] = _FOURCC_CODECS.get(fourcc, fourcc.decode('latin-1').strip().lower())
+                # 视觉样本描述: 8字节保留/引用索引 + 16字节预定义，随后是宽高
+                if track['handler'] == b'vide' and entry_start + 28 <= entry_end:
+                    track['width'], track['height'] = struct.unpack_from('>HH', data, entry_start + 24)
+        stts = _find_box(data, stbl[0], stbl[1], b'stts')
+        if stts and track['handler'] == b'vide':
+            track['fps'] = _parse_stts_fps(data, stts[0], timescale)
+    return track
+
+
+def _probe_mp4_header(media_path):
+    """
+    解析 MP4/MOV 文件头获取媒体信息
+
+    返回:
+        MediaInfo，非MP4结构、分片MP4或数据异常时返回None（由调用方回退到ffprobe）
+    """
+    try:
+        path = Path(media_path)
+        file_size = path.stat().st_size
+        with open(path, 'rb') as f:
+            data = _read_moov(f, file_size)
+        if not data:
+            return None
+
+        moov_end = len(data)
+        moov_start = 16 if struct.unpack_from('>I', data, 0)[0] == 1 else 8
+
+        # 分片MP4的时长分散在moof中，交给ffprobe处理
+        if _find_box(data, moov_start, moov_end, b'mvex'):
+            return None
+
+        duration = None
+        mvhd = _find_box(data, moov_start, moov_end, b'mvhd')
+        if mvhd:
+            timescale, raw_duration = _parse_header_duration(data, mvhd[0])
+            if timescale and raw_duration:
+                duration = raw_duration / float(timescale)
+
+        video_track = None
+        audio_track = None
+        for box_type, trak_start, trak_end in _iter_boxes(data, moov_start, moov_end):
+            if box_type != b'trak':
+                continue
+            track = _parse_trak(data, trak_start, trak_end)
+            if not track:
+                continue
+            if track['handler'] == b'vide' and video_track is None:
+                video_track = track
+            elif track['handler'] == b'soun' and audio_track is None:
+                audio_track = track
+
+        if video_track is None and audio_track is None:
+            return None
+        # 加密或未知编码的视频轨道没有可靠的宽高，交给ffprobe处理
+        if video_track is not None and not (video_track['width'] and video_track['height']):
+            return None
+
+        if not duration:
+            track_durations = [t['duration'] for t in (video_track, audio_track) if t and t['duration']]
+            duration = max(track_durations) if track_durations else None
+        if not duration:
+            return None
+
+        return MediaInfo(
+            path=str(media_path),
+            width=video_track['width'] if video_track else None,
+            height=video_track['height'] if video_track else None,
+            duration=duration,
+            fps=video_track['fps'] if video_track else None,
+            has_video=video_track is not None,
+            has_audio=audio_track is not None,
+            video_codec=video_track['codec'] if video_track else None,
+            audio_codec=audio_track['codec'] if audio_track else None,
+            rotation=video_track['rotation'] if video_track else 0,
+            format_name='mov,mp4,m4a,3gp,3g2,mj2'
+        )
+    except (OSError, struct.error, ValueError, IndexError, TypeError):
+        return None
+
+
+def probe_media(media_path):
+    """
+    获取媒体文件信息（带缓存）
+
+    参数:
+        media_path: 媒体文件路径
+
+    返回:
+        MediaInfo，文件不存在或探测失败返回None
+    """
+    key = _file_key(media_path)
+    if key is None:
+        print(f"【媒体探测】文件不存在: {media_path}")
+        return None
+
+    with _probe_lock:
+        info = _probe_cache.get(key)
+        if info is not None:
+            _probe_cache.move_to_end(key)
+            return info
+
+    # MP4/MOV 优先解析文件头，其他容器或解析失败时回退到 ffprobe
+    info = None
+    if Path(media_path).suffix.lower() in _MP4_SUFFIXES:
+        info = _probe_mp4_header(media_path)
+    if info is None:
+        data = _run_ffprobe(media_path)
+        if data is None:
+            return None
+        info = _media_info_from_ffprobe(media_path, data)
+
+    with _probe_lock:
+        _probe_cache[key] = info
+        _probe_cache.move_to_end(key)
+        while len(_probe_cache) > _MAX_CACHE_ENTRIES:
+            _probe_cache.popitem(last=False)
+    return info
+
+
+def clear_probe_cache():
+    """清空媒体探测缓存"""
+    with _probe_lock:
+        _probe_cache.clear()
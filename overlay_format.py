@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+叠加链像素格式规划模块
+素材叠加原来在每个素材输入上执行 format=rgba，叠加使用 overlay=...:format=auto，由FFmpeg自行协商格式：
+素材先转成RGBA再被自动转换为带alpha的YUV，GIF每一帧都要转换两次；主画面的格式取决于解码结果
+（如yuvj420p、10bit源），可能在叠加链中和最终编码前被反复转换。
+
+这里按最终编码的像素格式为整条叠加链选定一个工作格式：主画面在叠加前统一转换一次（已是该格式时不产生转换），
+素材直接转换为对应的带alpha格式（如yuv420p主画面 + yuva420p素材），overlay显式指定格式，
+整条链中只在素材输入处各转换一次。
+
+调试：set_filter_debug 或环境变量 VIDEO_FILTER_DEBUG=1 时，最终编码前用同一滤镜图处理一帧并输出
+FFmpeg协商后的各节点格式和自动插入的转换；
+命令行 python overlay_format.py benchmark [视频] 在1080x1920画面上对比原有滤镜图与规划后的滤镜图
+"""
+
+import os
+import re
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+from collections import namedtuple
+
+# 叠加链格式：主画面格式（None表示不转换）、素材格式、overlay的format参数
+OverlayFormat = namedtuple('OverlayFormat', ['base', 'layer', 'overlay'])
+
+# 最终编码像素格式 -> 叠加链格式
+OVERLAY_FORMATS = {
+    'yuv420p': OverlayFormat('yuv420p', 'yuva420p', 'yuv420'),
+    'yuv422p': OverlayFormat('yuv422p', 'yuva422p', 'yuv422'),
+    'yuv444p': OverlayFormat('yuv444p', 'yuva444p', 'yuv444'),
+}
+
+# 原有的滤镜图格式（用于对比）
+LEGACY_FORMAT = OverlayFormat(None, 'rgba', 'auto')
+
+# 调试输出中保留的FFmpeg日志行：overlay的输入格式、自动插入的格式转换
+_NEGOTIATION_PATTERN = re.compile(r"fmt:|auto_scale|auto-inserted|Parsed_overlay|Parsed_format")
+
+_filter_debug = os.environ.get("VIDEO_FILTER_DEBUG", "0") == "1"
+
+
+def set_filter_debug(enabled):
+    """开启或关闭滤镜格式调试输出"""
+    global _filter_debug
+    _filter_debug = bool(enabled)
+
+
+def is_filter_debug_enabled():
+    """是否输出滤镜格式调试信息"""
+    return _filter_debug
+
+
+def plan_overlay_format(pix_fmt='yuv420p'):
+    """
+    根据最终编码的像素格式选择叠加链格式
+
+    参数:
+        pix_fmt: 最终编码的像素格式（见 _get_video_encode_params）
+
+    返回:
+        OverlayFormat，不支持的格式返回原有的协商方式（LEGACY_FORMAT）
+    """
+    plan = OVERLAY_FORMATS.get(pix_fmt or 'yuv420p')
+    if plan is None:
+        print(f"【像素格式】叠加链不支持 {pix_fmt}，由FFmpeg自动协商格式")
+        return LEGACY_FORMAT
+    return plan
+
+
+def base_format_filter(plan):
+    """主画面进入叠加链前的格式滤镜（滤镜链片段，不需要时返回空字符串）"""
+    return f"format={plan.base}" if plan.base else ""
+
+
+def layer_format_filter(plan):
+    """素材输入的格式滤镜（滤镜链片段）"""
+    return f"format={plan.layer}"
+
+
+def overlay_format_option(plan):
+    """overlay滤镜的format参数（以冒号开头的参数片段）"""
+    return f":format={plan.overlay}"
+
+
+def dump_negotiated_formats(command):
+    """
+    用同一条FFmpeg命令（不含输出路径）处理一帧，输出滤镜图和协商后的各节点格式
+
+    参数:
+        command: 最终编码的FFmpeg命令列表（输入、滤镜图、映射和编码参数，不含输出路径）
+    """
+    probe_cmd = [command[0], '-v', 'verbose'] + list(command[1:]) + ['-frames:v', '1', '-f', 'null', '-']
+    if '-filter_complex' in command:
+        graph = command[command.index('-filter_complex') + 1]
+        print("【像素格式】滤镜图:")
+        for part in graph.split(';'):
+            print(f"    {part}")
+    try:
+        result = subprocess.run(probe_cmd, capture_output=True, text=True, timeout=120)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        print(f"【像素格式】格式协商调试失败: {e}")
+        return
+    lines = [line.strip() for line in (result.stderr or "").splitlines() if _NEGOTIATION_PATTERN.search(line)]
+    print(f"【像素格式】协商结果（{len(lines)} 行）:")
+    for line in lines:
+        print(f"    {line}")
+
+
+def _make_test_layers(work_dir, width=1080, height=1920):
+    """生成与实际素材尺寸相近的测试叠加图：背景条、图片、字幕，以及一个带透明背景的GIF"""
+    from PIL import Image, ImageDraw
+
+    layers = []
+    background = Image.new('RGBA', (1000, 180), (0, 0, 0, 0))
+    ImageDraw.Draw(background).rounded_rectangle([(0, 0), (999, 179)], radius=20, fill=(255, 255, 255, 128))
+    layers.append((work_dir / "background.png", background, 40, int(height * 0.57)))
+
+    picture = Image.new('RGBA', (420, 420), (200, 80, 40, 255))
+    layers.append((work_dir / "image.png", picture, 100, 200))
+
+    subtitle = Image.new('RGBA', (900, 160), (0, 0, 0, 0))
+    ImageDraw.Draw(subtitle).text((10, 10), "Benchmark 字幕 subtitle", fill=(255, 255, 0, 255))
+    layers.append((work_dir / "subtitle.png", subtitle, 80, int(height * 0.58)))
+
+    for path, image, _, _ in layers:
+        image.save(path)
+
+    frames = []
+    for index in range(10):
+        frame = Image.new('RGBA', (240, 240), (0, 0, 0, 0))
+        ImageDraw.Draw(frame).ellipse([index * 10, index * 10, 120 + index * 10, 120 + index * 10],
+                                      fill=(0, 200, 255, 255))
+        frames.append(frame)
+    gif_path = work_dir / "animated.gif"
+    frames[0].save(gif_path, save_all=True, append_images=frames[1:], duration=100, loop=0, disposal=2)
+    return [(path, x, y) for path, _, x, y in layers], gif_path
+
+
+def build_benchmark_graph(layers, gif_index, gif_position, plan):
+    """
+    构建与 add_subtitle_to_video 结构相同的叠加链：背景、图片、GIF、字幕依次叠加
+
+    参数:
+        layers: [(输入索引, x, y), ...]，静态素材（背景、图片、字幕）
+        gif_index: GIF的输入索引
+        gif_position: GIF位置 (x, y)
+        plan: OverlayFormat
+    """
+    base = base_format_filter(plan)
+    parts = [f"[0:v]{base + ',' if base else ''}null[v1]"]
+    for input_index, _, _ in layers:
+        parts.append(f"[{input_index}:v]{layer_format_filter(plan)}[l{input_index}]")
+    parts.append(f"[{gif_index}:v]{layer_format_filter(plan)}[gif]")
+
+    current = "v1"
+    order = [layers[0], layers[1], None, layers[2]]
+    for step, layer in enumerate(order, 2):
+        if layer is None:
+            parts.append(f"[{current}][gif]overlay=x={gif_position[0]}:y={gif_position[1]}:shortest=1"
+                         f"{overlay_format_option(plan)}[v{step}]")
+        else:
+            input_index, x, y = layer
+            parts.append(f"[{current}][l{input_index}]overlay=x='if(lt(t,3.0),{x}*t/3.0,{x})':y={y}"
+                         f"{overlay_format_option(plan)}[v{step}]")
+        current = f"v{step}"
+    parts.append(f"[{current}]format=yuv420p[v]")
+    return ";".join(parts)
+
+
+def _children_cpu_seconds():
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def benchmark_overlay_formats(video_path=None, duration=10.0):
+    """
+    对比原有滤镜图（format=rgba + overlay format=auto）与规划后的滤镜图在1080x1920画面上的滤镜开销
+
+    两者解码相同的视频并输出到 -f null（不编码），耗时差异即为格式转换和叠加的差异
+
+    返回:
+        结果字典列表
+    """
+    from intermediate_codec import _make_test_clip
+
+    work_dir = Path(tempfile.mkdtemp(prefix="overlay_format_bench_"))
+    results = []
+    try:
+        if video_path is None:
+            video_path = work_dir / "clip_1080x1920.mp4"
+            print(f"【像素格式】生成测试视频: {duration}秒 1080x1920")
+            if not _make_test_clip(video_path, duration):
+                print("【像素格式】生成测试视频失败")
+                return results
+
+        layer_files, gif_path = _make_test_layers(work_dir)
+        inputs = ['-i', str(video_path)]
+        layers = []
+        for input_index, (path, x, y) in enumerate(layer_files, 1):
+            inputs.extend(['-i', str(path)])
+            layers.append((input_index, x, y))
+        gif_index = len(layer_files) + 1
+        inputs.extend(['-ignore_loop', '0', '-i', str(gif_path)])
+
+        for name, plan in (("原有（rgba/auto）", LEGACY_FORMAT), ("规划（yuv420p/yuva420p）", plan_overlay_format('yuv420p'))):
+            graph = build_benchmark_graph(layers, gif_index, (760, 120), plan)
+            cmd = ['ffmpeg', '-v', 'error', '-y'] + inputs + ['-filter_complex', graph, '-map', '[v]', '-f', 'null', '-']
+            cpu_start = _children_cpu_seconds()
+            start_time = time.time()
+            result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+            elapsed = time.time() - start_time
+            cpu = _children_cpu_seconds() - cpu_start
+            if result.returncode != 0:
+                print(f"【像素格式】{name} 失败: {result.stderr.strip()[-500:]}")
+                results.append({'name': name, 'error': "执行失败"})
+                continue
+            results.append({'name': name, 'seconds': round(elapsed, 2), 'cpu': round(cpu, 2)})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"{'滤镜图':<28}{'耗时(秒)':>10}{'CPU(秒)':>10}")
+    for result in results:
+        if result.get('error'):
+            print(f"{result['name']:<28}{result['error']}")
+            continue
+        print(f"{result['name']:<28}{result['seconds']:>10}{result['cpu']:>10}")
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="叠加链像素格式规划")
+    subparsers = parser.add_subparsers(dest="command")
+    bench_parser = subparsers.add_parser("benchmark", help="对比原有滤镜图与规划后的滤镜图")
+    bench_parser.add_argument("video", nargs="?", default=None, help="测试视频，默认生成1080x1920测试视频")
+    bench_parser.add_argument("--duration", type=float, default=10.0, help="生成的测试视频时长（秒）")
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        bench_results = benchmark_overlay_formats(args.video, args.duration)
+        sys.exit(0 if bench_results and not any(r.get('error') for r in bench_results) else 1)
+    else:
+        parser.print_help()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+叠加素材裁剪模块
+FFmpeg的overlay每一帧的开销与叠加图片的面积成正比，而字幕图片至少是1200x600的画布、文字只占其中一小块，
+叠加图片和GIF周围也常有大片透明区域。这里把素材裁剪到不透明内容的外接矩形（留出少量边距），
+并记录裁掉的左上角偏移，叠加时把位置加上偏移，画面保持不变而每帧混合的像素大幅减少。
+
+PNG素材的偏移写在PNG文本块中（图片缓存保存的是完整的PNG字节，偏移随缓存一起复用）；
+GIF在滤镜图中用crop裁剪，偏移由 animated_content_box 计算（循环拼接后的GIF只检查一个循环，见 animation_frame_count）
+"""
+
+from collections import namedtuple
+
+# PNG文本块中保存偏移的键
+OFFSET_KEY = "overlay_offset"
+
+# 内容外接矩形四周保留的边距（像素）
+DEFAULT_MARGIN = 2
+
+# 偏移对齐到偶数：yuv420p画面上叠加位置会按色度采样对齐，偶数偏移保证裁剪前后的实际叠加位置一致
+ALIGN = 2
+
+# 内容外接矩形（左、上、右、下）
+ContentBox = namedtuple('ContentBox', ['left', 'top', 'right', 'bottom'])
+
+
+def _expand_box(bbox, size, margin=DEFAULT_MARGIN):
+    """在外接矩形四周加上边距，左上角向下对齐到偶数，并限制在图片范围内"""
+    left, top, right, bottom = bbox
+    left = max(0, left - margin)
+    top = max(0, top - margin)
+    left -= left % ALIGN
+    top -= top % ALIGN
+    return ContentBox(left, top, min(size[0], right + margin), min(size[1], bottom + margin))
+
+
+def content_box(image, margin=DEFAULT_MARGIN):
+    """
+    图片中不透明内容（alpha > 0）的外接矩形
+
+    返回:
+        ContentBox，图片完全透明时返回None
+    """
+    if image.mode != 'RGBA':
+        image = image.convert('RGBA')
+    bbox = image.getchannel('A').getbbox()
+    if not bbox:
+        return None
+    return _expand_box(bbox, image.size, margin)
+
+
+def save_trimmed_png(image, output_path, margin=DEFAULT_MARGIN):
+    """
+    把RGBA图片裁剪到内容外接矩形后保存为PNG，偏移写入PNG文本块
+
+    参数:
+        image: PIL图片
+        output_path: 输出路径
+        margin: 边距（像素）
+
+    返回:
+        (偏移x, 偏移y)：裁剪后图片左上角在原图中的位置
+    """
+    from PIL import PngImagePlugin
+
+    box = content_box(image, margin)
+    offset = (0, 0)
+    if box and (box.left, box.top, box.right, box.bottom) != (0, 0, image.width, image.height):
+        print(f"【素材裁剪】{image.width}x{image.height} -> {box.right - box.left}x{box.bottom - box.top}，"
+              f"偏移 ({box.left}, {box.top})")
+        image = image.crop(box)
+        offset = (box.left, box.top)
+
+    info = PngImagePlugin.PngInfo()
+    info.add_text(OFFSET_KEY, f"{offset[0]},{offset[1]}")
+    image.save(output_path, pnginfo=info)
+    return offset
+
+
+def read_overlay_offset(image_path):
+    """
+    读取素材裁剪时记录的偏移
+
+    返回:
+        (偏移x, 偏移y)，没有记录（未裁剪的图片、非PNG文件）或读取失败时返回 (0, 0)
+    """
+    try:
+        from PIL import Image
+        with Image.open(image_path) as image:
+            value = (getattr(image, 'text', None) or {}).get(OFFSET_KEY)
+        if value:
+            offset_x, offset_y = value.split(',')
+            return int(offset_x), int(offset_y)
+    except Exception:
+        pass
+    return 0, 0
+
+
+def animation_frame_count(image_path):
+    """动画（GIF/WebP）一个循环的帧数，读取失败时返回None"""
+    try:
+        from PIL import Image
+
+        with Image.open(image_path) as image:
+            return getattr(image, 'n_frames', 1)
+    except Exception as e:
+        print(f"【素材裁剪】读取动画帧数失败: {e}")
+        return None
+
+
+def animated_content_box(image_path, max_frames=None, margin=DEFAULT_MARGIN):
+    """
+    动画（GIF）所有帧中不透明内容的外接矩形的并集
+
+    参数:
+        max_frames: 最多检查的帧数（循环拼接的GIF只需要检查一个循环），为None时检查全部帧
+
+    返回:
+        ContentBox，没有透明边缘可裁剪、全部透明或读取失败时返回None
+    """
+    try:
+        from PIL import Image, ImageSequence
+
+        union = None
+        with Image.open(image_path) as image:
+            size = image.size
+            for index, frame in enumerate(ImageSequence.Iterator(image)):
+                if max_frames is not None and index >= max_frames:
+                    break
+                bbox = frame.convert('RGBA').getchannel('A').getbbox()
+                if not bbox:
+                    continue
+                union = bbox if union is None else (min(union[0], bbox[0]), min(union[1], bbox[1]),
+                                                    max(union[2], bbox[2]), max(union[3], bbox[3]))
+        if not union:
+            return None
+        box = _expand_box(union, size, margin)
+        if (box.left, box.top, box.right, box.bottom) == (0, 0, size[0], size[1]):
+            return None
+        return box
+    except Exception as e:
+        print(f"【素材裁剪】读取动画失败: {e}")
+        return None
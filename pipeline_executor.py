@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流水线阶段执行模块
+每个任务依次流经若干阶段（如 预处理 → 精处理），每个阶段由独立的工作线程执行，阶段之间用有界队列连接：
+下游繁忙时上游阻塞等待，因此同一时刻存在的中间文件数量有上限（不再先预处理全部视频再统一精处理）；
+某个阶段失败的任务直接跳过后续阶段，结果按任务索引依次提交，清理函数对每个任务都会调用一次
+"""
+
+import time
+import queue
+import threading
+import traceback
+from collections import namedtuple
+
+# 流水线阶段：名称、处理函数 func(task) -> task（返回None或抛出异常表示失败）、工作线程数
+Stage = namedtuple('Stage', ['name', 'func', 'workers'])
+
+# 默认的阶段间队列长度
+DEFAULT_QUEUE_SIZE = 1
+
+# 队列结束标记
+_DONE = object()
+
+
+class RenderSlot:
+    """
+    渲染槽：限制同时进行最终编码的任务数
+
+    精处理阶段有多个工作线程时，素材准备（字幕图片、GIF、背景、音乐裁剪、配音变速等）可以并发进行，
+    只有最终的FFmpeg编码需要占用渲染槽，这样第N+1个视频的素材准备与第N个视频的编码相互重叠，
+    而编码本身仍然独占全部FFmpeg线程
+
+    用法:
+        with render_slot:
+            run_ffmpeg_command(cmd)
+    """
+
+    def __init__(self, slots=1):
+        self.slots = max(1, int(slots))
+        self._semaphore = threading.BoundedSemaphore(self.slots)
+        self.wait_time = 0.0
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        start_time = time.time()
+        self._semaphore.acquire()
+        with self._lock:
+            self.wait_time += time.time() - start_time
+        return self
+
+    def __exit__(self, *exc):
+        self._semaphore.release()
+        return False
+
+
+class StagePipeline:
+    """
+    有界队列连接的多阶段流水线
+
+    参数:
+        stages: Stage列表，按执行顺序排列
+        queue_size: 阶段之间的队列长度（每个阶段最多有 queue_size 个已完成的任务等待下一阶段）
+        on_result: 结果回调 on_result(task)，在调用run的线程中按任务索引顺序调用；
+                   task中 success 表示是否完成全部阶段，失败时 error 为失败原因，failed_stage 为失败的阶段名
+        cleanup: 清理回调 cleanup(task)，每个任务离开流水线时立即调用一次（无论成功与否），用于删除中间文件
+        should_stop: 返回True时停止提交新任务，已进入流水线的任务跳过剩余阶段
+        poll_interval: 等待结果时检查停止请求的间隔（秒）
+
+    任务为字典，必须包含 index 键（同时作为结果提交顺序），各阶段在同一个字典上读写
+    """
+
+    def __init__(self, stages, queue_size=DEFAULT_QUEUE_SIZE, on_result=None, cleanup=None,
+                 should_stop=None, poll_interval=0.2):
+        if not stages:
+            raise ValueError("流水线至少需要一个阶段")
+        self.stages = [Stage(stage.name, stage.func, max(1, int(stage.workers))) for stage in stages]
+        self.queue_size = max(1, int(queue_size))
+        self.on_result = on_result
+        self.cleanup = cleanup
+        self.should_stop = should_stop
+        self.poll_interval = poll_interval
+        self._stopped = threading.Event()
+        self.stats = {stage.name: {'count': 0, 'busy': 0.0} for stage in self.stages}
+        self._stats_lock = threading.Lock()
+
+    def _fail(self, task, stage_name, error):
+        task['success'] = False
+        task['failed_stage'] = stage_name
+        task['error'] = error
+
+    def _cleanup(self, task):
+        if not self.cleanup:
+            return
+        try:
+            self.cleanup(task)
+        except Exception as e:
+            print(f"【流水线】清理任务失败: {e}")
+
+    def _worker(self, stage_index, input_queue, output_queue, finished_queue, remaining, remaining_lock):
+        stage = self.stages[stage_index]
+        is_last = stage_index == len(self.stages) - 1
+        try:
+            while True:
+                task = input_queue.get()
+                if task is _DONE:
+                    break
+                if task.get('success') is False:
+                    # 前面的阶段已失败，直接提交结果
+                    finished_queue.put(task)
+                    continue
+                if self._stopped.is_set():
+                    self._fail(task, stage.name, "已取消")
+                    finished_queue.put(task)
+                    continue
+
+                start_time = time.time()
+                try:
+                    result = stage.func(task)
+                    if result is None:
+                        self._fail(task, stage.name, f"{stage.name}失败")
+                    else:
+                        task = result
+                except Exception as e:
+                    traceback.print_exc()
+                    self._fail(task, stage.name, str(e))
+                with self._stats_lock:
+                    self.stats[stage.name]['count'] += 1
+                    self.stats[stage.name]['busy'] += time.time() - start_time
+
+                if task.get('success') is False:
+                    finished_queue.put(task)
+                elif is_last:
+                    task['success'] = True
+                    finished_queue.put(task)
+                else:
+                    # 下一阶段繁忙时在此阻塞，限制等待中的中间结果数量
+                    output_queue.put(task)
+        finally:
+            # 本阶段最后一个退出的工作线程通知下一阶段结束
+            with remaining_lock:
+                remaining[stage_index] -= 1
+                last_worker = remaining[stage_index] == 0
+            if last_worker and not is_last:
+                for _ in range(self.stages[stage_index + 1].workers):
+                    output_queue.put(_DONE)
+
+    def _feed(self, tasks, first_queue):
+        try:
+            for task in tasks:
+                if self._stopped.is_set():
+                    break
+                first_queue.put(task)
+        finally:
+            for _ in range(self.stages[0].workers):
+                first_queue.put(_DONE)
+
+    def run(self, tasks):
+        """
+        执行流水线
+
+        参数:
+            tasks: 任务字典列表，按index升序排列
+
+        返回:
+            按index排序的任务列表
+        """
+        tasks = list(tasks)
+        if not tasks:
+            return []
+
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        finished_queue = queue.Queue()
+        remaining = [stage.workers for stage in self.stages]
+        remaining_lock = threading.Lock()
+
+        threads = [threading.Thread(target=self._feed, args=(tasks, queues[0]), name="pipeline-feed", daemon=True)]
+        for stage_index, stage in enumerate(self.stages):
+            output_queue = queues[stage_index + 1] if stage_index + 1 < len(queues) else None
+            for worker_index in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._worker,
+                    args=(stage_index, queues[stage_index], output_queue, finished_queue, remaining, remaining_lock),
+                    name=f"pipeline-{stage.name}-{worker_index}",
+                    daemon=True
+                ))
+        print(f"【流水线】任务数: {len(tasks)}, 阶段: "
+              f"{' → '.join(f'{stage.name}×{stage.workers}' for stage in self.stages)}, 队列长度: {self.queue_size}")
+        for thread in threads:
+            thread.start()
+
+        ordered_indexes = [task['index'] for task in tasks]
+        pending = {task['index']: task for task in tasks}
+        finished = {}
+        ordered_results = []
+        next_pos = 0
+
+        while next_pos < len(ordered_indexes):
+            if not self._stopped.is_set() and self.should_stop and self.should_stop():
+                print("【流水线】收到停止请求，不再提交新任务")
+                self._stopped.set()
+            try:
+                task = finished_queue.get(timeout=self.poll_interval)
+                finished[task['index']] = task
+                # 任务离开流水线后立即清理中间文件，不等待前面的任务提交
+                self._cleanup(task)
+            except queue.Empty:
+                if self._stopped.is_set() and not any(thread.is_alive() for thread in threads):
+                    # 尚未进入流水线的任务直接标记为取消
+                    for index in ordered_indexes[next_pos:]:
+                        if index not in finished:
+                            self._fail(pending[index], "排队", "已取消")
+                            finished[index] = pending[index]
+
+            # 按索引顺序提交结果
+            while next_pos < len(ordered_indexes) and ordered_indexes[next_pos] in finished:
+                task = finished[ordered_indexes[next_pos]]
+                ordered_results.append(task)
+                if self.on_result:
+                    self.on_result(task)
+                next_pos += 1
+
+        for thread in threads:
+            thread.join(timeout=1)
+        summary = ", ".join(f"{name}: {stat['count']}个/{stat['busy']:.1f}秒" for name, stat in self.stats.items())
+        print(f"【流水线】全部任务完成（{summary}）")
+        return ordered_results
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+预处理结果缓存模块
+去水印缩放裁剪（以及短视频正放倒放）的输出只取决于源视频内容和预处理参数，
+因此按 "源文件内容哈希 + 缩放系数 + 是否倒放 + 目标尺寸 + 中间文件档位" 缓存到磁盘，
+重复处理同一批素材（只修改字幕、样式、音乐等）时直接复用，缓存总大小超出上限时按最近使用时间淘汰
+"""
+
+import os
+import shutil
+import hashlib
+import uuid
+from pathlib import Path
+
+from utils import get_data_path, file_content_hash
+
+# 缓存格式版本，预处理命令发生变化时需要递增，使旧缓存失效
+_CACHE_VERSION = 1
+
+# 默认缓存上限 10GB
+DEFAULT_CACHE_SIZE_MB = 10 * 1024
+
+# 可通过环境变量 VIDEO_PREPROCESS_CACHE=0 默认关闭缓存
+_cache_enabled = os.environ.get("VIDEO_PREPROCESS_CACHE", "1") != "0"
+_cache_max_bytes = DEFAULT_CACHE_SIZE_MB * 1024 * 1024
+
+
+def set_preprocess_cache(enabled=None, max_size_mb=None):
+    """
+    设置预处理缓存
+
+    参数:
+        enabled: 是否启用缓存，None表示不修改
+        max_size_mb: 缓存大小上限（MB），None表示不修改
+    """
+    global _cache_enabled, _cache_max_bytes
+    if enabled is not None:
+        _cache_enabled = bool(enabled)
+    if max_size_mb is not None and max_size_mb > 0:
+        _cache_max_bytes = int(max_size_mb) * 1024 * 1024
+
+
+def is_preprocess_cache_enabled():
+    """是否启用了预处理缓存"""
+    return _cache_enabled
+
+
+def get_preprocess_cache_dir():
+    """获取预处理缓存目录"""
+    return get_data_path("cache/preprocess")
+
+
+def make_preprocess_cache_key(video_path, scale_factor=1.1, reverse_effect=False,
+                              target_width=1080, target_height=1920, intermediate_profile=None):
+    """
+    生成预处理缓存键，缓存未启用、无法读取源文件或中间文件档位不缓存（原始帧）时返回None
+    """
+    from intermediate_codec import get_intermediate_profile, is_cacheable_profile, DEFAULT_PROFILE
+
+    if not _cache_enabled:
+        return None
+    intermediate_profile = get_intermediate_profile(intermediate_profile)
+    if not is_cacheable_profile(intermediate_profile):
+        return None
+    content_hash = file_content_hash(video_path)
+    if not content_hash:
+        return None
+    params = f"v{_CACHE_VERSION}|scale={scale_factor:.4f}|reverse={int(bool(reverse_effect))}|{target_width}x{target_height}"
+    if intermediate_profile != DEFAULT_PROFILE:
+        # 默认档位不加入缓存键，保持与已有缓存兼容
+        params += f"|codec={intermediate_profile}"
+    return hashlib.blake2b(f"{content_hash}|{params}".encode('utf-8'), digest_size=20).hexdigest()
+
+
+# 缓存条目可能的扩展名（与中间文件档位对应）
+_ENTRY_SUFFIXES = (".mp4", ".mkv")
+
+
+def _cache_entry_path(key, suffix=".mp4"):
+    return get_preprocess_cache_dir() / f"{key}{suffix}"
+
+
+def _link_or_copy(source, target):
+    """优先创建硬链接（不复制数据），跨文件系统等无法链接时退回到复制
+
+    命中副本使用唯一文件名，后续步骤只读取、不会原地改写，因此可以与缓存条目共享数据
+    """
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def fetch_preprocess_cache(key, temp_dir, suffix=".mp4"):
+    """
+    查找缓存，命中时链接（或复制）到临时目录并返回该路径（避免后续步骤删除缓存文件）
+
+    参数:
+        suffix: 中间文件扩展名（见 intermediate_codec.intermediate_suffix）
+
+    返回:
+        临时目录中的视频路径，未命中返回None
+    """
+    if not key or not _cache_enabled:
+        return None
+    entry = _cache_entry_path(key, suffix)
+    if not entry.exists():
+        return None
+    try:
+        local_path = Path(temp_dir) / f"cached_{uuid.uuid4().hex}{suffix}"
+        _link_or_copy(entry, local_path)
+        # 更新修改时间，作为LRU淘汰依据
+        os.utime(entry, None)
+        print(f"【预处理缓存】命中缓存: {entry.name}")
+        return str(local_path)
+    except OSError as e:
+        print(f"【预处理缓存】读取缓存失败: {e}")
+        return None
+
+
+def store_preprocess_cache(key, processed_path):
+    """将预处理结果写入缓存（先写临时文件再原子替换），并按上限淘汰旧条目"""
+    if not key or not _cache_enabled or not processed_path or not Path(processed_path).exists():
+        return
+    entry = _cache_entry_path(key, Path(processed_path).suffix or ".mp4")
+    temp_entry = entry.with_name(f"{entry.stem}.{uuid.uuid4().hex}.tmp")
+    try:
+        shutil.copyfile(processed_path, temp_entry)
+        os.replace(temp_entry, entry)
+        print(f"【预处理缓存】已缓存: {entry.name}")
+    except OSError as e:
+        print(f"【预处理缓存】写入缓存失败: {e}")
+        try:
+            temp_entry.unlink()
+        except OSError:
+            pass
+        return
+    _evict_preprocess_cache(_cache_max_bytes)
+
+
+def _evict_preprocess_cache(max_bytes):
+    """按最近使用时间淘汰缓存条目，直到总大小不超过上限"""
+    try:
+        entries = []
+        total_size = 0
+        for entry in get_preprocess_cache_dir().iterdir():
+            if entry.suffix not in _ENTRY_SUFFIXES:
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+            total_size += stat.st_size
+
+        entries.sort()
+        for _, size, entry in entries:
+            if total_size <= max_bytes:
+                break
+            try:
+                entry.unlink()
+                total_size -= size
+                print(f"【预处理缓存】淘汰缓存: {entry.name}")
+            except OSError:
+                pass
+    except Exception as e:
+        print(f"【预处理缓存】清理缓存失败: {e}")
+
+
+def clear_preprocess_cache():
+    """
+    清空预处理缓存
+
+    返回:
+        删除的文件数量
+    """
+    removed = 0
+    for entry in get_preprocess_cache_dir().iterdir():
+        if entry.suffix in _ENTRY_SUFFIXES + (".tmp",):
+            try:
+                entry.unlink()
+                removed += 1
+            except OSError:
+                pass
+    print(f"【预处理缓存】已清空缓存，删除 {removed} 个文件")
+    return removed
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态图层预合成模块
+背景、图片和字幕只在前3秒有入场动画，之后位置固定不变，但原来的叠加方式在整段视频的每一帧都要计算位置表达式
+并分别混合各个RGBA图层。分时段渲染模式下入场动画的叠加只在前3秒启用，之后改为叠加一张用Pillow预先合成好的
+RGBA图层（只覆盖各图层在画面内的外接矩形，相距较远的图层分成几张），视频越长节省越多；GIF是动画，仍单独叠加。
+
+可通过 set_timeline_split 或环境变量 VIDEO_TIMELINE_SPLIT=0 关闭
+"""
+
+import os
+from pathlib import Path
+from collections import namedtuple
+
+# 待合成的图层：图片路径和最终位置（相对于画面左上角，可以为负数或超出画面）
+PlateLayer = namedtuple('PlateLayer', ['path', 'x', 'y'])
+
+# 合成后的静态图层：图片路径和叠加位置
+StaticPlate = namedtuple('StaticPlate', ['path', 'x', 'y', 'width', 'height'])
+
+# 合并后外接矩形面积与各图层面积之和的最大比值，超出时分成多张分别叠加
+MAX_PLATE_WASTE = 1.5
+
+_timeline_split = os.environ.get("VIDEO_TIMELINE_SPLIT", "1") != "0"
+
+
+def set_timeline_split(enabled):
+    """开启或关闭分时段渲染"""
+    global _timeline_split
+    _timeline_split = bool(enabled)
+
+
+def is_timeline_split_enabled():
+    """是否使用分时段渲染"""
+    return _timeline_split
+
+
+def _union(rect_a, rect_b):
+    return (min(rect_a[0], rect_b[0]), min(rect_a[1], rect_b[1]), max(rect_a[2], rect_b[2]), max(rect_a[3], rect_b[3]))
+
+
+def _area(rect):
+    return max(0, rect[2] - rect[0]) * max(0, rect[3] - rect[1])
+
+
+def group_layers(rects):
+    """
+    把相邻的图层分组合成：合并后外接矩形的面积不超过各图层面积之和的 MAX_PLATE_WASTE 倍时才合并，
+    避免相距较远的图层（如顶部的图片和底部的字幕）合成出一张大部分透明的大图，每帧反而要混合更多像素
+
+    参数:
+        rects: 按叠加顺序排列的图层矩形 [(left, top, right, bottom), ...]
+
+    返回:
+        分组列表，每组为连续的图层序号列表（按组依次叠加即可保持原有层次）
+    """
+    groups = []
+    group_rect = None
+    group_area = 0
+    for index, rect in enumerate(rects):
+        if groups:
+            merged_rect = _union(group_rect, rect)
+            if _area(merged_rect) <= (group_area + _area(rect)) * MAX_PLATE_WASTE:
+                groups[-1].append(index)
+                group_rect = merged_rect
+                group_area += _area(rect)
+                continue
+        groups.append([index])
+        group_rect = rect
+        group_area = _area(rect)
+    return groups
+
+
+def compose_static_plates(layers, frame_width, frame_height, output_prefix):
+    """
+    按顺序把图层合成为一张或几张RGBA图片（先添加的在下层），裁剪到画面范围内
+
+    参数:
+        layers: PlateLayer列表
+        frame_width: 画面宽度
+        frame_height: 画面高度
+        output_prefix: 输出路径前缀，第n张图片保存为 <前缀>_<n>.png
+
+    返回:
+        StaticPlate列表（按叠加顺序），图层无法读取时返回None；完全在画面外的图层被忽略
+    """
+    try:
+        from PIL import Image
+
+        images = []
+        for layer in layers:
+            with Image.open(layer.path) as image:
+                image = image.convert('RGBA')
+            x, y = int(layer.x), int(layer.y)
+            # 图层在画面内的部分
+            rect = (max(0, x), max(0, y), min(int(frame_width), x + image.width), min(int(frame_height), y + image.height))
+            if _area(rect) > 0:
+                images.append((image, x, y, rect))
+
+        plates = []
+        for group in group_layers([rect for _, _, _, rect in images]):
+            left, top, right, bottom = images[group[0]][3]
+            for index in group[1:]:
+                left, top, right, bottom = _union((left, top, right, bottom), images[index][3])
+
+            plate = Image.new('RGBA', (right - left, bottom - top), (0, 0, 0, 0))
+            for index in group:
+                image, x, y, rect = images[index]
+                visible = image.crop((rect[0] - x, rect[1] - y, rect[2] - x, rect[3] - y))
+                plate.alpha_composite(visible, dest=(rect[0] - left, rect[1] - top))
+
+            output_path = Path(f"{output_prefix}_{len(plates)}.png")
+            plate.save(output_path)
+            print(f"【静态图层】合成 {len(group)} 个图层: {output_path.name} {plate.width}x{plate.height} @ ({left}, {top})")
+            plates.append(StaticPlate(str(output_path), left, top, plate.width, plate.height))
+        return plates
+    except Exception as e:
+        print(f"【静态图层】合成失败: {e}")
+        return None
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+FFmpeg流式管道模块
+分步处理时预处理结果原本要完整写成中间文件，再由叠加素材的最终编码读出。流式模式下两者通过命名管道（FIFO）
+以NUT格式传递原始帧，各阶段的FFmpeg同时运行，磁盘上只写出最终带 +faststart 的MP4。
+
+仅支持提供 os.mkfifo 的系统（Linux/macOS），其他系统或管道建立失败时调用方回退到基于文件的处理；
+可通过 set_streaming 或环境变量 VIDEO_STREAMING=1 开启
+"""
+
+import os
+import time
+import errno
+import threading
+import subprocess
+from pathlib import Path
+from collections import namedtuple
+
+from utils import _apply_thread_budget
+
+# 管道中视频使用原始帧（不产生额外的有损编码），音频使用AAC（后续步骤可以直接复制到MP4）
+NUT_VIDEO_ARGS = ['-c:v', 'rawvideo', '-pix_fmt', 'yuv420p']
+NUT_AUDIO_ARGS = ['-c:a', 'aac', '-b:a', '192k']
+
+# 预处理流：生成预处理画面的FFmpeg命令（不含输出参数）及其输出的尺寸、时长和是否包含音频
+StreamSource = namedtuple('StreamSource', ['command', 'width', 'height', 'duration', 'has_audio'])
+
+_streaming_enabled = os.environ.get("VIDEO_STREAMING", "0") == "1"
+
+
+def set_streaming(enabled):
+    """开启或关闭流式管道模式"""
+    global _streaming_enabled
+    _streaming_enabled = bool(enabled)
+
+
+def is_streaming_supported():
+    """当前系统是否支持命名管道"""
+    return os.name == 'posix' and hasattr(os, 'mkfifo')
+
+
+def is_streaming_enabled():
+    """是否使用流式管道模式（已开启且系统支持）"""
+    return _streaming_enabled and is_streaming_supported()
+
+
+def nut_output_args(with_audio=True):
+    """写入NUT管道的输出参数（原始帧视频，有音频时编码为AAC，否则不输出音频）"""
+    audio_args = list(NUT_AUDIO_ARGS) if with_audio else ['-an']
+    return list(NUT_VIDEO_ARGS) + audio_args + ['-f', 'nut']
+
+
+class FfmpegStream:
+    """
+    一组通过命名管道相连的后台FFmpeg进程
+
+    某个进程异常退出时：它读取的管道的写入方被结束（失败沿管道向上游传递），
+    它写入的管道被打开后立即关闭，阻塞在读取上的下游进程收到EOF后结束；
+    下游已正常结束而导致上游写入失败（如 -shortest 提前结束）不视为失败。
+    close() 结束仍在运行的进程并删除管道。
+
+    用法:
+        with FfmpegStream(temp_dir) as stream:
+            fifo = stream.fifo("source")
+            stream.start("预处理", producer_cmd + [str(fifo)], [(fifo, 'w')])
+            stream.start("最终编码", ['ffmpeg', '-y', '-i', str(fifo), ..., output_path], [(fifo, 'r')])
+            ok = stream.wait()
+    """
+
+    def __init__(self, temp_dir):
+        self.temp_dir = Path(temp_dir)
+        self._fifos = []
+        self._processes = []
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def fifo(self, name):
+        """在临时目录中创建命名管道，返回路径"""
+        path = self.temp_dir / f"{name}.nut"
+        if path.exists():
+            path.unlink()
+        os.mkfifo(path)
+        self._fifos.append(path)
+        return path
+
+    def start(self, name, command, fifos=()):
+        """
+        在后台启动FFmpeg进程
+
+        参数:
+            name: 进程名称（用于日志）
+            command: FFmpeg命令列表
+            fifos: 该进程使用的管道列表 [(管道路径, 'r'或'w'), ...]，'r'表示读取（消费者），'w'表示写入（生产者）
+
+        返回:
+            subprocess.Popen，启动失败返回None
+        """
+        command = _apply_thread_budget(command)
+        log_path = self.temp_dir / f"{name}.log"
+        print(f"【流式管道】启动{name}: {' '.join(str(arg) for arg in command)}")
+        entry = {'name': name, 'process': None, 'log': log_path, 'fifos': list(fifos), 'downstream_done': False}
+        try:
+            with open(log_path, 'wb') as log_file:
+                entry['process'] = subprocess.Popen(command, stdin=subprocess.DEVNULL,
+                                                    stdout=subprocess.DEVNULL, stderr=log_file)
+        except OSError as e:
+            print(f"【流式管道】启动{name}失败: {e}")
+            self._release(entry)
+            return None
+
+        entry['watcher'] = threading.Thread(target=self._watch, args=(entry,), daemon=True)
+        with self._lock:
+            self._processes.append(entry)
+        entry['watcher'].start()
+        return entry['process']
+
+    def _peers(self, fifo, mode):
+        with self._lock:
+            return [entry for entry in self._processes if (fifo, mode) in entry['fifos']]
+
+    def _watch(self, entry):
+        entry['process'].wait()
+        if entry['process'].returncode == 0:
+            return
+        if self._downstream_succeeded(entry):
+            entry['downstream_done'] = True
+            return
+        self._release(entry)
+
+    def _release(self, entry):
+        """进程失败后解除各管道另一端的阻塞"""
+        for fifo, mode in entry['fifos']:
+            if mode == 'r':
+                # 结束上游写入方
+                for peer in self._peers(fifo, 'w'):
+                    if peer['process'].poll() is None:
+                        peer['process'].kill()
+            else:
+                threading.Thread(target=self._release_reader, args=(fifo,), daemon=True).start()
+
+    def _release_reader(self, fifo):
+        """写入方失败：打开写端后立即关闭，阻塞在读取上的进程会收到EOF"""
+        while not self._closed.is_set():
+            try:
+                os.close(os.open(fifo, os.O_WRONLY | os.O_NONBLOCK))
+                return
+            except OSError as e:
+                # ENXIO: 读取方尚未打开管道，稍后重试
+                if e.errno != errno.ENXIO:
+                    return
+            self._closed.wait(0.1)
+
+    def _downstream_succeeded(self, entry, grace=0.5):
+        """
+        写入失败是否由下游提前正常结束引起（如 -shortest）：该进程写入的管道的读取方都已正常退出
+
+        真正的失败发生时下游仍阻塞在读取上（尚未被解除），不会在等待时间内退出
+        """
+        readers = [peer for fifo, mode in entry['fifos'] if mode == 'w' for peer in self._peers(fifo, 'r')]
+        if not readers:
+            return False
+        for peer in readers:
+            try:
+                if peer['process'].wait(grace) != 0:
+                    return False
+            except subprocess.TimeoutExpired:
+                return False
+        return True
+
+    def wait(self, timeout=None):
+        """
+        等待所有后台进程结束
+
+        返回:
+            bool: 全部成功返回True；超时或有进程失败时返回False（并输出失败进程的错误信息）
+        """
+        deadline = time.time() + timeout if timeout else None
+        ok = True
+        with self._lock:
+            entries = list(self._processes)
+        for entry in entries:
+            remaining = max(0.0, deadline - time.time()) if deadline else None
+            try:
+                entry['process'].wait(remaining)
+            except subprocess.TimeoutExpired:
+                print(f"【流式管道】{entry['name']}超时")
+                ok = False
+                continue
+            entry['watcher'].join(1)
+
+        for entry in entries:
+            returncode = entry['process'].poll()
+            if returncode == 0 or returncode is None:
+                continue
+            if entry['downstream_done']:
+                print(f"【流式管道】{entry['name']}的下游已提前结束，忽略写入错误")
+                continue
+            ok = False
+            try:
+                error_text = entry['log'].read_text(encoding='utf-8', errors='ignore').strip()
+            except OSError:
+                error_text = ""
+            print(f"【流式管道】{entry['name']}失败 (返回码: {returncode})")
+            if error_text:
+                print(f"错误信息: {error_text[-2000:]}")
+        return ok and len(entries) > 0
+
+    def close(self):
+        """结束仍在运行的后台进程并删除管道"""
+        self._closed.set()
+        with self._lock:
+            entries = list(self._processes)
+        for entry in entries:
+            process = entry['process']
+            if process.poll() is None:
+                process.kill()
+                try:
+                    process.wait(5)
+                except subprocess.TimeoutExpired:
+                    pass
+        for fifo in self._fifos:
+            try:
+                fifo.unlink()
+            except OSError:
+                pass
+        self._fifos = []
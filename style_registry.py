@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+字幕样式注册表模块
+subtitle_styles.ini 只解析一次，编译为不可变的样式对象（颜色、描边、阴影等均已转换为对应类型），
+配置文件修改时间变化时自动重新加载；video_core、video_helpers 和 GUI 共用同一份样式数据
+"""
+
+import os
+import ast
+import threading
+import configparser
+from collections import namedtuple
+from pathlib import Path
+from types import MappingProxyType
+
+from utils import get_data_path
+
+# 需要解析为元组的配置项
+_TUPLE_KEYS = ('text_color', 'stroke_color', 'shadow_color', 'shadow_offset')
+# 需要解析为数值的配置项
+_NUMBER_KEYS = ('font_size', 'stroke_width', 'white_stroke_ratio')
+
+_StyleFields = namedtuple('_StyleFields', [
+    'name', 'description', 'font_path', 'font_size', 'text_color', 'stroke_color',
+    'stroke_width', 'white_stroke_ratio', 'shadow', 'shadow_color', 'shadow_offset', 'options'
+])
+
+
+class SubtitleStyle(_StyleFields):
+    """
+    编译后的字幕样式（不可变）
+
+    各字段为配置文件中的值，未配置的字段使用默认值；
+    options 保存配置文件中实际出现的配置项（键值对元组），用于还原为 load_style_config 的字典格式
+    """
+    __slots__ = ()
+
+    def to_dict(self):
+        """转换为 load_style_config(style) 返回的字典格式（只包含配置文件中出现的配置项）"""
+        return dict(self.options)
+
+
+# 样式注册表快照
+StyleRegistry = namedtuple('StyleRegistry', ['path', 'mtime', 'styles', 'font_paths', 'parser'])
+
+_lock = threading.Lock()
+_registry = None
+
+
+def find_style_config_path():
+    """查找样式配置文件，找不到返回None"""
+    config_paths = [
+        get_data_path("config") / "subtitle_styles.ini",
+        Path("VideoApp/config") / "subtitle_styles.ini",
+        Path("config") / "subtitle_styles.ini",
+        Path(os.getcwd()) / "config" / "subtitle_styles.ini"
+    ]
+    for config_path in config_paths:
+        if config_path.exists():
+            return config_path
+    return None
+
+
+def _parse_value(key, value):
+    """按 load_style_config 的规则解析配置值"""
+    if key in _TUPLE_KEYS:
+        try:
+            parsed = ast.literal_eval(value)
+            return tuple(parsed) if isinstance(parsed, list) else parsed
+        except Exception:
+            return value
+    if key in _NUMBER_KEYS:
+        try:
+            return float(value) if '.' in value else int(value)
+        except ValueError:
+            return value
+    if key == 'shadow':
+        return value.lower() in ['true', 'yes', '1']
+    return value
+
+
+def _read_descriptions(config_path):
+    """读取每个样式段落下的第一行注释作为样式描述"""
+    descriptions = {}
+    current = None
+    try:
+        with open(config_path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith('[') and line.endswith(']'):
+                    current = line[1:-1]
+                elif current and line.startswith(';') and current not in descriptions:
+                    descriptions[current] = line.lstrip(';').strip()
+    except OSError:
+        pass
+    return descriptions
+
+
+def _compile_style(name, section, description):
+    """将配置段编译为 SubtitleStyle"""
+    options = tuple((key, _parse_value(key, value)) for key, value in section.items())
+    values = dict(options)
+    return SubtitleStyle(
+        name=name,
+        description=description or name,
+        font_path=values.get('font_path', 'data/fonts/BebasNeue-Regular.ttf'),
+        font_size=values.get('font_size', 70),
+        text_color=values.get('text_color', (255, 255, 255, 255)),
+        stroke_color=values.get('stroke_color', (0, 0, 0, 255)),
+        stroke_width=values.get('stroke_width', 2),
+        white_stroke_ratio=values.get('white_stroke_ratio', 1.2),
+        shadow=values.get('shadow', False),
+        shadow_color=values.get('shadow_color', (0, 0, 0, 120)),
+        shadow_offset=values.get('shadow_offset', (4, 4)),
+        options=options
+    )
+
+
+def _load_registry(config_path):
+    """解析配置文件，生成样式注册表快照"""
+    parser = configparser.ConfigParser()
+    styles = {}
+    font_paths = {}
+    mtime = None
+
+    if config_path is not None:
+        try:
+            mtime = config_path.stat().st_mtime_ns
+            parser.read(str(config_path), encoding='utf-8')
+            print(f"成功加载样式配置: {config_path}")
+        except Exception as e:
+            print(f"读取样式配置文件 {config_path} 失败: {e}")
+
+        descriptions = _read_descriptions(config_path)
+        for section in parser.sections():
+            if section.startswith("styles."):
+                name = section.replace("styles.", "")
+                styles[name] = _compile_style(name, parser[section], descriptions.get(section))
+        if parser.has_section('font_paths'):
+            font_paths = dict(parser.items('font_paths'))
+    else:
+        print("未找到样式配置文件，将使用默认样式")
+
+    return StyleRegistry(
+        path=config_path,
+        mtime=mtime,
+        styles=MappingProxyType(styles),
+        font_paths=MappingProxyType(font_paths),
+        parser=parser
+    )
+
+
+def get_style_registry(force_reload=False):
+    """
+    获取样式注册表（配置文件路径或修改时间变化时重新加载）
+
+    返回:
+        StyleRegistry: path, mtime, styles(样式名 -> SubtitleStyle), font_paths, parser
+    """
+    global _registry
+    config_path = find_style_config_path()
+    try:
+        mtime = config_path.stat().st_mtime_ns if config_path else None
+    except OSError:
+        mtime = None
+
+    with _lock:
+        if (force_reload or _registry is None
+                or _registry.path != config_path or _registry.mtime != mtime):
+            _registry = _load_registry(config_path)
+        return _registry
+
+
+def reload_style_registry():
+    """强制重新加载样式配置"""
+    return get_style_registry(force_reload=True)
+
+
+def get_style(style):
+    """获取指定名称的样式，不存在返回None"""
+    return get_style_registry().styles.get(style)
+
+
+def list_style_names():
+    """按配置文件中的顺序返回所有样式名称"""
+    return list(get_style_registry().styles.keys())
+
+
+def get_font_paths():
+    """获取 [font_paths] 段的语言字体配置（只读字典）"""
+    return get_style_registry().font_paths
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""测试公共配置：把项目根目录加入模块搜索路径，缓存目录指向临时目录"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+def _patch_cache_dir(tmp_path, monkeypatch, module, dir_getter, name):
+    """把缓存模块的缓存目录指向临时目录"""
+    cache_dir = tmp_path / name
+    cache_dir.mkdir()
+    monkeypatch.setattr(module, dir_getter, lambda: cache_dir)
+    return cache_dir
+
+
+@pytest.fixture
+def preprocess_cache_dir(tmp_path, monkeypatch):
+    """预处理缓存目录指向临时目录，并启用缓存"""
+    import preprocess_cache
+    monkeypatch.setattr(preprocess_cache, "_cache_enabled", True)
+    return _patch_cache_dir(tmp_path, monkeypatch, preprocess_cache, "get_preprocess_cache_dir", "preprocess")
+
+
+@pytest.fixture
+def image_cache_dir(tmp_path, monkeypatch):
+    """叠加图片缓存目录指向临时目录，并清空内存缓存"""
+    import image_cache
+    monkeypatch.setattr(image_cache, "_memory_cache", image_cache.OrderedDict())
+    return _patch_cache_dir(tmp_path, monkeypatch, image_cache, "get_image_cache_dir", "images")
+
+
+@pytest.fixture
+def tts_cache_dir(tmp_path, monkeypatch):
+    """配音缓存目录指向临时目录，并使用假后端"""
+    import tts_cache
+    import tts_backend
+    monkeypatch.setattr(tts_cache, "_cache_enabled", True)
+    monkeypatch.setattr(tts_backend, "_backend", tts_backend.FakeTTSBackend())
+    return _patch_cache_dir(tmp_path, monkeypatch, tts_cache, "get_tts_cache_dir", "tts_cache")
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""能量VAD：语音区间与首尾静音检测"""
+
+import numpy as np
+import pytest
+
+import audio_vad
+from audio_vad import detect_speech_intervals, detect_speech_bounds
+
+RATE = 16000
+
+
+def tone(seconds, amplitude=0.5):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return amplitude * np.sin(2 * np.pi * 440 * t)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * RATE))
+
+
+def test_intervals_around_silence():
+    samples = np.concatenate([silence(0.5), tone(1.0), silence(0.5), tone(0.5), silence(0.3)])
+    intervals = detect_speech_intervals(samples, RATE)
+    assert len(intervals) == 2
+    assert intervals[0] == pytest.approx((0.5, 1.5), abs=0.021)
+    assert intervals[1] == pytest.approx((2.0, 2.5), abs=0.021)
+
+
+def test_short_silence_is_merged():
+    samples = np.concatenate([tone(0.5), silence(0.1), tone(0.5)])
+    assert detect_speech_intervals(samples, RATE) == [pytest.approx((0.0, 1.1), abs=0.021)]
+
+
+def test_short_blip_is_dropped():
+    samples = np.concatenate([silence(0.5), tone(0.02), silence(0.5), tone(0.5)])
+    intervals = detect_speech_intervals(samples, RATE)
+    assert len(intervals) == 1
+    assert intervals[0][0] == pytest.approx(1.02, abs=0.021)
+
+
+def test_silent_or_empty_input():
+    assert detect_speech_intervals(silence(1.0), RATE) == []
+    assert detect_speech_intervals(np.zeros(10), RATE) == []
+
+
+def test_speech_bounds_with_padding(monkeypatch):
+    samples = np.concatenate([silence(0.4), tone(1.0), silence(0.6)])
+    monkeypatch.setattr(audio_vad, "decode_pcm", lambda path, sample_rate=RATE: samples)
+    start, end = detect_speech_bounds("speech.wav", padding=0.05)
+    assert start == pytest.approx(0.35, abs=0.021)
+    assert end == pytest.approx(1.45, abs=0.021)
+
+
+def test_speech_bounds_clamped_to_audio(monkeypatch):
+    monkeypatch.setattr(audio_vad, "decode_pcm", lambda path, sample_rate=RATE: tone(1.0))
+    assert detect_speech_bounds("speech.wav", padding=0.2) == (0.0, 1.0)
+
+
+def test_speech_bounds_without_speech(monkeypatch):
+    monkeypatch.setattr(audio_vad, "decode_pcm", lambda path, sample_rate=RATE: silence(1.0))
+    assert detect_speech_bounds("silence.wav") is None
+    monkeypatch.setattr(audio_vad, "decode_pcm", lambda path, sample_rate=RATE: None)
+    assert detect_speech_bounds("missing.wav") is None
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""批量调度：FFmpeg线程预算与流式管道任务类型"""
+
+import pytest
+
+import stream_pipeline
+import utils
+from batch_scheduler import compute_thread_budget, job_stream_kind
+from utils import _apply_thread_budget
+
+
+@pytest.mark.parametrize("max_workers, cpu_count, expected", [
+    (1, 8, 8),
+    (2, 8, 4),
+    (3, 8, 2),
+    (8, 8, 1),
+    (16, 8, 1),
+    (0, 8, 8),
+])
+def test_compute_thread_budget(max_workers, cpu_count, expected):
+    assert compute_thread_budget(max_workers, cpu_count) == expected
+
+
+def test_thread_budget_inserted_before_output(monkeypatch):
+    monkeypatch.setattr(utils, "_ffmpeg_threads", 4)
+    assert _apply_thread_budget(['ffmpeg', '-y', '-i', 'in.mp4', 'out.mp4']) == \
+        ['ffmpeg', '-y', '-i', 'in.mp4', '-threads', '4', 'out.mp4']
+
+
+def test_thread_budget_keeps_explicit_threads(monkeypatch):
+    monkeypatch.setattr(utils, "_ffmpeg_threads", 4)
+    command = ['ffmpeg', '-i', 'in.mp4', '-threads', '2', 'out.mp4']
+    assert _apply_thread_budget(command) == command
+
+
+def test_thread_budget_only_applies_to_ffmpeg(monkeypatch):
+    monkeypatch.setattr(utils, "_ffmpeg_threads", 4)
+    command = ['ffprobe', '-v', 'error', 'in.mp4']
+    assert _apply_thread_budget(command) == command
+    monkeypatch.setattr(utils, "_ffmpeg_threads", None)
+    assert _apply_thread_budget(['ffmpeg', '-i', 'in.mp4', 'out.mp4']) == ['ffmpeg', '-i', 'in.mp4', 'out.mp4']
+
+
+def test_preprocess_job_passes_path_and_scale_factor(tmp_path, monkeypatch):
+    import video_core
+    from batch_scheduler import preprocess_job
+
+    calls = []
+
+    def fake_preprocess(path, temp_dir, scale_factor=1.1, **kwargs):
+        calls.append((temp_dir, scale_factor))
+        output = temp_dir / "processed.mp4"
+        output.write_bytes(b"video")
+        return output
+
+    monkeypatch.setattr(video_core, "preprocess_video_without_reverse", fake_preprocess)
+    job = {'kind': 'long', 'path': str(tmp_path / "input.mp4"), 'process_kwargs': {'scale_factor': 1.3}}
+    # 临时目录以字符串传入时也按Path拼接路径
+    preprocessed_path, single_pass = preprocess_job(job, str(tmp_path))
+
+    assert preprocessed_path == str(tmp_path / "processed.mp4")
+    assert not single_pass
+    assert calls == [(tmp_path, 1.3)]
+
+
+@pytest.fixture
+def streaming(monkeypatch):
+    monkeypatch.setattr(stream_pipeline, "_streaming_enabled", True)
+    monkeypatch.setattr(stream_pipeline, "is_streaming_supported", lambda: True)
+
+
+def test_job_stream_kind_without_streaming(monkeypatch):
+    monkeypatch.setattr(stream_pipeline, "_streaming_enabled", False)
+    assert job_stream_kind({'kind': 'long', 'process_kwargs': {}}) is None
+
+
+def test_job_stream_kind_with_streaming(streaming):
+    assert job_stream_kind({'kind': 'long'}) == 'long'
+    assert job_stream_kind({'kind': 'short', 'process_kwargs': {'single_pass': False}}) == 'short'
+
+
+def test_single_pass_takes_precedence_over_streaming(streaming):
+    assert job_stream_kind({'kind': 'long', 'process_kwargs': {'single_pass': True}}) is None
+
+
+def test_folder_jobs_stream_even_with_single_pass(streaming):
+    # 文件夹任务不支持单次渲染，仍使用流式管道
+    assert job_stream_kind({'kind': 'folder', 'process_kwargs': {'single_pass': True}}) == 'folder'
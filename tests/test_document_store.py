@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""字幕文档存储：按语言索引文本与文档修改后的重新加载"""
+
+import os
+
+import pytest
+
+import document_store
+from document_store import load_document_store
+
+DOCUMENT = """name,zn,malay_title,cn_prompt
+a,标题一,Tajuk satu,配音一
+b,,Tajuk dua,配音二
+c,标题三,,
+"""
+
+
+@pytest.fixture(autouse=True)
+def empty_store(monkeypatch):
+    monkeypatch.setattr(document_store, "_documents", document_store.OrderedDict())
+
+
+@pytest.fixture
+def document(tmp_path):
+    path = tmp_path / "subtitles.csv"
+    path.write_text(DOCUMENT, encoding='utf-8')
+    return path
+
+
+def touch(path, text):
+    """改写文档并把修改时间向后推，避免文件系统时间精度不足时签名不变"""
+    mtime = path.stat().st_mtime_ns
+    path.write_text(text, encoding='utf-8')
+    os.utime(path, ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+
+
+def test_texts_are_indexed_per_language(document):
+    store = load_document_store(str(document))
+    # 空值被跳过，索引按有效文本计数
+    assert store.titles["chinese"] == ("标题一", "标题三")
+    assert store.titles["malay"] == ("Tajuk satu", "Tajuk dua")
+    assert "thai" not in store.titles
+    assert store.subtitle_text("chinese", 1) == "标题三"
+    # 视频索引超出范围时使用最后一个
+    assert store.subtitle_text("malay", 5) == "Tajuk dua"
+    assert store.subtitle_text("thai", 0) is None
+    assert store.tts_text("chinese", 1) == "配音二"
+    # 没有配音列的语言回退到中文
+    assert store.tts_text("english", 0) == "配音一"
+
+
+def test_document_is_parsed_once(document, monkeypatch):
+    first = load_document_store(str(document))
+    monkeypatch.setattr(document_store, "read_document", lambda path: pytest.fail("文档被重复解析"))
+    assert load_document_store(str(document)) is first
+
+
+def test_modified_document_is_reloaded(document):
+    assert load_document_store(str(document)).subtitle_text("chinese", 0) == "标题一"
+    touch(document, "name,zn,title_thai\na,新标题,ราคา_พิเศษ\n")
+
+    store = load_document_store(str(document))
+    assert store.subtitle_text("chinese", 0) == "新标题"
+    # 泰文中的下划线替换为空格
+    assert store.subtitle_text("thai", 0) == "ราคา พิเศษ"
+    assert "malay" not in store.titles
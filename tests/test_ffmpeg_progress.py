@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""FFmpeg进度：-progress 键值解析与格式化"""
+
+import pytest
+
+from utils import _make_progress, format_progress_stage, format_encode_stats
+
+
+def test_progress_with_duration():
+    progress = _make_progress({'out_time_us': '4000000', 'fps': '45.0', 'speed': '2.00x',
+                               'total_size': '1048576'}, duration=10.0)
+    assert progress.out_time == pytest.approx(4.0)
+    assert progress.percent == pytest.approx(40.0)
+    assert progress.eta == pytest.approx(3.0)
+    assert progress.total_size == 1048576
+    assert format_progress_stage("编码中", progress) == "编码中 45fps 2.00x 剩余3秒"
+
+
+def test_progress_without_values():
+    # 编码刚开始时 speed=N/A、out_time_us 可能为负
+    progress = _make_progress({'out_time_us': '-9223372036854775807', 'fps': '0.00', 'speed': 'N/A'}, duration=10.0)
+    assert progress.out_time is None
+    assert progress.percent is None and progress.eta is None
+    assert format_progress_stage("编码中", progress) == "编码中"
+
+
+def test_progress_is_clamped():
+    progress = _make_progress({'out_time_us': '12000000', 'speed': '1.5x'}, duration=10.0)
+    assert progress.percent == 100.0
+    assert progress.eta == 0.0
+
+
+def test_format_encode_stats():
+    stats = {'wall_time': 3.26, 'fps': 60.0, 'speed': 2.5, 'total_size': 5 * 1024 * 1024}
+    assert format_encode_stats(stats) == "编码 3.3秒, 60.0fps, 2.50x, 5.0MB"
+    assert format_encode_stats(None) == ""
+    assert format_encode_stats({'wall_time': 1.0, 'fps': None, 'speed': None}) == ""
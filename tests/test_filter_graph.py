@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""滤镜图构建：输入去重、无效节点优化与连线检查"""
+
+import pytest
+
+from filter_graph import FilterGraph, Input, is_noop_filter
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('null', True), ('anull', True), ('trim', True), ('atrim=start=0', True),
+    ('setpts=PTS', True), ('scale=iw*1.0:ih*1.0', True), ('scale=w=iw:h=ih:flags=lanczos', True),
+    ('trim=duration=5', False), ('setpts=PTS-STARTPTS', False), ('scale=iw*1.1:ih*1.1', False),
+    ('format=yuv420p', False),
+])
+def test_is_noop_filter(text, expected):
+    assert is_noop_filter(text) is expected
+
+
+def test_inputs_are_deduplicated_by_path_and_options():
+    graph = FilterGraph()
+    source = graph.input("a.mp4")
+    logo = graph.input("logo.png", ('-loop', '1'))
+    assert graph.input("a.mp4") == source
+    assert graph.input("logo.png") != logo
+    assert graph.input_count == 3
+    assert graph.input_args() == ['-i', 'a.mp4', '-loop', '1', '-i', 'logo.png', '-i', 'logo.png']
+
+
+def test_render_drops_noop_filters_and_dead_nodes():
+    graph = FilterGraph()
+    source = graph.input("a.mp4")
+    logo = graph.input("logo.png")
+    base = graph.filter(['scale=iw*1.0:ih*1.0', 'null', 'scale=1080:1920'], source.video)
+    graph.filter('hflip', source.video)
+    video = graph.filter('overlay=x=1:y=2', graph.filter('null', base), graph.filter('format=yuva420p', logo.video))
+    assert graph.render({'v': video}) == \
+        "[0:v]scale=1080:1920[n0];[1:v]format=yuva420p[n3];[n0][n3]overlay=x=1:y=2[v]"
+
+
+def test_passthrough_outputs_keep_matching_null_filter():
+    graph = FilterGraph()
+    source = graph.input("a.mp4")
+    video = graph.filter('null', source.video)
+    audio = graph.filter(['atrim', 'asetpts=PTS'], source.audio)
+    assert graph.render({'v': video, 'aout': audio}) == "[0:v]null[v];[0:a]anull[aout]"
+
+
+def test_split_outputs():
+    graph = FilterGraph()
+    source = graph.input("a.mp4")
+    forward, backward = graph.filter('split', source.video, outputs=2)
+    video = graph.filter('concat=n=2:v=1:a=0', forward, graph.filter('reverse', backward))
+    assert graph.render({'v': video}) == \
+        "[0:v]split[n0][n1];[n1]reverse[n2];[n0][n2]concat=n=2:v=1:a=0[v]"
+
+
+def test_pad_used_twice_raises():
+    graph = FilterGraph()
+    source = graph.input("a.mp4")
+    base = graph.filter('scale=1080:1920', source.video)
+    video = graph.filter('overlay', base, base)
+    with pytest.raises(ValueError):
+        graph.render({'v': video})
+
+
+def test_unconnected_output_raises():
+    graph = FilterGraph()
+    source = graph.input("a.mp4")
+    forward, _ = graph.filter('split', source.video, outputs=2)
+    with pytest.raises(ValueError):
+        graph.render({'v': graph.filter('hflip', forward)})
+
+
+def test_missing_input_raises():
+    graph = FilterGraph()
+    graph.input("a.mp4")
+    video = graph.filter('hflip', Input(1).video)
+    with pytest.raises(ValueError):
+        graph.render({'v': video})
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""滤镜图预检：命令拆分、结构哈希、null输出命令与已验证结构记录"""
+
+import subprocess
+from types import SimpleNamespace
+
+import pytest
+
+import utils
+import graph_preflight
+from graph_preflight import _split_command, _null_output_command, graph_shape_key, preflight_graph
+
+
+def encode_command(text="hello", x=100, duration=5.0, logo="logo.png", video_filter="overlay"):
+    return ['ffmpeg', '-y', '-stream_loop', '-1', '-i', '/videos/a.mp4', '-loop', '1', '-i', logo,
+            '-filter_complex', f"[0:v]trim=duration={duration}[b];[1:v]format=yuva420p[l];[b][l]{video_filter}=x={x}:y=20[v]",
+            '-map', '[v]', '-map', '0:a?', '-c:v', 'libx264', '-crf', '23',
+            '-movflags', '+faststart', '-brand', 'mp42', '-f', 'mp4']
+
+
+@pytest.fixture
+def preflight_dir(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "graph_preflight"
+    cache_dir.mkdir()
+    monkeypatch.setattr(graph_preflight, "get_preflight_cache_dir", lambda: cache_dir)
+    monkeypatch.setattr(graph_preflight, "_preflight_enabled", True)
+    monkeypatch.setattr(graph_preflight, "has_audio_stream", lambda path: True)
+    monkeypatch.setattr(utils, "_ffmpeg_threads", 0)
+    return cache_dir
+
+
+def test_split_command():
+    inputs, others = _split_command(encode_command())
+    assert inputs == [(['-stream_loop', '-1'], '/videos/a.mp4'), (['-loop', '1'], 'logo.png')]
+    assert others[:2] == ['-y', '-filter_complex']
+    assert others[-2:] == ['-f', 'mp4']
+
+
+def test_split_command_keeps_every_input_option():
+    command = ['ffmpeg', '-y', '-i', '/videos/a.mp4', '-loop', '1', '-t', '5', '-i', 'plate.png',
+               '-filter_complex', '[0:v][1:v]overlay[v]', '-map', '[v]']
+    inputs, others = _split_command(command)
+    assert inputs == [([], '/videos/a.mp4'), (['-loop', '1', '-t', '5'], 'plate.png')]
+    assert others == ['-y', '-filter_complex', '[0:v][1:v]overlay[v]', '-map', '[v]']
+
+
+def test_shape_key_tells_input_options_apart(preflight_dir):
+    # 输入选项不同（静态图片是否循环）的滤镜图不能复用预检记录
+    looped = ['ffmpeg', '-y', '-i', 'a.mp4', '-loop', '1', '-t', '5', '-i', 'plate.png', '-map', '0:v']
+    single = ['ffmpeg', '-y', '-i', 'a.mp4', '-t', '5', '-i', 'plate.png', '-loop', '1', '-map', '0:v']
+    assert graph_shape_key(looped) != graph_shape_key(single)
+
+
+def test_shape_key_ignores_numbers_and_paths(preflight_dir):
+    key = graph_shape_key(encode_command())
+    assert key == graph_shape_key(encode_command(x=300, duration=7.5, logo="/other/plate.png"))
+    assert key != graph_shape_key(encode_command(video_filter="blend"))
+    assert key != graph_shape_key(encode_command(logo="sticker.gif"))
+
+
+def test_shape_key_includes_referenced_audio(preflight_dir, monkeypatch):
+    key = graph_shape_key(encode_command())
+    monkeypatch.setattr(graph_preflight, "has_audio_stream", lambda path: False)
+    assert graph_shape_key(encode_command()) != key
+
+
+def test_null_output_command_drops_muxer_options(preflight_dir):
+    command = ['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', 'list.txt',
+               '-c:v', 'libx264', '-movflags', '+faststart', '-brand', 'mp42', '-f', 'mp4']
+    assert _null_output_command(command, frames=3) == [
+        'ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', 'list.txt',
+        '-c:v', 'libx264', '-frames:v', '3', '-f', 'null', '-']
+
+
+def fake_run(returncode=0, error=None):
+    calls = []
+
+    def run(cmd, **kwargs):
+        calls.append(cmd)
+        if error:
+            raise error
+        return SimpleNamespace(returncode=returncode, stderr="Invalid filter")
+    return run, calls
+
+
+def test_preflight_records_good_shape(preflight_dir, monkeypatch):
+    run, calls = fake_run()
+    monkeypatch.setattr(graph_preflight.subprocess, "run", run)
+    assert preflight_graph(encode_command())
+    assert preflight_graph(encode_command(text="other", x=250))
+    assert len(calls) == 1
+    assert calls[0][-5:] == ['-frames:v', '3', '-f', 'null', '-']
+    assert len(list(preflight_dir.glob("*.ok"))) == 1
+
+
+def test_preflight_failure_is_not_recorded(preflight_dir, monkeypatch):
+    run, calls = fake_run(returncode=1)
+    monkeypatch.setattr(graph_preflight.subprocess, "run", run)
+    assert not preflight_graph(encode_command())
+    assert not preflight_graph(encode_command())
+    assert len(calls) == 2
+    assert not list(preflight_dir.glob("*.ok"))
+
+
+@pytest.mark.parametrize("error", [subprocess.TimeoutExpired("ffmpeg", 60), OSError("not found")])
+def test_undecidable_preflight_passes(preflight_dir, monkeypatch, error):
+    run, _ = fake_run(error=error)
+    monkeypatch.setattr(graph_preflight.subprocess, "run", run)
+    assert preflight_graph(encode_command())
+    assert not list(preflight_dir.glob("*.ok"))
+
+
+def test_disabled_preflight_does_not_run(preflight_dir, monkeypatch):
+    run, calls = fake_run(returncode=1)
+    monkeypatch.setattr(graph_preflight.subprocess, "run", run)
+    monkeypatch.setattr(graph_preflight, "_preflight_enabled", False)
+    assert preflight_graph(encode_command())
+    assert not calls
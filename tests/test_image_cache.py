@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""叠加图片缓存：缓存键、内存/磁盘命中与淘汰"""
+
+import os
+
+import image_cache
+from image_cache import make_image_cache_key, fetch_cached_image, store_cached_image
+
+
+def test_key_ignores_parameter_order():
+    assert make_image_cache_key("subtitle", text="你好", font_size=70) == \
+        make_image_cache_key("subtitle", font_size=70, text="你好")
+
+
+def test_key_depends_on_kind_and_parameters():
+    base = make_image_cache_key("subtitle", text="hello", color=(255, 255, 255))
+    assert make_image_cache_key("background", text="hello", color=(255, 255, 255)) != base
+    assert make_image_cache_key("subtitle", text="hello", color=(255, 255, 0)) != base
+    assert make_image_cache_key("subtitle", text="hello", color=[255, 255, 255]) == base
+
+
+def test_disk_hit_after_memory_is_cleared(image_cache_dir, tmp_path):
+    key = make_image_cache_key("subtitle", text="hello")
+    image = tmp_path / "rendered.png"
+    image.write_bytes(b"png data")
+    store_cached_image(key, image)
+    assert (image_cache_dir / f"{key}.png").exists()
+
+    image_cache._memory_cache.clear()
+    output = tmp_path / "out.png"
+    assert fetch_cached_image(key, output) == output
+    assert output.read_bytes() == b"png data"
+    assert key in image_cache._memory_cache
+
+
+def test_miss_returns_none(image_cache_dir, tmp_path):
+    assert fetch_cached_image(make_image_cache_key("subtitle", text="missing"), tmp_path / "out.png") is None
+    assert fetch_cached_image(None, tmp_path / "out.png") is None
+
+
+def test_memory_cache_is_bounded(image_cache_dir, monkeypatch):
+    monkeypatch.setattr(image_cache, "_MAX_MEMORY_ENTRIES", 2)
+    for key in ("a", "b", "c"):
+        image_cache._remember(key, key.encode())
+    assert list(image_cache._memory_cache) == ["b", "c"]
+
+
+def test_disk_eviction_removes_least_recently_used(image_cache_dir):
+    for index in range(4):
+        entry = image_cache_dir / f"entry{index}.png"
+        entry.write_bytes(b"png")
+        os.utime(entry, (1000 + index, 1000 + index))
+    os.utime(image_cache_dir / "entry0.png", (2000, 2000))
+
+    image_cache._evict_disk_cache(2)
+
+    assert sorted(entry.name for entry in image_cache_dir.glob("*.png")) == ["entry0.png", "entry3.png"]
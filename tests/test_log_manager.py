@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""输出捕获：多个线程同时捕获时按线程记录，并正确恢复stdout/stderr"""
+
+import sys
+import logging
+import threading
+
+import pytest
+
+from log_manager import LogManager
+
+
+@pytest.fixture
+def log_manager(tmp_path):
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    manager = LogManager(tmp_path / "logs")
+    yield manager
+    for handler in root.handlers:
+        handler.close()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def _log_text(manager):
+    for handler in logging.getLogger().handlers:
+        handler.flush()
+    return manager.read_latest_log()
+
+
+def test_interleaved_captures_restore_streams(log_manager):
+    original_stdout, original_stderr = sys.stdout, sys.stderr
+    a_entered, b_entered, a_exited = threading.Event(), threading.Event(), threading.Event()
+
+    def worker_a():
+        with log_manager.capture_output():
+            a_entered.set()
+            b_entered.wait(5)
+            print("output from a")
+        a_exited.set()
+
+    def worker_b():
+        a_entered.wait(5)
+        with log_manager.capture_output():
+            b_entered.set()
+            # a 先结束捕获，b 的输出仍应记录到日志
+            a_exited.wait(5)
+            print("output from b")
+
+    threads = [threading.Thread(target=worker_a), threading.Thread(target=worker_b)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert sys.stdout is original_stdout
+    assert sys.stderr is original_stderr
+    text = _log_text(log_manager)
+    assert "output from a" in text
+    assert "output from b" in text
+
+
+def test_only_capturing_thread_is_logged(log_manager):
+    entered, printed = threading.Event(), threading.Event()
+
+    def capturing():
+        with log_manager.capture_output():
+            entered.set()
+            printed.wait(5)
+
+    thread = threading.Thread(target=capturing)
+    thread.start()
+    entered.wait(5)
+    print("not captured")
+    printed.set()
+    thread.join(10)
+
+    assert "not captured" not in _log_text(log_manager)
+
+
+def test_nested_capture_logs_each_line_once(log_manager):
+    with log_manager.capture_output():
+        with log_manager.capture_output():
+            print("nested line")
+        print("outer line")
+    text = _log_text(log_manager)
+    assert text.count("nested line") == 1
+    assert "outer line" in text
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""MP4/MOV 文件头解析：用手工构造的最小文件验证时长、尺寸、帧率、编码和旋转角度"""
+
+import struct
+
+import pytest
+
+import media_probe
+from media_probe import _probe_mp4_header, probe_media
+
+
+def box(box_type, *payloads):
+    content = b"".join(payloads)
+    return struct.pack('>I4s', 8 + len(content), box_type) + content
+
+
+def header_box(box_type, timescale, duration):
+    """mvhd/mdhd（version 0）"""
+    return box(box_type, struct.pack('>IIIII', 0, 0, 0, timescale, duration), b"\0" * 80)
+
+
+def tkhd(rotation=0):
+    matrix = {0: (65536, 0), 90: (0, 65536), 180: (-65536, 0), 270: (0, -65536)}[rotation]
+    return box(b'tkhd', struct.pack('>IIIIII', 0, 0, 0, 1, 0, 0), b"\0" * 16,
+               struct.pack('>ii', *matrix), b"\0" * 36)
+
+
+def trak(handler, fourcc, timescale, duration, width=0, height=0, sample_delta=None, rotation=0):
+    sample_entry = box(fourcc, b"\0" * 24, struct.pack('>HH', width, height), b"\0" * 50)
+    stbl_children = [box(b'stsd', struct.pack('>II', 0, 1), sample_entry)]
+    if sample_delta:
+        stbl_children.append(box(b'stts', struct.pack('>IIII', 0, 1, duration // sample_delta, sample_delta)))
+    return box(b'trak', tkhd(rotation), box(
+        b'mdia',
+        header_box(b'mdhd', timescale, duration),
+        box(b'hdlr', struct.pack('>I', 0), b"\0" * 4, handler, b"\0" * 12),
+        box(b'minf', box(b'stbl', *stbl_children))))
+
+
+def make_mp4(path, moov_first=True, rotation=0, fragmented=False, with_audio=True, large_mdat=False):
+    traks = [trak(b'vide', b'avc1', 15360, 15360 * 4, 1080, 1920, sample_delta=512, rotation=rotation)]
+    if with_audio:
+        traks.append(trak(b'soun', b'mp4a', 44100, 44100 * 4))
+    moov_children = [header_box(b'mvhd', 1000, 4000)] + traks
+    if fragmented:
+        moov_children.append(box(b'mvex'))
+    moov = box(b'moov', *moov_children)
+    payload = b"\0" * 64
+    if large_mdat:
+        mdat = struct.pack('>I4sQ', 1, b'mdat', 16 + len(payload)) + payload
+    else:
+        mdat = box(b'mdat', payload)
+    ftyp = box(b'ftyp', b'isom', struct.pack('>I', 512), b'isomiso2avc1mp41')
+    path.write_bytes(ftyp + (moov + mdat if moov_first else mdat + moov))
+    return path
+
+
+def test_parses_video_and_audio_tracks(tmp_path):
+    info = _probe_mp4_header(make_mp4(tmp_path / "clip.mp4"))
+    assert (info.width, info.height) == (1080, 1920)
+    assert info.duration == pytest.approx(4.0)
+    assert info.fps == pytest.approx(30.0)
+    assert (info.video_codec, info.audio_codec) == ("h264", "aac")
+    assert info.has_video and info.has_audio
+    assert info.rotation == 0
+
+
+def test_moov_after_64bit_mdat(tmp_path):
+    info = _probe_mp4_header(make_mp4(tmp_path / "clip.mp4", moov_first=False, large_mdat=True))
+    assert info is not None
+    assert info.duration == pytest.approx(4.0)
+
+
+@pytest.mark.parametrize("rotation", [90, 180, 270])
+def test_rotation_from_track_matrix(tmp_path, rotation):
+    assert _probe_mp4_header(make_mp4(tmp_path / "clip.mov", rotation=rotation)).rotation == rotation
+
+
+def test_video_only(tmp_path):
+    info = _probe_mp4_header(make_mp4(tmp_path / "clip.mp4", with_audio=False))
+    assert info.has_video and not info.has_audio
+    assert info.audio_codec is None
+
+
+def test_fragmented_mp4_falls_back(tmp_path):
+    assert _probe_mp4_header(make_mp4(tmp_path / "clip.mp4", fragmented=True)) is None
+
+
+def test_non_mp4_data_falls_back(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(b"\x1aE\xdf\xa3" + b"\0" * 64)
+    assert _probe_mp4_header(path) is None
+
+
+def test_truncated_moov_falls_back(tmp_path):
+    path = make_mp4(tmp_path / "clip.mp4", moov_first=False)
+    path.write_bytes(path.read_bytes()[:-10])
+    assert _probe_mp4_header(path) is None
+
+
+def test_probe_media_uses_header_without_ffprobe(tmp_path, monkeypatch):
+    def no_ffprobe(media_path):
+        raise AssertionError("ffprobe should not be called")
+
+    monkeypatch.setattr(media_probe, "_run_ffprobe", no_ffprobe)
+    path = make_mp4(tmp_path / "clip.mp4")
+    media_probe.clear_probe_cache()
+    info = probe_media(path)
+    assert info.duration == pytest.approx(4.0)
+    assert probe_media(path) is info
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""叠加链像素格式规划"""
+
+import pytest
+
+from overlay_format import (OverlayFormat, LEGACY_FORMAT, plan_overlay_format, base_format_filter,
+                            layer_format_filter, overlay_format_option, build_benchmark_graph)
+
+
+@pytest.mark.parametrize("pix_fmt, expected", [
+    ('yuv420p', OverlayFormat('yuv420p', 'yuva420p', 'yuv420')),
+    ('yuv444p', OverlayFormat('yuv444p', 'yuva444p', 'yuv444')),
+    (None, OverlayFormat('yuv420p', 'yuva420p', 'yuv420')),
+])
+def test_plan_matches_encode_format(pix_fmt, expected):
+    assert plan_overlay_format(pix_fmt) == expected
+
+
+def test_unsupported_format_falls_back_to_negotiation():
+    plan = plan_overlay_format('yuv420p10le')
+    assert plan is LEGACY_FORMAT
+    assert base_format_filter(plan) == ""
+    assert layer_format_filter(plan) == "format=rgba"
+    assert overlay_format_option(plan) == ":format=auto"
+
+
+def test_filter_fragments():
+    plan = plan_overlay_format('yuv420p')
+    assert base_format_filter(plan) == "format=yuv420p"
+    assert layer_format_filter(plan) == "format=yuva420p"
+    assert overlay_format_option(plan) == ":format=yuv420"
+
+
+def test_planned_graph_converts_each_input_once():
+    layers = [(1, 0, 0), (2, 10, 20), (3, 30, 40)]
+    graph = build_benchmark_graph(layers, 4, (50, 60), plan_overlay_format('yuv420p'))
+    assert "rgba" not in graph
+    assert graph.count("format=yuva420p") == 4
+    assert graph.count(":format=yuv420") == 4
+    # 主画面只在进入叠加链时转换一次（另一次是输出端的format=yuv420p）
+    assert graph.count("format=yuv420p") == 2
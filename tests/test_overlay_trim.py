@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""叠加素材裁剪：裁剪到内容外接矩形并在PNG中记录偏移"""
+
+from PIL import Image
+
+import video_core
+from overlay_trim import (ContentBox, content_box, save_trimmed_png, read_overlay_offset, animated_content_box,
+                          animation_frame_count)
+
+
+def canvas_with_block(size, box, color=(255, 0, 0, 255)):
+    image = Image.new('RGBA', size, (0, 0, 0, 0))
+    image.paste(Image.new('RGBA', (box[2] - box[0], box[3] - box[1]), color), box[:2])
+    return image
+
+
+def test_offset_round_trip(tmp_path):
+    image = canvas_with_block((1200, 600), (101, 201, 301, 261))
+    path = tmp_path / "subtitle.png"
+    offset = save_trimmed_png(image, path)
+
+    # 左上角减去边距后向下对齐到偶数
+    assert offset == (98, 198)
+    assert read_overlay_offset(path) == offset
+    with Image.open(path) as trimmed:
+        assert trimmed.size == (301 + 2 - 98, 261 + 2 - 198)
+        # 在原位置加上偏移后，内容与原图完全一致
+        restored = Image.new('RGBA', image.size, (0, 0, 0, 0))
+        restored.paste(trimmed, offset)
+    assert restored.tobytes() == image.tobytes()
+
+
+def test_box_is_clamped_to_image():
+    image = canvas_with_block((100, 100), (0, 0, 100, 99))
+    assert content_box(image) == ContentBox(0, 0, 100, 100)
+
+
+def test_untrimmed_and_transparent_images_keep_zero_offset(tmp_path):
+    full = Image.new('RGBA', (50, 40), (255, 255, 255, 255))
+    assert save_trimmed_png(full, tmp_path / "full.png") == (0, 0)
+    empty = Image.new('RGBA', (50, 40), (0, 0, 0, 0))
+    assert save_trimmed_png(empty, tmp_path / "empty.png") == (0, 0)
+    with Image.open(tmp_path / "empty.png") as saved:
+        assert saved.size == (50, 40)
+
+
+def test_offset_defaults_to_zero(tmp_path):
+    plain = tmp_path / "plain.png"
+    Image.new('RGBA', (10, 10)).save(plain)
+    assert read_overlay_offset(plain) == (0, 0)
+    assert read_overlay_offset(tmp_path / "missing.png") == (0, 0)
+
+
+def test_animated_box_is_union_of_frames(tmp_path):
+    frames = [canvas_with_block((200, 200), (40, 50, 80, 90)),
+              canvas_with_block((200, 200), (100, 120, 150, 160))]
+    path = tmp_path / "sticker.gif"
+    frames[0].save(path, save_all=True, append_images=frames[1:], disposal=2, duration=100, loop=0)
+
+    assert animated_content_box(path) == ContentBox(38, 48, 152, 162)
+    assert animated_content_box(path, max_frames=1) == ContentBox(38, 48, 82, 92)
+
+
+def save_gif(path, frames):
+    frames[0].save(path, save_all=True, append_images=frames[1:], disposal=2, duration=100, loop=0)
+
+
+def test_frame_count(tmp_path):
+    path = tmp_path / "sticker.gif"
+    save_gif(path, [canvas_with_block((60, 60), (10, 10, 20, 20)), canvas_with_block((60, 60), (30, 30, 40, 40))])
+    assert animation_frame_count(path) == 2
+    assert animation_frame_count(tmp_path / "missing.gif") is None
+
+
+def test_looped_gif_box_scans_one_loop(tmp_path, monkeypatch):
+    loop = [canvas_with_block((200, 200), (40, 50, 80, 90)),
+            canvas_with_block((200, 200), (100, 120, 150, 160))]
+    source = tmp_path / "sticker.gif"
+    save_gif(source, loop)
+
+    def fake_ffmpeg(cmd, **kwargs):
+        # 模拟 -stream_loop 的输出；之后的循环放一块更大的内容，检查只扫描了第一个循环
+        save_gif(cmd[-1], loop + [canvas_with_block((200, 200), (0, 0, 200, 200))] * 3)
+
+    scans = []
+
+    def recording_box(image_path, max_frames=None, **kwargs):
+        scans.append(max_frames)
+        return animated_content_box(image_path, max_frames=max_frames, **kwargs)
+
+    monkeypatch.setattr(video_core.subprocess, "run", fake_ffmpeg)
+    monkeypatch.setattr(video_core, "animated_content_box", recording_box)
+
+    processed_path, box = video_core.process_animated_gif_for_video(str(source), tmp_path)
+
+    assert processed_path == str(tmp_path / "processed_animated_gif.gif")
+    assert scans == [2]
+    assert box == ContentBox(38, 48, 152, 162)
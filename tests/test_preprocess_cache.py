@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""预处理缓存：缓存键、命中与LRU淘汰"""
+
+import os
+
+import pytest
+
+import preprocess_cache
+import video_core
+from preprocess_cache import make_preprocess_cache_key, fetch_preprocess_cache, store_preprocess_cache
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / "source.mp4"
+    path.write_bytes(b"source video")
+    return path
+
+
+def test_key_follows_content_not_path(preprocess_cache_dir, video, tmp_path):
+    copy = tmp_path / "copy.mp4"
+    copy.write_bytes(video.read_bytes())
+    assert make_preprocess_cache_key(video) == make_preprocess_cache_key(copy)
+
+    changed = tmp_path / "changed.mp4"
+    changed.write_bytes(b"other video")
+    assert make_preprocess_cache_key(changed) != make_preprocess_cache_key(video)
+
+
+def test_key_depends_on_parameters(preprocess_cache_dir, video):
+    base = make_preprocess_cache_key(video)
+    assert make_preprocess_cache_key(video, scale_factor=1.2) != base
+    assert make_preprocess_cache_key(video, reverse_effect=True) != base
+    assert make_preprocess_cache_key(video, target_width=720, target_height=1280) != base
+    assert make_preprocess_cache_key(video, intermediate_profile="ffv1") != base
+    # 默认档位与显式指定默认档位一致
+    assert make_preprocess_cache_key(video, intermediate_profile="h264") == base
+
+
+def test_no_key_when_disabled_or_uncacheable(preprocess_cache_dir, video, tmp_path, monkeypatch):
+    assert make_preprocess_cache_key(video, intermediate_profile="nut") is None
+    assert make_preprocess_cache_key(tmp_path / "missing.mp4") is None
+    monkeypatch.setattr(preprocess_cache, "_cache_enabled", False)
+    assert make_preprocess_cache_key(video) is None
+
+
+def test_store_and_fetch_links_entry(preprocess_cache_dir, video, tmp_path):
+    key = make_preprocess_cache_key(video)
+    processed = tmp_path / "processed.mkv"
+    processed.write_bytes(b"processed")
+    store_preprocess_cache(key, processed)
+    processed.unlink()
+
+    entry = preprocess_cache_dir / f"{key}.mkv"
+    assert fetch_preprocess_cache(key, tmp_path, suffix=".mp4") is None
+    cached = fetch_preprocess_cache(key, tmp_path, suffix=".mkv")
+    assert cached and open(cached, 'rb').read() == b"processed"
+    assert cached != str(entry)
+    # 命中时创建硬链接而不是复制数据，删除副本不影响缓存条目
+    assert os.path.samefile(cached, entry)
+    os.remove(cached)
+    assert entry.read_bytes() == b"processed"
+
+
+def test_fetch_copies_when_link_fails(preprocess_cache_dir, video, tmp_path, monkeypatch):
+    key = make_preprocess_cache_key(video)
+    processed = tmp_path / "processed.mp4"
+    processed.write_bytes(b"processed")
+    store_preprocess_cache(key, processed)
+
+    def fail_link(source, target):
+        raise OSError("cross-device link")
+
+    monkeypatch.setattr(preprocess_cache.os, "link", fail_link)
+    cached = fetch_preprocess_cache(key, tmp_path)
+    assert cached and open(cached, 'rb').read() == b"processed"
+    assert not os.path.samefile(cached, preprocess_cache_dir / f"{key}.mp4")
+
+
+def test_eviction_removes_least_recently_used(preprocess_cache_dir):
+    for index, suffix in enumerate((".mp4", ".mkv", ".mp4")):
+        entry = preprocess_cache_dir / f"entry{index}{suffix}"
+        entry.write_bytes(b"\0" * 100)
+        os.utime(entry, (1000 + index, 1000 + index))
+    # 非缓存条目不参与淘汰
+    (preprocess_cache_dir / "notes.txt").write_bytes(b"\0" * 1000)
+
+    preprocess_cache._evict_preprocess_cache(250)
+
+    assert sorted(entry.name for entry in preprocess_cache_dir.iterdir()) == ["entry1.mkv", "entry2.mp4", "notes.txt"]
+
+
+def test_unprocessed_source_is_returned_in_place(preprocess_cache_dir, video, tmp_path, monkeypatch):
+    # 水印处理失败时返回原始视频：不能移动到（随后会被删除的）临时目录，也不写入缓存
+    temp_dir = tmp_path / "temp"
+    temp_dir.mkdir()
+    monkeypatch.setattr(video_core, "process_normal_video", lambda path, *args, **kwargs: str(path))
+
+    result = video_core.preprocess_video_without_reverse(str(video), temp_dir, duration=5.0)
+
+    assert result == str(video)
+    assert video.read_bytes() == b"source video"
+    assert list(temp_dir.iterdir()) == []
+    assert list(preprocess_cache_dir.iterdir()) == []
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""静态图层预合成：分组、裁剪到画面范围和叠加顺序"""
+
+from PIL import Image
+
+from static_plate import PlateLayer, StaticPlate, group_layers, compose_static_plates
+
+
+def save_layer(path, size, color):
+    Image.new('RGBA', size, color).save(path)
+    return str(path)
+
+
+def test_adjacent_layers_share_a_plate():
+    # 上下相邻的背景和字幕：外接矩形没有浪费
+    assert group_layers([(0, 0, 100, 50), (0, 50, 100, 100)]) == [[0, 1]]
+
+
+def test_distant_layers_get_separate_plates():
+    # 顶部的图片和底部的字幕相距很远，合并后大部分透明
+    assert group_layers([(0, 0, 100, 100), (0, 900, 100, 1000)]) == [[0], [1]]
+
+
+def test_groups_keep_layer_order():
+    # 第三个图层与第一组相邻，但被中间的远处图层隔开，不能跨组合并，否则会改变层次
+    rects = [(0, 0, 100, 100), (0, 900, 100, 1000), (0, 100, 100, 200)]
+    assert group_layers(rects) == [[0], [1], [2]]
+
+
+def test_layers_are_clipped_to_frame(tmp_path):
+    layers = [
+        PlateLayer(save_layer(tmp_path / "left.png", (40, 30), (255, 0, 0, 255)), -10, -5),
+        PlateLayer(save_layer(tmp_path / "right.png", (40, 30), (0, 0, 255, 255)), 20, 0),
+    ]
+    plates = compose_static_plates(layers, 50, 20, tmp_path / "plate")
+
+    # 负坐标和超出右下边缘的部分都被裁掉
+    assert plates == [StaticPlate(str(tmp_path / "plate_0.png"), 0, 0, 50, 20)]
+    with Image.open(plates[0].path) as plate:
+        assert plate.getpixel((5, 5)) == (255, 0, 0, 255)
+        # 后添加的图层在上层
+        assert plate.getpixel((25, 5)) == (0, 0, 255, 255)
+        assert plate.getpixel((49, 19)) == (0, 0, 255, 255)
+
+
+def test_layer_outside_frame_is_ignored(tmp_path):
+    layers = [
+        PlateLayer(save_layer(tmp_path / "outside.png", (40, 30), (255, 0, 0, 255)), 200, 10),
+        PlateLayer(save_layer(tmp_path / "inside.png", (20, 10), (0, 255, 0, 255)), 5, 5),
+    ]
+    plates = compose_static_plates(layers, 100, 100, tmp_path / "plate")
+
+    assert plates == [StaticPlate(str(tmp_path / "plate_0.png"), 5, 5, 20, 10)]
+
+
+def test_unreadable_layer_returns_none(tmp_path):
+    layers = [PlateLayer(str(tmp_path / "missing.png"), 0, 0)]
+    assert compose_static_plates(layers, 100, 100, tmp_path / "plate") is None
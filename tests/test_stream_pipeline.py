@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""流式管道：失败时回退到基于文件的预处理"""
+
+from types import SimpleNamespace
+
+import pytest
+
+import video_core
+
+
+@pytest.fixture
+def fallback_calls(monkeypatch):
+    calls = []
+
+    def fake_preprocess(video_path, kind, temp_dir, intermediate_profile=None, scale_factor=1.1):
+        calls.append((kind, scale_factor))
+        return None
+
+    monkeypatch.setattr(video_core, "preprocess_video_for_kind", fake_preprocess)
+    monkeypatch.setattr(video_core, "add_subtitle_to_video", lambda *args, **kwargs: None)
+    return calls
+
+
+def test_unplanned_stream_falls_back_with_scale_factor(tmp_path, monkeypatch, fallback_calls):
+    monkeypatch.setattr(video_core, "plan_preprocess_stream", lambda *args: None)
+
+    output = video_core.process_video(str(tmp_path / "input.mp4"), str(tmp_path / "output.mp4"),
+                                      scale_factor=1.25, stream_kind='long')
+
+    assert output is None
+    assert fallback_calls == [('long', 1.25)]
+
+
+def test_failed_stream_render_falls_back_with_scale_factor(tmp_path, monkeypatch, fallback_calls):
+    stream_source = SimpleNamespace(width=1080, height=1920, duration=10.0)
+    monkeypatch.setattr(video_core, "plan_preprocess_stream", lambda *args: stream_source)
+
+    output = video_core.process_video(str(tmp_path / "input.mp4"), str(tmp_path / "output.mp4"),
+                                      scale_factor=1.25, stream_kind='short')
+
+    assert output is None
+    assert fallback_calls == [('short', 1.25)]
+
+
+@pytest.mark.parametrize("kind, target", [
+    ('folder', "process_folder_videos"),
+    ('short', "preprocess_video_by_type"),
+    ('long', "preprocess_video_without_reverse"),
+])
+def test_preprocess_video_for_kind_forwards_scale_factor(tmp_path, monkeypatch, kind, target):
+    calls = []
+
+    def fake_preprocess(video_path, temp_dir, **kwargs):
+        calls.append((temp_dir, kwargs['scale_factor']))
+        return video_path
+
+    monkeypatch.setattr(video_core, target, fake_preprocess)
+
+    assert video_core.preprocess_video_for_kind("input.mp4", kind, str(tmp_path), scale_factor=1.3) == "input.mp4"
+    # 临时目录以字符串传入时规范化为Path
+    assert calls == [(tmp_path, 1.3)]
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""字幕样式注册表：编译结果与配置文件修改后的重新加载"""
+
+import os
+
+import pytest
+
+import style_registry
+from style_registry import get_style, get_style_registry, list_style_names, get_font_paths
+
+STYLES = """[styles.style1]
+; 白字黑边
+font_size = 70
+text_color = (255, 255, 255, 255)
+stroke_width = 2
+shadow = false
+
+[styles.style2]
+font_size = 60
+
+[font_paths]
+chinese = data/fonts/chinese.ttf
+"""
+
+
+@pytest.fixture
+def style_ini(tmp_path, monkeypatch):
+    path = tmp_path / "subtitle_styles.ini"
+    path.write_text(STYLES, encoding='utf-8')
+    monkeypatch.setattr(style_registry, "find_style_config_path", lambda: path)
+    monkeypatch.setattr(style_registry, "_registry", None)
+    return path
+
+
+def touch(path, text):
+    """改写配置文件并把修改时间向后推，避免文件系统时间精度不足时修改时间不变"""
+    mtime = path.stat().st_mtime_ns
+    path.write_text(text, encoding='utf-8')
+    os.utime(path, ns=(mtime + 10 ** 9, mtime + 10 ** 9))
+
+
+def test_styles_are_compiled(style_ini):
+    style = get_style("style1")
+    assert style.font_size == 70
+    assert style.text_color == (255, 255, 255, 255)
+    assert style.shadow is False
+    assert style.description == "白字黑边"
+    # 未配置的字段使用默认值，to_dict只包含配置文件中出现的项
+    assert get_style("style2").stroke_width == 2
+    assert get_style("style2").to_dict() == {'font_size': 60}
+    assert list_style_names() == ["style1", "style2"]
+    assert dict(get_font_paths()) == {'chinese': 'data/fonts/chinese.ttf'}
+
+
+def test_registry_is_reused_while_file_unchanged(style_ini):
+    assert get_style_registry() is get_style_registry()
+
+
+def test_modified_file_is_reloaded(style_ini):
+    assert get_style("style1").font_size == 70
+    touch(style_ini, STYLES.replace("font_size = 70", "font_size = 90") + "\n[styles.style3]\nfont_size = 50\n")
+
+    assert get_style("style1").font_size == 90
+    assert list_style_names() == ["style1", "style2", "style3"]
+
+
+def test_removed_style_disappears_after_reload(style_ini):
+    assert get_style("style2") is not None
+    touch(style_ini, STYLES.replace("[styles.style2]\nfont_size = 60\n", ""))
+    assert get_style("style2") is None
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""字幕描边：单次蒙版描边与逐偏移重复绘制的效果对比"""
+
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+from video_core import _draw_text_stroke
+
+CANVAS = (90, 60)
+POSITION = (15, 10)
+TEXT = "Ag"
+
+
+@pytest.fixture(scope="module")
+def font():
+    return ImageFont.load_default(size=28)
+
+
+def brute_force_alpha(font, radius):
+    """原实现：在半径范围内的每个偏移位置重复绘制文本"""
+    image = Image.new('RGBA', CANVAS, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    for dx in range(-radius, radius + 1):
+        for dy in range(-radius, radius + 1):
+            if dx * dx + dy * dy <= radius * radius:
+                draw.text((POSITION[0] + dx, POSITION[1] + dy), TEXT, font=font, fill=(0, 0, 0, 255))
+    return np.asarray(image)[..., 3].astype(int)
+
+
+def stroke_alpha(font, radius):
+    image = Image.new('RGBA', CANVAS, (0, 0, 0, 0))
+    _draw_text_stroke(image, POSITION, TEXT, font, (0, 0, 0), radius)
+    return np.asarray(image)[..., 3].astype(int)
+
+
+@pytest.mark.parametrize("radius", [1, 3, 5])
+def test_stroke_matches_per_offset_redraw(font, radius):
+    expected = brute_force_alpha(font, radius)
+    actual = stroke_alpha(font, radius)
+    assert expected.any()
+    assert np.abs(actual - expected).max() <= 2
+
+
+def test_stroke_clipped_at_canvas_edge(font):
+    image = Image.new('RGBA', (30, 20), (0, 0, 0, 0))
+    _draw_text_stroke(image, (-10, -8), TEXT, font, (0, 0, 0), 4)
+    assert image.getbbox() is not None
+
+
+def test_without_numpy_falls_back_to_pillow_stroke(font, monkeypatch):
+    radius = 5
+    expected = brute_force_alpha(font, radius)
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    actual = stroke_alpha(font, radius)
+
+    # Pillow的stroke_width覆盖圆形描边的全部区域，但拐角处更方，外观不同
+    assert not ((expected >= 128) & (actual == 0)).any()
+    assert ((actual >= 128) & (expected == 0)).any()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""配音缓存：缓存键、后端校验与LRU淘汰"""
+
+import os
+import json
+import wave
+
+import tts_cache
+from tts_backend import FakeTTSBackend, EdgeTTSBackend, get_tts_backend, set_tts_backend, tts_audio_suffix
+from tts_cache import make_tts_cache_key, fetch_tts_cache, store_tts_cache, synthesize_tts
+
+
+def test_key_ignores_whitespace_differences():
+    assert make_tts_cache_key(" 你好\n\n世界 ", "zh-CN-XiaoxiaoNeural", backend="edge") == \
+        make_tts_cache_key("你好\n世界", "zh-CN-XiaoxiaoNeural", backend="edge")
+
+
+def test_key_depends_on_voice_rate_pitch_and_backend():
+    base = make_tts_cache_key("hello", "ms-MY-YasminNeural", backend="edge")
+    assert make_tts_cache_key("hello", "ms-MY-OsmanNeural", backend="edge") != base
+    assert make_tts_cache_key("hello", "ms-MY-YasminNeural", rate="+10%", backend="edge") != base
+    assert make_tts_cache_key("hello", "ms-MY-YasminNeural", pitch="+5Hz", backend="edge") != base
+    assert make_tts_cache_key("hello", "ms-MY-YasminNeural", backend="fake") != base
+
+
+def test_key_defaults_to_current_backend(tts_cache_dir):
+    assert make_tts_cache_key("hello", "ms-MY-YasminNeural") == \
+        make_tts_cache_key("hello", "ms-MY-YasminNeural", backend="fake")
+
+
+def test_fake_backend_writes_wav_suffix():
+    assert tts_audio_suffix(FakeTTSBackend()) == ".wav"
+    assert tts_audio_suffix(EdgeTTSBackend()) == ".mp3"
+
+
+def test_synthesize_stores_and_reuses_entry(tts_cache_dir, tmp_path):
+    backend = get_tts_backend()
+    first = tmp_path / "first.wav"
+    second = tmp_path / "second.wav"
+    assert synthesize_tts("你好世界", "zh-CN-XiaoxiaoNeural", first)
+    assert synthesize_tts("你好世界", "zh-CN-XiaoxiaoNeural", second)
+    assert backend.calls == 1
+    assert second.read_bytes() == first.read_bytes()
+    with wave.open(str(second)) as wav:
+        assert wav.getnframes() > 0
+    meta = json.loads(next(tts_cache_dir.glob("*.json")).read_text(encoding='utf-8'))
+    assert meta['backend'] == "fake"
+    assert meta['words']
+
+
+class OtherBackend(FakeTTSBackend):
+    name = "other"
+
+
+def test_backends_do_not_share_entries(tts_cache_dir, tmp_path):
+    fake = get_tts_backend()
+    assert synthesize_tts("你好世界", "zh-CN-XiaoxiaoNeural", tmp_path / "fake.wav")
+    other = OtherBackend()
+    set_tts_backend(other)
+    assert synthesize_tts("你好世界", "zh-CN-XiaoxiaoNeural", tmp_path / "other.wav")
+    # 同一文本在不同后端下各合成一次，各自写入独立的缓存条目
+    assert fake.calls == 1 and other.calls == 1
+    backends = sorted(json.loads(meta.read_text(encoding='utf-8'))['backend'] for meta in tts_cache_dir.glob("*.json"))
+    assert backends == ["fake", "other"]
+    assert make_tts_cache_key("你好世界", "zh-CN-XiaoxiaoNeural", backend="fake") != \
+        make_tts_cache_key("你好世界", "zh-CN-XiaoxiaoNeural", backend="other")
+
+
+def test_fetch_rejects_entry_from_other_backend(tts_cache_dir, tmp_path):
+    audio = tmp_path / "audio.wav"
+    audio.write_bytes(b"RIFF" + b"\0" * 64)
+    key = make_tts_cache_key("hello", "ms-MY-YasminNeural", backend="edge")
+    assert store_tts_cache(key, audio, {'duration': 1.0, 'backend': "fake"})
+
+    assert fetch_tts_cache(key, tmp_path / "out.mp3", backend="edge") is None
+    assert not (tmp_path / "out.mp3").exists()
+    assert fetch_tts_cache(key, tmp_path / "out.wav", backend="fake")['duration'] == 1.0
+
+
+def test_eviction_removes_least_recently_used(tts_cache_dir, tmp_path):
+    keys = []
+    for index in range(3):
+        audio = tmp_path / f"{index}.wav"
+        audio.write_bytes(b"\0" * 100)
+        key = make_tts_cache_key(f"text {index}", "ms-MY-YasminNeural", backend="fake")
+        assert store_tts_cache(key, audio, {'duration': 1.0, 'backend': "fake"})
+        os.utime(tts_cache_dir / f"{key}.audio", (1000 + index, 1000 + index))
+        keys.append(key)
+    # 最早写入的条目刚被读取过，应保留
+    assert fetch_tts_cache(keys[0], tmp_path / "hit.wav", backend="fake")
+
+    tts_cache._evict_tts_cache(200)
+
+    remaining = {entry.stem for entry in tts_cache_dir.glob("*.audio")}
+    assert remaining == {keys[0], keys[2]}
+    assert not (tts_cache_dir / f"{keys[1]}.json").exists()
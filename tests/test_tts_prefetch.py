@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""批量配音预取：并发上限、超时重试、失败标记与缓存命中"""
+
+import asyncio
+from pathlib import Path
+
+from tts_backend import FakeTTSBackend
+from tts_prefetch import TTSPrefetcher, wait_for_prefetched_tts
+
+VOICE = "ms-MY-YasminNeural"
+
+
+class SlowBackend(FakeTTSBackend):
+    """记录同时进行的请求数，前 hang_calls 次请求挂起（用于触发超时）"""
+
+    def __init__(self, delay=0.05, hang_calls=0):
+        super().__init__()
+        self.delay = delay
+        self.hang_calls = hang_calls
+        self.active = 0
+        self.max_active = 0
+
+    async def synthesize(self, text, voice, output_file, rate="+0%", pitch="+0Hz"):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            if self.hang_calls > 0:
+                self.hang_calls -= 1
+                await asyncio.sleep(60)
+            await asyncio.sleep(self.delay)
+            return await super().synthesize(text, voice, output_file, rate, pitch)
+        finally:
+            self.active -= 1
+
+
+class FailingBackend(FakeTTSBackend):
+    async def synthesize(self, text, voice, output_file, rate="+0%", pitch="+0Hz"):
+        with self._lock:
+            self.calls += 1
+        return False
+
+
+def _run(prefetcher):
+    prefetcher.start()
+    assert prefetcher.join(timeout=30)
+    return prefetcher
+
+
+def test_concurrency_is_bounded(tts_cache_dir, tmp_path):
+    backend = SlowBackend()
+    texts = {index: f"text number {index}" for index in range(8)}
+    prefetcher = _run(TTSPrefetcher(texts, VOICE, max_concurrency=2, backend=backend, output_dir=tmp_path / "out"))
+    assert backend.max_active == 2
+    assert prefetcher.stats['generated'] == 8
+    for index in texts:
+        path = prefetcher.wait(index, timeout=1)
+        assert path and path.endswith(".wav")
+
+
+def test_duplicate_texts_are_synthesized_once(tts_cache_dir, tmp_path):
+    backend = FakeTTSBackend()
+    prefetcher = _run(TTSPrefetcher({0: "same text", 1: " same  text "}, VOICE, backend=backend,
+                                    output_dir=tmp_path / "out"))
+    assert backend.calls == 1
+    assert prefetcher.audio_path(0) == prefetcher.audio_path(1)
+
+
+def test_timeout_is_retried(tts_cache_dir, tmp_path):
+    backend = SlowBackend(delay=0, hang_calls=1)
+    prefetcher = _run(TTSPrefetcher({0: "slow text"}, VOICE, timeout=0.2, retries=1, backend=backend,
+                                    output_dir=tmp_path / "out"))
+    assert prefetcher.stats == {'cached': 0, 'generated': 1, 'failed': 0, 'retries': 1}
+    assert prefetcher.wait(0, timeout=1)
+
+
+def test_failure_writes_marker(tts_cache_dir, tmp_path):
+    backend = FailingBackend()
+    prefetcher = _run(TTSPrefetcher({0: "broken text"}, VOICE, retries=1, backend=backend,
+                                    output_dir=tmp_path / "out"))
+    assert backend.calls == 2
+    assert prefetcher.stats['failed'] == 1
+    audio_path = Path(prefetcher.audio_path(0))
+    assert audio_path.with_name(audio_path.name + ".failed").exists()
+    # 失败标记让等待立即返回，而不是等到超时
+    assert wait_for_prefetched_tts(audio_path, timeout=5) is None
+    assert not list((tmp_path / "out").glob("*.part"))
+
+
+def test_second_run_hits_cache(tts_cache_dir, tmp_path):
+    backend = FakeTTSBackend()
+    texts = {0: "first text", 1: "second text"}
+    _run(TTSPrefetcher(texts, VOICE, backend=backend, output_dir=tmp_path / "run1"))
+    assert backend.calls == 2
+
+    prefetcher = _run(TTSPrefetcher(texts, VOICE, backend=backend, output_dir=tmp_path / "run2"))
+    assert backend.calls == 2
+    assert prefetcher.stats['cached'] == 2
+    assert prefetcher.wait(0, timeout=1)
+
+
+def test_cache_from_other_backend_is_not_reused(tts_cache_dir, tmp_path):
+    _run(TTSPrefetcher({0: "shared text"}, VOICE, backend=FakeTTSBackend(), output_dir=tmp_path / "run1"))
+
+    class OtherBackend(FakeTTSBackend):
+        name = "other"
+
+    other = OtherBackend()
+    prefetcher = _run(TTSPrefetcher({0: "shared text"}, VOICE, backend=other, output_dir=tmp_path / "run2"))
+    assert other.calls == 1
+    assert prefetcher.stats['generated'] == 1
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""配音自动匹配时长：裁剪/变速滤镜计划与逐词时间换算"""
+
+import pytest
+
+from tts_cache import plan_tts_tempo, scale_timings
+
+
+def test_no_change_within_tolerance():
+    assert plan_tts_tempo(10.0, 10.05) is None
+    assert plan_tts_tempo(10.0, 10.0, speech_bounds=(0.02, 9.98)) is None
+
+
+def test_speed_up():
+    tempo = plan_tts_tempo(12.0, 10.0)
+    assert tempo.filter == "atempo=1.200"
+    assert tempo.offset == 0.0
+    assert tempo.factor == pytest.approx(1 / 1.2)
+    assert tempo.duration == pytest.approx(10.0)
+
+
+def test_ratio_outside_atempo_range_is_chained():
+    assert plan_tts_tempo(25.0, 5.0).filter == "atempo=2.0,atempo=2.0,atempo=1.250"
+    assert plan_tts_tempo(1.0, 5.0).filter == "atempo=0.5,atempo=0.5,atempo=0.800"
+
+
+def test_trim_silence_before_tempo():
+    tempo = plan_tts_tempo(12.0, 10.0, speech_bounds=(0.5, 11.5))
+    assert tempo.filter == "atrim=start=0.500:end=11.500,asetpts=PTS-STARTPTS,atempo=1.100"
+    assert tempo.offset == 0.5
+    assert tempo.duration == pytest.approx(10.0)
+
+
+def test_trim_only_when_speech_already_matches():
+    tempo = plan_tts_tempo(11.0, 10.0, speech_bounds=(0.5, 10.5))
+    assert tempo.filter == "atrim=start=0.500:end=10.500,asetpts=PTS-STARTPTS"
+    assert tempo.factor == 1.0
+    assert tempo.duration == pytest.approx(10.0)
+
+
+def test_scale_timings_applies_offset_and_factor():
+    timings = [{'word': 'a', 'start': 0.2, 'end': 0.7}, {'word': 'b', 'start': 1.5, 'end': 2.5}]
+    assert scale_timings(timings, 0.5, offset=0.5) == [
+        {'word': 'a', 'start': 0.0, 'end': 0.1},
+        {'word': 'b', 'start': 0.5, 'end': 1.0},
+    ]
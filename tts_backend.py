@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TTS后端模块
+语音合成通过可替换的后端完成：默认使用 Edge-TTS，另外提供不需要网络的本地假后端（生成与文本长度相关的提示音），
+以及请求本地HTTP服务的后端和配套的桩服务器（可模拟延迟和失败），用于离线环境下验证配音缓存和批量合成流程；
+可通过环境变量 VIDEO_TTS_BACKEND=edge/fake/http（VIDEO_TTS_URL 指定服务地址）或 set_tts_backend 切换
+
+后端接口: async synthesize(text, voice, output_file, rate, pitch) -> bool
+后端属性 name 为后端名称（参与配音缓存键），audio_suffix 为生成音频的扩展名（如 .mp3 / .wav）
+能够提供逐词时间的后端将其保存在音频旁的 <音频文件名>.words.json 中（见 save_word_timings）
+"""
+
+import io
+import os
+import sys
+import json
+import math
+import time
+import wave
+import array
+import random
+import asyncio
+from pathlib import Path
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 桩服务器默认地址
+DEFAULT_STUB_URL = "http://127.0.0.1:8765/tts"
+
+
+def make_tone_wav(duration, sample_rate=16000):
+    """生成指定时长的单声道440Hz提示音，返回WAV字节"""
+    frame_count = int(duration * sample_rate)
+    samples = array.array('h', (
+        int(3000 * math.sin(2 * math.pi * 440 * i / sample_rate)) for i in range(frame_count)
+    ))
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+def word_timings_path(audio_path):
+    """逐词时间文件路径：<音频文件名>.words.json"""
+    return Path(f"{audio_path}.words.json")
+
+
+def save_word_timings(audio_path, word_timings):
+    """将逐词时间 [{'word', 'start', 'end'}]（秒）保存到音频旁"""
+    try:
+        word_timings_path(audio_path).write_text(json.dumps(word_timings, ensure_ascii=False), encoding='utf-8')
+        return True
+    except OSError as e:
+        print(f"保存逐词时间失败: {e}")
+        return False
+
+
+def load_word_timings(audio_path):
+    """读取音频旁的逐词时间，不存在或无效时返回None"""
+    try:
+        word_timings = json.loads(word_timings_path(audio_path).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+    return word_timings if isinstance(word_timings, list) and word_timings else None
+
+
+def tts_backend_name(backend):
+    """后端名称（未定义name属性的自定义后端使用类名）"""
+    return getattr(backend, 'name', type(backend).__name__)
+
+
+def tts_audio_suffix(backend):
+    """后端生成音频的扩展名（未定义audio_suffix属性时按MP3处理）"""
+    return getattr(backend, 'audio_suffix', ".mp3")
+
+
+def estimate_tone_duration(text, seconds_per_char=0.08):
+    """按文本长度估算提示音时长（秒）"""
+    return round(0.3 + seconds_per_char * len(text.replace("\n", "")), 3)
+
+
+class EdgeTTSBackend:
+    """Edge-TTS 在线语音合成"""
+    name = "edge"
+    audio_suffix = ".mp3"
+
+    async def synthesize(self, text, voice, output_file, rate="+0%", pitch="+0Hz"):
+        """
+        合成语音并保存到output_file
+
+        返回:
+            bool: 是否成功生成音频
+        """
+        from utils import generate_tts_audio
+        word_timings = []
+        ok = await generate_tts_audio(text, voice, output_file, rate=rate, pitch=pitch, word_timings=word_timings)
+        if ok and word_timings:
+            save_word_timings(output_file, word_timings)
+        return ok
+
+
+class FakeTTSBackend:
+    """
+    本地假后端：不访问网络，按文本长度生成单声道WAV提示音，并按词平均分配生成逐词时间
+
+    参数:
+        seconds_per_char: 每个字符对应的时长（秒）
+        sample_rate: 采样率
+    """
+    name = "fake"
+    audio_suffix = ".wav"
+
+    def __init__(self, seconds_per_char=0.08, sample_rate=16000):
+        self.seconds_per_char = seconds_per_char
+        self.sample_rate = sample_rate
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def estimate_duration(self, text):
+        """按文本长度估算生成音频的时长（秒）"""
+        return estimate_tone_duration(text, self.seconds_per_char)
+
+    async def synthesize(self, text, voice, output_file, rate="+0%", pitch="+0Hz"):
+        with self._lock:
+            self.calls += 1
+        try:
+            duration = self.estimate_duration(text)
+            data = make_tone_wav(duration, self.sample_rate)
+            with open(output_file, 'wb') as f:
+                f.write(data)
+            # 中文按字符、其他语言按空格分词，在首尾各留0.15秒静音后平均分配
+            words = text.split() if not any('\u4e00' <= char <= '\u9fff' for char in text) \
+                else [char for char in text if char.strip()]
+            if words:
+                step = max(duration - 0.3, 0.01) / len(words)
+                save_word_timings(output_file, [
+                    {'word': word, 'start': round(0.15 + i * step, 3), 'end': round(0.15 + (i + 1) * step, 3)}
+                    for i, word in enumerate(words)
+                ])
+            print(f"【TTS假后端】已生成音频: {output_file}")
+            return True
+        except Exception as e:
+            print(f"【TTS假后端】生成音频失败: {e}")
+            return False
+
+
+class HttpTTSBackend:
+    """
+    通过HTTP服务合成语音：POST JSON {text, voice, rate, pitch}，响应体为音频数据
+
+    参数:
+        url: 服务地址，默认使用环境变量 VIDEO_TTS_URL 或本地桩服务器地址
+        timeout: 单次请求超时（秒）
+    """
+    name = "http"
+    # 桩服务器返回WAV
+    audio_suffix = ".wav"
+
+    def __init__(self, url=None, timeout=30):
+        self.url = url or os.environ.get("VIDEO_TTS_URL", DEFAULT_STUB_URL)
+        self.timeout = timeout
+
+    def _request(self, payload):
+        import urllib.request
+        request = urllib.request.Request(self.url, data=json.dumps(payload).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return response.read()
+
+    async def synthesize(self, text, voice, output_file, rate="+0%", pitch="+0Hz"):
+        try:
+            data = await asyncio.to_thread(self._request, {'text': text, 'voice': voice, 'rate': rate, 'pitch': pitch})
+            if not data:
+                print("【TTS服务】响应为空")
+                return False
+            with open(output_file, 'wb') as f:
+                f.write(data)
+            return True
+        except Exception as e:
+            print(f"【TTS服务】请求失败: {e}")
+            return False
+
+
+class StubTTSServer:
+    """
+    本地TTS桩服务器：按文本长度返回WAV提示音，可模拟网络延迟和随机失败
+
+    参数:
+        host, port: 监听地址，port为0时自动分配
+        latency: 每个请求的延迟（秒）
+        failure_rate: 请求失败（返回503）的概率
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.requests = 0
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                server.requests += 1
+                length = int(self.headers.get('Content-Length', 0))
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self.send_error(400)
+                    return
+                if server.latency:
+                    time.sleep(server.latency)
+                if server.failure_rate and random.random() < server.failure_rate:
+                    self.send_error(503)
+                    return
+                data = make_tone_wav(estimate_tone_duration(str(payload.get('text', ''))))
+                self.send_response(200)
+                self.send_header('Content-Type', 'audio/wav')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/tts"
+
+    def start(self):
+        """在后台线程中启动服务器"""
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        print(f"【TTS桩服务器】已启动: {self.url}")
+        return self
+
+    def stop(self):
+        """停止服务器"""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+_BACKENDS = {
+    "edge": EdgeTTSBackend,
+    "fake": FakeTTSBackend,
+    "http": HttpTTSBackend
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def set_tts_backend(backend):
+    """
+    设置TTS后端
+
+    参数:
+        backend: 后端名称（edge / fake / http）或实现了 async synthesize(text, voice, output_file, rate, pitch) 的对象，
+                 None表示恢复为环境变量指定的默认后端
+    """
+    global _backend
+    if isinstance(backend, str):
+        if backend not in _BACKENDS:
+            raise ValueError(f"未知的TTS后端: {backend}")
+        backend = _BACKENDS[backend]()
+    with _backend_lock:
+        _backend = backend
+
+
+def get_tts_backend():
+    """获取当前TTS后端（默认由环境变量 VIDEO_TTS_BACKEND 决定，未设置时使用 Edge-TTS）"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            name = os.environ.get("VIDEO_TTS_BACKEND", "edge")
+            _backend = _BACKENDS.get(name, EdgeTTSBackend)()
+        return _backend
+
+
+if __name__ == "__main__":
+    # python tts_backend.py [端口] [延迟秒数] [失败概率]：启动本地TTS桩服务器
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    failure_rate = float(sys.argv[3]) if len(sys.argv) > 3 else 0.0
+    stub = StubTTSServer(port=port, latency=latency, failure_rate=failure_rate).start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,528 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+配音（TTS）缓存模块
+合成结果只取决于 TTS后端 + 规范化后的文本 + 语音 + 语速/音调，文档中重复的配音文本和重复运行的批次都可以直接复用，
+因此音频、测得的时长和逐词时间按内容寻址保存在磁盘缓存目录中，缓存总大小超出上限时按最近使用时间淘汰；
+也可以在处理前按文档预先生成全部配音（prewarm_tts_cache / 命令行 python tts_cache.py prewarm）
+"""
+
+import os
+import sys
+import json
+import shutil
+import asyncio
+import hashlib
+import threading
+import unicodedata
+import uuid
+from pathlib import Path
+from collections import namedtuple
+
+from utils import get_data_path, get_audio_duration
+from tts_backend import (get_tts_backend, set_tts_backend, tts_backend_name, tts_audio_suffix,
+                         word_timings_path, save_word_timings, load_word_timings)
+
+# 缓存格式版本，合成方式发生变化时需要递增，使旧缓存失效
+_CACHE_VERSION = 2
+
+# 默认缓存上限 1GB
+DEFAULT_TTS_CACHE_SIZE_MB = 1024
+
+# 默认语速和音调
+DEFAULT_RATE = "+0%"
+DEFAULT_PITCH = "+0Hz"
+
+# 各语言的默认语音（文本语言与所选语音不一致时自动切换）
+DEFAULT_VOICES = {
+    "chinese": "zh-CN-XiaoxiaoNeural",
+    "malay": "ms-MY-YasminNeural",
+    "thai": "th-TH-PremwadeeNeural"
+}
+
+# 可通过环境变量 VIDEO_TTS_CACHE=0 默认关闭缓存
+_cache_enabled = os.environ.get("VIDEO_TTS_CACHE", "1") != "0"
+_cache_max_bytes = DEFAULT_TTS_CACHE_SIZE_MB * 1024 * 1024
+
+# 配音自动匹配时长的处理：在最终编码的音频滤镜中执行的裁剪/变速滤镜、裁掉的开头时长（秒）、
+# 时间缩放系数（变速系数的倒数）和处理后的配音时长（秒）
+TtsTempo = namedtuple('TtsTempo', ['filter', 'offset', 'factor', 'duration'])
+
+# 本进程生成的配音文件 -> (修改时间, 时长)，避免重复探测时长
+_durations = {}
+_durations_lock = threading.Lock()
+
+
+def set_tts_cache(enabled=None, max_size_mb=None):
+    """
+    设置配音缓存
+
+    参数:
+        enabled: 是否启用缓存，None表示不修改
+        max_size_mb: 缓存大小上限（MB），None表示不修改
+    """
+    global _cache_enabled, _cache_max_bytes
+    if enabled is not None:
+        _cache_enabled = bool(enabled)
+    if max_size_mb is not None and max_size_mb > 0:
+        _cache_max_bytes = int(max_size_mb) * 1024 * 1024
+
+
+def is_tts_cache_enabled():
+    """是否启用了配音缓存"""
+    return _cache_enabled
+
+
+def get_tts_cache_dir():
+    """获取配音缓存目录"""
+    return get_data_path("cache/tts")
+
+
+def normalize_tts_text(text):
+    """规范化配音文本：统一Unicode形式，去掉每行首尾空白并合并连续空白，删除空行"""
+    text = unicodedata.normalize("NFC", str(text or ""))
+    lines = (" ".join(line.split()) for line in text.strip().splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def resolve_tts_voice(text, voice):
+    """
+    根据文本语言选择合适的语音（所选语音与文本语言不一致时切换为该语言的默认语音）
+
+    参数:
+        text: 配音文本
+        voice: 用户选择的语音
+
+    返回:
+        实际使用的语音名称
+    """
+    is_chinese = any('\u4e00' <= char <= '\u9fff' for char in text)
+    is_thai = any('\u0e00' <= char <= '\u0e7f' for char in text)
+    is_malay = not (is_chinese or is_thai)  # 简单判断，如果不是中文或泰文，则假设为马来文
+
+    selected_voice = voice  # 默认使用传入的语音
+    if is_chinese and not voice.startswith('zh-'):
+        selected_voice = DEFAULT_VOICES["chinese"]  # 中文默认使用小晓
+        print(f"检测到中文文本，自动切换为中文语音: {selected_voice}")
+    elif is_thai and not voice.startswith('th-'):
+        selected_voice = DEFAULT_VOICES["thai"]  # 泰文默认使用Premwadee
+        print(f"检测到泰文文本，自动切换为泰文语音: {selected_voice}")
+    elif is_malay and not voice.startswith('ms-'):
+        selected_voice = DEFAULT_VOICES["malay"]  # 马来文默认使用Yasmin
+        print(f"检测到马来文文本，自动切换为马来文语音: {selected_voice}")
+    return selected_voice
+
+
+def make_tts_cache_key(text, voice, rate=DEFAULT_RATE, pitch=DEFAULT_PITCH, backend=None):
+    """
+    根据TTS后端、规范化文本、语音和语速/音调生成缓存键
+
+    参数:
+        backend: 后端名称，为None时使用当前后端（不同后端生成的音频不同，不能互相复用）
+    """
+    if backend is None:
+        backend = tts_backend_name(get_tts_backend())
+    payload = json.dumps([_CACHE_VERSION, backend, normalize_tts_text(text), voice, rate, pitch], ensure_ascii=False)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=20).hexdigest()
+
+
+def _entry_paths(key):
+    cache_dir = get_tts_cache_dir()
+    return cache_dir / f"{key}.audio", cache_dir / f"{key}.json"
+
+
+def _remember_duration(path, duration):
+    try:
+        mtime = Path(path).stat().st_mtime_ns
+    except OSError:
+        return
+    with _durations_lock:
+        _durations[str(path)] = (mtime, duration)
+
+
+def get_tts_duration(audio_path):
+    """
+    获取配音音频时长（本进程合成或从缓存取出的音频直接使用记录的时长，否则探测文件）
+
+    返回:
+        float: 时长（秒），失败返回None
+    """
+    with _durations_lock:
+        record = _durations.get(str(audio_path))
+    if record:
+        try:
+            if Path(audio_path).stat().st_mtime_ns == record[0] and record[1]:
+                return record[1]
+        except OSError:
+            pass
+    return get_audio_duration(str(audio_path))
+
+
+def copy_tts_audio(src_path, dst_path, move=False):
+    """
+    复制（或移动）配音音频及其逐词时间文件；音频最后写入，音频存在即表示两者都已就绪
+
+    返回:
+        bool: 是否成功
+    """
+    src_words = word_timings_path(src_path)
+    dst_words = word_timings_path(dst_path)
+    try:
+        if src_words.exists():
+            if move:
+                os.replace(src_words, dst_words)
+            else:
+                shutil.copyfile(src_words, dst_words)
+        elif dst_words.exists():
+            dst_words.unlink()
+        if move:
+            os.replace(src_path, dst_path)
+        else:
+            shutil.copyfile(src_path, dst_path)
+        return True
+    except OSError as e:
+        print(f"【配音缓存】复制配音音频失败: {e}")
+        return False
+
+
+def plan_tts_tempo(audio_duration, target_duration, speech_bounds=None):
+    """
+    计算配音自动匹配视频时长的处理：先裁掉首尾静音，再按 有声时长/视频时长 变速
+
+    参数:
+        audio_duration: 配音时长（秒）
+        target_duration: 视频时长（秒）
+        speech_bounds: 检测到的语音区间 (开始, 结束)，为None时按整段音频计算
+
+    返回:
+        TtsTempo，无需处理（变速系数接近1且没有首尾静音）时返回None
+    """
+    speech_start, speech_end = speech_bounds or (0.0, audio_duration)
+    trim_silence = speech_start > 0.05 or audio_duration - speech_end > 0.05
+    speech_duration = speech_end - speech_start
+    speed_ratio = speech_duration / target_duration
+    print(f"[自动匹配时长] 视频时长: {target_duration}秒, 配音时长: {audio_duration}秒, 有声时长: {speech_duration:.2f}秒")
+    print(f"[自动匹配时长] 计算变速系数: {speed_ratio:.3f}")
+
+    # 允许1%的误差
+    change_tempo = abs(speed_ratio - 1.0) > 0.01
+    if not change_tempo and not trim_silence:
+        return None
+
+    filter_parts = []
+    if trim_silence:
+        filter_parts.append(f'atrim=start={speech_start:.3f}:end={speech_end:.3f}')
+        filter_parts.append('asetpts=PTS-STARTPTS')
+
+    # atempo单次的有效范围是0.5-2.0，超出范围需要多次应用
+    remaining_ratio = speed_ratio if change_tempo else 1.0
+    while remaining_ratio > 2.0:
+        filter_parts.append('atempo=2.0')
+        remaining_ratio /= 2.0
+    while remaining_ratio < 0.5:
+        filter_parts.append('atempo=0.5')
+        remaining_ratio /= 0.5
+    if remaining_ratio != 1.0:
+        filter_parts.append(f'atempo={remaining_ratio:.3f}')
+
+    factor = 1.0 / speed_ratio if change_tempo else 1.0
+    return TtsTempo(','.join(filter_parts), speech_start if trim_silence else 0.0, factor,
+                    round(speech_duration * factor, 3))
+
+
+def scale_timings(word_timings, factor, offset=0.0):
+    """
+    按裁剪和变速调整逐词时间列表（新时间 = (原时间 - offset) × factor）
+
+    参数:
+        offset: 裁掉的开头时长（秒）
+        factor: 时间缩放系数（变速系数的倒数）
+    """
+    return [
+        dict(timing,
+             start=round(max(0.0, timing['start'] - offset) * factor, 3),
+             end=round(max(0.0, timing['end'] - offset) * factor, 3))
+        for timing in word_timings
+    ]
+
+
+def scale_word_timings(src_audio, dst_audio, factor, offset=0.0):
+    """
+    按裁剪和变速调整逐词时间（见scale_timings），保存到处理后的音频旁
+    """
+    word_timings = load_word_timings(src_audio)
+    if not word_timings:
+        return False
+    return save_word_timings(dst_audio, scale_timings(word_timings, factor, offset))
+
+
+def fetch_tts_cache(key, output_path, backend=None):
+    """
+    查找缓存，命中时复制到output_path（缓存中有逐词时间时一并写出）
+
+    参数:
+        backend: 期望的后端名称，为None时使用当前后端；条目记录的后端与之不一致时视为未命中
+
+    返回:
+        命中返回元数据字典（包含 duration、words），未命中返回None
+    """
+    if not key or not _cache_enabled:
+        return None
+    audio_entry, meta_entry = _entry_paths(key)
+    if not audio_entry.exists():
+        return None
+    try:
+        meta = json.loads(meta_entry.read_text(encoding='utf-8')) if meta_entry.exists() else {}
+        if backend is None:
+            backend = tts_backend_name(get_tts_backend())
+        if meta.get('backend') != backend:
+            print(f"【配音缓存】缓存条目的后端不匹配（{meta.get('backend')} != {backend}），重新合成: {audio_entry.name}")
+            return None
+        if meta.get('words'):
+            save_word_timings(output_path, meta['words'])
+        else:
+            word_timings_path(output_path).unlink(missing_ok=True)
+        shutil.copyfile(audio_entry, output_path)
+        # 更新修改时间，作为LRU淘汰依据
+        os.utime(audio_entry, None)
+    except (OSError, ValueError) as e:
+        print(f"【配音缓存】读取缓存失败: {e}")
+        return None
+    _remember_duration(output_path, meta.get('duration'))
+    print(f"【配音缓存】命中缓存: {audio_entry.name}")
+    return meta
+
+
+def store_tts_cache(key, audio_path, meta=None):
+    """
+    将合成好的音频和元数据（文本、语音、时长、逐词时间等）写入缓存，并按上限淘汰旧条目
+
+    返回:
+        写入的元数据字典，失败返回None
+    """
+    if not key or not _cache_enabled or not audio_path or not Path(audio_path).exists():
+        return None
+    meta = dict(meta or {})
+    if not meta.get('duration'):
+        meta['duration'] = get_audio_duration(str(audio_path))
+    meta['size'] = Path(audio_path).stat().st_size
+    word_timings = load_word_timings(audio_path)
+    if word_timings:
+        meta['words'] = word_timings
+
+    audio_entry, meta_entry = _entry_paths(key)
+    suffix = uuid.uuid4().hex
+    temp_audio = audio_entry.with_name(f"{key}.{suffix}.tmp")
+    temp_meta = meta_entry.with_name(f"{key}.{suffix}.json.tmp")
+    try:
+        shutil.copyfile(audio_path, temp_audio)
+        temp_meta.write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+        # 先写元数据再写音频，音频存在即表示条目完整
+        os.replace(temp_meta, meta_entry)
+        os.replace(temp_audio, audio_entry)
+    except OSError as e:
+        print(f"【配音缓存】写入缓存失败: {e}")
+        for temp_file in (temp_audio, temp_meta):
+            try:
+                temp_file.unlink()
+            except OSError:
+                pass
+        return None
+    _evict_tts_cache(_cache_max_bytes)
+    return meta
+
+
+def _evict_tts_cache(max_bytes):
+    """按最近使用时间淘汰缓存条目，直到总大小不超过上限"""
+    try:
+        entries = []
+        total_size = 0
+        for entry in get_tts_cache_dir().glob("*.audio"):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+            total_size += stat.st_size
+
+        entries.sort()
+        for _, size, entry in entries:
+            if total_size <= max_bytes:
+                break
+            try:
+                entry.unlink()
+                entry.with_suffix(".json").unlink(missing_ok=True)
+                total_size -= size
+                print(f"【配音缓存】淘汰缓存: {entry.name}")
+            except OSError:
+                pass
+    except Exception as e:
+        print(f"【配音缓存】清理缓存失败: {e}")
+
+
+def clear_tts_cache():
+    """
+    清空配音缓存
+
+    返回:
+        删除的音频数量
+    """
+    removed = 0
+    for entry in get_tts_cache_dir().iterdir():
+        if entry.suffix in (".audio", ".json", ".tmp"):
+            try:
+                entry.unlink()
+                if entry.suffix == ".audio":
+                    removed += 1
+            except OSError:
+                pass
+    print(f"【配音缓存】已清空缓存，删除 {removed} 个音频")
+    return removed
+
+
+def run_coroutine(coro):
+    """在同步代码中运行协程（已经处于事件循环中时在新线程中运行）"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        # 没有运行中的事件循环，直接使用asyncio.run()
+        return asyncio.run(coro)
+
+    result = None
+    exception = None
+
+    def run_in_thread():
+        nonlocal result, exception
+        try:
+            result = asyncio.run(coro)
+        except Exception as e:
+            exception = e
+
+    thread = threading.Thread(target=run_in_thread)
+    thread.start()
+    thread.join()  # 等待线程完成
+    if exception:
+        raise exception
+    return result
+
+
+def synthesize_tts(text, voice, output_path, rate=DEFAULT_RATE, pitch=DEFAULT_PITCH):
+    """
+    合成配音：先查缓存，未命中时调用TTS后端合成并写入缓存
+
+    参数:
+        text: 配音文本（会先规范化）
+        voice: 实际使用的语音（调用前应通过 resolve_tts_voice 选择）
+        output_path: 输出音频路径
+        rate: 语速调整
+        pitch: 音调调整
+
+    返回:
+        bool: 是否成功生成音频
+    """
+    text = normalize_tts_text(text)
+    if not text:
+        print("【配音缓存】配音文本为空，跳过合成")
+        return False
+
+    backend = get_tts_backend()
+    backend_name = tts_backend_name(backend)
+    key = make_tts_cache_key(text, voice, rate, pitch, backend_name) if _cache_enabled else None
+    if fetch_tts_cache(key, output_path, backend_name) is not None:
+        return True
+
+    if not run_coroutine(backend.synthesize(text, voice, str(output_path), rate=rate, pitch=pitch)):
+        return False
+    if not Path(output_path).exists() or Path(output_path).stat().st_size == 0:
+        print(f"【配音缓存】TTS后端未生成有效音频: {output_path}")
+        return False
+
+    meta = store_tts_cache(key, output_path, {
+        'text': text,
+        'voice': voice,
+        'rate': rate,
+        'pitch': pitch,
+        'backend': backend_name
+    })
+    if meta:
+        _remember_duration(output_path, meta.get('duration'))
+    return True
+
+
+def prewarm_tts_cache(document_path=None, languages=None, voice=DEFAULT_VOICES["chinese"],
+                      rate=DEFAULT_RATE, pitch=DEFAULT_PITCH):
+    """
+    按文档预先生成全部配音并写入缓存
+
+    参数:
+        document_path: 文档路径，为None时使用默认字幕配置
+        languages: 需要预热的语言列表（chinese / malay / thai），为None时预热文档中的全部语言
+        voice: 用户选择的语音（与处理视频时相同，会按文本语言自动切换）
+
+    返回:
+        (命中数, 新生成数, 失败数)
+    """
+    import tempfile
+    from document_store import load_document_store
+
+    if not _cache_enabled:
+        print("【配音缓存】缓存未启用，跳过预热")
+        return 0, 0, 0
+
+    document = load_document_store(document_path)
+    languages = languages or list(document.prompts.keys())
+    backend = get_tts_backend()
+    backend_name = tts_backend_name(backend)
+    hits = generated = failed = 0
+    seen = set()
+    temp_dir = Path(tempfile.mkdtemp())
+    try:
+        for language in languages:
+            for text in document.prompts.get(language, ()):
+                text = normalize_tts_text(text)
+                if not text:
+                    continue
+                selected_voice = resolve_tts_voice(text, voice)
+                key = make_tts_cache_key(text, selected_voice, rate, pitch, backend_name)
+                if key in seen:
+                    continue
+                seen.add(key)
+                if _entry_paths(key)[0].exists():
+                    hits += 1
+                    continue
+                output_path = temp_dir / f"{key}{tts_audio_suffix(backend)}"
+                if synthesize_tts(text, selected_voice, output_path, rate, pitch):
+                    generated += 1
+                else:
+                    failed += 1
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    print(f"【配音缓存】预热完成: 已缓存 {hits} 条，新生成 {generated} 条，失败 {failed} 条")
+    return hits, generated, failed
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="配音缓存管理")
+    subparsers = parser.add_subparsers(dest="command")
+    prewarm_parser = subparsers.add_parser("prewarm", help="按文档预先生成配音")
+    prewarm_parser.add_argument("document", nargs="?", default=None, help="文档路径，默认使用字幕配置")
+    prewarm_parser.add_argument("--lang", action="append", choices=list(DEFAULT_VOICES.keys()), help="预热的语言，可重复指定")
+    prewarm_parser.add_argument("--voice", default=DEFAULT_VOICES["chinese"], help="语音名称")
+    prewarm_parser.add_argument("--rate", default=DEFAULT_RATE, help="语速调整，如 +10%%")
+    prewarm_parser.add_argument("--pitch", default=DEFAULT_PITCH, help="音调调整，如 +0Hz")
+    prewarm_parser.add_argument("--backend", choices=["edge", "fake", "http"], help="TTS后端")
+    subparsers.add_parser("clear", help="清空配音缓存")
+    args = parser.parse_args()
+
+    if args.command == "prewarm":
+        if args.backend:
+            set_tts_backend(args.backend)
+        _, _, failed_count = prewarm_tts_cache(args.document, args.lang, args.voice, args.rate, args.pitch)
+        sys.exit(1 if failed_count else 0)
+    elif args.command == "clear":
+        clear_tts_cache()
+    else:
+        parser.print_help()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量配音预取模块
+批次开始时收集所有视频的配音文本，在后台线程的同一个事件循环中并发合成（信号量限制并发数，
+每个请求有超时和重试），与视频预处理同时进行；合成结果（连同逐词时间）写入批次目录（同时写入配音缓存），
+处理视频时直接取用，编码不再等待逐个的TTS网络请求。
+结果通过文件交接（先写临时文件再原子重命名，失败时写 .failed 标记），因此并行模式下的工作进程同样可以使用
+"""
+
+import time
+import uuid
+import shutil
+import asyncio
+import tempfile
+import threading
+from pathlib import Path
+
+from tts_backend import get_tts_backend, tts_backend_name, tts_audio_suffix, word_timings_path
+from tts_cache import (DEFAULT_RATE, DEFAULT_PITCH, normalize_tts_text, resolve_tts_voice,
+                       make_tts_cache_key, fetch_tts_cache, store_tts_cache, copy_tts_audio)
+
+# 默认并发数、单次请求超时（秒）和重试次数
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TIMEOUT = 30
+DEFAULT_RETRIES = 2
+
+# 等待预取结果的默认超时（秒），超时后由process_video自行合成
+DEFAULT_WAIT_TIMEOUT = 180
+
+_FAILED_SUFFIX = ".failed"
+
+
+def wait_for_prefetched_tts(audio_path, timeout=DEFAULT_WAIT_TIMEOUT, poll_interval=0.1):
+    """
+    等待预取的配音文件就绪
+
+    参数:
+        audio_path: TTSPrefetcher.audio_path 返回的路径
+        timeout: 最长等待时间（秒）
+
+    返回:
+        就绪时返回音频路径，合成失败、超时或路径为空时返回None
+    """
+    if not audio_path:
+        return None
+    audio_path = Path(audio_path)
+    failed_marker = audio_path.with_name(audio_path.name + _FAILED_SUFFIX)
+    deadline = time.time() + timeout
+    while True:
+        if audio_path.exists():
+            return str(audio_path)
+        if failed_marker.exists() or not audio_path.parent.exists():
+            return None
+        if time.time() >= deadline:
+            print(f"【配音预取】等待配音超时: {audio_path.name}")
+            return None
+        time.sleep(poll_interval)
+
+
+class TTSPrefetcher:
+    """
+    批量配音预取器
+
+    参数:
+        texts: 视频索引 -> 配音文本
+        voice: 用户选择的语音（按文本语言自动切换）
+        max_concurrency: 同时进行的合成请求数
+        timeout: 单次请求超时（秒）
+        retries: 失败后的重试次数
+        backend: TTS后端，为None时使用当前默认后端
+        output_dir: 结果目录，为None时创建临时目录（close时删除）
+    """
+
+    def __init__(self, texts, voice, max_concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT,
+                 retries=DEFAULT_RETRIES, backend=None, output_dir=None,
+                 rate=DEFAULT_RATE, pitch=DEFAULT_PITCH):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.timeout = timeout
+        self.retries = max(0, int(retries))
+        self.backend = backend or get_tts_backend()
+        self.backend_name = tts_backend_name(self.backend)
+        self._suffix = tts_audio_suffix(self.backend)
+        self.rate = rate
+        self.pitch = pitch
+        self._owns_dir = output_dir is None
+        self.output_dir = Path(output_dir or tempfile.mkdtemp(prefix="tts_prefetch_"))
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+        # 相同文本+语音只合成一次
+        self._requests = {}
+        self._paths = {}
+        for index, text in sorted(texts.items()):
+            text = normalize_tts_text(text)
+            if not text:
+                continue
+            selected_voice = resolve_tts_voice(text, voice)
+            key = make_tts_cache_key(text, selected_voice, rate, pitch, self.backend_name)
+            self._requests.setdefault(key, (text, selected_voice))
+            self._paths[index] = self.output_dir / f"{key}{self._suffix}"
+
+        self.stats = {'cached': 0, 'generated': 0, 'failed': 0, 'retries': 0}
+        self._thread = None
+        self._loop = None
+        self._task = None
+        self._done = threading.Event()
+
+    def audio_path(self, index):
+        """视频对应的预取音频路径（合成完成后才会出现），没有配音文本时返回None"""
+        path = self._paths.get(index)
+        return str(path) if path else None
+
+    def start(self):
+        """在后台线程中启动预取"""
+        if not self._requests:
+            self._done.set()
+            return self
+        print(f"【配音预取】开始预取 {len(self._requests)} 条配音（{len(self._paths)} 个视频），"
+              f"并发数: {self.max_concurrency}, 后端: {self.backend_name}")
+        self._thread = threading.Thread(target=self._thread_main, name="tts-prefetch", daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, index, timeout=DEFAULT_WAIT_TIMEOUT):
+        """等待指定视频的配音就绪，返回音频路径或None"""
+        return wait_for_prefetched_tts(self.audio_path(index), timeout)
+
+    def join(self, timeout=None):
+        """等待全部预取完成"""
+        return self._done.wait(timeout)
+
+    def close(self):
+        """取消未完成的请求，并删除自动创建的结果目录"""
+        if self._loop is not None and self._task is not None and not self._done.is_set():
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._owns_dir:
+            shutil.rmtree(self.output_dir, ignore_errors=True)
+
+    def _thread_main(self):
+        try:
+            asyncio.run(self._run())
+        except Exception as e:
+            print(f"【配音预取】预取出错: {e}")
+        finally:
+            self._done.set()
+
+    async def _run(self):
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        start_time = time.time()
+        try:
+            # 按视频索引顺序创建任务，靠前的视频先拿到配音
+            await asyncio.gather(*(self._prefetch_one(semaphore, key, text, voice)
+                                   for key, (text, voice) in self._requests.items()))
+        except asyncio.CancelledError:
+            print("【配音预取】预取已取消")
+            return
+        print(f"【配音预取】预取完成，耗时 {time.time() - start_time:.1f}秒: 缓存命中 {self.stats['cached']}，"
+              f"新合成 {self.stats['generated']}，失败 {self.stats['failed']}，重试 {self.stats['retries']} 次")
+
+    async def _prefetch_one(self, semaphore, key, text, voice):
+        final_path = self.output_dir / f"{key}{self._suffix}"
+        temp_path = self.output_dir / f"{key}.{uuid.uuid4().hex}.part"
+        async with semaphore:
+            if await asyncio.to_thread(fetch_tts_cache, key, temp_path, self.backend_name) is not None:
+                copy_tts_audio(temp_path, final_path, move=True)
+                self.stats['cached'] += 1
+                return
+
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    self.stats['retries'] += 1
+                    # 指数退避
+                    await asyncio.sleep(min(0.5 * (2 ** (attempt - 1)), 8))
+                try:
+                    ok = await asyncio.wait_for(
+                        self.backend.synthesize(text, voice, str(temp_path), rate=self.rate, pitch=self.pitch),
+                        timeout=self.timeout)
+                except asyncio.TimeoutError:
+                    print(f"【配音预取】请求超时（第{attempt + 1}次）: {text[:20]}")
+                    ok = False
+                except Exception as e:
+                    print(f"【配音预取】请求失败（第{attempt + 1}次）: {e}")
+                    ok = False
+
+                if ok and temp_path.exists() and temp_path.stat().st_size > 0:
+                    await asyncio.to_thread(store_tts_cache, key, temp_path, {
+                        'text': text,
+                        'voice': voice,
+                        'rate': self.rate,
+                        'pitch': self.pitch,
+                        'backend': self.backend_name
+                    })
+                    copy_tts_audio(temp_path, final_path, move=True)
+                    self.stats['generated'] += 1
+                    return
+
+        for temp_file in (temp_path, word_timings_path(temp_path)):
+            try:
+                temp_file.unlink()
+            except OSError:
+                pass
+        final_path.with_name(final_path.name + _FAILED_SUFFIX).touch()
+        self.stats['failed'] += 1
+        print(f"【配音预取】配音合成失败，处理视频时将重新尝试: {text[:20]}")
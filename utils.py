@@ -11,9 +11,14 @@ import subprocess
 import shutil
 from pathlib import Path
 import time
-import ast
+import hashlib
+import threading
+import tempfile
+from collections import namedtuple
 import pandas as pd
 
+from media_probe import probe_media
+
 
 # 路径相关函数
 def get_app_path():
@@ -140,68 +145,22 @@ def load_style_config(style=None):
     返回:
         如果提供了style，返回该样式的配置字典；否则返回整个ConfigParser对象
     """
-    import configparser
-    
-    # 尝试不同位置查找配置文件
-    config_paths = [
-        get_data_path("config") / "subtitle_styles.ini",
-        Path("VideoApp/config") / "subtitle_styles.ini",
-        Path("config") / "subtitle_styles.ini",
-        Path(os.getcwd()) / "config" / "subtitle_styles.ini"
-    ]
-    
-    config = configparser.ConfigParser()
+    # 通过样式注册表获取，配置文件只在修改后才会重新解析
+    from style_registry import get_style_registry
+    registry = get_style_registry()
     
-    # 尝试读取配置文件
-    config_found = False
-    for config_path in config_paths:
-        if config_path.exists():
-            try:
-                config.read(str(config_path), encoding='utf-8')
-                print(f"成功加载样式配置: {config_path}")
-                config_found = True
-                break
-            except Exception as e:
-                print(f"读取样式配置文件 {config_path} 失败: {e}")
-    
-    if not config_found:
-        print("未找到样式配置文件，将使用默认样式")
-        return {} if style else config
+    if registry.path is None:
+        return {} if style else registry.parser
     
     # 如果提供了style参数，返回该样式的配置
     if style:
-        style_section = f"styles.{style}"
-        if config.has_section(style_section):
-            # 将配置项转换为字典
-            style_dict = {}
-            for key, value in config.items(style_section):
-                # 尝试解析列表类型的值
-                if key in ['text_color', 'stroke_color', 'shadow_color', 'shadow_offset']:
-                    try:
-                        style_dict[key] = ast.literal_eval(value)
-                    except:
-                        style_dict[key] = value
-                # 尝试解析数值类型的值
-                elif key in ['font_size', 'stroke_width', 'white_stroke_ratio']:
-                    try:
-                        if '.' in value:
-                            style_dict[key] = float(value)
-                        else:
-                            style_dict[key] = int(value)
-                    except:
-                        style_dict[key] = value
-                # 尝试解析布尔类型的值
-                elif key == 'shadow':
-                    style_dict[key] = value.lower() in ['true', 'yes', '1']
-                else:
-                    style_dict[key] = value
-            
-            return style_dict
-        else:
-            print(f"样式 {style} 在配置文件中不存在，将使用默认样式")
-            return {}
+        compiled_style = registry.styles.get(style)
+        if compiled_style is not None:
+            return compiled_style.to_dict()
+        print(f"样式 {style} 在配置文件中不存在，将使用默认样式")
+        return {}
     
-    return config
+    return registry.parser
 
 
 # 文件操作
@@ -339,14 +298,157 @@ def find_matching_file(base_name, directory, extensions=[".jpg", ".png", ".jpeg"
     return None
 
 
+# 每个FFmpeg进程可使用的线程数（由并行调度器按CPU核数分配，None表示由FFmpeg自行决定）
+_ffmpeg_threads = None
+
+
+def set_ffmpeg_threads(threads):
+    """
+    设置当前进程中FFmpeg命令的线程数上限
+    
+    参数:
+        threads: 线程数，0或None表示不限制
+    """
+    global _ffmpeg_threads
+    _ffmpeg_threads = int(threads) if threads else None
+
+
+def _apply_thread_budget(command):
+    """为FFmpeg命令添加线程数限制（输出选项，插入到输出路径之前）"""
+    if not _ffmpeg_threads or not command or "-threads" in command:
+        return command
+    if Path(str(command[0])).stem.lower() != "ffmpeg":
+        return command
+    return list(command[:-1]) + ["-threads", str(_ffmpeg_threads), command[-1]]
+
+
+# FFmpeg编码进度：已输出的媒体时长（秒）、编码帧率、编码速度（倍速）、已输出大小（字节）、
+# 进度百分比和预计剩余时间（秒），无法计算的项为None
+FfmpegProgress = namedtuple('FfmpegProgress', ['out_time', 'fps', 'speed', 'total_size', 'percent', 'eta'])
+
+# 每个线程最近一次带进度的FFmpeg命令的统计（见get_last_encode_stats）
+_encode_stats = threading.local()
+
+
+def _parse_progress_value(value, suffix=""):
+    value = value.strip()
+    if suffix and value.endswith(suffix):
+        value = value[:-len(suffix)]
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _make_progress(fields, duration=None):
+    """由 -progress 输出的一组键值生成FfmpegProgress"""
+    out_time_us = _parse_progress_value(fields.get('out_time_us', ''))
+    out_time = out_time_us / 1000000.0 if out_time_us is not None and out_time_us >= 0 else None
+    fps = _parse_progress_value(fields.get('fps', ''))
+    speed = _parse_progress_value(fields.get('speed', ''), 'x')
+    total_size = _parse_progress_value(fields.get('total_size', ''))
+    percent = None
+    eta = None
+    if duration and out_time is not None:
+        percent = max(0.0, min(100.0, out_time / duration * 100.0))
+        if speed:
+            eta = max(0.0, duration - out_time) / speed
+    return FfmpegProgress(out_time, fps, speed, int(total_size) if total_size is not None else None, percent, eta)
+
+
+def _run_with_progress(command, progress_callback, duration=None, creationflags=0):
+    """
+    以 -progress pipe:1 -nostats 执行FFmpeg，逐块解析标准输出中的进度并回调
+
+    返回:
+        (返回码, 错误输出)
+    """
+    command = [command[0], '-progress', 'pipe:1', '-nostats'] + list(command[1:])
+    start_time = time.time()
+    progress = None
+    # 错误输出写入临时文件，避免管道写满阻塞FFmpeg
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=stderr_file,
+                                   text=True, errors='ignore', creationflags=creationflags)
+        fields = {}
+        for line in process.stdout:
+            key, _, value = line.strip().partition('=')
+            if not key:
+                continue
+            if key != 'progress':
+                fields[key] = value
+                continue
+            # 每组进度以 progress=continue/end 结束
+            progress = _make_progress(fields, duration)
+            try:
+                progress_callback(progress)
+            except Exception as e:
+                print(f"进度回调失败: {e}")
+            fields = {}
+        returncode = process.wait()
+        stderr_file.seek(0)
+        stderr_text = stderr_file.read().decode('utf-8', errors='ignore')
+
+    _encode_stats.value = {
+        'wall_time': time.time() - start_time,
+        'media_time': progress.out_time if progress else None,
+        'fps': progress.fps if progress else None,
+        'speed': progress.speed if progress else None,
+        'total_size': progress.total_size if progress else None,
+        'success': returncode == 0,
+    }
+    return returncode, stderr_text
+
+
+def get_last_encode_stats():
+    """
+    当前线程最近一次带进度执行的FFmpeg命令的统计
+
+    返回:
+        字典 {wall_time, media_time, fps, speed, total_size, success}，没有记录时返回None
+    """
+    return getattr(_encode_stats, 'value', None)
+
+
+def pop_encode_stats():
+    """取出并清除当前线程最近一次编码的统计（见get_last_encode_stats），用于按任务汇总"""
+    stats = get_last_encode_stats()
+    _encode_stats.value = None
+    return stats
+
+
+def format_progress_stage(stage, progress):
+    """把编码进度格式化为阶段文字，如：编码中 45fps 1.80x 剩余12秒"""
+    details = []
+    if progress.fps:
+        details.append(f"{progress.fps:.0f}fps")
+    if progress.speed:
+        details.append(f"{progress.speed:.2f}x")
+    if progress.eta is not None:
+        details.append(f"剩余{progress.eta:.0f}秒")
+    return f"{stage} {' '.join(details)}" if details else stage
+
+
+def format_encode_stats(stats):
+    """把编码统计（见get_last_encode_stats）格式化为日志文字，没有统计时返回空字符串"""
+    if not stats or not stats.get('speed'):
+        return ""
+    text = f"编码 {stats['wall_time']:.1f}秒, {stats['fps'] or 0:.1f}fps, {stats['speed']:.2f}x"
+    if stats.get('total_size'):
+        text += f", {stats['total_size'] / 1024 / 1024:.1f}MB"
+    return text
+
+
 # FFMPEG命令执行
-def run_ffmpeg_command(command, quiet=False):
+def run_ffmpeg_command(command, quiet=False, progress_callback=None, duration=None):
     """
     执行FFMPEG命令
     
     参数:
         command: 命令列表，如 ["ffmpeg", "-i", "input.mp4", "output.mp4"]
         quiet: 是否静默执行
+        progress_callback: 进度回调 progress_callback(FfmpegProgress)，指定时以 -progress pipe:1 执行并实时解析进度
+        duration: 输出时长（秒），用于计算进度百分比和预计剩余时间
     
     返回:
         成功返回True，失败返回False
@@ -354,19 +456,27 @@ def run_ffmpeg_command(command, quiet=False):
     import logging
     import platform
     
+    command = _apply_thread_budget(command)
+    
     if not quiet:
         print(f"执行命令: {' '.join(command)}")
         logging.info(f"🎥 执行FFmpeg命令: {' '.join(command[:10])}...")
     
     try:
-        # 在Windows上，可能需要处理编码问题
-        if platform.system() == "Windows":
-            # Windows上使用creationflags来避免控制台窗口闪烁
+        # Windows上使用creationflags来避免控制台窗口闪烁
+        creationflags = subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
+        if progress_callback:
+            returncode, stderr_text = _run_with_progress(command, progress_callback, duration, creationflags)
+            result = subprocess.CompletedProcess(command, returncode, stderr=stderr_text)
+            stats_text = format_encode_stats(get_last_encode_stats())
+            if not quiet and stats_text:
+                logging.info(f"📈 编码统计: {stats_text}")
+        elif platform.system() == "Windows":
             result = subprocess.run(
                 command, 
                 capture_output=True, 
                 text=True,
-                creationflags=subprocess.CREATE_NO_WINDOW
+                creationflags=creationflags
             )
         else:
             # 在其他系统上正常执行
@@ -420,29 +530,38 @@ def get_audio_duration(audio_path):
         float: 音频时长（秒），失败返回None
     """
     try:
-        # 获取音频时长
-        duration_cmd = [
-            "ffprobe", "-v", "error", "-show_entries", "format=duration",
-            "-of", "default=noprint_wrappers=1:nokey=1", str(audio_path)
-        ]
-        duration_str = subprocess.check_output(duration_cmd).decode("utf-8").strip()
-        
+        info = probe_media(audio_path)
+        if info is None:
+            print(f"获取音频时长失败: 无法探测文件 {audio_path}")
+            return None
+
         # 确保获取到有效的时长值
-        try:
-            duration = float(duration_str)
-            if duration <= 0:
-                print(f"警告: 检测到无效的音频时长 ({duration}秒)")
-                return None
-            return duration
-        except ValueError:
-            print(f"无法解析音频时长字符串: '{duration_str}'")
+        duration = info.duration
+        if not duration or duration <= 0:
+            print(f"警告: 检测到无效的音频时长 ({duration}秒)")
             return None
+        return duration
             
     except Exception as e:
         print(f"获取音频时长失败: {e}")
         return None
 
 
+def _count_video_duration(video_path, fps):
+    """通过解码计数帧数估算视频时长（较慢，仅在容器和流时长都不可用时使用）"""
+    frame_cmd = [
+        "ffprobe", "-v", "error", "-count_frames",
+        "-select_streams", "v:0", "-show_entries", "stream=nb_read_frames",
+        "-of", "default=noprint_wrappers=1:nokey=1", str(video_path)
+    ]
+    frames = int(subprocess.check_output(frame_cmd).decode("utf-8").strip())
+    if frames > 0 and fps and fps > 0:
+        duration = frames / fps
+        print(f"使用帧数计算时长: {frames}帧 / {fps}fps = {duration}秒")
+        return duration
+    return None
+
+
 def get_video_info(video_path):
     """
     获取视频信息(宽度、高度、时长)
@@ -454,70 +573,24 @@ def get_video_info(video_path):
         (width, height, duration) 元组，失败返回None
     """
     try:
-        # 获取视频尺寸
-        size_cmd = [
-            "ffprobe", "-v", "error", "-select_streams", "v:0",
-            "-show_entries", "stream=width,height", "-of", "csv=s=x:p=0",
-            str(video_path)
-        ]
-        video_size = subprocess.check_output(size_cmd).decode("utf-8").strip()
-        width, height = map(int, video_size.split("x"))
-        
-        # 获取视频时长
-        duration_cmd = [
-            "ffprobe", "-v", "error", "-show_entries", "format=duration",
-            "-of", "default=noprint_wrappers=1:nokey=1", str(video_path)
-        ]
-        duration_str = subprocess.check_output(duration_cmd).decode("utf-8").strip()
-        
-        # 确保获取到有效的时长值
-        try:
-            duration = float(duration_str)
-            if duration <= 0.1:  # 如果时长异常短，尝试使用另一种方法
-                print(f"警告: 检测到异常短的视频时长 ({duration}秒)，尝试使用另一种方法获取...")
-                # 使用另一种方法获取时长
-                alt_duration_cmd = [
-                    "ffprobe", "-v", "error", "-select_streams", "v:0",
-                    "-show_entries", "stream=duration", "-of", "default=noprint_wrappers=1:nokey=1",
-                    str(video_path)
-                ]
-                alt_duration_str = subprocess.check_output(alt_duration_cmd).decode("utf-8").strip()
-                if alt_duration_str and float(alt_duration_str) > 0.1:
-                    duration = float(alt_duration_str)
-                    print(f"使用流时长: {duration}秒")
-                else:
-                    # 如果流时长也不可用，使用帧数和帧率计算
-                    frame_cmd = [
-                        "ffprobe", "-v", "error", "-count_frames",
-                        "-select_streams", "v:0", "-show_entries", "stream=nb_read_frames",
-                        "-of", "default=noprint_wrappers=1:nokey=1", str(video_path)
-                    ]
-                    fps_cmd = [
-                        "ffprobe", "-v", "error", "-select_streams", "v:0",
-                        "-show_entries", "stream=r_frame_rate", "-of", "default=noprint_wrappers=1:nokey=1",
-                        str(video_path)
-                    ]
-                    
-                    try:
-                        frames = int(subprocess.check_output(frame_cmd).decode("utf-8").strip())
-                        fps_str = subprocess.check_output(fps_cmd).decode("utf-8").strip()
-                        fps_parts = fps_str.split('/')
-                        if len(fps_parts) == 2:
-                            fps = float(fps_parts[0]) / float(fps_parts[1])
-                        else:
-                            fps = float(fps_str)
-                        
-                        if frames > 0 and fps > 0:
-                            duration = frames / fps
-                            print(f"使用帧数计算时长: {frames}帧 / {fps}fps = {duration}秒")
-                    except Exception as e:
-                        print(f"帧数计算失败: {e}")
-                        # 使用默认值
-                        duration = 10.0
-                        print(f"无法获取准确时长，使用默认值: {duration}秒")
-        except ValueError:
-            print(f"无法解析时长字符串: '{duration_str}'")
-            duration = 10.0  # 使用默认值
+        info = probe_media(video_path)
+        if info is None or not info.width or not info.height:
+            raise ValueError(f"无法获取视频尺寸: {video_path}")
+        width, height = info.width, info.height
+
+        # 探测结果已依次尝试容器时长、流时长和帧数/帧率
+        duration = info.duration
+        if not duration or duration <= 0.1:  # 如果时长异常短，尝试逐帧计数
+            print(f"警告: 检测到异常短的视频时长 ({duration}秒)，尝试使用帧数计算...")
+            try:
+                duration = _count_video_duration(video_path, info.fps)
+            except Exception as e:
+                print(f"帧数计算失败: {e}")
+                duration = None
+            if not duration:
+                # 使用默认值
+                duration = 10.0
+                print(f"无法获取准确时长，使用默认值: {duration}秒")
             
         print(f"视频信息: {width}x{height}, {duration}秒")
         return width, height, duration
@@ -527,6 +600,63 @@ def get_video_info(video_path):
         return 1080, 1920, 10.0  # 默认值
 
 
+def has_audio_stream(media_path):
+    """
+    检查媒体文件是否包含音频流
+
+    参数:
+        media_path: 媒体文件路径
+
+    返回:
+        bool: 包含音频流返回True，否则（或检测失败）返回False
+    """
+    try:
+        info = probe_media(media_path)
+        return bool(info and info.has_audio)
+    except Exception as e:
+        print(f"检测音频流失败: {e}")
+        return False
+
+
+# 文件内容哈希缓存 {(路径, 大小, 修改时间): 哈希}
+_hash_cache = {}
+_hash_lock = threading.Lock()
+
+
+def file_content_hash(file_path):
+    """
+    计算文件内容哈希（同一进程内按路径、大小和修改时间缓存结果）
+
+    返回:
+        十六进制哈希字符串，失败返回None
+    """
+    try:
+        path = Path(file_path).resolve()
+        stat = path.stat()
+    except OSError:
+        return None
+
+    stat_key = (str(path), stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        cached = _hash_cache.get(stat_key)
+    if cached:
+        return cached
+
+    try:
+        hasher = hashlib.blake2b(digest_size=20)
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+    except OSError as e:
+        print(f"计算文件哈希失败: {e}")
+        return None
+
+    with _hash_lock:
+        _hash_cache[stat_key] = digest
+    return digest
+
+
 def ensure_dir(directory):
     """确保目录存在，不存在则创建"""
     os.makedirs(directory, exist_ok=True)
@@ -542,184 +672,13 @@ def find_font_file(font_path):
     返回:
         找到的字体文件路径，如果没找到则返回None
     """
-    # 如果是绝对路径且文件存在，直接返回
-    font_path_obj = Path(font_path)
-    if font_path_obj.is_absolute() and font_path_obj.exists():
-        return font_path
-    
-    # 尝试不同的基础路径
-    possible_paths = [
-        font_path_obj,  # 原始路径
-        get_app_path() / font_path,  # 相对于应用程序路径
-        Path.cwd() / font_path,  # 相对于当前工作目录
-        Path(get_data_path()) / font_path,  # 相对于数据目录
-        get_app_path() / "VideoApp" / font_path,  # VideoApp子目录
-        Path.cwd() / "VideoApp" / font_path,  # 当前目录下的VideoApp子目录
-        Path(__file__).parent.parent / font_path,  # 相对于utils.py的上级目录
-        Path(__file__).parent / font_path,  # 相对于utils.py目录
-    ]
-    
-    # 检查可能的路径
-    for path in possible_paths:
-        if path.exists():
-            print(f"找到字体文件: {path}")
-            return str(path)
-    
-    # 如果指定的字体文件找不到，尝试在fonts目录中查找任何可用的字体
-    fonts_dirs = [
-        Path(get_data_path()) / "fonts",
-        Path(get_data_path()) / "fonts/new",  # 新增字体目录
-        get_app_path() / "data/fonts",
-        get_app_path() / "data/fonts/new",  # 新增字体目录
-        Path.cwd() / "data/fonts",
-        Path.cwd() / "data/fonts/new",  # 新增字体目录
-        Path.cwd() / "VideoApp/data/fonts",
-        Path.cwd() / "VideoApp/data/fonts/new",  # 新增字体目录
-    ]
-    
-    # 获取字体文件名（不含路径）
-    font_filename = font_path_obj.name
-    
-    # 在fonts目录中查找匹配的字体
-    for fonts_dir in fonts_dirs:
-        if fonts_dir.exists():
-            print(f"检查字体目录: {fonts_dir}")
-            # 首先尝试精确匹配
-            exact_match = fonts_dir / font_filename
-            if exact_match.exists():
-                print(f"找到精确匹配的字体文件: {exact_match}")
-                return str(exact_match)
-                
-            # 如果没有精确匹配，尝试查找任何可用的字体
-            try:
-                font_files = [f.name for f in fonts_dir.iterdir() if f.is_file() and f.suffix.lower() in ('.ttf', '.otf')]
-                if font_files:
-                    # 优先选择名称中包含Bold的字体
-                    bold_fonts = [f for f in font_files if 'bold' in f.lower()]
-                    if bold_fonts:
-                        selected_font = fonts_dir / bold_fonts[0]
-                        print(f"找不到指定字体，使用粗体字体: {selected_font}")
-                        return str(selected_font)
-                    
-                    # 如果没有粗体字体，使用任何可用字体
-                    selected_font = fonts_dir / font_files[0]
-                    print(f"找不到指定字体，使用可用字体: {selected_font}")
-                    return str(selected_font)
-            except Exception as e:
-                print(f"在字体目录中查找字体时出错: {e}")
-    
-    # 尝试系统字体目录
-    system_font_dirs = []
-    
-    # macOS 系统字体目录
-    if sys.platform == 'darwin':
-        system_font_dirs.extend([
-            Path('/System/Library/Fonts'),
-            Path('/Library/Fonts'),
-            Path.home() / 'Library/Fonts'
-        ])
-    
-    # Windows 系统字体目录
-    elif sys.platform == 'win32':
-        windir = Path(os.environ.get('WINDIR', 'C:\\Windows'))
-        fonts_dir = windir / 'Fonts'
-        if fonts_dir.exists():
-            system_font_dirs.extend([fonts_dir])
-        else:
-            # 备用Windows字体目录
-            system_font_dirs.extend([
-                Path('C:\\Windows\\Fonts'),
-            ])
-    
-    # Linux 系统字体目录
-    else:
-        system_font_dirs.extend([
-            Path('/usr/share/fonts'),
-            Path('/usr/local/share/fonts'),
-            Path.home() / '.fonts'
-        ])
-    
-    # 常见字体名称
-    common_fonts = [
-        'Arial.ttf', 
-        'Helvetica.ttf', 
-        'DejaVuSans.ttf', 
-        'FreeSans.ttf',
-        'NotoSans-Regular.ttf',
-        'OpenSans-Regular.ttf',
-        'LiberationSans-Regular.ttf',
-        'Times.ttf',
-        'TimesNewRoman.ttf',
-        'Georgia.ttf',
-        'Verdana.ttf',
-        'Tahoma.ttf',
-        'Calibri.ttf',
-        'SFPro.ttf',
-        'SFProText-Regular.ttf',
-        'SFProDisplay-Regular.ttf',
-        'PingFang.ttc',
-        'PingFangSC-Regular.ttf',
-        'STHeiti-Light.ttc',
-        'STHeiti-Regular.ttc',
-        'Menlo-Regular.ttf',
-        'Monaco.ttf',
-        'Consolas.ttf',
-        'CourierNew.ttf'
-    ]
-    
-    # 在系统字体目录中查找常见字体
-    for font_dir in system_font_dirs:
-        if font_dir.exists():
-            print(f"检查系统字体目录: {font_dir}")
-            for font_name in common_fonts:
-                font_path = font_dir / font_name
-                if font_path.exists():
-                    print(f"找到系统字体: {font_path}")
-                    
-                    # 尝试复制字体到应用程序字体目录
-                    try:
-                        app_fonts_dir = Path(get_data_path()) / "fonts"
-                        ensure_dir(str(app_fonts_dir))
-                        dest_path = app_fonts_dir / font_name
-                        if not dest_path.exists():
-                            import shutil
-                            shutil.copy2(str(font_path), str(dest_path))
-                            print(f"已将系统字体复制到应用程序目录: {dest_path}")
-                        return str(dest_path)
-                    except Exception as e:
-                        print(f"复制字体失败: {e}")
-                        return str(font_path)
-            
-            # 如果没有找到常见字体，尝试列出目录中的所有字体文件
-            try:
-                all_files = [f for f in font_dir.iterdir() if f.is_file()]
-                font_files = [f for f in all_files if f.suffix.lower() in ('.ttf', '.otf', '.ttc')]
-                if font_files:
-                    font_path = font_files[0]
-                    print(f"使用系统中找到的第一个字体: {font_path}")
-                    
-                    # 尝试复制字体到应用程序字体目录
-                    try:
-                        app_fonts_dir = Path(get_data_path()) / "fonts"
-                        ensure_dir(str(app_fonts_dir))
-                        dest_path = app_fonts_dir / font_path.name
-                        if not dest_path.exists():
-                            import shutil
-                            shutil.copy2(str(font_path), str(dest_path))
-                            print(f"已将系统字体复制到应用程序目录: {dest_path}")
-                        return str(dest_path)
-                    except Exception as e:
-                        print(f"复制字体失败: {e}")
-                        return str(font_path)
-            except Exception as e:
-                print(f"列出系统字体目录时出错: {e}")
-    
-    print(f"找不到字体文件: {font_path}")
-    return None
+    # 通过字体注册表查找，结果会被缓存，字体目录变化时自动失效
+    from font_registry import find_font
+    return find_font(font_path)
 
 
 # TTS相关函数
-async def generate_tts_audio(text, voice, output_file):
+async def generate_tts_audio(text, voice, output_file, rate="+0%", pitch="+0Hz", word_timings=None):
     """
     使用Edge-TTS生成音频文件
     
@@ -727,6 +686,9 @@ async def generate_tts_audio(text, voice, output_file):
         text: 要转换为语音的文本
         voice: 语音名称（如zh-CN-XiaoxiaoNeural）
         output_file: 输出音频文件路径
+        rate: 语速调整（如 +10%）
+        pitch: 音调调整（如 +0Hz）
+        word_timings: 传入列表时收集合成过程中的逐词边界事件 [{'word', 'start', 'end'}]（秒）
         
     返回:
         bool: 是否成功生成音频
@@ -734,9 +696,19 @@ async def generate_tts_audio(text, voice, output_file):
     try:
         import edge_tts
         
-        # 使用Edge-TTS生成音频
-        communicate = edge_tts.Communicate(text, voice)
-        await communicate.save(output_file)
+        # 使用Edge-TTS生成音频，同时接收逐词边界事件（offset/duration单位为100纳秒）
+        communicate = edge_tts.Communicate(text, voice, rate=rate, pitch=pitch, boundary="WordBoundary")
+        with open(output_file, "wb") as f:
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    f.write(chunk["data"])
+                elif chunk["type"] == "WordBoundary" and word_timings is not None:
+                    start = chunk["offset"] / 1e7
+                    word_timings.append({
+                        'word': chunk["text"],
+                        'start': round(start, 3),
+                        'end': round(start + chunk["duration"] / 1e7, 3)
+                    })
         
         print(f"TTS音频已生成: {output_file}")
         return True
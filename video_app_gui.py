@@ -11,7 +11,6 @@ import json
 import subprocess  # 添加subprocess导入
 from pathlib import Path
 import random
-import configparser
 import pandas as pd
 
 # 将所有PyQt5导入放在一个try块中
@@ -34,7 +33,8 @@ except ImportError as e:
 try:
     # 导入处理函数
     from video_core import process_video
-    from utils import load_style_config, get_data_path
+    from utils import get_data_path
+    from style_registry import get_style_registry, reload_style_registry
     # 导入日志管理器
     from log_manager import init_logging, get_log_manager
     import logging
@@ -59,7 +59,8 @@ class ProcessingThread(QThread):
                  gif_scale=1.0, gif_rotation=0, gif_x=800, gif_y=100, scale_factor=1.1, image_path=None, quality_settings=None,
                  enable_tts=False, tts_voice="zh-CN-XiaoxiaoNeural", tts_volume=100, tts_text="", auto_match_duration=True,
                  enable_dynamic_subtitle=False, animation_style="highlight", animation_intensity=1.5, 
-                 highlight_color="#FFD700", match_mode="fixed"):  # 添加动态字幕参数
+                 highlight_color="#FFD700", match_mode="fixed",  # 添加动态字幕参数
+                 performance_settings=None):
         super().__init__()
         # 分别存储不同类型的文件
         self.short_videos = short_videos  # 小于9秒的视频
@@ -106,6 +107,8 @@ class ProcessingThread(QThread):
         self.tts_text = tts_text  # 用户输入的固定TTS文本
         self.auto_match_duration = auto_match_duration  # 添加自动匹配时长参数
         self.user_document_path = document_path  # 保存用户指定的文档路径
+        self.document_store = None  # 批次开始时加载的字幕文档
+        self.tts_document = None  # 批次开始时加载的配音文本（默认字幕配置）
         
         # 动态字幕相关参数
         self.enable_dynamic_subtitle = enable_dynamic_subtitle
@@ -114,6 +117,20 @@ class ProcessingThread(QThread):
         self.highlight_color = highlight_color
         self.match_mode = match_mode
         
+        # 性能相关参数
+        self.performance_settings = performance_settings or {}
+        self.single_pass = self.performance_settings.get('single_pass', False)  # 单次渲染模式
+        self.max_workers = self.performance_settings.get('max_workers', 1)  # 并行任务数
+        self.ffmpeg_threads = self.performance_settings.get('ffmpeg_threads', 0)  # 每任务FFmpeg线程数，0为自动
+        self.preprocess_cache = self.performance_settings.get('preprocess_cache', True)  # 是否使用预处理缓存
+        self.preprocess_cache_size = self.performance_settings.get('preprocess_cache_size', 10)  # 预处理缓存上限（GB）
+        self.tts_concurrency = self.performance_settings.get('tts_concurrency', 4)  # 配音预取并发数
+        self.pipeline_depth = self.performance_settings.get('pipeline_depth', 1)  # 等待精处理的预处理结果上限
+        self.intermediate_profile = self.performance_settings.get('intermediate_profile', 'h264')  # 中间文件编码档位
+        self.streaming = self.performance_settings.get('streaming', False)  # 流式管道模式
+        self.timeline_split = self.performance_settings.get('timeline_split', True)  # 分时段渲染
+        self.tts_prefetcher = None  # 批量配音预取器
+        
         # 构建按文件名升序排列的文件列表（包括文件和文件夹）
         all_files = []
         # 添加文件夹
@@ -130,28 +147,355 @@ class ProcessingThread(QThread):
         self.sorted_file_list = sorted(all_files, key=lambda x: Path(x[1]).name)
         print(f"排序后的文件列表: {self.sorted_file_list}")
     
-    def run(self):
+    def _build_process_kwargs(self):
+        """构建传递给process_video的公共参数（并行模式下传递到工作进程，需可序列化）"""
+        music_mode_value = self.music_mode.currentData() if hasattr(self.music_mode, 'currentData') else self.music_mode
+        music_path_value = self.music_path.text() if hasattr(self.music_path, 'text') else self.music_path
+        return {
+            'style': self.style,
+            'subtitle_lang': self.subtitle_lang,
+            'quicktime_compatible': self.quicktime_compatible,
+            'img_position_x': self.img_position_x,
+            'img_position_y': self.img_position_y,
+            'font_size': self.font_size,
+            'subtitle_x': self.subtitle_x,
+            'subtitle_y': self.subtitle_y,
+            'bg_width': self.bg_width,
+            'bg_height': self.bg_height,
+            'img_size': self.img_size,
+            'subtitle_text_x': self.subtitle_text_x,
+            'subtitle_text_y': self.subtitle_text_y,
+            'random_position': self.random_position,
+            'enable_subtitle': self.enable_subtitle,
+            'enable_background': self.enable_background,
+            'enable_image': self.enable_image,
+            'enable_music': self.enable_music,
+            'music_path': music_path_value,
+            'music_mode': music_mode_value,
+            'music_volume': self.music_volume,
+            'document_path': self.user_document_path,
+            'document_store': self.document_store,
+            'enable_gif': self.enable_gif,
+            'gif_path': self.gif_path,
+            'gif_loop_count': self.gif_loop_count,
+            'gif_scale': self.gif_scale,
+            'gif_rotation': self.gif_rotation,
+            'gif_x': self.gif_x,
+            'gif_y': self.gif_y,
+            'scale_factor': self.scale_factor,
+            'image_path': self.image_path,
+            'subtitle_width': self.subtitle_width,
+            'quality_settings': self.quality_settings,
+            'enable_tts': self.enable_tts,
+            'tts_voice': self.tts_voice,
+            'tts_volume': self.tts_volume,
+            'auto_match_duration': self.auto_match_duration,
+            'single_pass': self.single_pass
+        }
+    
+    def _load_documents(self):
+        """加载本批次使用的字幕文档和配音文本"""
+        from document_store import load_document_store
+        try:
+            self.document_store = load_document_store(self.user_document_path)
+        except Exception as exc:
+            print(f"加载字幕文档失败: {exc}")
+            self.document_store = None
+        
+        self.tts_document = None
+        if self.enable_tts and not self.tts_text:
+            try:
+                self.tts_document = load_document_store()
+            except Exception as exc:
+                print(f"加载字幕配置失败: {exc}")
+    
+    def _get_tts_text(self, video_index):
+        """获取视频对应的配音文本（用户输入了固定文本时直接使用固定文本）"""
+        if self.tts_text or self.tts_document is None:
+            return self.tts_text
+        return self.tts_document.tts_text(self.subtitle_lang, video_index) or ""
+    
+    def _start_tts_prefetch(self):
+        """收集所有视频的配音文本，启动批量预取"""
+        self.tts_prefetcher = None
+        if not self.enable_tts:
+            return
+        texts = {}
+        for index in range(len(self.sorted_file_list)):
+            text = self._get_tts_text(index)
+            if text:
+                texts[index] = text
+        if not texts:
+            return
+        try:
+            from tts_prefetch import TTSPrefetcher
+            self.tts_prefetcher = TTSPrefetcher(texts, self.tts_voice, max_concurrency=self.tts_concurrency).start()
+        except Exception as exc:
+            print(f"启动配音预取失败: {exc}")
+            self.tts_prefetcher = None
+    
+    def _stop_tts_prefetch(self):
+        """停止配音预取并清理预取目录"""
+        if self.tts_prefetcher is not None:
+            self.tts_prefetcher.close()
+            self.tts_prefetcher = None
+    
+    def _get_tts_audio_file(self, video_index):
+        """获取视频对应的预取配音路径"""
+        if self.tts_prefetcher is None:
+            return None
+        return self.tts_prefetcher.audio_path(video_index)
+    
+    def _build_jobs(self):
+        """按排序后的文件列表构建任务（见batch_scheduler.run_batch_job），索引同时作为video_index"""
+        short_video_set = set(self.short_videos)
+        base_kwargs = self._build_process_kwargs()
+        jobs = []
+        for index, (file_type, file_path) in enumerate(self.sorted_file_list):
+            if file_type == 'folder':
+                kind = 'folder'
+                output_name = f"{Path(file_path).name}_processed.mp4"
+            else:
+                kind = 'short' if file_path in short_video_set else 'long'
+                output_name = f"{Path(file_path).stem}_processed.mp4"
+            
+            # 为每个视频准备TTS文本（使用排序后的索引）
+            current_tts_text = self._get_tts_text(index)
+            
+            process_kwargs = dict(base_kwargs)
+            process_kwargs['tts_text'] = current_tts_text
+            process_kwargs['tts_audio_file'] = self._get_tts_audio_file(index)
+            jobs.append({
+                'index': index,
+                'kind': kind,
+                'path': file_path,
+                'output_path': str(Path(self.output_dir) / output_name),
+                'process_kwargs': process_kwargs
+            })
+        return jobs
+    
+    def _run_parallel(self):
+        """并行处理模式：使用进程池同时处理多个视频，结果按排序索引依次提交"""
         import time
-        import tempfile
-        from pathlib import Path
-        from video_core import process_video, process_folder_videos, preprocess_video_by_type, preprocess_video_without_reverse
+        from batch_scheduler import run_parallel_batch
+        from utils import format_encode_stats
         
         start_time = time.time()
+        total_files = len(self.sorted_file_list)
+        success_count = 0
+        failed_items = []
+        completed_count = 0
         
-        # 初始化变量，确保在所有代码路径中都定义
-        total_files = 0
+        try:
+            logging.info(f"🚀 开始并行批量处理，总计: {total_files} 个项目，并行数: {self.max_workers}")
+            
+            jobs = self._build_jobs()
+            
+            def on_progress(index, stage, percent):
+                current_progress = (completed_count / total_files) * 100 if total_files > 0 else 0
+                self.progress_updated.emit(int(current_progress),
+                                           f"处理视频 {index+1}/{total_files}: {stage} ({percent:.0f}%)")
+                self.processing_stage_updated.emit(f"[{index+1}/{total_files}] {stage}", percent)
+            
+            def on_result(result):
+                nonlocal success_count, completed_count
+                completed_count += 1
+                icon = "📁" if result['kind'] == 'folder' else "🎥"
+                if result['success']:
+                    success_count += 1
+                    logging.info(f"✅ 视频处理成功: {result['name']} (耗时: {result['elapsed']:.1f}秒)")
+                    encode_text = format_encode_stats(result.get('encode'))
+                    if encode_text:
+                        logging.info(f"📈 {result['name']} {encode_text}")
+                    message = f"已完成: {completed_count}/{total_files} - {result['name']} (耗时: {result['elapsed']:.1f}秒)"
+                else:
+                    failed_items.append(f"{icon} {result['name']}")
+                    logging.error(f"❌ 视频处理失败: {result['name']} - {result['error']}")
+                    message = f"视频处理失败: {completed_count}/{total_files} - {result['name']}"
+                self.progress_updated.emit(int((completed_count / total_files) * 100), message)
+            
+            run_parallel_batch(
+                jobs,
+                self.max_workers,
+                ffmpeg_threads=self.ffmpeg_threads or None,
+                on_progress=on_progress,
+                on_result=on_result,
+                should_stop=self.isInterruptionRequested,
+                preprocess_cache={'enabled': self.preprocess_cache,
+                                  'max_size_mb': self.preprocess_cache_size * 1024},
+                intermediate_profile=self.intermediate_profile,
+                streaming=self.streaming,
+                timeline_split=self.timeline_split
+            )
+            
+            total_duration = time.time() - start_time
+            stats = {
+                'total_videos': total_files,
+                'success_count': success_count,
+                'failed_count': len(failed_items),
+                'failed_videos': [item.split(' ', 1)[1] if ' ' in item else item for item in failed_items],
+                'total_time': total_duration,
+                'avg_time': total_duration / total_files if total_files > 0 else 0,
+                'output_dir': str(self.output_dir)
+            }
+            self.processing_complete.emit(True, stats)
+            logging.info(f"🏁 并行批量处理完成！成功: {success_count}/{total_files} 个，耗时: {total_duration:.1f}秒")
+        except Exception as exc:
+            logging.error(f"并行处理过程中发生异常: {str(exc)}")
+            import traceback
+            traceback.print_exc()
+            stats = {
+                'total_videos': total_files,
+                'success_count': success_count,
+                'failed_count': len(failed_items),
+                'failed_videos': [item.split(' ', 1)[1] if ' ' in item else item for item in failed_items],
+                'total_time': 0,
+                'avg_time': 0,
+                'output_dir': str(self.output_dir),
+                'error': str(exc)
+            }
+            self.processing_complete.emit(False, stats)
+    
+    def run(self):
+        # 字幕文档和配音文本在批次开始时只加载一次，每个视频按索引直接取值
+        self._load_documents()
+        
+        # 配音在后台并发预取，与视频预处理同时进行
+        self._start_tts_prefetch()
+        try:
+            # 并行模式：多个任务同时处理
+            if self.max_workers > 1 and len(self.sorted_file_list) > 1:
+                self._run_parallel()
+            else:
+                self._run_pipeline()
+        finally:
+            self._stop_tts_prefetch()
+    
+    def _run_pipeline(self):
+        """
+        串行处理模式（流水线）：每个视频依次经过 预处理 → 素材准备 → 最终编码（含配音混合），
+        预处理和精处理由有界队列连接的独立线程执行，第N+1个视频的预处理和素材准备与第N个视频的编码重叠；
+        最终编码同一时刻只有一个（渲染槽），等待精处理的预处理结果最多 pipeline_depth 个，
+        每个视频完成后立即删除其中间文件
+        """
+        import time
+        import shutil
+        from batch_scheduler import preprocess_job, job_stream_kind
+        from pipeline_executor import StagePipeline, Stage, RenderSlot
+        from video_core import process_video
+        from utils import get_video_info, pop_encode_stats, format_encode_stats
+        
+        # 串行模式下同样应用每任务FFmpeg线程数设置（0表示不限制）
+        from utils import set_ffmpeg_threads
+        set_ffmpeg_threads(self.ffmpeg_threads)
+        
+        # 应用预处理缓存设置
+        from preprocess_cache import set_preprocess_cache
+        set_preprocess_cache(self.preprocess_cache, self.preprocess_cache_size * 1024)
+        
+        # 应用中间文件编码档位
+        from intermediate_codec import set_intermediate_profile, make_intermediate_temp_dir
+        set_intermediate_profile(self.intermediate_profile)
+        
+        # 应用流式管道模式
+        from stream_pipeline import set_streaming
+        set_streaming(self.streaming)
+        
+        # 应用分时段渲染
+        from static_plate import set_timeline_split
+        set_timeline_split(self.timeline_split)
+        
+        start_time = time.time()
+        total_files = len(self.sorted_file_list)
         success_count = 0
         failed_items = []
-        preprocessed_videos = []  # 在方法开始处初始化，确保在所有代码路径中都定义
-        total_duration = 0  # 初始化变量
-        avg_duration = 0    # 初始化变量
-        e = None            # 初始化变量
-        stats = {}          # 初始化变量
+        completed_count = 0
+        icons = {'folder': "📁", 'short': "⏱️", 'long': "🎬"}
+        kind_names = {'folder': "文件夹", 'short': "短视频", 'long': "长视频"}
+        render_slot = RenderSlot(1)
+        
+        def preprocess(task):
+            name = Path(task['path']).name
+            task['start_time'] = time.time()
+            logging.info(f"{icons[task['kind']]} 开始预处理{kind_names[task['kind']]} {task['index']+1}/{total_files}: {name}")
+            self.progress_updated.emit(int((completed_count / total_files) * 100),
+                                       f"预处理{kind_names[task['kind']]} {task['index']+1}/{total_files}: {name}")
+            
+            task['temp_dir'] = make_intermediate_temp_dir()
+            preprocessed_path, single_pass = preprocess_job(task, task['temp_dir'])
+            if not preprocessed_path:
+                logging.error(f"❌ {kind_names[task['kind']]}预处理失败: {name}")
+                return None
+            
+            # 流式管道模式下预处理与精处理同时进行，这里不产生中间文件
+            task['stream_kind'] = job_stream_kind(task)
+            if not single_pass and not task['stream_kind']:
+                preprocessed_info = get_video_info(preprocessed_path)
+                if preprocessed_info:
+                    width, height, duration = preprocessed_info
+                    print(f"预处理后视频信息: 时长: {duration:.2f}秒, 分辨率: {width}x{height}")
+            task['preprocessed_path'] = preprocessed_path
+            task['single_pass'] = single_pass
+            return task
+        
+        def compose(task):
+            index = task['index']
+            
+            # 定义内部回调函数来更新视频处理进度
+            def update_progress_callback(stage, progress_percent):
+                current_progress = (completed_count + progress_percent / 100.0) / total_files * 100
+                self.progress_updated.emit(int(current_progress),
+                                           f"处理视频 {index+1}/{total_files}: {stage} ({progress_percent:.0f}%)")
+                self.processing_stage_updated.emit(f"[{index+1}/{total_files}] {stage}", progress_percent)
+            
+            logging.info(f"开始处理视频 {index+1}/{total_files}: {Path(task['path']).name} (类型: {task['kind']})")
+            process_kwargs = dict(task['process_kwargs'])
+            process_kwargs['single_pass'] = task['single_pass']
+            process_kwargs['reverse_effect'] = task['single_pass'] and task['kind'] == 'short'
+            process_kwargs['stream_kind'] = task['stream_kind']
+            # 素材准备不占用渲染槽，只有最终编码需要等待上一个视频编码完成
+            pop_encode_stats()
+            result = process_video(
+                task['preprocessed_path'],
+                task['output_path'],
+                progress_callback=update_progress_callback,
+                video_index=index,  # 使用排序后的索引，确保文档数据和背景音乐按正确顺序匹配
+                render_slot=render_slot,
+                **process_kwargs
+            )
+            task['encode'] = pop_encode_stats()
+            if not result:
+                return None
+            task['result_path'] = str(result)
+            return task
+        
+        def cleanup(task):
+            # 视频离开流水线后立即删除其预处理中间文件
+            if task.get('temp_dir'):
+                shutil.rmtree(task['temp_dir'], ignore_errors=True)
+                print(f"已清理临时目录: {task['temp_dir']}")
+        
+        def on_result(task):
+            nonlocal success_count, completed_count
+            completed_count += 1
+            name = Path(task['path']).name
+            elapsed = time.time() - task.get('start_time', time.time())
+            if task['success']:
+                success_count += 1
+                logging.info(f"✅ 视频处理成功: {name} (耗时: {elapsed:.1f}秒)")
+                encode_text = format_encode_stats(task.get('encode'))
+                if encode_text:
+                    logging.info(f"📈 {name} {encode_text}")
+                message = f"已完成: {completed_count}/{total_files} - {name} (耗时: {elapsed:.1f}秒)"
+            else:
+                icon = icons[task['kind']] if task.get('failed_stage') == "预处理" else "🎥"
+                failed_items.append(f"{icon} {name}")
+                logging.error(f"❌ 视频处理失败: {name} - {task.get('error')}")
+                message = f"视频处理失败: {completed_count}/{total_files} - {name}"
+            self.progress_updated.emit(int((completed_count / total_files) * 100), message)
         
         try:
-            # 获取日志管理器并记录开始信息
             log_manager = get_log_manager()
-            total_files = len(self.short_videos) + len(self.long_videos) + len(self.folders)
             logging.info(f"🚀 开始批量处理，总计: {total_files} 个项目")
             logging.info(f"  - 短视频 (<9秒): {len(self.short_videos)} 个")
             logging.info(f"  - 长视频 (>=9秒): {len(self.long_videos)} 个")
@@ -161,384 +505,35 @@ class ProcessingThread(QThread):
             logging.info(f"📋 随机位置: {self.random_position}")
             logging.info(f"📋 TTS设置: enable={self.enable_tts}, voice={self.tts_voice}")
             
-            success_count = 0
-            failed_items = []
-            
-            # 第一阶段：预处理所有视频
-            print("开始预处理阶段...")
-            # preprocessed_videos已在方法开始处初始化
-            
-            # 1. 预处理文件夹中的视频
-            for i, folder_path in enumerate(self.folders):
-                try:
-                    logging.info(f"📁 开始预处理文件夹 {i+1}/{len(self.folders)}: {Path(folder_path).name}")
-                    self.progress_updated.emit(int((i / total_files) * 100), f"预处理文件夹 {i+1}/{len(self.folders)}: {Path(folder_path).name}")
-                    
-                    # 创建用于文件夹处理的临时目录
-                    folder_temp_dir = Path(tempfile.mkdtemp())
-                    print(f"创建文件夹处理临时目录: {folder_temp_dir}")
-                    
-                    # 处理文件夹中的视频，拼接成一个视频
-                    merged_video_path = process_folder_videos(folder_path, folder_temp_dir)
-                    
-                    if merged_video_path and Path(merged_video_path).exists():
-                        print(f"文件夹视频预处理完成: {merged_video_path}")
-                        # 获取预处理后视频的信息
-                        from utils import get_video_info
-                        merged_info = get_video_info(merged_video_path)
-                        if merged_info:
-                            width, height, duration = merged_info
-                            print(f"预处理后视频信息: 时长: {duration:.2f}秒, 分辨率: {width}x{height}")
-                        
-                        # 将预处理后的视频添加到列表中
-                        preprocessed_videos.append({
-                            'type': 'folder',
-                            'original_path': folder_path,
-                            'preprocessed_path': merged_video_path,
-                            'output_name': f"{Path(folder_path).name}_processed.mp4"
-                        })
-                    else:
-                        failed_items.append(f"📁 {Path(folder_path).name}")
-                        logging.error(f"❌ 文件夹视频拼接失败: {Path(folder_path).name}")
-                        print(f"❌ 文件夹视频拼接失败: {Path(folder_path).name}")
-                except Exception as folder_error:
-                    failed_items.append(f"📁 {Path(folder_path).name}")
-                    logging.error(f"❌ 文件夹预处理异常: {Path(folder_path).name} - {str(folder_error)}")
-                    print(f"❌ 文件夹预处理异常: {Path(folder_path).name} - {str(folder_error)}")
-            
-            # 2. 预处理短视频 (< 9秒)
-            for i, video_path in enumerate(self.short_videos):
-                try:
-                    logging.info(f"⏱️ 开始预处理短视频 {i+1}/{len(self.short_videos)}: {Path(video_path).name}")
-                    current_index = len(self.folders) + i
-                    self.progress_updated.emit(int((current_index / total_files) * 100), f"预处理短视频 {i+1}/{len(self.short_videos)}: {Path(video_path).name}")
-                    
-                    # 对短视频进行预处理（水印处理+正放倒放）
-                    import tempfile
-                    temp_dir = Path(tempfile.mkdtemp())
-                    preprocessed_path = None
-                    try:
-                        preprocessed_path = preprocess_video_by_type(video_path, temp_dir)
-                        
-                        if preprocessed_path and Path(preprocessed_path).exists():
-                            print(f"短视频预处理完成: {preprocessed_path}")
-                            # 获取预处理后视频的信息
-                            from utils import get_video_info
-                            preprocessed_info = get_video_info(preprocessed_path)
-                            if preprocessed_info:
-                                width, height, duration = preprocessed_info
-                                print(f"预处理后视频信息: 时长: {duration:.2f}秒, 分辨率: {width}x{height}")
-                            
-                            # 将预处理后的视频添加到列表中，同时保存临时目录路径
-                            preprocessed_videos.append({
-                                'type': 'short',
-                                'original_path': video_path,
-                                'preprocessed_path': preprocessed_path,
-                                'temp_dir': str(temp_dir),  # 保存临时目录路径
-                                'output_name': f"{Path(video_path).stem}_processed.mp4"
-                            })
-                        else:
-                            failed_items.append(f"⏱️ {Path(video_path).name}")
-                            logging.error(f"❌ 短视频预处理失败: {Path(video_path).name}")
-                            print(f"❌ 短视频预处理失败: {Path(video_path).name}")
-                            # 预处理失败时清理临时目录
-                            try:
-                                import shutil
-                                shutil.rmtree(temp_dir)
-                            except:
-                                pass
-                    except Exception as video_error:
-                        failed_items.append(f"⏱️ {Path(video_path).name}")
-                        logging.error(f"❌ 短视频预处理异常: {Path(video_path).name} - {str(video_error)}")
-                        print(f"❌ 短视频预处理异常: {Path(video_path).name} - {str(video_error)}")
-                        # 异常时清理临时目录
-                        try:
-                            import shutil
-                            shutil.rmtree(temp_dir)
-                        except:
-                            pass
-                except Exception as short_video_error:
-                    failed_items.append(f"⏱️ {Path(video_path).name}")
-                    logging.error(f"❌ 短视频预处理异常: {Path(video_path).name} - {str(short_video_error)}")
-                    print(f"❌ 短视频预处理异常: {Path(video_path).name} - {str(short_video_error)}")
-            
-            # 3. 预处理长视频 (>= 9秒)
-            for i, video_path in enumerate(self.long_videos):
-                try:
-                    logging.info(f"🎬 开始预处理长视频 {i+1}/{len(self.long_videos)}: {Path(video_path).name}")
-                    current_index = len(self.folders) + len(self.short_videos) + i
-                    self.progress_updated.emit(int((current_index / total_files) * 100), f"预处理长视频 {i+1}/{len(self.long_videos)}: {Path(video_path).name}")
-                    
-                    # 对长视频进行预处理（仅水印处理，不进行正放倒放）
-                    import tempfile
-                    temp_dir = Path(tempfile.mkdtemp())
-                    preprocessed_path = None
-                    try:
-                        preprocessed_path = preprocess_video_without_reverse(video_path, temp_dir)
-                        
-                        if preprocessed_path and Path(preprocessed_path).exists():
-                            print(f"长视频预处理完成: {preprocessed_path}")
-                            # 获取预处理后视频的信息
-                            from utils import get_video_info
-                            preprocessed_info = get_video_info(preprocessed_path)
-                            if preprocessed_info:
-                                width, height, duration = preprocessed_info
-                                print(f"预处理后视频信息: 时长: {duration:.2f}秒, 分辨率: {width}x{height}")
-                            
-                            # 将预处理后的视频添加到列表中，同时保存临时目录路径
-                            preprocessed_videos.append({
-                                'type': 'long',
-                                'original_path': video_path,
-                                'preprocessed_path': preprocessed_path,
-                                'temp_dir': str(temp_dir),  # 保存临时目录路径
-                                'output_name': f"{Path(video_path).stem}_processed.mp4"
-                            })
-                        else:
-                            failed_items.append(f"🎬 {Path(video_path).name}")
-                            logging.error(f"❌ 长视频预处理失败: {Path(video_path).name}")
-                            print(f"❌ 长视频预处理失败: {Path(video_path).name}")
-                            # 预处理失败时清理临时目录
-                            try:
-                                import shutil
-                                shutil.rmtree(temp_dir)
-                            except:
-                                pass
-                    except Exception as preprocess_error:
-                        failed_items.append(f"🎬 {Path(video_path).name}")
-                        logging.error(f"❌ 长视频预处理异常: {Path(video_path).name} - {str(preprocess_error)}")
-                        print(f"❌ 长视频预处理异常: {Path(video_path).name} - {str(preprocess_error)}")
-                        # 异常时清理临时目录
-                        try:
-                            import shutil
-                            shutil.rmtree(temp_dir)
-                        except:
-                            pass
-                except Exception as long_video_error:
-                    failed_items.append(f"🎬 {Path(video_path).name}")
-                    logging.error(f"❌ 长视频预处理异常: {Path(video_path).name} - {str(long_video_error)}")
-                    print(f"❌ 长视频预处理异常: {Path(video_path).name} - {str(long_video_error)}")
-            
-            # 第二阶段：统一处理所有预处理后的视频
-            print(f"预处理阶段完成，共预处理 {len(preprocessed_videos)} 个视频，开始统一处理阶段...")
-            total_preprocessed = len(preprocessed_videos)
-            
-            # 创建预处理视频到排序列表的映射
-            # 将预处理后的视频索引映射到排序后的索引
-            preprocessed_to_sorted_map = {}
-            for j, preprocessed_video in enumerate(preprocessed_videos):
-                for i, (file_type, file_path) in enumerate(self.sorted_file_list):
-                    if preprocessed_video['original_path'] == file_path:
-                        preprocessed_to_sorted_map[j] = i
-                        break
-            
-            print(f"预处理视频到排序列表映射: {preprocessed_to_sorted_map}")
-            
-            # 统一处理所有预处理后的视频，使用简单的索引进行背景音乐匹配
-            for i, video_info in enumerate(preprocessed_videos):
-                item_start_time = time.time()
-                
-                # 计算进度
-                current_index = i
-                total_items = total_preprocessed + len(failed_items)  # 包含失败项
-                base_progress = (current_index / total_items) * 100 if total_items > 0 else 0
-                
-                video_type = video_info['type']
-                original_path = video_info['original_path']
-                preprocessed_path = video_info['preprocessed_path']
-                output_name = video_info['output_name']
-                
-                self.progress_updated.emit(
-                    int(base_progress), 
-                    f"处理视频 {i+1}/{total_preprocessed}: {Path(original_path).name}"
-                )
-                
-                # 发送处理阶段信息
-                self.processing_stage_updated.emit(f"开始处理视频 {i+1}/{total_preprocessed}", 0.0)
-                
-                logging.info(f"开始处理视频 {i+1}/{total_preprocessed}: {Path(original_path).name} (类型: {video_type})")
-                
-                try:
-                    with log_manager.capture_output():
-                        # 对预处理后的视频进行精处理（添加字幕、图片等）
-                        output_path = Path(self.output_dir) / output_name
-                        print(f"准备对预处理后的视频进行精处理...")
-                        print(f"输出路径: {output_path}")
-                        
-                        # 定义内部回调函数来更新视频处理进度
-                        def update_progress_callback(stage, progress_percent):
-                            # 计算当前项目的进度占总进度的比例
-                            current_item_progress = base_progress + (progress_percent / 100.0) * (100.0 / total_items)
-                            self.progress_updated.emit(int(current_item_progress), 
-                                                      f"处理视频 {i+1}/{total_preprocessed}: {stage} ({progress_percent:.0f}%)")
-                            # 发送处理阶段信息
-                            self.processing_stage_updated.emit(stage, progress_percent)
-                        
-                        # 如果启用了TTS且用户没有输入固定文本，则为每个视频获取对应的TTS文本
-                        current_tts_text = self.tts_text  # 默认使用用户输入的固定文本
-                        print(f"视频处理TTS设置: enable={self.enable_tts}, fixed_text='{self.tts_text}'")
-                        if self.enable_tts and not self.tts_text:
-                            # 为每个视频获取对应的TTS文本，使用排序后的索引
-                            sorted_index = preprocessed_to_sorted_map.get(i, i)
-                            print(f"使用排序索引获取TTS文本: 预处理索引={i}, 排序索引={sorted_index}")
-                            
-                            try:
-                                from video_helpers import get_tts_text_for_video
-                                from utils import load_subtitle_config
-                                subtitle_df = load_subtitle_config()
-                                if subtitle_df is not None and not subtitle_df.empty:
-                                    # 使用排序后的索引获取对应的TTS文本
-                                    current_tts_text = get_tts_text_for_video(subtitle_df, self.subtitle_lang, sorted_index)
-                                    print(f"为视频 {i+1} (排序索引 {sorted_index}) 获取TTS文本: {current_tts_text}")
-                                else:
-                                    print("无法加载字幕配置，使用空TTS文本")
-                                    current_tts_text = ""
-                            except Exception as exc:
-                                print(f"获取TTS文本时出错: {exc}")
-                                current_tts_text = ""
-                        else:
-                            current_tts_text = self.tts_text  # 确保变量已定义
-                            print(f"使用用户输入的固定TTS文本: {current_tts_text}")
-                        
-                        # 对预处理后的视频进行精处理
-                        # 获取音乐模式的实际值
-                        music_mode_value = self.music_mode.currentData() if hasattr(self.music_mode, 'currentData') else self.music_mode
-                        music_path_value = self.music_path.text() if hasattr(self.music_path, 'text') else self.music_path
-                        # 使用排序后的索引作为视频索引
-                        sorted_index = preprocessed_to_sorted_map.get(i, i)
-                        print(f"调用process_video进行精处理，预处理索引: {i}, 排序索引: {sorted_index}")
-                        print(f"音乐参数: enable_music={self.enable_music}, music_path={music_path_value}, music_mode={music_mode_value}, music_volume={self.music_volume}")
-                        result = process_video(
-                            preprocessed_path, 
-                            str(output_path),
-                            self.style, 
-                            self.subtitle_lang, 
-                            self.quicktime_compatible,
-                            self.img_position_x, 
-                            self.img_position_y,
-                            self.font_size,
-                            self.subtitle_x,
-                            self.subtitle_y,
-                            self.bg_width,
-                            self.bg_height,
-                            self.img_size,
-                            self.subtitle_text_x,
-                            self.subtitle_text_y,
-                            self.random_position,
-                            self.enable_subtitle,
-                            self.enable_background,
-                            self.enable_image,
-                            self.enable_music,
-                            music_path_value,
-                            music_mode_value,
-                            self.music_volume,
-                            self.user_document_path,
-                            self.enable_gif,
-                            self.gif_path,
-                            self.gif_loop_count,
-                            self.gif_scale,
-                            self.gif_rotation,
-                            self.gif_x,
-                            self.gif_y,
-                            self.scale_factor,
-                            self.image_path,
-                            self.subtitle_width,
-                            quality_settings=self.quality_settings,
-                            progress_callback=update_progress_callback,
-                            video_index=sorted_index,  # 传递排序后的索引，确保文档数据按正确顺序匹配
-                            enable_tts=self.enable_tts,
-                            tts_voice=self.tts_voice,
-                            tts_volume=self.tts_volume,
-                            tts_text=current_tts_text,
-                            auto_match_duration=self.auto_match_duration  # 添加自动匹配时长参数
-                        )
-                        
-                        item_end_time = time.time()
-                        item_duration = item_end_time - item_start_time
-                        print(f"视频精处理完成，耗时: {item_duration:.2f}秒")
-                        video_name = Path(original_path).name
-                        if result:
-                            success_count += 1
-                            logging.info(f"✅ 视频处理成功: {video_name} (耗时: {item_duration:.1f}秒)")
-                            print(f"✅ 视频处理成功: {video_name} (耗时: {item_duration:.1f}秒)")
-                            
-                            # 更新整体进度
-                            current_progress = int(((current_index + 1) / total_items) * 100)
-                            self.progress_updated.emit(
-                                current_progress,
-                                f"已完成: {i+1}/{total_preprocessed} - {video_name} (耗时: {item_duration:.1f}秒)"
-                            )
-                        else:
-                            failed_items.append(f"🎥 {video_name}")
-                            logging.error(f"❌ 视频处理失败: {video_name}")
-                            print(f"❌ 视频处理失败: {video_name}")
-                            
-                            # 即使失败也更新进度
-                            current_progress = int(((current_index + 1) / total_items) * 100)
-                            self.progress_updated.emit(
-                                current_progress,
-                                f"视频处理失败: {i+1}/{total_preprocessed} - {video_name}"
-                            )
-                        
-                        # 无论成功还是失败，都清理临时目录
-                        if 'temp_dir' in video_info:
-                            try:
-                                import shutil
-                                shutil.rmtree(video_info['temp_dir'])
-                                print(f"已清理临时目录: {video_info['temp_dir']}")
-                            except Exception as exc:
-                                print(f"清理临时目录失败: {exc}")
-                except Exception as video_error:
-                    video_name = Path(original_path).name
-                    failed_items.append(f"🎥 {video_name}")
-                    logging.error(f"❌ 视频处理异常: {video_name} - {str(video_error)}")
-                    print(f"❌ 视频处理异常: {video_name} - {str(video_error)}")
-                    
-                    # 即使异常也更新进度
-                    current_progress = int(((current_index + 1) / total_items) * 100)
-                    self.progress_updated.emit(
-                        current_progress,
-                        f"视频处理异常: {i+1}/{total_preprocessed} - {video_name}"
-                    )
-                    
-                    # 异常时也清理临时目录
-                    if 'temp_dir' in video_info:
-                        try:
-                            import shutil
-                            shutil.rmtree(video_info['temp_dir'])
-                            print(f"已清理临时目录: {video_info['temp_dir']}")
-                        except Exception as exc:
-                            print(f"清理临时目录失败: {exc}")
-            
-            # 所有处理完成
-            end_time = time.time()
-            total_duration = end_time - start_time
-            avg_duration = total_duration / total_files if total_files > 0 else 0
+            pipeline = StagePipeline(
+                [Stage("预处理", preprocess, 1),
+                 # 两个精处理线程：一个编码时另一个准备下一个视频的素材
+                 Stage("精处理", compose, 2)],
+                queue_size=self.pipeline_depth,
+                on_result=on_result,
+                cleanup=cleanup,
+                should_stop=self.isInterruptionRequested
+            )
+            with log_manager.capture_output():
+                pipeline.run(self._build_jobs())
+            print(f"【流水线】最终编码等待时间: {render_slot.wait_time:.1f}秒")
             
-            # 准备统计信息
+            total_duration = time.time() - start_time
             stats = {
                 'total_videos': total_files,
                 'success_count': success_count,
                 'failed_count': len(failed_items),
                 'failed_videos': [item.split(' ', 1)[1] if ' ' in item else item for item in failed_items],
                 'total_time': total_duration,
-                'avg_time': avg_duration,
+                'avg_time': total_duration / total_files if total_files > 0 else 0,
                 'output_dir': str(self.output_dir)
             }
-            
-            # 发送完成信号
             self.processing_complete.emit(True, stats)
-            
-            # 记录完成日志
             logging.info(f"🏁 批量处理完成！成功: {success_count}/{total_files} 个，耗时: {total_duration:.1f}秒")
-
         except Exception as exc:
-            # 处理异常情况
-            e = exc  # 保存异常到变量
-            logging.error(f"处理过程中发生异常: {str(e)}")
+            logging.error(f"处理过程中发生异常: {str(exc)}")
             import traceback
             traceback.print_exc()
-            
-            # 准备错误统计信息
             stats = {
                 'total_videos': total_files,
                 'success_count': success_count,
@@ -547,22 +542,9 @@ class ProcessingThread(QThread):
                 'total_time': 0,
                 'avg_time': 0,
                 'output_dir': str(self.output_dir),
-                'error': str(e)
+                'error': str(exc)
             }
-            
-            # 发送完成信号
             self.processing_complete.emit(False, stats)
-            
-        finally:
-            # 无论成功还是失败，都清理所有临时目录
-            for video_info in preprocessed_videos:
-                if 'temp_dir' in video_info:
-                    try:
-                        import shutil
-                        shutil.rmtree(video_info['temp_dir'])
-                        print(f"已清理临时目录: {video_info['temp_dir']}")
-                    except Exception as exc:
-                        print(f"清理临时目录失败: {exc}")
 
 class VideoProcessorApp(QMainWindow):
     """视频处理应用主窗口"""
@@ -841,7 +823,7 @@ class VideoProcessorApp(QMainWindow):
         logging.info(f"🖥️  运行平台: {sys.platform}")
         
         # 加载配置和样式
-        self.style_config = load_style_config()  # type: ignore
+        get_style_registry()
         self.settings = QSettings("VideoApp", "VideoProcessor")
         
         # 设置默认输出目录为代码所在目录下的output文件夹
@@ -1815,6 +1797,113 @@ class VideoProcessorApp(QMainWindow):
         
         quality_group.setLayout(quality_layout)
         
+        # 性能设置组
+        performance_group = QGroupBox("性能设置")
+        performance_layout = QGridLayout()
+        performance_layout.setSpacing(3)
+        performance_layout.setContentsMargins(5, 5, 5, 5)
+        
+        # 单次渲染模式
+        self.single_pass_check = QCheckBox("单次渲染模式")
+        self.single_pass_check.setChecked(False)
+        self.single_pass_check.setToolTip("去水印缩放裁剪、正放倒放、素材叠加、背景音乐和配音混合在一次FFmpeg编码中完成，"
+                                          "不再生成预处理中间文件，失败时自动回退到分步处理")
+        
+        performance_layout.addWidget(self.single_pass_check, 0, 0)
+        
+        # 配音预取并发数
+        self.tts_concurrency_spin = QSpinBox()
+        self.tts_concurrency_spin.setRange(1, 16)
+        self.tts_concurrency_spin.setValue(4)
+        self.tts_concurrency_spin.setToolTip("批次开始时同时合成的配音数量，配音在后台预取，与视频预处理同时进行")
+        
+        performance_layout.addWidget(QLabel("配音并发数:"), 0, 2)
+        performance_layout.addWidget(self.tts_concurrency_spin, 0, 3)
+        
+        # 并行任务数
+        from batch_scheduler import get_cpu_count
+        cpu_count = get_cpu_count()
+        self.max_workers_spin = QSpinBox()
+        self.max_workers_spin.setRange(1, max(1, cpu_count))
+        self.max_workers_spin.setValue(1)
+        self.max_workers_spin.setToolTip(f"同时处理的视频数量，1表示串行处理（本机CPU核数: {cpu_count}）")
+        
+        performance_layout.addWidget(QLabel("并行任务数:"), 1, 0)
+        performance_layout.addWidget(self.max_workers_spin, 1, 1)
+        
+        # 每个任务的FFmpeg线程数
+        self.ffmpeg_threads_spin = QSpinBox()
+        self.ffmpeg_threads_spin.setRange(0, max(1, cpu_count))
+        self.ffmpeg_threads_spin.setValue(0)
+        self.ffmpeg_threads_spin.setSpecialValueText("自动")
+        self.ffmpeg_threads_spin.setToolTip("每个并行任务中FFmpeg可使用的线程数，自动表示按CPU核数平均分配")
+        
+        performance_layout.addWidget(QLabel("每任务线程数:"), 1, 2)
+        performance_layout.addWidget(self.ffmpeg_threads_spin, 1, 3)
+        
+        # 预处理缓存
+        self.preprocess_cache_check = QCheckBox("预处理缓存")
+        self.preprocess_cache_check.setChecked(True)
+        self.preprocess_cache_check.setToolTip("缓存去水印和正放倒放的预处理结果，重复处理同一批素材时直接复用；"
+                                               "取消勾选则每次重新预处理")
+        
+        self.preprocess_cache_size_spin = QSpinBox()
+        self.preprocess_cache_size_spin.setRange(1, 500)
+        self.preprocess_cache_size_spin.setValue(10)
+        self.preprocess_cache_size_spin.setSuffix(" GB")
+        self.preprocess_cache_size_spin.setToolTip("预处理缓存的总大小上限，超出后删除最久未使用的缓存")
+        
+        clear_cache_btn = QPushButton("清空缓存")
+        clear_cache_btn.clicked.connect(self.clear_preprocess_cache)
+        
+        performance_layout.addWidget(self.preprocess_cache_check, 2, 0)
+        performance_layout.addWidget(QLabel("缓存上限:"), 2, 1)
+        performance_layout.addWidget(self.preprocess_cache_size_spin, 2, 2)
+        performance_layout.addWidget(clear_cache_btn, 2, 3)
+        
+        # 流水线深度（串行模式）
+        self.pipeline_depth_spin = QSpinBox()
+        self.pipeline_depth_spin.setRange(1, 8)
+        self.pipeline_depth_spin.setValue(1)
+        self.pipeline_depth_spin.setToolTip("串行模式下预处理与精处理流水进行，该值为已预处理、等待精处理的视频数量上限，"
+                                            "越大越能掩盖预处理耗时的波动，但同时保留的中间文件也越多")
+        
+        performance_layout.addWidget(QLabel("流水线深度:"), 3, 0)
+        performance_layout.addWidget(self.pipeline_depth_spin, 3, 1)
+        
+        # 中间文件编码档位
+        from intermediate_codec import INTERMEDIATE_PROFILES
+        self.intermediate_profile_combo = QComboBox()
+        for profile_name, profile in INTERMEDIATE_PROFILES.items():
+            self.intermediate_profile_combo.addItem(profile['label'], profile_name)
+        self.intermediate_profile_combo.setToolTip("无法单次渲染时（如文件夹拼接）预处理中间文件的编码方式：无损档位避免两次有损压缩，"
+                                                   "FFV1和原始帧解码更快但文件更大，原始帧写到内存盘（/dev/shm）；"
+                                                   "可用 python intermediate_codec.py benchmark 对比")
+        
+        performance_layout.addWidget(QLabel("中间文件:"), 3, 2)
+        performance_layout.addWidget(self.intermediate_profile_combo, 3, 3)
+        
+        # 流式管道模式
+        from stream_pipeline import is_streaming_supported
+        self.streaming_check = QCheckBox("流式管道（不写中间文件）")
+        self.streaming_check.setChecked(False)
+        self.streaming_check.setEnabled(is_streaming_supported())
+        self.streaming_check.setToolTip("分步处理时预处理、素材叠加和最终编码同时运行，通过命名管道传递画面，"
+                                        "磁盘上只写出最终视频，适合临时磁盘较慢或多任务并行的情况；"
+                                        "失败时自动回退到基于中间文件的处理（仅支持Linux/macOS）")
+        
+        performance_layout.addWidget(self.streaming_check, 4, 0, 1, 2)
+        
+        # 分时段渲染
+        self.timeline_split_check = QCheckBox("分时段渲染（静态图层预合成）")
+        self.timeline_split_check.setChecked(True)
+        self.timeline_split_check.setToolTip("背景、图片和字幕的入场动画只在前3秒逐帧叠加，之后改为叠加一张预先合成的静态图层，"
+                                             "画面不变，视频越长素材叠加越快；GIF仍单独叠加")
+        
+        performance_layout.addWidget(self.timeline_split_check, 4, 2, 1, 2)
+        
+        performance_group.setLayout(performance_layout)
+        
         # 保存按钮
         save_btn = QPushButton("保存设置")
         save_btn.clicked.connect(self.save_settings)
@@ -1825,6 +1914,7 @@ class VideoProcessorApp(QMainWindow):
         layout.addWidget(style_config_group)
         layout.addWidget(default_group)
         layout.addWidget(quality_group)  # 添加质量设置组
+        layout.addWidget(performance_group)  # 添加性能设置组
         layout.addWidget(voice_group)
         layout.addWidget(save_btn, alignment=Qt.AlignmentFlag.AlignLeft)  # 左对齐保存按钮
         layout.addStretch()
@@ -1834,51 +1924,17 @@ class VideoProcessorApp(QMainWindow):
         combo_box.clear()
         combo_box.addItem("随机", "random")
         
-        # 从样式配置中读取可用样式
-        styles = []
+        # 从样式注册表中读取可用样式
+        styles = {}
         try:
-            # 确保 style_config 是 ConfigParser 实例
-            if isinstance(self.style_config, configparser.ConfigParser):
-                for section in self.style_config.sections():
-                    if section.startswith("styles."):
-                        style_name = section.replace("styles.", "")
-                        styles.append(style_name)
-        except Exception:
+            styles = get_style_registry().styles
+        except Exception as e:
             # 如果读取失败，就使用空列表
-            pass
+            print(f"读取样式配置失败: {e}")
         
-        # 添加样式到下拉框
+        # 添加样式到下拉框（描述取自样式段落下的第一行注释，没有注释时使用样式名称）
         for style in sorted(styles):
-            # 获取样式描述
-            style_section = f"styles.{style}"
-            description = ""
-            
-            # 尝试获取注释作为描述
-            try:
-                if isinstance(self.style_config, configparser.ConfigParser):
-                    if self.style_config.has_option(style_section, "; 样式配置"):
-                        comment_text = self.style_config.get(style_section, "; 样式配置")
-                        for line in comment_text.split("\n"):
-                            if line.strip() and not line.strip().startswith("["):
-                                description = line.strip()
-                                break
-                    
-                    # 如果没有注释，查看第一个非空行
-                    if not description:
-                        for option in self.style_config.options(style_section):
-                            if option.startswith(";") and not option.startswith("; "):
-                                description = option.lstrip(";").strip()
-                                break
-            except Exception:
-                # 如果读取失败，就使用默认描述
-                pass
-            
-            # 如果仍然没有描述，使用样式名称
-            if not description:
-                description = style
-            
-            # 添加到下拉框
-            combo_box.addItem(f"{style} - {description}", style)
+            combo_box.addItem(f"{style} - {styles[style].description}", style)
     
     def add_video_files(self):
         """添加视频文件到列表"""
@@ -2163,6 +2219,22 @@ class VideoProcessorApp(QMainWindow):
                 'pixfmt_value': self.pixfmt_combo.currentData()
             }
         
+        # 获取性能设置参数
+        performance_settings = {}
+        if hasattr(self, 'single_pass_check'):
+            performance_settings = {
+                'single_pass': self.single_pass_check.isChecked(),
+                'max_workers': self.max_workers_spin.value(),
+                'ffmpeg_threads': self.ffmpeg_threads_spin.value(),
+                'preprocess_cache': self.preprocess_cache_check.isChecked(),
+                'preprocess_cache_size': self.preprocess_cache_size_spin.value(),
+                'tts_concurrency': self.tts_concurrency_spin.value(),
+                'pipeline_depth': self.pipeline_depth_spin.value(),
+                'intermediate_profile': self.intermediate_profile_combo.currentData(),
+                'streaming': self.streaming_check.isChecked(),
+                'timeline_split': self.timeline_split_check.isChecked()
+            }
+        
         # 获取TTS参数
         enable_tts = False
         tts_voice = "zh-CN-XiaoxiaoNeural"
@@ -2212,7 +2284,8 @@ class VideoProcessorApp(QMainWindow):
             document_path, enable_gif, gif_path, gif_loop_count, gif_scale, self.gif_rotation.value(), gif_x, gif_y, scale_factor, image_path,
             quality_settings,  # 添加质量设置参数
             enable_tts, tts_voice, tts_volume, tts_text, self.auto_match_duration.isChecked(),  # 添加TTS参数和自动匹配时长参数
-            enable_dynamic_subtitle, animation_style, animation_intensity, highlight_color, match_mode  # 添加动态字幕参数
+            enable_dynamic_subtitle, animation_style, animation_intensity, highlight_color, match_mode,  # 添加动态字幕参数
+            performance_settings=performance_settings
         )
         
         self.processing_thread.progress_updated.connect(self.update_progress)
@@ -2462,7 +2535,7 @@ class VideoProcessorApp(QMainWindow):
         """重新加载样式配置"""
         try:
             # 重新加载样式配置
-            self.style_config = load_style_config()  # type: ignore
+            reload_style_registry()
             
             # 重新填充样式下拉框
             self.populate_style_combo(self.style_combo)
@@ -2473,7 +2546,18 @@ class VideoProcessorApp(QMainWindow):
             QMessageBox.critical(self, "错误", f"重新加载样式配置失败: {str(e)}")
             import traceback
             traceback.print_exc()
-    
+
+    def clear_preprocess_cache(self):
+        """清空预处理缓存、字幕/背景图片缓存和配音缓存"""
+        try:
+            from preprocess_cache import clear_preprocess_cache
+            from image_cache import clear_image_cache
+            from tts_cache import clear_tts_cache
+            removed = clear_preprocess_cache() + clear_image_cache() + clear_tts_cache()
+            QMessageBox.information(self, "成功", f"缓存已清空，共删除 {removed} 个文件")
+        except Exception as e:
+            QMessageBox.warning(self, "警告", f"清空预处理缓存失败: {str(e)}")
+
     def load_saved_settings(self):
         """加载保存的设置"""
         # 是否记住路径
@@ -2626,6 +2710,22 @@ class VideoProcessorApp(QMainWindow):
             pixfmt_index = self.pixfmt_combo.findData(pixfmt_value)
             if pixfmt_index >= 0:
                 self.pixfmt_combo.setCurrentIndex(pixfmt_index)
+        
+        # 加载性能设置参数
+        if hasattr(self, 'single_pass_check'):
+            self.single_pass_check.setChecked(self.settings.value("single_pass", False, type=bool))
+            self.max_workers_spin.setValue(self.settings.value("max_workers", 1, type=int))
+            self.ffmpeg_threads_spin.setValue(self.settings.value("ffmpeg_threads", 0, type=int))
+            self.preprocess_cache_check.setChecked(self.settings.value("preprocess_cache", True, type=bool))
+            self.preprocess_cache_size_spin.setValue(self.settings.value("preprocess_cache_size", 10, type=int))
+            self.tts_concurrency_spin.setValue(self.settings.value("tts_concurrency", 4, type=int))
+            self.pipeline_depth_spin.setValue(self.settings.value("pipeline_depth", 1, type=int))
+            intermediate_index = self.intermediate_profile_combo.findData(
+                self.settings.value("intermediate_profile", "h264", type=str))
+            if intermediate_index >= 0:
+                self.intermediate_profile_combo.setCurrentIndex(intermediate_index)
+            self.streaming_check.setChecked(self.settings.value("streaming", False, type=bool))
+            self.timeline_split_check.setChecked(self.settings.value("timeline_split", True, type=bool))
     
     def on_auto_match_duration_changed(self, state):
         """处理自动匹配时长勾选框状态变化"""
@@ -2740,6 +2840,19 @@ class VideoProcessorApp(QMainWindow):
             self.settings.setValue("gop_value", self.gop_spin.value())
             self.settings.setValue("tune_value", self.tune_combo.currentData())
             self.settings.setValue("pixfmt_value", self.pixfmt_combo.currentData())
+        
+        # 保存性能设置参数
+        if hasattr(self, 'single_pass_check'):
+            self.settings.setValue("single_pass", self.single_pass_check.isChecked())
+            self.settings.setValue("max_workers", self.max_workers_spin.value())
+            self.settings.setValue("ffmpeg_threads", self.ffmpeg_threads_spin.value())
+            self.settings.setValue("preprocess_cache", self.preprocess_cache_check.isChecked())
+            self.settings.setValue("preprocess_cache_size", self.preprocess_cache_size_spin.value())
+            self.settings.setValue("tts_concurrency", self.tts_concurrency_spin.value())
+            self.settings.setValue("pipeline_depth", self.pipeline_depth_spin.value())
+            self.settings.setValue("intermediate_profile", self.intermediate_profile_combo.currentData())
+            self.settings.setValue("streaming", self.streaming_check.isChecked())
+            self.settings.setValue("timeline_split", self.timeline_split_check.isChecked())
     
     def on_random_position_changed(self, state):
         """处理字幕位置随机化勾选框状态变化"""
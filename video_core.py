@@ -12,14 +12,56 @@ import shutil
 from pathlib import Path
 import tempfile
 import random
-import pandas as pd
+import math
 import time
 import logging
-import asyncio
 import platform  # 添加platform模块导入
+import contextlib
 
 # 导入工具函数
-from utils import get_video_info, get_audio_duration, run_ffmpeg_command, get_data_path, ensure_dir, load_style_config, find_font_file, find_matching_image, generate_tts_audio, load_subtitle_config
+from utils import get_video_info, get_audio_duration, run_ffmpeg_command, format_progress_stage, get_data_path, ensure_dir, load_style_config, find_font_file, find_matching_image, has_audio_stream, _apply_thread_budget, file_content_hash
+
+# 导入预处理缓存
+from preprocess_cache import make_preprocess_cache_key, fetch_preprocess_cache, store_preprocess_cache, set_preprocess_cache
+
+# 导入中间文件编码档位
+from intermediate_codec import get_intermediate_profile, intermediate_path, intermediate_encode_args, intermediate_suffix
+
+# 导入滤镜图构建
+from filter_graph import FilterGraph
+
+# 导入滤镜图预检
+from graph_preflight import preflight_graph
+
+# 导入流式管道
+from stream_pipeline import StreamSource, FfmpegStream, nut_output_args
+
+# 导入静态图层预合成（分时段渲染）
+from static_plate import PlateLayer, compose_static_plates, is_timeline_split_enabled
+
+# 导入叠加素材裁剪
+from overlay_trim import save_trimmed_png, read_overlay_offset, animated_content_box, animation_frame_count
+
+# 导入叠加链像素格式规划
+from overlay_format import (plan_overlay_format, base_format_filter, layer_format_filter, overlay_format_option,
+                            is_filter_debug_enabled, dump_negotiated_formats)
+
+# 导入叠加图片缓存
+from image_cache import make_image_cache_key, fetch_cached_image, store_cached_image
+
+# 导入字体注册表
+from font_registry import load_font
+
+# 导入样式注册表
+from style_registry import list_style_names, get_font_paths
+
+# 导入配音缓存
+from tts_cache import resolve_tts_voice, synthesize_tts, get_tts_duration, set_tts_cache, copy_tts_audio, plan_tts_tempo
+from tts_prefetch import wait_for_prefetched_tts
+from tts_backend import get_tts_backend, tts_audio_suffix
+
+# 导入语音活动检测
+from audio_vad import detect_speech_bounds
 
 # 导入日志管理器
 from log_manager import init_logging, log_with_capture
@@ -71,6 +113,13 @@ def create_rounded_rect_background(width, height, radius, output_path, bg_color=
             except Exception as e:
                 print(f"从视频取色失败，使用默认颜色: {e}")
                 
+        # 查找背景图片缓存
+        cache_key = make_image_cache_key('background', width=width, height=height,
+                                         radius=radius, bg_color=list(bg_color))
+        if fetch_cached_image(cache_key, output_path):
+            print(f"圆角矩形背景已保存（使用缓存）: {output_path}")
+            return output_path
+                
         # 创建透明背景
         image = Image.new('RGBA', (width, height), (0, 0, 0, 0))
         draw = ImageDraw.Draw(image)
@@ -81,6 +130,7 @@ def create_rounded_rect_background(width, height, radius, output_path, bg_color=
         # 保存图片
         image.save(output_path)
         print(f"圆角矩形背景已保存: {output_path}")
+        store_cached_image(cache_key, output_path)
         return output_path
     except Exception as e:
         print(f"创建圆角矩形背景失败: {e}")
@@ -91,85 +141,190 @@ import uuid
 from PIL import Image, ImageDraw, ImageFont
 
 
-def _apply_final_conversion(input_path, output_path, progress_callback=None):
-    """应用最终转换，添加QuickTime兼容性"""
-    ensure_dir(Path(output_path).parent)
+def _partial_output_path(output_path):
+    """
+    成片的临时写入路径：与输出文件位于同一目录（同一文件系统），写完后用 os.replace 原子重命名，
+    这样输出路径上不会出现写到一半的文件，也不需要再复制一次
+    """
+    output_path = Path(output_path)
+    ensure_dir(output_path.parent)
+    return output_path.with_name(f".{output_path.stem}.{uuid.uuid4().hex[:8]}.partial{output_path.suffix}")
+
+
+def _finish_output(partial_path, output_path, success):
+    """
+    编码成功时将临时文件原子重命名为输出路径，失败时删除临时文件
     
-    final_cmd = [
-        'ffmpeg', '-y',
-        '-i', str(input_path),
-        '-c', 'copy',
+    返回:
+        bool: 是否成功生成输出文件
+    """
+    partial_path = Path(partial_path)
+    if success and partial_path.exists() and partial_path.stat().st_size > 0:
+        try:
+            os.replace(partial_path, output_path)
+            return True
+        except OSError as e:
+            print(f"重命名输出文件失败: {e}")
+    try:
+        partial_path.unlink()
+    except OSError:
+        pass
+    return False
+
+
+def _get_video_encode_params(quality_settings=None):
+    """
+    根据质量设置生成最终编码的视频参数（针对TikTok优化的默认值）
+
+    参数:
+        quality_settings: 质量设置字典，为None时使用默认参数
+
+    返回:
+        FFmpeg视频编码参数列表
+    """
+    quality_settings = quality_settings or {}
+    crf_value = quality_settings.get('crf_value', 18)
+    preset_value = quality_settings.get('preset_value', 'slow')
+    profile_value = quality_settings.get('profile_value', 'high')
+    level_value = quality_settings.get('level_value', '4.1')
+    maxrate_value = quality_settings.get('maxrate_value', 8000)
+    bufsize_value = quality_settings.get('bufsize_value', 16000)
+    gop_value = quality_settings.get('gop_value', 30)
+    tune_value = quality_settings.get('tune_value', 'film')
+    pixfmt_value = quality_settings.get('pixfmt_value', 'yuv420p')
+
+    print(f"🎨 质量设置: CRF={crf_value}, Preset={preset_value}, Profile={profile_value}")
+    print(f"🎨 质量参数: Level={level_value}, MaxRate={maxrate_value}kbps, BufSize={bufsize_value}kbps")
+    print(f"🎨 高级参数: GOP={gop_value}, Tune={tune_value}, PixFmt={pixfmt_value}")
+
+    params = [
+        '-c:v', 'libx264',
+        '-pix_fmt', pixfmt_value,
+        '-profile:v', profile_value,
+        '-level', level_value,
+        '-crf', str(crf_value),
+        '-preset', preset_value,
         '-movflags', '+faststart',
-        str(output_path)
+        '-brand', 'mp42',
+        '-tag:v', 'avc1',
+        # TikTok推荐的高清参数
+        '-maxrate', f'{maxrate_value}k',
+        '-bufsize', f'{bufsize_value}k',
+        '-g', str(gop_value),
+        '-keyint_min', str(gop_value // 2),
+        '-sc_threshold', '40',
     ]
-    
-    print(f"执行命令: {' '.join(final_cmd)}")
-    # 报告进度：最终转换
-    if progress_callback:
-        progress_callback("最终转换", 95.0)
-        
-    return run_ffmpeg_command(final_cmd)
 
+    # 添加tune参数（如果不是'none'）
+    if tune_value and tune_value != 'none':
+        params.extend(['-tune', tune_value])
+    return params
 
-def trim_music_to_video_duration(music_path, video_duration, output_path):
+
+def _build_audio_mix(graph, source_audio=None, music=None, music_volume=50,
+                     tts=None, tts_volume=100, duration=None, tts_filter=None):
     """
-    根据视频时长裁剪音乐文件
+    在滤镜图中构建音频混合：背景音乐裁剪/音量、配音变速/音量以及两者的amix混合
+
+    行为与分步处理保持一致：有背景音乐时替换原声，配音再与背景音乐（或原声）混合。
+
+    参数:
+        graph: filter_graph.FilterGraph
+        source_audio: 原视频音频流端点（如 source.audio），无音频时为None
+        music: 背景音乐音频流端点，没有音乐时为None
+        music_volume: 背景音乐音量百分比
+        tts: 配音音频流端点，没有配音时为None
+        tts_volume: 配音音量百分比
+        duration: 成片时长（秒），用于裁剪背景音乐
+        tts_filter: 音量之前对配音执行的滤镜（自动匹配时长的裁剪/变速，见tts_cache.TtsTempo）
+
+    返回:
+        输出音频端点，不需要混音时为None
+    """
+    # Windows下使用更稳定的音频滤镜参数
+    precision = ":precision=fixed" if platform.system() == "Windows" else ""
+
+    base = None
+    if music is not None:
+        trim_filter = f"atrim=duration={duration}" if duration else ""
+        base = graph.filter([trim_filter, f"volume={music_volume / 100.0}{precision}"], music)
+
+    if tts is None:
+        return base
+
+    tts = graph.filter([tts_filter, f"volume={tts_volume / 100:.2f}{precision}"], tts)
+    base = base or source_audio
+    if base is None:
+        return tts
+
+    # 根据操作系统设置不同的amix参数
+    if platform.system() == "Windows":
+        amix_params = "inputs=2:duration=longest:dropout_transition=0:weights=1 1"
+    else:
+        amix_params = "inputs=2:duration=first:weights=1 1"
+    return graph.filter(f"amix={amix_params}", base, tts)
+
+
+def _run_stream_render(stream, stream_source, source_fifo, render_command, output_path, render_slot=None,
+                       progress_callback=None):
+    """
+    流式模式下同时启动预处理和最终编码两个FFmpeg进程，预处理画面通过命名管道以NUT格式的原始帧传递，
+    只有最终编码写出MP4（先写到输出目录中的临时文件，完成后原子重命名）
     
     参数:
-        music_path: 音乐文件路径
-        video_duration: 视频时长（秒）
-        output_path: 裁剪后音乐的输出路径
+        stream: stream_pipeline.FfmpegStream
+        stream_source: 预处理流（stream_pipeline.StreamSource）
+        source_fifo: 预处理输出的管道（最终编码命令已将其作为主视频输入）
+        render_command: 最终编码命令（不含输出路径）
         
     返回:
-        裁剪后的音乐文件路径（字符串格式），失败返回None
+        成功返回输出路径，失败返回None
     """
-    try:
-        # 获取音乐文件时长
-        music_duration = get_audio_duration(music_path)
-        if music_duration is None:
-            print(f"无法获取音乐文件时长: {music_path}")
-            return None
-            
-        print(f"音乐原始时长: {music_duration}秒，视频时长: {video_duration}秒")
-        
-        # 如果音乐时长小于等于视频时长，直接返回原文件（确保返回字符串）
-        if music_duration <= video_duration:
-            print("音乐时长不超过视频时长，无需裁剪")
-            return str(music_path)  # 确保返回字符串格式
-            
-        # 裁剪音乐到视频时长
-        print(f"裁剪音乐从 {music_duration}秒 到 {video_duration}秒")
-        
-        # 根据操作系统设置不同的音频参数
-        if platform.system() == "Windows":
-            trim_cmd = [
-                "ffmpeg", "-y",  # 覆盖输出文件
-                "-i", str(music_path),
-                "-t", str(video_duration),  # 设置输出时长
-                "-ar", "44100",  # 设置采样率
-                "-ac", "2",      # 设置声道数
-                "-c:a", "aac",   # 使用AAC编码
-                str(output_path)
-            ]
-        else:
-            trim_cmd = [
-                "ffmpeg", "-y",  # 覆盖输出文件
-                "-i", str(music_path),
-                "-t", str(video_duration),  # 设置输出时长
-                "-c", "copy",  # 复制编码，避免重新编码
-                str(output_path)
-            ]
-        
-        if run_ffmpeg_command(trim_cmd, quiet=True):
-            print(f"音乐裁剪成功: {output_path}")
-            return str(output_path)  # 确保返回字符串格式
-        else:
-            print("音乐裁剪失败")
-            return None
-            
-    except Exception as e:
-        print(f"音乐裁剪过程中发生错误: {e}")
+    producer_command = stream_source.command + nut_output_args(stream_source.has_audio) + [str(source_fifo)]
+    partial_output = _partial_output_path(output_path)
+    if progress_callback:
+        progress_callback("流式渲染", 50.0)
+    
+    # 预处理与最终编码同时运行，整个流式段占用渲染槽
+    with _render_section(render_slot):
+        stream.start("预处理", producer_command, [(source_fifo, 'w')])
+        stream.start("最终编码", render_command + [str(partial_output)], [(source_fifo, 'r')])
+        stream_ok = stream.wait()
+    
+    if not _finish_output(partial_output, output_path, stream_ok):
+        print("【流式管道】流式渲染失败")
+        return None
+    print(f"【流式管道】成功输出: {output_path}")
+    if progress_callback:
+        progress_callback("处理完成", 100.0)
+    return output_path
+
+
+def _encode_progress_callback(progress_callback, stage, start=50.0, end=95.0, interval=1.0):
+    """
+    把FFmpeg编码进度（utils.FfmpegProgress）转换为任务进度回调：百分比映射到 [start, end]，
+    阶段文字带编码帧率、倍速和预计剩余时间，最多每 interval 秒回调一次
+    
+    返回:
+        run_ffmpeg_command的progress_callback，没有任务进度回调时返回None
+    """
+    if not progress_callback:
         return None
+    last_report = [0.0]
+    
+    def on_progress(progress):
+        now = time.time()
+        if now - last_report[0] < interval and (progress.percent or 0.0) < 100.0:
+            return
+        last_report[0] = now
+        percent = progress.percent or 0.0
+        progress_callback(format_progress_stage(stage, progress), start + (end - start) * percent / 100.0)
+    return on_progress
+
+
+def _render_section(render_slot):
+    """最终编码所在的代码段：指定了渲染槽时占用渲染槽，否则不做限制"""
+    return render_slot if render_slot is not None else contextlib.nullcontext()
 
 
 @log_with_capture
@@ -184,7 +339,9 @@ def process_video(video_path, output_path=None, style=None, subtitle_lang=None,
                  video_index=0, enable_tts=False, tts_voice="zh-CN-XiaoxiaoNeural", 
                  tts_volume=100, tts_text="", auto_match_duration=False,
                  enable_dynamic_subtitle=False, animation_style="高亮放大", animation_intensity=1.5, highlight_color="#FFD700",
-                 match_mode="随机样式", position_x=540, position_y=960):  # 添加动态字幕参数
+                 match_mode="随机样式", position_x=540, position_y=960,  # 添加动态字幕参数
+                 single_pass=False, reverse_effect=False, document_store=None, tts_audio_file=None,
+                 render_slot=None, stream_kind=None):
     """
     处理视频的主函数（精处理阶段）
     
@@ -208,6 +365,15 @@ def process_video(video_path, output_path=None, style=None, subtitle_lang=None,
         tts_volume: TTS音量（百分比）
         tts_text: TTS文本
         auto_match_duration: 是否自动匹配视频时长（根据视频时长和配音时长计算变速系数）
+        single_pass: 单次渲染模式，video_path为未预处理的原始视频，预处理与最终编码合并为一次FFmpeg调用，
+                     失败时自动回退到分步处理
+        reverse_effect: 单次渲染模式下是否进行正放+倒放拼接（短视频）
+        document_store: 批次中共享的字幕文档（document_store.SubtitleDocument），为None时按document_path加载
+        tts_audio_file: 批量预取的配音文件路径（tts_prefetch.TTSPrefetcher.audio_path），未就绪或失败时自行合成
+        render_slot: 流水线模式下的渲染槽（pipeline_executor.RenderSlot），只在最终编码时占用，
+                     配音变速和素材准备不占用，可以与其他视频的编码重叠
+        stream_kind: 流式管道模式下的任务类型（folder/short/long），video_path为未预处理的原始视频（或文件夹），
+                     预处理、素材叠加和最终编码通过命名管道同时进行，不写中间文件；失败时回退到基于文件的预处理
         
     返回:
         处理后的视频路径，失败返回None
@@ -256,83 +422,69 @@ def process_video(video_path, output_path=None, style=None, subtitle_lang=None,
     print(f"使用临时目录: {temp_dir}")
     
     try:
+        # 流式管道模式：预处理不写中间文件，成片尺寸和时长由预处理流给出
+        stream_source = None
+        if stream_kind and not single_pass:
+            stream_source = plan_preprocess_stream(video_path, stream_kind, scale_factor)
+            if stream_source is None:
+                print("【流式管道】无法建立预处理流，回退到基于文件的预处理")
+                video_path = preprocess_video_for_kind(video_path, stream_kind, temp_dir, scale_factor=scale_factor)
+                if not video_path:
+                    print("【流式管道】回退预处理失败")
+                    return None
+        
         # 1. 获取视频信息
-        video_info = get_video_info(video_path)
-        if not video_info:
-            print("无法获取视频信息，处理失败")
-            return None
-            
-        width, height, duration = video_info
+        if stream_source:
+            width, height, duration = stream_source.width, stream_source.height, stream_source.duration
+        else:
+            video_info = get_video_info(video_path)
+            if not video_info:
+                print("无法获取视频信息，处理失败")
+                return None
+            width, height, duration = video_info
         print(f"视频信息: {width}x{height}, {duration}秒")
         
+        if single_pass and reverse_effect:
+            # 正放+倒放后的成片时长（正放片段最长5秒）
+            duration = min(duration, 5.0) * 2
+            print(f"【单次渲染】正放倒放后成片时长: {duration}秒")
+        
         # 直接使用预处理后的视频，不再进行额外的预处理
         processed_path = video_path
         print(f"使用预处理后的视频: {processed_path}")
         
         # 如果启用了TTS，先生成TTS音频
         tts_audio_path = None
+        tts_tempo = None
         if enable_tts and tts_text:
-            print("生成TTS音频...")
-            tts_audio_path = temp_dir / "tts_audio.mp3"
-            if generate_subtitle_tts(tts_text, tts_voice, str(tts_audio_path)):
+            # 优先使用批次开始时预取的配音；文件扩展名与后端生成的音频格式一致
+            prefetched_path = wait_for_prefetched_tts(tts_audio_file) if tts_audio_file else None
+            audio_suffix = Path(prefetched_path).suffix if prefetched_path else tts_audio_suffix(get_tts_backend())
+            tts_audio_path = temp_dir / f"tts_audio{audio_suffix}"
+            if prefetched_path:
+                tts_generated = copy_tts_audio(prefetched_path, tts_audio_path)
+                print(f"使用预取的TTS音频: {prefetched_path}")
+            else:
+                print("生成TTS音频...")
+                tts_generated = generate_subtitle_tts(tts_text, tts_voice, str(tts_audio_path))
+            if tts_generated:
                 print(f"TTS音频生成成功: {tts_audio_path}")
                 # 检查生成的音频文件是否存在且不为空
                 if tts_audio_path.exists() and tts_audio_path.stat().st_size > 0:
                     print(f"TTS音频文件验证成功: {tts_audio_path}")
                     
-                    # 如果启用了自动匹配时长，计算并应用变速系数
+                    # 如果启用了自动匹配时长，计算变速系数；裁剪和变速在最终编码的音频滤镜中完成
                     if auto_match_duration:
                         print("[自动匹配时长] 开始计算变速系数...")
-                        audio_duration = get_audio_duration(str(tts_audio_path))
+                        audio_duration = get_tts_duration(tts_audio_path)
                         if audio_duration and audio_duration > 0:
-                            # 计算变速系数：音频时长 / 视频时长
-                            speed_ratio = audio_duration / duration
-                            print(f"[自动匹配时长] 视频时长: {duration}秒, 配音时长: {audio_duration}秒")
-                            print(f"[自动匹配时长] 计算变速系数: {speed_ratio:.3f}")
-                            
-                            # 如果变速系数不等于1，应用变速处理
-                            if abs(speed_ratio - 1.0) > 0.01:  # 允许1%的误差
-                                print(f"[自动匹配时长] 应用变速处理，系数: {speed_ratio:.3f}")
-                                adjusted_audio_path = temp_dir / "tts_audio_adjusted.mp3"
-                                
-                                # 使用FFmpeg的atempo滤镜调整音频速度
-                                # atempo的有效范围是0.5-100，如果超出范围需要多次应用
-                                tempo_cmd = ['ffmpeg', '-y', '-i', str(tts_audio_path)]
-                                
-                                # 构建atempo滤镜链
-                                filter_parts = []
-                                remaining_ratio = speed_ratio
-                                
-                                while remaining_ratio > 2.0:
-                                    filter_parts.append('atempo=2.0')
-                                    remaining_ratio /= 2.0
-                                while remaining_ratio < 0.5:
-                                    filter_parts.append('atempo=0.5')
-                                    remaining_ratio /= 0.5
-                                
-                                if remaining_ratio != 1.0:
-                                    filter_parts.append(f'atempo={remaining_ratio:.3f}')
-                                
-                                if filter_parts:
-                                    filter_complex = ','.join(filter_parts)
-                                    tempo_cmd.extend(['-filter:a', filter_complex])
-                                
-                                tempo_cmd.extend(['-c:a', 'mp3', str(adjusted_audio_path)])
-                                
-                                print(f"[自动匹配时长] 执行变速命令: {' '.join(tempo_cmd)}")
-                                if run_ffmpeg_command(tempo_cmd):
-                                    if adjusted_audio_path.exists() and adjusted_audio_path.stat().st_size > 0:
-                                        tts_audio_path = adjusted_audio_path
-                                        print(f"[自动匹配时长] 变速处理成功: {tts_audio_path}")
-                                        
-                                        # 验证调整后的音频时长
-                                        new_duration = get_audio_duration(str(tts_audio_path))
-                                        if new_duration:
-                                            print(f"[自动匹配时长] 调整后音频时长: {new_duration:.2f}秒")
-                                    else:
-                                        print("[自动匹配时长] 变速处理失败，使用原始音频")
-                                else:
-                                    print("[自动匹配时长] 变速命令执行失败，使用原始音频")
+                            # 去掉首尾静音，按实际有声部分计算变速系数
+                            speech_bounds = detect_speech_bounds(str(tts_audio_path))
+                            if speech_bounds:
+                                print(f"[自动匹配时长] 检测到语音区间: {speech_bounds[0]:.2f}s - {speech_bounds[1]:.2f}s")
+                            tts_tempo = plan_tts_tempo(audio_duration, duration, speech_bounds)
+                            if tts_tempo:
+                                print(f"[自动匹配时长] 音频滤镜: {tts_tempo.filter}，处理后配音时长: {tts_tempo.duration:.2f}秒")
                             else:
                                 print(f"[自动匹配时长] 变速系数接近1.0，无需调整")
                         else:
@@ -352,12 +504,7 @@ def process_video(video_path, output_path=None, style=None, subtitle_lang=None,
         print(f"  - 传递music_volume: {music_volume}")
         print(f"  - 视频索引: {video_index}")
         
-        final_path = add_subtitle_to_video(
-            processed_path, 
-            output_path, 
-            style, 
-            subtitle_lang, 
-            video_path, 
+        subtitle_kwargs = dict(
             quicktime_compatible=quicktime_compatible,
             img_position_x=img_position_x,
             img_position_y=img_position_y,
@@ -378,6 +525,7 @@ def process_video(video_path, output_path=None, style=None, subtitle_lang=None,
             music_mode=music_mode,
             music_volume=music_volume,
             document_path=document_path,
+            document_store=document_store,
             enable_gif=enable_gif,
             gif_path=gif_path,
             gif_loop_count=gif_loop_count,
@@ -397,35 +545,76 @@ def process_video(video_path, output_path=None, style=None, subtitle_lang=None,
             highlight_color=highlight_color,
             match_mode=match_mode,
             position_x=position_x,
-            position_y=position_y
+            position_y=position_y,
+            tts_timing_path=str(tts_audio_path) if tts_audio_path else None,
+            # 配音在成片的编码中直接混入，不再单独混音、转封装和复制
+            tts_audio_path=str(tts_audio_path) if tts_audio_path else None,
+            tts_volume=tts_volume,
+            tts_tempo=tts_tempo if tts_audio_path else None,
+            render_slot=render_slot
+        )
+        
+        if single_pass:
+            # 单次渲染：去水印、正放倒放、素材叠加、音乐和配音在一次FFmpeg调用中完成
+            print(f"【单次渲染】开始单次渲染: {video_path}")
+            final_path = add_subtitle_to_video(
+                video_path,
+                output_path,
+                style,
+                subtitle_lang,
+                video_path,
+                single_pass=True,
+                reverse_effect=reverse_effect,
+                **subtitle_kwargs
+            )
+            if final_path:
+                print(f"视频处理完成: {final_path}")
+                return final_path
+            
+            # 单次渲染失败时回退到分步处理：先预处理，再叠加素材
+            print("【单次渲染】单次渲染失败，回退到分步处理")
+            if reverse_effect:
+                processed_path = preprocess_video_by_type(video_path, temp_dir, scale_factor=scale_factor)
+            else:
+                processed_path = preprocess_video_without_reverse(video_path, temp_dir, scale_factor=scale_factor)
+            if not processed_path:
+                print("【单次渲染】回退预处理失败")
+                return None
+        
+        if stream_source:
+            # 流式渲染：预处理画面通过命名管道直接进入最终编码，只写出成片
+            print(f"【流式管道】开始流式渲染: {video_path}")
+            final_path = add_subtitle_to_video(
+                video_path,
+                output_path,
+                style,
+                subtitle_lang,
+                video_path,
+                stream_source=stream_source,
+                **subtitle_kwargs
+            )
+            if final_path:
+                print(f"视频处理完成: {final_path}")
+                return final_path
+            
+            print("【流式管道】流式渲染失败，回退到基于文件的处理")
+            processed_path = preprocess_video_for_kind(video_path, stream_kind, temp_dir, scale_factor=scale_factor)
+            if not processed_path:
+                print("【流式管道】回退预处理失败")
+                return None
+        
+        final_path = add_subtitle_to_video(
+            processed_path, 
+            output_path, 
+            style, 
+            subtitle_lang, 
+            video_path, 
+            **subtitle_kwargs
         )
         
         if not final_path:
             print("添加字幕失败")
             return None
-            
-        # 如果生成了TTS音频，将其添加到视频中
-        if tts_audio_path and tts_audio_path.exists() and tts_audio_path.stat().st_size > 0:
-            print("将TTS音频添加到视频中...")
-            final_with_tts_path = temp_dir / "final_with_tts.mp4"
-            if add_tts_audio_to_video(final_path, str(tts_audio_path), str(final_with_tts_path), tts_volume):
-                # 如果成功添加TTS音频，使用带TTS的版本作为最终输出
-                final_path = str(final_with_tts_path)
-                print(f"TTS音频已添加到视频中: {final_path}")
-                # 验证输出文件是否存在
-                if Path(final_path).exists():
-                    print(f"带TTS的视频文件已生成: {final_path}")
-                    # 将最终文件复制到输出路径，确保不会在临时目录被清理时删除
-                    import shutil
-                    shutil.copy2(final_path, output_path)
-                    final_path = str(output_path)
-                else:
-                    print("带TTS的视频文件生成失败")
-                    final_path = final_path.replace("_with_tts", "")  # 回退到原始文件
-            else:
-                print("添加TTS音频到视频失败，使用无TTS版本")
-        elif tts_audio_path:
-            print("TTS音频文件不存在或为空，跳过添加TTS音频步骤")
         
         print(f"视频处理完成: {final_path}")
         return final_path
@@ -453,7 +642,7 @@ def process_video(video_path, output_path=None, style=None, subtitle_lang=None,
             pass
 
 
-def process_short_video_reverse_effect(video_path, output_path, temp_dir):
+def process_short_video_reverse_effect(video_path, output_path, temp_dir, intermediate_profile=None):
     """
     处理短视频（5秒以下），进行正放+倒放拼接
     
@@ -461,30 +650,35 @@ def process_short_video_reverse_effect(video_path, output_path, temp_dir):
         video_path: 输入视频路径
         output_path: 输出视频路径
         temp_dir: 临时目录
+        intermediate_profile: 中间文件编码档位（见intermediate_codec），为None时使用当前设置
         
     返回:
         处理后的视频路径
     """
-    output_path_file = temp_dir / "forward_reverse.mp4"
+    output_path_file = intermediate_path(temp_dir, "forward_reverse", intermediate_profile)
+    # faststart、品牌标记和AVC标记只适用于MP4容器
+    mp4_args = [
+        '-movflags', '+faststart',
+        '-brand', 'mp42',  # 设置兼容的品牌标记
+        '-tag:v', 'avc1',  # 使用标准AVC标记
+    ] if output_path_file.suffix == ".mp4" else []
     
     # 使用一条命令完成正放+倒放+拼接
-    cmd = [
-        'ffmpeg', '-y', '-i', str(video_path),
-        '-filter_complex',
-        f'[0:v]trim=duration=5,setpts=PTS-STARTPTS[forward];'
-        f'[0:v]trim=duration=5,setpts=PTS-STARTPTS,reverse[reversed];'
-        f'[forward][reversed]concat=n=2:v=1:a=0[v]',
-        '-map', '[v]',
+    graph = FilterGraph()
+    source = graph.input(video_path)
+    video = build_forward_reverse_chain(graph, source.video, reverse_duration=5)
+    cmd = ['ffmpeg', '-y'] + graph.input_args() + [
+        '-filter_complex', graph.render({'v': video}),
+        '-map', '[v]'
+    ]
+    cmd.extend(intermediate_encode_args([
         '-c:v', 'libx264', '-pix_fmt', 'yuv420p',
         '-profile:v', 'main', '-level', '3.1',
         '-preset', 'ultrafast',
         '-crf', "23",  
         '-b:v', "4M",       
-        '-movflags', '+faststart',
-        '-brand', 'mp42',  # 设置兼容的品牌标记
-        '-tag:v', 'avc1',  # 使用标准AVC标记
-        str(output_path_file)
-    ]
+    ] + mp4_args, intermediate_profile, with_audio=False))
+    cmd.append(str(output_path_file))
     
     if run_ffmpeg_command(cmd):
         return output_path_file
@@ -523,42 +717,24 @@ def process_short_video_reverse_effect(video_path, output_path, temp_dir):
     if not run_ffmpeg_command(cmd_reverse):
         return None
 
-    # 3. 创建循环视频
+    # 3. 拼接正放和倒放片段
     concat_file = temp_dir / "concat.txt"
     concat_file.write_text(f"file '{forward_path}'\nfile '{reverse_path}'\n")
-
-    cmd_concat = [
-        'ffmpeg', '-y', 
-        '-f', 'concat', '-safe', '0',
-        '-i', str(concat_file),
-        '-c:v', 'libx264', '-pix_fmt', 'yuv420p',
-        '-profile:v', 'main', '-level', '3.1',
-        '-preset', 'ultrafast',
-        '-brand', 'mp42',  # 设置兼容的品牌标记
-        '-tag:v', 'avc1',  # 使用标准AVC标记
-        # '-an',  # 不要音频 - 移除这行以保留音频轨道
-        str(output_path_file)
-    ]
-    if not run_ffmpeg_command(cmd_concat):
-        return None
-    # 3. 拼接视频
-    concat_file = temp_dir / "concat.txt"
-    with open(concat_file, 'w') as f:
-        f.write(f"file '{forward_path}'\n")
-        f.write(f"file '{reverse_path}'\n")
     
     cmd_concat = [
         'ffmpeg', '-y', 
         '-f', 'concat', '-safe', '0',
-        '-i', str(concat_file),
+        '-i', str(concat_file)
+    ]
+    cmd_concat.extend(intermediate_encode_args([
         '-c:v', 'libx264', '-pix_fmt', 'yuv420p',
         '-profile:v', 'main', '-level', '3.1',
         '-preset', 'ultrafast',
-        '-brand', 'mp42',  # 设置兼容的品牌标记
-        '-tag:v', 'avc1',  # 使用标准AVC标记
+    ] + mp4_args, intermediate_profile, with_audio=False))
+    cmd_concat.extend([
         '-an',  # 不要音频
         str(output_path_file)
-    ]
+    ])
     
     if run_ffmpeg_command(cmd_concat):
         return output_path_file
@@ -566,7 +742,189 @@ def process_short_video_reverse_effect(video_path, output_path, temp_dir):
     return None
 
 
-def process_normal_video(video_path, temp_dir, scale_factor=1.1):
+def compute_watermark_crop(width, height, scale_factor=1.1, target_width=1080, target_height=1920):
+    """
+    计算去水印的缩放和裁剪参数：先铺满画布，再按缩放系数放大，最后居中裁剪
+    
+    参数:
+        width: 原始视频宽度
+        height: 原始视频高度
+        scale_factor: 缩放系数，用于去水印（默认1.1）
+        target_width: 目标宽度
+        target_height: 目标高度
+        
+    返回:
+        (缩放后宽度, 缩放后高度, 裁剪X, 裁剪Y)
+    """
+    # 1. 计算铺满画布的缩放比例，使用较大值确保完全铺满
+    scale_to_fit = max(target_width / width, target_height / height)
+    
+    # 2. 在铺满的基础上再应用用户设置的缩放系数
+    final_scale = scale_to_fit * scale_factor
+    
+    # 3. 计算缩放后的尺寸，确保为偶数
+    scaled_width = int(width * final_scale)
+    scaled_height = int(height * final_scale)
+    scaled_width = scaled_width - (scaled_width % 2)
+    scaled_height = scaled_height - (scaled_height % 2)
+    
+    # 4. 计算裁剪位置（居中裁剪）
+    crop_x = max(0, (scaled_width - target_width) // 2)
+    crop_y = max(0, (scaled_height - target_height) // 2)
+    
+    print(f"【去水印】铺满缩放比例: {scale_to_fit:.3f}")
+    print(f"【去水印】最终缩放比例: {final_scale:.3f}")
+    return scaled_width, scaled_height, crop_x, crop_y
+
+
+def build_forward_reverse_chain(graph, video, reverse_duration=None):
+    """
+    在滤镜图中构建正放+倒放拼接：截取前 reverse_duration 秒（为None时使用整段），拼接其倒放片段
+    
+    参数:
+        graph: filter_graph.FilterGraph
+        video: 输入视频流端点
+        reverse_duration: 正放片段的最大时长（秒）
+        
+    返回:
+        拼接后的视频流端点
+    """
+    trim_filter = f"trim=duration={reverse_duration}" if reverse_duration else "trim"
+    forward, backward = graph.filter([trim_filter, "setpts=PTS-STARTPTS", "split"], video, outputs=2)
+    reversed_video = graph.filter("reverse", backward)
+    return graph.filter("concat=n=2:v=1:a=0", forward, reversed_video)
+
+
+def build_xfade_chain(graph, clips, durations, transition_duration=0.3):
+    """
+    在滤镜图中把多个片段按顺序用叠化转场拼接
+    
+    第i个转场在前i+1个片段（已扣除之前的转场）播完前 transition_duration 秒开始
+    
+    参数:
+        graph: filter_graph.FilterGraph
+        clips: 各片段的视频流端点
+        durations: 各片段时长（秒）
+        transition_duration: 转场时长（秒）
+        
+    返回:
+        (拼接后的视频流端点, 拼接后时长)
+    """
+    current = clips[0]
+    for i in range(1, len(clips)):
+        offset = sum(durations[:i]) - i * transition_duration
+        print(f"第{i}个转场: 偏移={offset:.2f}秒")
+        current = graph.filter(f"xfade=transition=fade:duration={transition_duration}:offset={offset:.3f}",
+                               current, clips[i])
+    total_duration = sum(durations) - (len(clips) - 1) * transition_duration
+    return current, total_duration
+
+
+def build_single_pass_video_chain(graph, video, width, height, duration, scale_factor=1.1, reverse_effect=False,
+                                  reverse_duration=5.0, target_width=1080, target_height=1920):
+    """
+    构建单次渲染模式的视频预处理滤镜链（去水印缩放裁剪 + 可选正放倒放）
+    
+    与process_normal_video和process_short_video_reverse_effect的处理效果一致，
+    但不再写出中间文件，而是直接作为最终叠加滤镜图的输入。
+    
+    参数:
+        graph: filter_graph.FilterGraph
+        video: 原始视频流端点
+        width: 原始视频宽度
+        height: 原始视频高度
+        duration: 原始视频时长（秒）
+        scale_factor: 去水印缩放系数
+        reverse_effect: 是否进行正放+倒放拼接
+        reverse_duration: 正放片段的最大时长（秒）
+        
+    返回:
+        (预处理后的视频流端点, 输出视频时长)
+    """
+    scaled_width, scaled_height, crop_x, crop_y = compute_watermark_crop(
+        width, height, scale_factor, target_width, target_height
+    )
+    video = graph.filter([f"scale={scaled_width}:{scaled_height}",
+                          f"crop={target_width}:{target_height}:{crop_x}:{crop_y}"], video)
+    
+    if not reverse_effect:
+        return graph.filter([f"trim=duration={duration}", "setpts=PTS-STARTPTS"], video), duration
+    
+    # 正放+倒放：与预处理阶段相同，截取前5秒后拼接其倒放片段
+    forward_duration = min(duration, reverse_duration)
+    return build_forward_reverse_chain(graph, video, reverse_duration), forward_duration * 2
+
+
+def plan_preprocess_stream(video_path, kind, scale_factor=1.1, transition_duration=0.3):
+    """
+    构建流式模式下的预处理命令：预处理画面不写出中间文件，而是以NUT格式写入命名管道供精处理读取
+    
+    处理效果与基于文件的预处理一致：
+        short  去水印 + 正放倒放（不保留原声）
+        long   去水印（保留原声）
+        folder 每个视频去水印后按文件名顺序叠化拼接（不保留原声，只有一个视频时与long相同）
+    
+    参数:
+        video_path: 原始视频路径（folder时为文件夹路径）
+        kind: 任务类型 folder/short/long
+        scale_factor: 去水印缩放系数
+        transition_duration: 文件夹拼接的转场时长（秒）
+        
+    返回:
+        stream_pipeline.StreamSource，无法构建时返回None（调用方回退到基于文件的预处理）
+    """
+    target_width, target_height = 1080, 1920
+    
+    if kind == 'folder':
+        video_files = _list_folder_videos(video_path)
+        if not video_files:
+            return None
+        if len(video_files) == 1:
+            return plan_preprocess_stream(str(video_files[0]), 'long', scale_factor)
+        
+        graph = FilterGraph()
+        clips = []
+        durations = []
+        for video_file in video_files:
+            video_info = get_video_info(str(video_file))
+            if not video_info:
+                print(f"【流式管道】无法获取视频信息: {video_file.name}")
+                return None
+            width, height, duration = video_info
+            scaled_width, scaled_height, crop_x, crop_y = compute_watermark_crop(
+                width, height, scale_factor, target_width, target_height
+            )
+            clips.append(graph.filter([f"scale={scaled_width}:{scaled_height}",
+                                       f"crop={target_width}:{target_height}:{crop_x}:{crop_y}",
+                                       "setpts=PTS-STARTPTS"], graph.input(video_file).video))
+            durations.append(duration)
+        
+        video, total_duration = build_xfade_chain(graph, clips, durations, transition_duration)
+        command = ['ffmpeg', '-y'] + graph.input_args() + ['-filter_complex', graph.render({'v1': video}),
+                                                           '-map', '[v1]']
+        print(f"【流式管道】文件夹拼接: {len(video_files)}个视频, 时长: {total_duration:.2f}秒")
+        return StreamSource(command, target_width, target_height, total_duration, False)
+    
+    video_info = get_video_info(video_path)
+    if not video_info:
+        print(f"【流式管道】无法获取视频信息: {video_path}")
+        return None
+    width, height, duration = video_info
+    reverse_effect = kind == 'short'
+    graph = FilterGraph()
+    source = graph.input(video_path)
+    video, output_duration = build_single_pass_video_chain(
+        graph, source.video, width, height, duration, scale_factor, reverse_effect,
+        target_width=target_width, target_height=target_height
+    )
+    has_audio = not reverse_effect and has_audio_stream(video_path)
+    command = ['ffmpeg', '-y'] + graph.input_args() + ['-filter_complex', graph.render({'v1': video}), '-map', '[v1]']
+    if has_audio:
+        command.extend(['-map', f'{source.index}:a:0'])
+    return StreamSource(command, target_width, target_height, output_duration, has_audio)
+
+
+def process_normal_video(video_path, temp_dir, scale_factor=1.1, intermediate_profile=None):
     """
     处理普通长度视频（无需正倒放）
     
@@ -574,6 +932,7 @@ def process_normal_video(video_path, temp_dir, scale_factor=1.1):
         video_path: 输入视频路径
         temp_dir: 临时目录
         scale_factor: 缩放系数，用于去水印（默认1.1）
+        intermediate_profile: 中间文件编码档位（见intermediate_codec），为None时使用当前设置
         
     返回:
         处理后的视频路径
@@ -586,7 +945,7 @@ def process_normal_video(video_path, temp_dir, scale_factor=1.1):
     width, height, duration = video_info
     
     # 创建转换后的临时文件，使用唯一文件名避免冲突
-    resized_path = temp_dir / f"resized_{uuid.uuid4().hex}.mp4"
+    resized_path = intermediate_path(temp_dir, f"resized_{uuid.uuid4().hex}", intermediate_profile)
     
     # 目标尺寸
     target_width = 1080
@@ -595,44 +954,31 @@ def process_normal_video(video_path, temp_dir, scale_factor=1.1):
     print(f"【去水印】原始视频尺寸: {width}x{height}")
     print(f"【去水印】缩放系数: {scale_factor}")
     
-    # 新的去水印逻辑：先铺满画布，再缩放裁剪
-    # 1. 计算铺满画布的缩放比例
-    scale_to_fit_width = target_width / width
-    scale_to_fit_height = target_height / height
-    scale_to_fit = max(scale_to_fit_width, scale_to_fit_height)  # 使用较大值确保完全铺满
-    
-    # 2. 在铺满的基础上再应用用户设置的缩放系数
-    final_scale = scale_to_fit * scale_factor
-    
-    # 3. 计算缩放后的尺寸
-    scaled_width = int(width * final_scale)
-    scaled_height = int(height * final_scale)
-    
-    # 确保为偶数
-    scaled_width = scaled_width - (scaled_width % 2)
-    scaled_height = scaled_height - (scaled_height % 2)
-    
-    # 4. 计算裁剪位置（居中裁剪）
-    crop_x = max(0, (scaled_width - target_width) // 2)
-    crop_y = max(0, (scaled_height - target_height) // 2)
+    scaled_width, scaled_height, crop_x, crop_y = compute_watermark_crop(
+        width, height, scale_factor, target_width, target_height
+    )
     
-    print(f"【去水印】铺满缩放比例: {scale_to_fit:.3f}")
-    print(f"【去水印】最终缩放比例: {final_scale:.3f}")
     print(f"【去水印】缩放后尺寸: {scaled_width}x{scaled_height}")
     print(f"【去水印】裁剪位置: ({crop_x}, {crop_y})")
     print(f"【去水印】裁剪尺寸: {target_width}x{target_height}")
     
     # 5. 构建FFmpeg命令
-    resize_cmd = [
-        'ffmpeg', '-y', '-i', str(video_path),
-        '-vf', f'scale={scaled_width}:{scaled_height},crop={target_width}:{target_height}:{crop_x}:{crop_y}',
+    graph = FilterGraph()
+    source = graph.input(video_path)
+    video = graph.filter([f"scale={scaled_width}:{scaled_height}",
+                          f"crop={target_width}:{target_height}:{crop_x}:{crop_y}"], source.video)
+    resize_cmd = ['ffmpeg', '-y'] + graph.input_args() + [
+        '-filter_complex', graph.render({'v': video}),
+        '-map', '[v]', '-map', f'{source.index}:a:0?'
+    ]
+    resize_cmd.extend(intermediate_encode_args([
         '-c:v', 'libx264', '-pix_fmt', 'yuv420p',
         '-profile:v', 'main', '-level', '3.1',
         '-preset', 'ultrafast',
         '-brand', 'mp42',
         '-tag:v', 'avc1',
-        str(resized_path)
-    ]
+    ], intermediate_profile))
+    resize_cmd.append(str(resized_path))
     
     print(f"【去水印】执行命令: {' '.join(resize_cmd)}")
     if not run_ffmpeg_command(resize_cmd):
@@ -643,7 +989,7 @@ def process_normal_video(video_path, temp_dir, scale_factor=1.1):
     return resized_path
 
 
-def preprocess_video_without_reverse(video_path, temp_dir, duration=None):
+def preprocess_video_without_reverse(video_path, temp_dir, duration=None, intermediate_profile=None, scale_factor=1.1):
     """
     视频预处理函数 - 仅进行水印处理，不进行正放倒放处理
     
@@ -651,6 +997,8 @@ def preprocess_video_without_reverse(video_path, temp_dir, duration=None):
         video_path: 视频文件路径
         temp_dir: 临时目录路径
         duration: 视频时长（秒），如果为None则自动获取
+        intermediate_profile: 中间文件编码档位（见intermediate_codec），为None时使用当前设置
+        scale_factor: 去水印缩放系数（与单次渲染和流式管道模式使用同一设置）
         
     返回:
         预处理后的视频路径，失败返回None
@@ -670,17 +1018,32 @@ def preprocess_video_without_reverse(video_path, temp_dir, duration=None):
     
     print(f"视频时长: {duration}秒")
     
+    # 查找预处理缓存
+    intermediate_profile = get_intermediate_profile(intermediate_profile)
+    cache_key = make_preprocess_cache_key(video_path, scale_factor=scale_factor, reverse_effect=False,
+                                          intermediate_profile=intermediate_profile)
+    cached_path = fetch_preprocess_cache(cache_key, temp_dir, intermediate_suffix(intermediate_profile))
+    if cached_path:
+        print(f"预处理完成（使用缓存）: {cached_path}")
+        return cached_path
+    
     # 对所有视频都进行水印处理（缩放裁剪去水印），但不进行正放倒放处理
     # 使用唯一文件名避免冲突
     unique_id = uuid.uuid4().hex
-    temp_output_path = temp_dir / f"processed_{unique_id}.mp4"
-    print(f"进行水印处理，缩放系数: 1.1，输出路径: {temp_output_path}")
-    processed_path = process_normal_video(video_path, temp_dir, scale_factor=1.1)
+    temp_output_path = intermediate_path(temp_dir, f"processed_{unique_id}", intermediate_profile)
+    print(f"进行水印处理，缩放系数: {scale_factor}，中间文件档位: {intermediate_profile}，输出路径: {temp_output_path}")
+    processed_path = process_normal_video(video_path, temp_dir, scale_factor=scale_factor,
+                                          intermediate_profile=intermediate_profile)
     
     if not processed_path:
         print("水印处理失败")
         return None
     
+    # 水印处理失败时会返回原始视频：直接使用，不能移动到临时目录（临时目录随后会被删除），也不写入缓存
+    if str(processed_path) == str(video_path):
+        print(f"预处理未生成新文件，使用原始视频: {video_path}")
+        return video_path
+    
     # 如果处理后的文件名不是我们期望的唯一文件名，则重命名
     if processed_path != str(temp_output_path):
         try:
@@ -691,6 +1054,8 @@ def preprocess_video_without_reverse(video_path, temp_dir, duration=None):
             print(f"重命名处理后的视频失败: {e}")
             return None
     
+    store_preprocess_cache(cache_key, processed_path)
+    
     print(f"预处理完成: {processed_path}")
     return processed_path
 
@@ -708,12 +1073,13 @@ def process_animated_gif_for_video(gif_path, temp_dir, scale_factor=1.0, loop_co
         gif_rotation: 旋转角度（度），0-359度
         
     返回:
-        处理后的GIF文件路径，失败返回None
+        (处理后的GIF文件路径, 不透明内容的外接矩形overlay_trim.ContentBox)，没有可裁剪的透明边缘时外接矩形为None，
+        失败返回 (None, None)
     """
     try:
         if not Path(gif_path).exists():
             print(f"GIF文件不存在: {gif_path}")
-            return None
+            return None, None
         
         # 输出路径
         processed_gif_path = temp_dir / "processed_animated_gif.gif"
@@ -721,14 +1087,8 @@ def process_animated_gif_for_video(gif_path, temp_dir, scale_factor=1.0, loop_co
         # 如果提供了视频时长，计算需要的循环次数
         if video_duration is not None:
             # 获取原始GIF的持续时间
-            gif_info_cmd = [
-                'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-                '-of', 'default=noprint_wrappers=1:nokey=1', str(gif_path)
-            ]
-            
             try:
-                result = subprocess.run(gif_info_cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                gif_duration = float(result.stdout.decode().strip())
+                gif_duration = get_audio_duration(gif_path) or 0
                 print(f"原始GIF时长: {gif_duration} 秒")
                 
                 # 计算需要循环的次数
@@ -791,175 +1151,46 @@ def process_animated_gif_for_video(gif_path, temp_dir, scale_factor=1.0, loop_co
             '-f', 'gif',
             str(processed_gif_path)
         ])
+        gif_cmd = _apply_thread_budget(gif_cmd)
         
         print(f"【GIF动画处理】执行命令: {' '.join(gif_cmd)}")
         
         result = subprocess.run(gif_cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
         print(f"【GIF动画处理】处理成功: {processed_gif_path}")
-        return str(processed_gif_path)
+        
+        # 输出是原始GIF循环拼接的结果，每个循环的画面相同，只检查一个循环（原始GIF的帧数）的内容范围
+        content_box = animated_content_box(processed_gif_path, max_frames=animation_frame_count(gif_path))
+        return str(processed_gif_path), content_box
         
     except subprocess.CalledProcessError as e:
         print(f"【GIF动画处理】处理失败: {e}")
         print(f"stderr: {e.stderr.decode()}")
-        return None
+        return None, None
     except Exception as e:
         print(f"【GIF动画处理】处理异常: {e}")
-        return None
-
-
-@log_with_capture
-def add_tts_audio_to_video(video_path, audio_path, output_path, audio_volume=100):
-    """
-    将TTS音频添加到视频中
-    
-    参数:
-        video_path: 视频文件路径
-        audio_path: 音频文件路径
-        output_path: 输出文件路径
-        audio_volume: 音频音量（百分比，默认100）
-        
-    返回:
-        bool: 是否成功添加音频
-    """
-    try:
-        # 构建FFmpeg命令，将音频混合到视频中
-        # 使用volume滤镜调整音频音量
-        # 为Windows系统优化音频处理参数
-        import platform
-        if platform.system() == 'Windows':
-            # Windows下使用更稳定的音频滤镜参数
-            audio_volume_filter = f"volume={audio_volume/100:.2f}:precision=fixed"
-        else:
-            # macOS和其他系统使用默认参数
-            audio_volume_filter = f"volume={audio_volume/100:.2f}"
-        
-        # 首先检查视频是否有音频流
-        import subprocess
-        probe_cmd = ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_streams', str(video_path)]
-        probe_result = subprocess.run(probe_cmd, capture_output=True, text=True)
-        
-        has_audio = False
-        if probe_result.returncode == 0:
-            import json
-            probe_data = json.loads(probe_result.stdout)
-            for stream in probe_data.get('streams', []):
-                if stream.get('codec_type') == 'audio':
-                    has_audio = True
-                    break
-        
-        if has_audio:
-            # 视频有音频流，混合音频
-            # 使用amix滤镜混合背景音乐和TTS音频，确保两者都能听到
-            # 根据操作系统设置不同的amix参数
-            if platform.system() == "Windows":
-                amix_params = "inputs=2:duration=longest:dropout_transition=0:weights=1 1"
-            else:
-                amix_params = "inputs=2:duration=first:weights=1 1"
-                
-            cmd = [
-                'ffmpeg', '-y', '-i', str(video_path), '-i', str(audio_path),
-                '-filter_complex', f'[1:a]{audio_volume_filter}[tts_audio];[0:a][tts_audio]amix={amix_params}[aout]',
-                '-map', '0:v', '-map', '[aout]',
-                '-c:v', 'copy',  # 视频流直接复制，不重新编码
-                '-c:a', 'aac',   # 音频编码为AAC
-                '-ar', '44100',  # 设置音频采样率为44.1kHz
-                '-ac', '2',      # 设置音频通道为立体声
-                '-b:a', '128k',  # 音频比特率
-                '-strict', 'experimental',
-                '-y',  # 覆盖输出文件
-                str(output_path)
-            ]
-            print(f"[TTS音频处理] 检测到视频已有音频流（可能包含背景音乐），使用amix混合TTS和现有音频")
-        else:
-            # 视频没有音频流，直接添加TTS音频
-            cmd = [
-                'ffmpeg', '-y', '-i', str(video_path), '-i', str(audio_path),
-                '-filter_complex', f'[1:a]{audio_volume_filter}[audio]',
-                '-map', '0:v', '-map', '[audio]',
-                '-c:v', 'copy',  # 视频流直接复制，不重新编码
-                '-c:a', 'aac',   # 音频编码为AAC
-                '-ar', '44100',  # 设置音频采样率为44.1kHz
-                '-ac', '2',      # 设置音频通道为立体声
-                '-b:a', '128k',  # 音频比特率
-                '-strict', 'experimental',
-                '-y',  # 覆盖输出文件
-                str(output_path)
-            ]
-        
-        print(f"执行音频混合命令: {' '.join(cmd)}")
-        if run_ffmpeg_command(cmd):
-            print(f"成功将TTS音频添加到视频: {output_path}")
-            return True
-        else:
-            print("添加TTS音频失败")
-            return False
-    except Exception as e:
-        print(f"添加TTS音频时出错: {e}")
-        return False
+        return None, None
 
 
 @log_with_capture
-def generate_subtitle_tts(subtitle_text, voice, output_path):
+def generate_subtitle_tts(subtitle_text, voice, output_path, rate="+0%", pitch="+0Hz"):
     """
-    生成字幕的TTS音频
+    生成字幕的TTS音频（优先使用配音缓存，未命中时才调用TTS后端）
     
     参数:
         subtitle_text: 字幕文本
         voice: TTS语音
         output_path: 输出音频文件路径
+        rate: 语速调整
+        pitch: 音调调整
         
     返回:
         bool: 是否成功生成音频
     """
     try:
-        # 检测文本语言并选择合适的语音
-        is_chinese = any('\u4e00' <= char <= '\u9fff' for char in subtitle_text)
-        is_thai = any('\u0e00' <= char <= '\u0e7f' for char in subtitle_text)
-        is_malay = not (is_chinese or is_thai)  # 简单判断，如果不是中文或泰文，则假设为马来文
-        
-        # 根据文本语言选择合适的语音
-        selected_voice = voice  # 默认使用传入的语音
-        if is_chinese and not voice.startswith('zh-'):
-            selected_voice = "zh-CN-XiaoxiaoNeural"  # 中文默认使用小晓
-            print(f"检测到中文文本，自动切换为中文语音: {selected_voice}")
-        elif is_thai and not voice.startswith('th-'):
-            selected_voice = "th-TH-PremwadeeNeural"  # 泰文默认使用Premwadee
-            print(f"检测到泰文文本，自动切换为泰文语音: {selected_voice}")
-        elif is_malay and not voice.startswith('ms-'):
-            selected_voice = "ms-MY-YasminNeural"  # 马来文默认使用Yasmin
-            print(f"检测到马来文文本，自动切换为马来文语音: {selected_voice}")
-        
-        print(f"使用语音: {selected_voice} 生成TTS音频")
-        
-        # 使用异步方式生成TTS音频
-        # 检查是否已经在事件循环中
-        try:
-            # 尝试获取当前事件循环
-            loop = asyncio.get_running_loop()
-            # 如果已经在事件循环中，创建一个新的线程来运行asyncio.run()
-            import threading
-            result = False
-            exception = None
-            
-            def run_in_thread():
-                nonlocal result, exception
-                try:
-                    # 在新线程中运行asyncio.run()
-                    result = asyncio.run(generate_tts_audio(subtitle_text, selected_voice, output_path))
-                except Exception as e:
-                    exception = e
-            
-            thread = threading.Thread(target=run_in_thread)
-            thread.start()
-            thread.join()  # 等待线程完成
-            
-            if exception:
-                raise exception
-                
-        except RuntimeError:
-            # 如果没有运行中的事件循环，使用asyncio.run()
-            result = asyncio.run(generate_tts_audio(subtitle_text, selected_voice, output_path))
-        return result
+        # 检测文本语言并选择合适的语音
+        selected_voice = resolve_tts_voice(subtitle_text, voice)
+        print(f"使用语音: {selected_voice} 生成TTS音频")
+        return synthesize_tts(subtitle_text, selected_voice, output_path, rate, pitch)
     except Exception as e:
         print(f"生成字幕TTS音频失败: {e}")
         import traceback
@@ -979,7 +1210,10 @@ def add_subtitle_to_video(video_path, output_path, style=None, subtitle_lang=Non
                         image_path=None, subtitle_width=500, quality_settings=None, progress_callback=None,
                         video_index=0, enable_dynamic_subtitle=False, animation_style="高亮放大", 
                         animation_intensity=1.5, highlight_color="#FFD700", match_mode="随机样式", 
-                        position_x=540, position_y=960):  # 添加动态字幕参数
+                        position_x=540, position_y=960,  # 添加动态字幕参数
+                        single_pass=False, reverse_effect=False, tts_audio_path=None, tts_volume=100,
+                        document_store=None, tts_timing_path=None, render_slot=None, stream_source=None,
+                        tts_tempo=None):
     """
     添加字幕到视频
     
@@ -1003,7 +1237,20 @@ def add_subtitle_to_video(video_path, output_path, style=None, subtitle_lang=Non
         music_mode: 音乐匹配模式（single/order/random）
         music_volume: 音量百分比（0-100）
         document_path: 用户选择的文档文件路径，如果为None则使用默认的subtitle.csv
+        document_store: 已加载的字幕文档（document_store.SubtitleDocument），为None时按document_path加载
+        tts_timing_path: 配音音频路径，仅用于动态字幕的逐词时间（不混入音频）
         progress_callback: 进度回调函数，用于报告处理进度
+        single_pass: 单次渲染模式，video_path为未预处理的原始视频，去水印缩放裁剪、
+                     正放倒放、素材叠加、背景音乐和配音混合在同一条FFmpeg命令中完成
+        reverse_effect: 单次渲染模式下是否进行正放+倒放拼接
+        tts_audio_path: 需要混入成片的配音音频路径（在最终编码中与背景音乐/原声混合）
+        tts_volume: 配音音量（百分比）
+        tts_tempo: 配音自动匹配时长的裁剪/变速（tts_cache.TtsTempo），在最终编码的音频滤镜中执行，
+                   动态字幕的逐词时间按其换算；为None时不处理
+        render_slot: 渲染槽（pipeline_executor.RenderSlot），最终编码时占用，素材准备阶段不占用；为None时不限制
+        stream_source: 流式模式下的预处理流（见plan_preprocess_stream），video_path为原始视频，
+                       预处理与最终编码通过命名管道同时进行，只写出最终MP4；
+                       失败时返回None，由调用方回退到基于文件的处理
         
     返回:
         处理后的视频路径
@@ -1011,6 +1258,7 @@ def add_subtitle_to_video(video_path, output_path, style=None, subtitle_lang=Non
     # 创建临时目录
     temp_dir = Path(tempfile.mkdtemp())
     print(f"使用临时目录: {temp_dir}")
+    stream = None
     
     try:
         # 添加背景音乐详细日志 - add_subtitle_to_video函数接收参数阶段
@@ -1041,21 +1289,49 @@ def add_subtitle_to_video(video_path, output_path, style=None, subtitle_lang=Non
         if progress_callback:
             progress_callback("开始处理视频", 5.0)
             
-        # 1. 获取视频信息
-        video_info = get_video_info(video_path)
-        if not video_info:
-            print("无法获取视频信息")
-            return None
-            
-        width, height, duration = video_info
+        # 1. 获取视频信息（流式模式下输入为管道，使用预处理流的尺寸和时长）
+        source_has_audio = False
+        if stream_source:
+            width, height, duration = stream_source.width, stream_source.height, stream_source.duration
+            source_has_audio = stream_source.has_audio
+            print(f"【流式管道】预处理流: {width}x{height}, {duration}秒, 音频: {source_has_audio}")
+        else:
+            video_info = get_video_info(video_path)
+            if not video_info:
+                print("无法获取视频信息")
+                return None
+            width, height, duration = video_info
         print(f"视频信息: {width}x{height}, {duration}秒")
         
+        # 最终编码的滤镜图，主视频为第一个输入（流式模式下为预处理输出的管道）
+        graph = FilterGraph()
+        input_video = video_path
+        if stream_source:
+            stream = FfmpegStream(temp_dir)
+            input_video = stream.fifo("source")
+        source = graph.input(input_video)
+        
+        # 单次渲染模式：预处理滤镜直接并入最终滤镜图，后续按预处理后的尺寸和时长计算
+        preprocessed_video = None
+        if single_pass:
+            preprocessed_video, duration = build_single_pass_video_chain(
+                graph, source.video, width, height, duration, scale_factor, reverse_effect
+            )
+            width, height = 1080, 1920
+            # 正放倒放片段不保留原声，与预处理阶段保持一致
+            source_has_audio = not reverse_effect and has_audio_stream(video_path)
+            print(f"【单次渲染】成片尺寸: {width}x{height}, 时长: {duration}秒, 正放倒放: {reverse_effect}")
+        elif not stream_source:
+            source_has_audio = has_audio_stream(video_path)
+        
         # 报告进度：获取视频信息完成
         if progress_callback:
             progress_callback("获取视频信息", 10.0)
         
-        # 2. 加载字幕配置
-        subtitle_df = None
+        # 2. 加载字幕配置（同一批次中文档只解析一次）
+        if document_store is None:
+            from document_store import load_document_store
+            document_store = load_document_store(document_path)
         
         # 检查是否启用动态字幕
         if enable_dynamic_subtitle:
@@ -1086,96 +1362,6 @@ def add_subtitle_to_video(video_path, output_path, style=None, subtitle_lang=Non
         elif enable_gif and gif_path:
             print(f"GIF文件不存在: {gif_path}")
             
-        # 尝试加载用户指定的文档
-        if document_path and Path(document_path).exists():
-            print(f"使用用户选择的文档文件: {document_path}")
-            try:
-                file_ext = Path(document_path).suffix.lower()
-                if file_ext == '.csv':
-                    subtitle_df = pd.read_csv(document_path)
-                elif file_ext in ['.xlsx', '.xls']:
-                    subtitle_df = pd.read_excel(document_path)
-                elif file_ext == '.md':
-                    # 简单的Markdown表格解析
-                    with open(document_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    # 尝试解析Markdown表格
-                    lines = content.strip().split('\n')
-                    # 查找表格开始
-                    table_started = False
-                    headers = []
-                    data_rows = []
-                    
-                    for line in lines:
-                        line = line.strip()
-                        if not line:
-                            continue
-                        if '|' in line and not table_started:
-                            # 表头行
-                            headers = [h.strip() for h in line.split('|') if h.strip()]
-                            table_started = True
-                        elif '|' in line and table_started and not line.startswith('|---'):
-                            # 数据行（跳过分隔符行）
-                            if not all(c in '-|: ' for c in line):  # 不是分隔符行
-                                row_data = [d.strip() for d in line.split('|') if d.strip() or d.strip() == '']
-                                if len(row_data) >= len(headers):  # 确保数据列数够
-                                    data_rows.append(row_data[:len(headers)])
-                    
-                    if headers and data_rows:
-                        subtitle_df = pd.DataFrame(data_rows, columns=pd.Index(headers))
-                        print(f"成功解析Markdown表格: {len(subtitle_df)} 条记录")
-                    else:
-                        print("Markdown文件中未找到有效的表格格式")
-                elif file_ext == '.txt':
-                    # 尝试作为CSV或制表符分隔的文件读取
-                    try:
-                        subtitle_df = pd.read_csv(document_path, delimiter='\t')  # 先尝试制表符
-                    except:
-                        subtitle_df = pd.read_csv(document_path)  # 再尝试逗号
-                
-                if subtitle_df is not None:
-                    print(f"成功加载用户文档: {len(subtitle_df)} 条记录")
-                    print(f"文档列名: {list(subtitle_df.columns)}")
-                else:
-                    print("无法解析用户选择的文档文件")
-                    
-            except Exception as e:
-                print(f"加载用户文档失败: {e}")
-                subtitle_df = None
-        
-        # 如果没有加载到用户文档，尝试加载默认的字幕配置
-        if subtitle_df is None:
-            try:
-                # 加载默认的字幕配置文件
-                subtitle_df = load_subtitle_config()
-                if subtitle_df is not None and not subtitle_df.empty:
-                    print(f"成功加载默认字幕配置: {len(subtitle_df)} 条记录")
-                    print(f"默认配置列名: {list(subtitle_df.columns)}")
-                else:
-                    print("默认字幕配置为空或不存在")
-                    # 创建一个简单的默认配置（使用新的列名）
-                    default_data = {
-                        'name': ['default'],
-                        'title': ['特价促销\n现在下单立即享受优惠'],
-                        'cn_prompt': ['特价促销\n现在下单立即享受优惠'],  # 修改列名
-                        'malay_prompt': ['Grab cepat\nStok laris seperti roti canai'],  # 修改列名
-                        'thai_prompt': ['ราคาพิเศษ\nซื้อเลยอย่ารอช้า']  # 修改列名
-                    }
-                    subtitle_df = pd.DataFrame(default_data)
-                    print("使用默认字幕数据")
-            except Exception as e:
-                print(f"加载默认字幕配置失败: {e}")
-                # 创建一个简单的默认配置（使用新的列名）
-                default_data = {
-                    'name': ['default'],
-                    'title': ['特价促销\n现在下单立即享受优惠'],
-                    'cn_prompt': ['特价促销\n现在下单立即เข้าร่วม'],  # 修改列名
-                    'malay_prompt': ['Grab cepat\nStok laris seperti roti canai'],  # 修改列名
-                    'thai_prompt': ['ราคาพิเศษ\nซื้อเลยอย่ารอช้า']  # 修改列名
-                }
-                subtitle_df = pd.DataFrame(default_data)
-                print("使用默认字幕データ")
-        
         # 获取视频目录
         videos_dir = get_data_path("input/videos")
         # 使用相对路径的output目录
@@ -1204,26 +1390,8 @@ def add_subtitle_to_video(video_path, output_path, style=None, subtitle_lang=Non
 
         # 如果是"random"样式，先随机选择一个实际样式
         if style == "random":
-            # 从配置文件中动态获取所有可用的样式
-            style_config_parser = load_style_config()
-            available_styles = []
-            
-            try:
-                # 检查style_config_parser是否有sections方法
-                if hasattr(style_config_parser, 'sections') and callable(getattr(style_config_parser, 'sections', None)):
-                    # ConfigParser 对象
-                    sections = style_config_parser.sections()  # type: ignore
-                    for section in sections:
-                        if section.startswith("styles."):
-                            style_name = section.replace("styles.", "")
-                            available_styles.append(style_name)
-                else:
-                    # 如果不是 ConfigParser 对象，使用默认样式列表
-                    print("配置文件加载失败，使用默认样式列表")
-                    available_styles = []
-            except Exception as e:
-                print(f"处理样式配置时出错: {e}，使用默认样式列表")
-                available_styles = []
+            # 从样式注册表获取所有可用的样式
+            available_styles = list_style_names()
             
             # 如果没有找到任何样式，使用默认样式列表
             if not available_styles:
@@ -1485,6 +1653,7 @@ def add_subtitle_to_video(video_path, output_path, style=None, subtitle_lang=Non
         # 6. 处理GIF（仅在启用GIF时）
         has_gif = False
         processed_gif_path = None
+        gif_box = None
         
         if enable_gif and gif_path and Path(gif_path).exists():
             print(f"【GIF流程】处理GIF {gif_path}，缩放系数: {gif_scale}，位置: ({gif_x}, {gif_y})，循环次数: {gif_loop_count}")
@@ -1493,7 +1662,8 @@ def add_subtitle_to_video(video_path, output_path, style=None, subtitle_lang=Non
             file_ext = Path(gif_path).suffix.lower()
             if file_ext in ['.gif', '.webp']:
                 # 使用改进的GIF处理函数，传递视频时长确保GIF持续整个视频时长
-                processed_gif_path = process_animated_gif_for_video(gif_path, temp_dir, gif_scale, gif_loop_count, duration, gif_rotation)
+                processed_gif_path, gif_box = process_animated_gif_for_video(gif_path, temp_dir, gif_scale, gif_loop_count,
+                                                                             duration, gif_rotation)
                 
                 if processed_gif_path:
                     has_gif = True
@@ -1519,96 +1689,23 @@ def add_subtitle_to_video(video_path, output_path, style=None, subtitle_lang=Non
         subtitle_img = None
         
         if enable_subtitle:
-            # 检查文档中的可用列
-            available_columns = list(subtitle_df.columns)
-            
-            # 🔍 调试信息：显示语言映射关系
-            print(f"\n=== 语言映射调试信息 ===")
-            print(f"GUI选择的语言: {subtitle_lang}")
-            print(f"用户期望的映射关系:")
-            print(f"  中文 (chinese) → zn列（字幕标题）")  # 修改为正确的列名
-            print(f"  马来语 (malay) → malay_title列（字幕标题）")  # 修改为正确的列名
-            print(f"  泰语 (thai) → title_thai列（字幕标题）")  # 修改为正确的列名
-            print(f"当前文档可用列: {available_columns}")
-            print(f"=========================\n")
-            
-            # 根据语言和视频索引选择对应的字幕
-            subtitle_text = None
-            
-            print(f"可用的文档列: {available_columns}")
-            print(f"视频索引: {video_index}")
-            
-            if subtitle_lang == "chinese":
-                # 中文：明确指定使用zn列（字幕标题文本）
-                chinese_col = 'zn'
-                
-                if chinese_col in available_columns:
-                    # 获取所有非空的中文字幕数据，按文件顺序匹配
-                    valid_subtitles = subtitle_df[subtitle_df[chinese_col].notna() & (subtitle_df[chinese_col] != "")]
-                    if not valid_subtitles.empty:
-                        # 使用视频索引获取对应的字幕，如果索引超出范围则使用最后一个
-                        if video_index < len(valid_subtitles):
-                            subtitle_text = str(valid_subtitles.iloc[video_index][chinese_col])
-                        else:
-                            subtitle_text = str(valid_subtitles.iloc[-1][chinese_col])
-                        print(f"✅ 中文映射成功：从 '{chinese_col}' 列获取索引 {video_index} 的字幕: {subtitle_text}")
-                    else:
-                        print(f"❌ '{chinese_col}' 列中没有有效数据")
-                        subtitle_text = "特价促销\n现在下单立即享受优惠"
-                        print("使用默认中文字幕")
-                else:
-                    print(f"❌ 文档中未找到中文列: {chinese_col}")
-                    subtitle_text = "特价促销\n现在下单立即享受优惠"
-                    print("使用默认中文字幕")
-                    
-            elif subtitle_lang == "malay":
-                # 马来语：明确指定使用malay_title列（字幕标题文本）
-                malay_col = 'malay_title'
-                
-                if malay_col in available_columns:
-                    # 获取所有非空的马来语字幕数据，按文件顺序匹配
-                    valid_subtitles = subtitle_df[subtitle_df[malay_col].notna() & (subtitle_df[malay_col] != "")]
-                    if not valid_subtitles.empty:
-                        # 使用视频索引获取对应的字幕，如果索引超出范围则使用最后一个
-                        if video_index < len(valid_subtitles):
-                            subtitle_text = str(valid_subtitles.iloc[video_index][malay_col])
-                        else:
-                            subtitle_text = str(valid_subtitles.iloc[-1][malay_col])
-                        print(f"✅ 马来语映射成功：从 '{malay_col}' 列获取索引 {video_index} 的字幕: {subtitle_text}")
-                    else:
-                        print(f"❌ '{malay_col}' 列中没有有效数据")
-                        subtitle_text = "Grab cepat\nStok laris seperti roti canai"
-                        print("使用默认马来语字幕")
-                else:
-                    print(f"❌ 文档中未找到马来语列: {malay_col}")
-                    subtitle_text = "Grab cepat\nStok laris seperti roti canai"
-                    print("使用默认马来语字幕")
-                    
-            else:  # thai
-                # 泰语：明确指定使用title_thai列（字幕标题文本）
-                thai_col = 'title_thai'
-                
-                if thai_col in available_columns:
-                    # 获取所有非空的泰文字幕数据，按文件顺序匹配
-                    valid_subtitles = subtitle_df[subtitle_df[thai_col].notna() & (subtitle_df[thai_col] != "")]
-                    if not valid_subtitles.empty:
-                        # 使用视频索引获取对应的字幕，如果索引超出范围则使用最后一个
-                        if video_index < len(valid_subtitles):
-                            subtitle_text = str(valid_subtitles.iloc[video_index][thai_col])
-                        else:
-                            subtitle_text = str(valid_subtitles.iloc[-1][thai_col])
-                        # 替换下划线为空格（如果泰文使用下划线占位）
-                        if "_" in subtitle_text:
-                            subtitle_text = subtitle_text.replace("_", " ")
-                        print(f"✅ 泰语映射成功：从 '{thai_col}' 列获取索引 {video_index} 的字幕: {subtitle_text}")
-                    else:
-                        print(f"❌ '{thai_col}' 列中没有有效数据")
-                        subtitle_text = "ราคาพิเศษ\nซื้อเลยอย่ารอช้า"  # 泰文示例
-                        print("ใช้ข้อความเริ่มต้นภาษาไทย")
+            from document_store import SUBTITLE_COLUMNS, DEFAULT_SUBTITLES
+            # 中文 → zn列，马来语 → malay_title列，其他（泰语）→ title_thai列
+            lang_key = subtitle_lang if subtitle_lang in ("chinese", "malay") else "thai"
+            lang_col = SUBTITLE_COLUMNS[lang_key]
+            print(f"GUI选择的语言: {subtitle_lang}, 字幕列: {lang_col}, 视频索引: {video_index}")
+            
+            # 根据语言和视频索引选择对应的字幕（索引超出范围时使用最后一个）
+            subtitle_text = document_store.subtitle_text(lang_key, video_index)
+            if subtitle_text is not None:
+                print(f"✅ 映射成功：从 '{lang_col}' 列获取索引 {video_index} 的字幕: {subtitle_text}")
+            else:
+                if lang_col in document_store.columns:
+                    print(f"❌ '{lang_col}' 列中没有有效数据")
                 else:
-                    print(f"❌ 文档中ไม่มีคอลัมน์ภาษาไทย: {thai_col}")
-                    subtitle_text = "ราคาพิเศษ\nซื้อเลยอย่ารอช้า"  # 泰文示例
-                    print("ใช้ข้อความเริ่มต้นภาษาไทย")
+                    print(f"❌ 文档中未找到字幕列: {lang_col}，可用列: {list(document_store.columns)}")
+                subtitle_text = DEFAULT_SUBTITLES[lang_key]
+                print("使用默认字幕")
             
             # 创建字幕图片
             subtitle_height = 500  # 字幕高度
@@ -1627,7 +1724,9 @@ def add_subtitle_to_video(video_path, output_path, style=None, subtitle_lang=Non
                     width=subtitle_width,
                     height=subtitle_height,
                     font_size=font_size,
-                    output_path=str(subtitle_img_path)
+                    output_path=str(subtitle_img_path),
+                    tts_audio_path=tts_audio_path or tts_timing_path,
+                    tts_tempo=tts_tempo
                 )
             else:
                 # 使用静态字幕生成
@@ -1730,119 +1829,189 @@ def add_subtitle_to_video(video_path, output_path, style=None, subtitle_lang=Non
         logging.info(f"📍 最终位置参数: 字幕=({subtitle_absolute_x}, {final_y_position}), 背景=({bg_final_x}, {bg_y_position}), 图片=({img_x_position}, {img_final_position})")
         
         # 构建FFmpeg命令来叠加字幕、背景和图片
-        output_with_subtitle = temp_dir / "with_subtitle.mp4"
-        
         # 添加QuickTime兼容性参数
         if quicktime_compatible:
             print("应用QuickTime兼容性参数")
         
-        ffmpeg_command = [
-            'ffmpeg', '-y',
-            '-i', str(video_path)
-        ]
-        
-        # 动态添加输入文件
+        # 添加素材输入（相同路径只添加一次，输入序号由滤镜图分配）
         logging.info("🔨 开始添加输入文件")
-        input_index = 1
-        subtitle_index = None
-        bg_index = None
-        img_index = None
-        gif_index = None
-        
-        # 素材输入已在前面添加，这里只需要设置索引
-        current_input_index = 1
+        subtitle_input = None
+        bg_input = None
+        img_input = None
+        gif_input = None
         
         if enable_subtitle and subtitle_img:
-            subtitle_index = current_input_index
-            current_input_index += 1
-            logging.info(f"  📝 字幕输入索引: {subtitle_index}")
+            subtitle_input = graph.input(subtitle_img)
+            logging.info(f"  📝 字幕输入索引: {subtitle_input.index}")
             
         if enable_background and bg_img:
-            bg_index = current_input_index
-            current_input_index += 1
-            logging.info(f"  🎨 背景输入索引: {bg_index}")
+            bg_input = graph.input(bg_img)
+            logging.info(f"  🎨 背景输入索引: {bg_input.index}")
             
         if enable_image and has_image:
             # 确保processed_img_path已定义且文件存在
             if 'processed_img_path' in locals() and processed_img_path and Path(processed_img_path).exists():
-                img_index = current_input_index
-                current_input_index += 1
-                logging.info(f"  📸 图片输入索引: {img_index}")
+                img_input = graph.input(processed_img_path)
+                logging.info(f"  📸 图片输入索引: {img_input.index}")
             else:
                 logging.warning(f"  ⚠️ 图片启用但processed_img_path未定义或文件不存在")
-                img_index = None
                 has_image = False
             
         if enable_gif and has_gif:
-            gif_index = current_input_index
-            current_input_index += 1
-            logging.info(f"  🎞️ GIF输入索引: {gif_index}")
-        
-        input_index = current_input_index
-        logging.info(f"  📊 总输入文件数: {input_index} (包括主视频)")
+            gif_input = graph.input(processed_gif_path)
+            logging.info(f"  🎞️ GIF输入索引: {gif_input.index}")
+        
+        logging.info(f"  📊 素材输入后输入文件数: {graph.input_count} (包括主视频)")
+        
+        # 修正坐标系统：将1080x1920坐标系统映射到实际视频尺寸
+        if width and height:
+            actual_width, actual_height = width, height
+            # 计算坐标缩放比例
+            x_scale = actual_width / 1080.0
+            y_scale = actual_height / 1920.0
+            
+            # 转换坐标到实际视频尺寸
+            scaled_subtitle_x = int(subtitle_absolute_x * x_scale)
+            scaled_subtitle_y = int(final_y_position * y_scale)
+            scaled_start_y = int(start_y_position * y_scale)
+            scaled_final_y = int(final_y_position * y_scale)
+            
+            print(f"🔧 坐标系统转换: 原始({subtitle_absolute_x}, {final_y_position}) -> 实际({scaled_subtitle_x}, {scaled_subtitle_y})")
+            print(f"🔧 缩放比例: X={x_scale:.3f}, Y={y_scale:.3f}")
+            logging.info(f"🔧 坐标系统转换: 原始({subtitle_absolute_x}, {final_y_position}) -> 实际({scaled_subtitle_x}, {scaled_subtitle_y})")
+        else:
+            # 如果无法获取视频信息，使用原始坐标
+            scaled_subtitle_x = subtitle_absolute_x
+            scaled_subtitle_y = final_y_position
+            scaled_start_y = start_y_position
+            scaled_final_y = final_y_position
+            print("⚠️ 无法获取视频信息，使用原始坐标")
+            logging.warning("⚠️ 无法获取视频信息，使用原始坐标")
+        
+        # 字幕、图片和GIF素材裁剪掉了透明边缘（见overlay_trim），叠加位置加上裁剪偏移，画面保持不变
+        if enable_subtitle and subtitle_input is not None:
+            subtitle_offset_x, subtitle_offset_y = read_overlay_offset(subtitle_img)
+            scaled_subtitle_x += subtitle_offset_x
+            scaled_start_y += subtitle_offset_y
+            scaled_final_y += subtitle_offset_y
+        if enable_image and img_input is not None:
+            img_offset_x, img_offset_y = read_overlay_offset(processed_img_path)
+            img_start_x += img_offset_x
+            img_x_position += img_offset_x
+            img_final_position += img_offset_y
+        gif_crop = ""
+        if enable_gif and gif_input is not None:
+            if gif_box:
+                gif_crop = f"crop={gif_box.right - gif_box.left}:{gif_box.bottom - gif_box.top}:{gif_box.left}:{gif_box.top}"
+                gif_x = int(gif_x) + gif_box.left
+                gif_y = int(gif_y) + gif_box.top
+                print(f"【素材裁剪】GIF裁剪到 {gif_box}")
+        
+        # 分时段渲染：背景、图片和字幕的入场动画只在前3秒叠加，之后叠加预合成的静态图层；
+        # GIF仍单独叠加，为保持层次，有GIF时GIF下方（背景、图片）和上方（字幕）各合成一张
+        static_plates = {}
+        if is_timeline_split_enabled():
+            lower_layers = []
+            if enable_background and bg_input is not None:
+                lower_layers.append(PlateLayer(bg_img, bg_final_x, bg_y_position))
+            if enable_image and img_input is not None:
+                lower_layers.append(PlateLayer(processed_img_path, img_x_position, img_final_position))
+            upper_layers = []
+            if enable_subtitle and subtitle_input is not None:
+                upper_layers.append(PlateLayer(subtitle_img, scaled_subtitle_x, scaled_final_y))
+            if gif_input is None:
+                lower_layers, upper_layers = [], lower_layers + upper_layers
+            
+            for plate_name, plate_layers in (("lower", lower_layers), ("upper", upper_layers)):
+                if not plate_layers:
+                    continue
+                plates = compose_static_plates(plate_layers, width, height, temp_dir / f"static_plate_{plate_name}")
+                if plates is None:
+                    # 合成失败时整段使用入场动画的叠加
+                    static_plates = {}
+                    break
+                static_plates[plate_name] = plates
+            # 全部合成成功后才添加静态图层输入
+            static_plates = {plate_name: [(plate, graph.input(plate.path)) for plate in plates]
+                             for plate_name, plates in static_plates.items()}
+        entrance_enable = f":enable='lt(t,{entrance_duration})'" if static_plates else ""
+        
+        def overlay_static_plate(plate_name, current_stream):
+            # 入场动画结束后叠加静态图层，返回新的当前流
+            for plate, plate_input in static_plates.get(plate_name, []):
+                plate_layer = graph.filter(layer_filter, plate_input.video)
+                current_stream = graph.filter(f"overlay=x={plate.x}:y={plate.y}:enable='gte(t,{entrance_duration})'"
+                                              f":shortest=0{overlay_option}", current_stream, plate_layer)
+                logging.info(f"  🧱 添加静态图层叠加: 输入{plate_input.index} @ ({plate.x}, {plate.y})")
+            return current_stream
             
         # 构建复杂过滤器
         logging.info("🔍 开始构建过滤器链")
-        filter_complex_parts = [f"[0:v]trim=duration={duration}[v1]"]
-        current_stream = "v1"
-        stream_index = 2
+        
+        # 叠加链像素格式：主画面统一转换一次，素材直接转换为对应的带alpha格式，overlay显式指定格式
+        overlay_format = plan_overlay_format((quality_settings or {}).get('pixfmt_value', 'yuv420p'))
+        layer_filter = layer_format_filter(overlay_format)
+        overlay_option = overlay_format_option(overlay_format)
+        base_filters = [base_format_filter(overlay_format)]
+        if preprocessed_video is not None:
+            current_stream = graph.filter(base_filters, preprocessed_video)
+        else:
+            current_stream = graph.filter([f"trim=duration={duration}"] + base_filters, source.video)
+        logging.info(f"  🎨 叠加链像素格式: 主画面={overlay_format.base}, 素材={overlay_format.layer}, overlay={overlay_format.overlay}")
         
         # 格式化图层
         logging.info("🎨 格式化图层")
-        if enable_background and bg_index is not None:
-            filter_complex_parts.append(f"[{bg_index}:v]format=rgba[bg]")
-            logging.info(f"  🎨 背景图层: [{bg_index}:v] -> [bg]")
+        if enable_background and bg_input is not None:
+            bg_layer = graph.filter(layer_filter, bg_input.video)
+            logging.info(f"  🎨 背景图层: 输入{bg_input.index}")
             
-        if enable_image and img_index is not None:
-            filter_complex_parts.append(f"[{img_index}:v]format=rgba[img]")
-            logging.info(f"  📸 图片图层: [{img_index}:v] -> [img]")
+        if enable_image and img_input is not None:
+            img_layer = graph.filter(layer_filter, img_input.video)
+            logging.info(f"  📸 图片图层: 输入{img_input.index}")
             
-        if enable_gif and gif_index is not None:
-            filter_complex_parts.append(f"[{gif_index}:v]format=rgba[gif]")
-            logging.info(f"  🎞️ GIF图层: [{gif_index}:v] -> [gif]")
+        if enable_gif and gif_input is not None:
+            gif_layer = graph.filter([gif_crop, layer_filter], gif_input.video)
+            logging.info(f"  🎞️ GIF图层: 输入{gif_input.index}")
             
-        if enable_subtitle and subtitle_index is not None:
-            filter_complex_parts.append(f"[{subtitle_index}:v]format=rgba[s1]")
-            logging.info(f"  📝 字幕图层: [{subtitle_index}:v] -> [s1]")
+        if enable_subtitle and subtitle_input is not None:
+            subtitle_layer = graph.filter(layer_filter, subtitle_input.video)
+            logging.info(f"  📝 字幕图层: 输入{subtitle_input.index}")
         
         # 叠加背景（如果启用）
         logging.info("🔄 开始叠加层处理")
-        if enable_background and bg_index is not None:
-            cmd = f"[{current_stream}][bg]overlay=x='if(lt(t,{entrance_duration}),{bg_start_x}+({bg_final_x}-({bg_start_x}))*t/{entrance_duration},{bg_final_x})':y={bg_y_position}:shortest=0:format=auto[v{stream_index}]"
-            filter_complex_parts.append(cmd)
-            logging.info(f"  🎨 添加背景叠加: {current_stream} + bg -> v{stream_index}")
+        if enable_background and bg_input is not None:
+            current_stream = graph.filter(
+                f"overlay=x='if(lt(t,{entrance_duration}),{bg_start_x}+({bg_final_x}-({bg_start_x}))*t/{entrance_duration},{bg_final_x})'"
+                f":y={bg_y_position}{entrance_enable}:shortest=0{overlay_option}", current_stream, bg_layer)
+            logging.info(f"  🎨 添加背景叠加")
             logging.info(f"    位置: x={bg_final_x}, y={bg_y_position}")
-            current_stream = f"v{stream_index}"
-            stream_index += 1
         else:
             if enable_background:
-                logging.warning(f"  ⚠️ 背景启用但bg_index为None")
+                logging.warning(f"  ⚠️ 背景启用但没有背景输入")
         
         # 叠加图片（如果启用）
-        if enable_image and img_index is not None:
-            cmd = f"[{current_stream}][img]overlay=x='if(lt(t,{entrance_duration}),{img_start_x}+({img_x_position}-({img_start_x}))*t/{entrance_duration},{img_x_position})':y={img_final_position}:shortest=0:format=auto[v{stream_index}]"
-            filter_complex_parts.append(cmd)
-            logging.info(f"  📸 添加图片叠加: {current_stream} + img -> v{stream_index}")
+        if enable_image and img_input is not None:
+            current_stream = graph.filter(
+                f"overlay=x='if(lt(t,{entrance_duration}),{img_start_x}+({img_x_position}-({img_start_x}))*t/{entrance_duration},{img_x_position})'"
+                f":y={img_final_position}{entrance_enable}:shortest=0{overlay_option}", current_stream, img_layer)
+            logging.info(f"  📸 添加图片叠加")
             logging.info(f"    位置: x={img_x_position}, y={img_final_position}")
-            current_stream = f"v{stream_index}"
-            stream_index += 1
         else:
             if enable_image:
-                logging.warning(f"  ⚠️ 图片启用但img_index为None或has_image为False")
+                logging.warning(f"  ⚠️ 图片启用但没有图片输入或has_image为False")
+            
+        current_stream = overlay_static_plate("lower", current_stream)
             
         # 叠加GIF（如果启用）
-        if enable_gif and gif_index is not None:
+        if enable_gif and gif_input is not None:
             # 保持GIF动画特性，使用正确的overlay语法
-            cmd = f"[{current_stream}][gif]overlay=x={gif_x}:y={gif_y}:shortest=0:repeatlast=0[v{stream_index}]"
-            filter_complex_parts.append(cmd)
-            logging.info(f"  🎞️ 添加GIF叠加: {current_stream} + gif -> v{stream_index}")
+            current_stream = graph.filter(f"overlay=x={gif_x}:y={gif_y}:shortest=0:repeatlast=0{overlay_option}",
+                                          current_stream, gif_layer)
+            logging.info(f"  🎞️ 添加GIF叠加")
             logging.info(f"    位置: x={gif_x}, y={gif_y}")
-            logging.info(f"    修复说明: 保持GIF动画特性")
-            current_stream = f"v{stream_index}"
-            stream_index += 1
         else:
             if enable_gif:
-                logging.warning(f"  ⚠️ GIF启用但gif_index为None或has_gif为False")
+                logging.warning(f"  ⚠️ GIF启用但没有GIF输入或has_gif为False")
             
         # 叠加字幕（如果启用）
         if enable_subtitle:
@@ -1853,79 +2022,27 @@ def add_subtitle_to_video(video_path, output_path, style=None, subtitle_lang=Non
             if use_ass_subtitle and subtitle_ass_path:
                 # 使用ASS字幕文件
                 # ASS字幕不需要作为输入流，直接在过滤器中使用
-                # 确保跨平台路径格式正确
-                ass_path_str = str(subtitle_ass_path)
-                if os.name == 'nt':  # Windows系统
-                    # 将反斜杠替换为正斜杠，保持驱动器字母格式 (C:/path/to/file)
-                    ass_path_str = ass_path_str.replace('\\', '/')
-                else:
-                    # Unix/Linux/macOS系统，确保使用正斜杠
-                    ass_path_str = ass_path_str.replace('\\', '/')
-                ass_filter = f"[{current_stream}]ass=filename={ass_path_str}[v]"
-                filter_complex_parts.append(ass_filter)
-                logging.info(f"  📝 添加ASS字幕: {current_stream} -> v")
+                # 确保跨平台路径格式正确（Windows下保持驱动器字母格式 C:/path/to/file）
+                ass_path_str = str(subtitle_ass_path).replace('\\', '/')
+                current_stream = graph.filter(f"ass=filename={ass_path_str}", current_stream)
+                logging.info(f"  📝 添加ASS字幕")
                 logging.info(f"    ASS文件: {subtitle_ass_path}")
-                current_stream = "v"
-                # stream_index += 1  # 不需要增加，因为直接输出到[v]
-            elif subtitle_index is not None:
+            elif subtitle_input is not None:
                 # 使用PNG图片字幕（回退模式）
-                # 修正坐标系统：将1080x1920坐标系统映射到实际视频尺寸
-                video_info = get_video_info(video_path)
-                if video_info:
-                    actual_width, actual_height, _ = video_info
-                    # 计算坐标缩放比例
-                    x_scale = actual_width / 1080.0
-                    y_scale = actual_height / 1920.0
-                    
-                    # 转换坐标到实际视频尺寸
-                    scaled_subtitle_x = int(subtitle_absolute_x * x_scale)
-                    scaled_subtitle_y = int(final_y_position * y_scale)
-                    scaled_start_y = int(start_y_position * y_scale)
-                    scaled_final_y = int(final_y_position * y_scale)
-                    
-                    print(f"🔧 坐标系统转换: 原始({subtitle_absolute_x}, {final_y_position}) -> 实际({scaled_subtitle_x}, {scaled_subtitle_y})")
-                    print(f"🔧 缩放比例: X={x_scale:.3f}, Y={y_scale:.3f}")
-                    logging.info(f"🔧 坐标系统转换: 原始({subtitle_absolute_x}, {final_y_position}) -> 实际({scaled_subtitle_x}, {scaled_subtitle_y})")
-                else:
-                    # 如果无法获取视频信息，使用原始坐标
-                    scaled_subtitle_x = subtitle_absolute_x
-                    scaled_subtitle_y = final_y_position
-                    scaled_start_y = start_y_position
-                    scaled_final_y = final_y_position
-                    print("⚠️ 无法获取视频信息，使用原始坐标")
-                    logging.warning("⚠️ 无法获取视频信息，使用原始坐标")
-                
-                cmd = f"[{current_stream}][s1]overlay=x={scaled_subtitle_x}:y='if(lt(t,{entrance_duration}),{scaled_start_y}-({scaled_start_y}-{scaled_final_y})*t/{entrance_duration},{scaled_final_y})':shortest=0:format=auto[v{stream_index}]"
-                filter_complex_parts.append(cmd)
-                logging.info(f"  📝 添加PNG字幕叠加: {current_stream} + s1 -> v{stream_index}")
+                current_stream = graph.filter(
+                    f"overlay=x={scaled_subtitle_x}:y='if(lt(t,{entrance_duration}),{scaled_start_y}-({scaled_start_y}-{scaled_final_y})*t/{entrance_duration},{scaled_final_y})'"
+                    f"{entrance_enable}:shortest=0{overlay_option}", current_stream, subtitle_layer)
+                logging.info(f"  📝 添加PNG字幕叠加")
                 logging.info(f"    位置: x={scaled_subtitle_x}, y={scaled_final_y}")
                 logging.info(f"    随机位置: {random_position}")
-                current_stream = f"v{stream_index}"
-                stream_index += 1
             else:
                 logging.warning(f"  ⚠️ 字幕启用但没有可用的字幕文件")
         
+        current_stream = overlay_static_plate("upper", current_stream)
+        
         # 检查是否有任何素材需要处理
         has_any_overlay = (enable_subtitle and subtitle_img) or (enable_background and bg_img) or (enable_image and has_image) or (enable_gif and has_gif)
         
-        # 组合过滤器链，并确保最终输出端点正确设置
-        if has_any_overlay:
-             # 确保最终输出有一个明确的标签[v]
-             if current_stream != "v1" and current_stream != "v":
-                 # 如果有叠加操作且不是最终输出，将最终流标记为[v]
-                 filter_complex_parts.append(f"[{current_stream}]null[v]")
-             elif current_stream == "v1":
-                 # 如果没有叠加操作，直接将基础视频流标记为[v]
-                 filter_complex_parts.append("[v1]null[v]")
-             # 如果current_stream已经是"v"，则不需要添加null过滤器
-        else:
-            # 如果没有任何叠加操作，确保有一个[v]标签
-            if current_stream != "v":
-                filter_complex_parts.append(f"[{current_stream}]null[v]")
-        
-        filter_complex = ";".join(filter_complex_parts)
-        logging.info(f"  🔗 最终过滤器链: {filter_complex}")
-        
         # 添加详细的调试信息
         logging.info(f"🚿 【素材状态调试】完整状态检查")
         logging.info(f"  enable_subtitle: {enable_subtitle}, subtitle_img: {subtitle_img is not None}")
@@ -2078,62 +2195,24 @@ def add_subtitle_to_video(video_path, output_path, style=None, subtitle_lang=Non
         if selected_music_path and Path(selected_music_path).exists():
             print(f"【音乐处理】音乐文件存在，大小: {Path(selected_music_path).stat().st_size} 字节")
             
-            # 根据视频时长自动裁剪音乐
-            print(f"【音乐处理】开始根据视频时长裁剪音乐")
-            print(f"【音乐处理】视频时长: {duration}秒")
-            
-            # 创建临时裁剪音乐文件路径
-            trimmed_music_path = temp_dir / f"trimmed_music_{uuid.uuid4().hex[:8]}.mp3"
-            
-            # 调用音乐裁剪函数
-            trimmed_result = trim_music_to_video_duration(selected_music_path, duration, trimmed_music_path)
-            
-            if trimmed_result:
-                selected_music_path = trimmed_result
-                print(f"【音乐处理】音乐裁剪成功，使用裁剪后的音乐: {selected_music_path}")
-            else:
-                print(f"【音乐处理】音乐裁剪失败，使用原始音乐文件")
+            # 音乐在最终编码的滤镜图中用atrim裁剪到视频时长，不再单独生成裁剪文件
+            print(f"【音乐处理】音乐将在滤镜图中裁剪到 {duration}秒")
                 
         elif selected_music_path:
             print(f"【音乐处理】警告：音乐文件不存在！")
             print(f"【音乐处理】检查的路径: {selected_music_path}")
             print(f"【音乐处理】路径类型: {type(selected_music_path)}")
         
-        # 构建FFmpeg命令
-        input_index = 1  # 视频输入为0，从1开始计算其他输入
-        
-        # 添加字幕、背景、图片、GIF等素材输入
-        if enable_subtitle and subtitle_img:
-            ffmpeg_command.extend(['-i', str(subtitle_img)])
-            input_index += 1
-            
-        if enable_background and bg_img:
-            ffmpeg_command.extend(['-i', str(bg_img)])
-            input_index += 1
-            
-        if enable_image and has_image and 'processed_img_path' in locals() and processed_img_path and Path(processed_img_path).exists():
-            ffmpeg_command.extend(['-i', str(processed_img_path)])
-            input_index += 1
-            
-        if enable_gif and has_gif:
-            ffmpeg_command.extend(['-i', str(processed_gif_path)])
-            input_index += 1
-        
-        # 音乐输入
-        music_index = None
+        # 音乐输入（素材和静态图层已在构建滤镜图时添加）
+        music = None
         if selected_music_path:
             print(f"【音乐处理】开始添加音乐输入到FFmpeg命令")
             print(f"【音乐处理】音乐文件路径: {selected_music_path}")
             print(f"【音乐处理】音乐文件存在性检查: {Path(selected_music_path).exists()}")
-            if Path(selected_music_path).exists():
-                print(f"【音乐处理】音乐文件大小: {Path(selected_music_path).stat().st_size} 字节")
-            
-            ffmpeg_command.extend(['-i', selected_music_path])
-            music_index = input_index
-            input_index += 1
-            print(f"【音乐处理】添加音乐输入，索引: {music_index}")
-            print(f"【音乐处理】当前FFmpeg命令长度: {len(ffmpeg_command)}")
-            print(f"【音乐处理】当前输入索引: {input_index}")
+            
+            music_input = graph.input(selected_music_path)
+            music = music_input.audio
+            print(f"【音乐处理】添加音乐输入，索引: {music_input.index}")
             # 检查音乐文件是否存在
             if Path(selected_music_path).exists():
                 print(f"【音乐处理】音乐文件存在，大小: {Path(selected_music_path).stat().st_size} 字节")
@@ -2142,251 +2221,141 @@ def add_subtitle_to_video(video_path, output_path, style=None, subtitle_lang=Non
         else:
             print(f"【音乐处理】没有选择音乐文件")
         
-        # 始终构建FFmpeg命令，确保音乐能够正确处理
-        # 修复：当启用音乐时，即使没有叠加素材也要进入FFmpeg处理逻辑
-        if has_any_overlay or selected_music_path:
-            
-            # 解析质量设置参数
-            if quality_settings:
-                crf_value = quality_settings.get('crf_value', 18)
-                preset_value = quality_settings.get('preset_value', 'slow')
-                profile_value = quality_settings.get('profile_value', 'high')
-                level_value = quality_settings.get('level_value', '4.1')
-                maxrate_value = quality_settings.get('maxrate_value', 8000)
-                bufsize_value = quality_settings.get('bufsize_value', 16000)
-                gop_value = quality_settings.get('gop_value', 30)
-                tune_value = quality_settings.get('tune_value', 'film')
-                pixfmt_value = quality_settings.get('pixfmt_value', 'yuv420p')
-                
-                print(f"🎨 使用自定义质量设置: CRF={crf_value}, Preset={preset_value}, Profile={profile_value}")
-                print(f"🎨 质量参数: Level={level_value}, MaxRate={maxrate_value}kbps, BufSize={bufsize_value}kbps")
-                print(f"🎨 高级参数: GOP={gop_value}, Tune={tune_value}, PixFmt={pixfmt_value}")
+        # 配音输入：配音在本次编码中混入，不再对成片单独混音和转封装
+        tts = None
+        if tts_audio_path and Path(tts_audio_path).exists():
+            tts_input = graph.input(tts_audio_path)
+            tts = tts_input.audio
+            print(f"【配音处理】添加配音输入，索引: {tts_input.index}")
+        
+        # 音频滤镜：背景音乐替换原声，配音再与背景音乐（或原声）混合
+        audio = _build_audio_mix(
+            graph,
+            source_audio=source.audio if source_has_audio else None,
+            music=music,
+            music_volume=music_volume,
+            tts=tts,
+            tts_volume=tts_volume,
+            duration=duration,
+            tts_filter=tts_tempo.filter if tts_tempo else None
+        )
+        
+        # 成片先写到输出目录中的临时文件，编码完成后原子重命名为输出路径
+        partial_output = _partial_output_path(output_path)
+        
+        if single_pass or stream_source or has_any_overlay or selected_music_path:
+            # 单次渲染的预处理滤镜和素材叠加都在视频滤镜图中；没有素材时直接使用原视频画面（未使用的视频节点在生成时删除）
+            use_video_filter = single_pass or has_any_overlay
+            graph_outputs = {}
+            if use_video_filter:
+                graph_outputs['v'] = current_stream
+            if audio is not None:
+                graph_outputs['aout'] = audio
+            ffmpeg_command = ['ffmpeg', '-y'] + graph.input_args()
+            if graph_outputs:
+                filter_complex = graph.render(graph_outputs)
+                logging.info(f"  🔗 最终过滤器链: {filter_complex}")
+                ffmpeg_command.extend(['-filter_complex', filter_complex])
+            ffmpeg_command.extend(['-map', '[v]' if use_video_filter else f'{source.index}:v'])
+            if audio is not None:
+                ffmpeg_command.extend([
+                    '-map', '[aout]',
+                    '-c:a', 'aac', '-b:a', '128k', '-ar', '44100', '-ac', '2'
+                ])
+                if music is not None:
+                    # 以最短的流为准（视频结束时背景音乐也结束）
+                    ffmpeg_command.append('-shortest')
+            elif source_has_audio:
+                ffmpeg_command.extend(['-map', f'{source.index}:a', '-c:a', 'copy'])
             else:
-                # 默认参数 (针对TikTok优化)
-                crf_value = 18
-                preset_value = 'slow'
-                profile_value = 'high'
-                level_value = '4.1'
-                maxrate_value = 8000
-                bufsize_value = 16000
-                gop_value = 30
-                tune_value = 'film'
-                pixfmt_value = 'yuv420p'
-                
-                print(f"🎨 使用默认质量设置: CRF={crf_value}, Preset={preset_value}, Profile={profile_value}")
-            
-            # 视频编码参数（使用动态质量设置）
-            ffmpeg_command.extend([
-                '-c:v', 'libx264',
-                '-pix_fmt', pixfmt_value,
-                '-profile:v', profile_value,
-                '-level', level_value,
-                '-crf', str(crf_value),
-                '-preset', preset_value,
-                '-movflags', '+faststart',
-                '-brand', 'mp42',
-                '-tag:v', 'avc1',
-                # TikTok推荐的高清参数
-                '-maxrate', f'{maxrate_value}k',
-                '-bufsize', f'{bufsize_value}k',
-                '-g', str(gop_value),
-                '-keyint_min', str(gop_value // 2),
-                '-sc_threshold', '40',
-            ])
+                ffmpeg_command.append('-an')
+            ffmpeg_command.extend(_get_video_encode_params(quality_settings))
+            print(f"【音乐处理】背景音乐: {music is not None}, 配音: {tts is not None}, 混音输出: {audio is not None}")
             
-            # 添加tune参数（如果不是'none'）
-            if tune_value and tune_value != 'none':
-                ffmpeg_command.extend(['-tune', tune_value])
+            if stream_source:
+                return _run_stream_render(stream, stream_source, input_video, ffmpeg_command, output_path,
+                                          render_slot=render_slot, progress_callback=progress_callback)
             
-            # 添加过滤器链（如果需要叠加素材）
-            if has_any_overlay:
-                ffmpeg_command.extend(['-filter_complex', filter_complex])
+            if is_filter_debug_enabled() and use_video_filter:
+                dump_negotiated_formats(ffmpeg_command)
             
-            # 音频处理 - 修复音频流映射
-            if selected_music_path:
-                # 计算音量调节值（50% = 0.5）
-                volume_ratio = music_volume / 100.0
-                print(f"【音乐处理】开始音频流映射处理")
-                print(f"【音乐处理】音量比例: {volume_ratio} (原始音量: {music_volume}%)")
-                print(f"【音乐处理】音乐输入索引: {music_index}")
-                print(f"【音乐处理】是否有叠加素材: {has_any_overlay}")
+            # 预检：用同一命令只处理几帧，滤镜图有误时直接进入回退流程，不再执行完整编码
+            result = preflight_graph(ffmpeg_command)
+            if result:
+                ffmpeg_command.append(str(partial_output))
                 
-                # 添加音频流映射和处理参数
-                if has_any_overlay:
-                    # 如果有叠加素材，视频流来自过滤器链
-                    audio_params = [
-                        '-map', '[v]',  # 映射过滤器链的视频输出
-                        '-map', f'{music_index}:a?',  # 映射音乐的音频流，使用可选映射避免错误
-                        '-c:a', 'aac',
-                        '-b:a', '128k',
-                        '-af', f'volume={volume_ratio}',  # 调节音量
-                        '-shortest'  # 以最短的流为准（视频结束时音频也结束）
-                    ]
-                    print(f"【音乐处理】叠加模式 - 视频流映射: [v]")
-                    print(f"【音乐处理】叠加模式 - 音频流映射: {music_index}:a")
-                    ffmpeg_command.extend(audio_params)
-                else:
-                    # 如果没有叠加素材，直接映射视频流
-                    # 使用实际记录的音乐索引，而不是重新计算
-                    music_input_index = music_index
-                    
-                    # 为Windows系统优化音频处理参数
-                    import platform
-                    if platform.system() == 'Windows':
-                        # Windows下使用更稳定的音频滤镜参数
-                        audio_filter = f'volume={volume_ratio}:precision=fixed'
-                    else:
-                        # macOS和其他系统使用默认参数
-                        audio_filter = f'volume={volume_ratio}'
-                    
-                    audio_params = [
-                        '-map', '0:v',  # 映射视频流
-                        '-map', f'{music_input_index}:a?',  # 映射音乐的音频流，使用可选映射避免错误
-                        '-c:a', 'aac',
-                        '-b:a', '128k',
-                        '-af', audio_filter,  # 调节音量
-                        '-shortest'  # 以最短的流为准（视频结束时音频也结束）
-                    ]
-                    print(f"【音乐处理】直接模式 - 视频流映射: 0:v")
-                    print(f"【音乐处理】直接模式 - 音频流映射: {music_input_index}:a (实际索引: {music_index})")
-                    ffmpeg_command.extend(audio_params)
-                print(f"【音乐处理】添加音频编码参数，音量: {music_volume}%")
-                print(f"【音乐处理】音频参数: {audio_params}")
-            else:
-                # 如果没有音乐，保留原视频的音频流
-                if has_any_overlay:
-                    # 如果有叠加素材，映射过滤器链的视频输出和原视频的音频流
-                    ffmpeg_command.extend(['-map', '[v]', '-map', '0:a?'])
-                else:
-                    # 如果没有叠加素材，直接映射视频流和音频流
-                    ffmpeg_command.extend(['-map', '0:v', '-map', '0:a?'])
-                # 保留原视频音频编码
-                ffmpeg_command.extend(['-c:a', 'copy'])
-                print(f"【音乐处理】没有音乐，保留原视频音频流")
-            
-            ffmpeg_command.append(str(output_with_subtitle))
+                # 报告进度：开始执行FFmpeg命令
+                if progress_callback:
+                    progress_callback("开始单次渲染" if single_pass else "开始视频处理", 50.0)
+                logging.info(f"🎥 执行最终FFmpeg命令")
+                logging.info(f"  输入文件数: {graph.input_count}")
+                logging.info(f"  完整命令: {' '.join(ffmpeg_command)}")
+                print(f"执行命令: {' '.join(ffmpeg_command)}")
+                with _render_section(render_slot):
+                    result = run_ffmpeg_command(
+                        ffmpeg_command, duration=duration,
+                        progress_callback=_encode_progress_callback(
+                            progress_callback, "单次渲染" if single_pass else "视频编码")
+                    )
+                print(f"【音乐处理】FFmpeg命令执行结果: {result}")
+            
+            if _finish_output(partial_output, output_path, result):
+                print(f"成功添加字幕动画，输出到: {output_path}")
+                if progress_callback:
+                    progress_callback("处理完成", 100.0)
+                return output_path
+            
+            if single_pass:
+                # 由调用方回退到分步处理
+                print("【单次渲染】FFmpeg命令执行失败")
+                return None
             
-            # 报告进度：开始执行FFmpeg命令
-            if progress_callback:
-                progress_callback("开始视频处理", 50.0)
-                
-            # 执行命令
-            logging.info(f"🎥 执行最终FFmpeg命令")
-            logging.info(f"  命令长度: {len(ffmpeg_command)} 个参数")
-            logging.info(f"  输入文件数: {input_index}")
-            logging.info(f"  输出文件: {output_with_subtitle}")
-            logging.info(f"  完整命令: {' '.join(ffmpeg_command)}")
-            print(f"【音乐处理】FFmpeg命令详细信息:")
-            print(f"【音乐处理】  命令长度: {len(ffmpeg_command)} 个参数")
-            print(f"【音乐处理】  输入文件数: {input_index}")
-            print(f"【音乐处理】  输出文件: {output_with_subtitle}")
-            print(f"【音乐处理】  是否包含音乐: {selected_music_path is not None}")
-            if selected_music_path:
-                print(f"【音乐处理】  音乐文件: {selected_music_path}")
-                print(f"【音乐处理】  音乐索引: {music_index}")
-            print(f"执行命令: {' '.join(ffmpeg_command)}")
-            # 报告进度：执行FFmpeg命令中
-            if progress_callback:
-                progress_callback("执行视频处理中", 70.0)
-                
-            print(f"【音乐处理】开始执行FFmpeg命令...")
-            result = run_ffmpeg_command(ffmpeg_command)
-            print(f"【音乐处理】FFmpeg命令执行结果: {result}")
-                
-            if not result:
-                print("添加素材失败，尝试使用备用方法")
-                if enable_subtitle and subtitle_img:
-                    return fallback_static_subtitle(video_path, subtitle_img, output_path, temp_dir, quicktime_compatible, 
-                                                   enable_music, selected_music_path, music_volume)
-                else:
-                    print("没有字幕可用于备用方法，直接复制原视频")
-                    # 直接复制原视频
-                    copy_cmd = [
-                        'ffmpeg', '-y',
-                        '-i', str(video_path),
-                        '-c', 'copy',
-                        str(output_with_subtitle)
-                    ]
-                    if not run_ffmpeg_command(copy_cmd):
-                        return None
+            print("添加素材失败，尝试使用备用方法")
+            if enable_subtitle and subtitle_img:
+                return fallback_static_subtitle(video_path, subtitle_img, output_path, temp_dir, quicktime_compatible, 
+                                               enable_music, selected_music_path, music_volume,
+                                               tts_audio_path=tts_audio_path if tts is not None else None,
+                                               tts_volume=tts_volume, tts_tempo=tts_tempo)
+            print("没有字幕可用于备用方法，直接复制原视频")
         else:
-            print("所有素材功能都已禁用，但需要处理音乐")
-            print(f"【音乐处理】检查音乐参数: selected_music_path={selected_music_path}, enable_music={enable_music}")
-            # 如果只有音乐，直接复制视频并添加音乐
-            if selected_music_path:
-                volume_ratio = music_volume / 100.0
-                print(f"【音乐处理】只添加音乐，不添加其他素材")
-                print(f"【音乐处理】音乐文件路径: {selected_music_path}")
-                print(f"【音乐处理】音量比例: {volume_ratio} (原始音量: {music_volume}%)")
-                # 检查音乐文件是否存在
-                if Path(selected_music_path).exists():
-                    print(f"【音乐处理】音乐文件存在，大小: {Path(selected_music_path).stat().st_size} 字节")
-                else:
-                    print(f"【音乐处理】警告：音乐文件不存在！")
-                    print(f"【音乐处理】检查的路径: {selected_music_path}")
-                
-                # 为Windows系统优化音频处理参数
-                import platform
-                if platform.system() == 'Windows':
-                    # Windows下使用更稳定的音频滤镜参数
-                    audio_filter = f'volume={volume_ratio}:precision=fixed'
-                else:
-                    # macOS和其他系统使用默认参数
-                    audio_filter = f'volume={volume_ratio}'
-                
-                copy_with_music_cmd = [
-                    'ffmpeg', '-y',
-                    '-i', str(video_path),
-                    '-i', selected_music_path,
-                    '-c:v', 'copy',
-                    '-c:a', 'aac',
-                    '-b:a', '128k',
-                    '-af', audio_filter,
-                    '-map', '0:v',  # 映射视频流
-                    '-map', '1:a?',   # 映射音频流，使用可选映射避免错误
-                    '-shortest',
-                    str(output_with_subtitle)
-                ]
-                print(f"【音乐处理】纯音乐模式FFmpeg命令详细信息:")
-                print(f"【音乐处理】  输入视频: {video_path}")
-                print(f"【音乐处理】  输入音乐: {selected_music_path}")
-                print(f"【音乐处理】  输出文件: {output_with_subtitle}")
-                print(f"【音乐处理】  视频流映射: 0:v")
-                print(f"【音乐处理】  音频流映射: 1:a?")
-                print(f"执行命令: {' '.join(copy_with_music_cmd)}")
-                print(f"【音乐处理】开始执行纯音乐模式FFmpeg命令...")
-                result = run_ffmpeg_command(copy_with_music_cmd)
-                print(f"【音乐处理】纯音乐模式FFmpeg命令执行结果: {result}")
-                if not result:
-                    print("添加音乐失败")
-                    return None
-            else:
-                print("没有音乐，直接复制原视频")
-                # 直接复制原视频
-                copy_cmd = [
-                    'ffmpeg', '-y',
-                    '-i', str(video_path),
-                    '-c', 'copy',
-                    str(output_with_subtitle)
-                ]
-                if not run_ffmpeg_command(copy_cmd):
-                    print("复制原视频失败")
-                    return None
-        
-        # 报告进度：视频处理完成
-        if progress_callback:
-            progress_callback("视频处理完成", 90.0)
-            
-        # 10. 添加QuickTime兼容性（如果需要）
-        if _apply_final_conversion(output_with_subtitle, output_path, progress_callback):
-            print(f"成功添加字幕动画，输出到: {output_path}")
-            # 报告进度：处理完成
-            if progress_callback:
-                progress_callback("处理完成", 100.0)
-            return output_path
+            print("所有素材功能和背景音乐都已禁用，直接复制原视频")
+        
+        # 没有素材和背景音乐（或叠加失败）：MP4中的视频流直接复制，需要时混入配音
+        copy_graph = FilterGraph()
+        copy_source = copy_graph.input(video_path)
+        copy_cmd = ['ffmpeg', '-y']
+        if tts is not None:
+            copy_audio = _build_audio_mix(
+                copy_graph, source_audio=copy_source.audio if source_has_audio else None,
+                tts=copy_graph.input(tts_audio_path).audio, tts_volume=tts_volume,
+                tts_filter=tts_tempo.filter if tts_tempo else None
+            )
+            copy_cmd.extend(copy_graph.input_args() + [
+                '-filter_complex', copy_graph.render({'aout': copy_audio}),
+                '-map', f'{copy_source.index}:v', '-map', '[aout]',
+                '-c:a', 'aac', '-b:a', '128k', '-ar', '44100', '-ac', '2'
+            ])
         else:
-            print("最终转换失败")
+            copy_cmd.extend(copy_graph.input_args() + ['-map', f'{copy_source.index}:v', '-map', f'{copy_source.index}:a?',
+                                                       '-c:a', 'copy'])
+        if Path(video_path).suffix.lower() == '.mp4':
+            copy_cmd.extend(['-c:v', 'copy', '-movflags', '+faststart'])
+        else:
+            # 无损中间文件（FFV1、原始帧等）不能直接复制到MP4
+            copy_cmd.extend(_get_video_encode_params(quality_settings))
+        copy_cmd.append(str(partial_output))
+        
+        with _render_section(render_slot):
+            result = run_ffmpeg_command(copy_cmd, duration=duration,
+                                        progress_callback=_encode_progress_callback(progress_callback, "复制视频"))
+        if not _finish_output(partial_output, output_path, result):
+            print("复制原视频失败")
             return None
+        
+        print(f"成功输出视频: {output_path}")
+        if progress_callback:
+            progress_callback("处理完成", 100.0)
+        return output_path
     
     except FileNotFoundError as e:
         error_msg = f"文件未找到错误: {e}"
@@ -2419,6 +2388,9 @@ def add_subtitle_to_video(video_path, output_path, style=None, subtitle_lang=Non
             progress_callback(f"错误: {error_msg}", -1)
         return None
     finally:
+        # 结束流式管道中残留的进程
+        if stream is not None:
+            stream.close()
         # 清理临时文件
         try:
             import shutil
@@ -2432,7 +2404,8 @@ def add_subtitle_to_video(video_path, output_path, style=None, subtitle_lang=Non
 
 
 def fallback_static_subtitle(video_path, subtitle_img_path, output_path, temp_dir, quicktime_compatible=False, 
-                           enable_music=False, music_path="", music_volume=50):
+                           enable_music=False, music_path="", music_volume=50, tts_audio_path=None, tts_volume=100,
+                           tts_tempo=None):
     """
     静态字幕备用方案
     当动画字幕失败时使用
@@ -2446,6 +2419,9 @@ def fallback_static_subtitle(video_path, subtitle_img_path, output_path, temp_di
         enable_music: 是否启用背景音乐
         music_path: 音乐文件路径
         music_volume: 音乐音量(0-100)
+        tts_audio_path: 需要混入的配音音频路径
+        tts_volume: 配音音量（百分比）
+        tts_tempo: 配音的裁剪/变速（tts_cache.TtsTempo），为None时不处理
     """
     print("使用静态字幕备用方案" + (", QuickTime兼容模式" if quicktime_compatible else ""))
     
@@ -2460,70 +2436,64 @@ def fallback_static_subtitle(video_path, subtitle_img_path, output_path, temp_di
     x_position = int(width * 0.08)  # 水平位置为视频宽度的8%
     y_position = int(height * 0.65)  # 垂直位置为视频高度的65%
     
-    # 使用静态字幕
-    output_with_subtitle = temp_dir / "with_static_subtitle.mp4"
-    
-    # 构建滤镜表达式
-    filter_complex = (
-        f"[0:v]trim=duration={duration}[v1];"
-        f"[1:v]format=rgba[s1];"
-        f"[v1][s1]overlay=x={x_position}:y={y_position}:shortest=0:format=auto[vout]"
-    )
+    # 字幕图片裁剪掉了透明边缘，加上裁剪偏移
+    offset_x, offset_y = read_overlay_offset(subtitle_img_path)
+    x_position += offset_x
+    y_position += offset_y
+    
+    # 构建滤镜图
+    graph = FilterGraph()
+    source = graph.input(video_path)
+    subtitle = graph.input(subtitle_img_path)
+    overlay_format = plan_overlay_format('yuv420p')
+    video = graph.filter([f"trim=duration={duration}", base_format_filter(overlay_format)], source.video)
+    subtitle_layer = graph.filter(layer_format_filter(overlay_format), subtitle.video)
+    video = graph.filter(f"overlay=x={x_position}:y={y_position}:shortest=0{overlay_format_option(overlay_format)}",
+                         video, subtitle_layer)
     
     # 处理音频
+    music = None
     if enable_music and music_path and Path(music_path).exists():
         print(f"【fallback音乐处理】添加背景音乐: {music_path}")
         
-        # 根据视频时长自动裁剪音乐
-        print(f"【fallback音乐处理】开始根据视频时长裁剪音乐")
-        print(f"【fallback音乐处理】视频时长: {duration}秒")
-        
-        # 创建临时裁剪音乐文件路径
-        trimmed_music_path = temp_dir / f"fallback_trimmed_music_{uuid.uuid4().hex[:8]}.mp3"
-        
-        # 调用音乐裁剪函数
-        trimmed_result = trim_music_to_video_duration(music_path, duration, trimmed_music_path)
-        
-        if trimmed_result:
-            music_path = trimmed_result
-            print(f"【fallback音乐处理】音乐裁剪成功，使用裁剪后的音乐: {music_path}")
-        else:
-            print(f"【fallback音乐处理】音乐裁剪失败，使用原始音乐文件")
-        
-        volume_ratio = music_volume / 100.0
-        
-        # 构建包含音乐的FFmpeg命令
-        cmd = [
-            'ffmpeg', '-y',
-            '-i', str(video_path),
-            '-i', str(subtitle_img_path),
-            '-i', str(music_path),
-            '-filter_complex', filter_complex,
-            '-map', '[v]', '-map', '2:a',
-            '-c:v', 'libx264',
-            '-c:a', 'aac',  # 指定音频编码器
-            '-af', f'volume={volume_ratio}',  # 音量调节
-            '-pix_fmt', 'yuv420p',
-            '-profile:v', 'main', '-level', '3.1',
-            '-preset', 'ultrafast',
-            '-movflags', '+faststart',
-        ]
-    else:
-        # 不包含音乐的FFmpeg命令 - 保留原视频音频流
-        cmd = [
-            'ffmpeg', '-y',
-            '-i', str(video_path),
-            '-i', str(subtitle_img_path),
-            '-filter_complex', f'{filter_complex}[v]',
-            '-map', '[v]',   # 映射处理后的视频流
-            '-map', '0:a?',  # 保留原视频音频流（如果存在）
-            '-c:v', 'libx264',
-            '-c:a', 'copy',  # 复制原音频编码
-            '-pix_fmt', 'yuv420p',
-            '-profile:v', 'main', '-level', '3.1',
-            '-preset', 'ultrafast',
-            '-movflags', '+faststart',
-        ]
+        # 音乐在滤镜图中用atrim裁剪到视频时长
+        print(f"【fallback音乐处理】音乐将在滤镜图中裁剪到 {duration}秒")
+        music = graph.input(music_path).audio
+    
+    tts = None
+    if tts_audio_path and Path(tts_audio_path).exists():
+        tts = graph.input(tts_audio_path).audio
+    
+    source_has_audio = has_audio_stream(video_path)
+    audio = _build_audio_mix(
+        graph,
+        source_audio=source.audio if source_has_audio else None,
+        music=music,
+        music_volume=music_volume,
+        tts=tts,
+        tts_volume=tts_volume,
+        duration=duration,
+        tts_filter=tts_tempo.filter if tts_tempo else None
+    )
+    outputs = {'vout': video}
+    if audio is not None:
+        outputs['aout'] = audio
+    cmd = ['ffmpeg', '-y'] + graph.input_args() + ['-filter_complex', graph.render(outputs), '-map', '[vout]']
+    if audio is not None:
+        cmd.extend(['-map', '[aout]', '-c:a', 'aac'])
+        if music is not None:
+            cmd.append('-shortest')
+    elif source_has_audio:
+        # 保留原视频音频流
+        cmd.extend(['-map', f'{source.index}:a', '-c:a', 'copy'])
+    
+    cmd.extend([
+        '-c:v', 'libx264',
+        '-pix_fmt', 'yuv420p',
+        '-profile:v', 'main', '-level', '3.1',
+        '-preset', 'ultrafast',
+        '-movflags', '+faststart',
+    ])
     
     # 添加QuickTime兼容性参数
     if quicktime_compatible:
@@ -2533,23 +2503,16 @@ def fallback_static_subtitle(video_path, subtitle_img_path, output_path, temp_di
         ])
         print("应用静态字幕的QuickTime兼容性参数")
     
-    # 添加输出文件路径
-    cmd.append(str(output_with_subtitle))
+    # 直接写到输出目录中的临时文件，完成后原子重命名为输出路径
+    partial_output = _partial_output_path(output_path)
+    cmd.append(str(partial_output))
     
-    if not run_ffmpeg_command(cmd):
+    if not _finish_output(partial_output, output_path, run_ffmpeg_command(cmd)):
         print("静态字幕添加失败")
         return None
     
-    # 复制到最终输出路径
-    if _apply_final_conversion(output_with_subtitle, output_path):
-        print(f"成功添加静态字幕，输出到: {output_path}")
-        return output_path
-    else:
-        print(f"复制最终视频失败，尝试直接复制文件")
-        ensure_dir(Path(output_path).parent)
-        shutil.copy2(output_with_subtitle, output_path)
-        print(f"成功添加静态字幕，输出到: {output_path}")
-        return output_path
+    print(f"成功添加静态字幕，输出到: {output_path}")
+    return output_path
 
 
 def process_reverse_effect(video_path, output_path):
@@ -2566,10 +2529,10 @@ def process_reverse_effect(video_path, output_path):
     print(f"对视频进行正放+倒放处理: {video_path}")
     
     # 使用一条命令完成正放+倒放+拼接
-    cmd = [
-        'ffmpeg', '-y', '-i', str(video_path),
-        '-filter_complex',
-        '[0:v]split[v1][v2];[v2]reverse[reversed];[v1][reversed]concat=n=2:v=1:a=0[v]',
+    graph = FilterGraph()
+    video = build_forward_reverse_chain(graph, graph.input(video_path).video)
+    cmd = ['ffmpeg', '-y'] + graph.input_args() + [
+        '-filter_complex', graph.render({'v': video}),
         '-map', '[v]',
         '-c:v', 'libx264', '-pix_fmt', 'yuv420p',
         '-profile:v', 'main', '-level', '3.1',
@@ -2586,7 +2549,7 @@ def process_reverse_effect(video_path, output_path):
     return run_ffmpeg_command(cmd)
 
 
-def preprocess_video(video_path, temp_dir, duration=None):
+def preprocess_video(video_path, temp_dir, duration=None, scale_factor=1.1):
     """
     视频预处理函数 - 根据视频时长进行不同的预处理
     
@@ -2594,6 +2557,7 @@ def preprocess_video(video_path, temp_dir, duration=None):
         video_path: 视频文件路径
         temp_dir: 临时目录路径
         duration: 视频时长（秒），如果为None则自动获取
+        scale_factor: 去水印缩放系数
         
     返回:
         预处理后的视频路径，失败返回None
@@ -2613,8 +2577,8 @@ def preprocess_video(video_path, temp_dir, duration=None):
     print(f"视频时长: {duration}秒")
     
     # 对所有视频都进行水印处理（缩放裁剪去水印）
-    print(f"进行水印处理，缩放系数: 1.1")
-    processed_path = process_normal_video(video_path, temp_dir, scale_factor=1.1)
+    print(f"进行水印处理，缩放系数: {scale_factor}")
+    processed_path = process_normal_video(video_path, temp_dir, scale_factor=scale_factor)
     
     if not processed_path:
         print("水印处理失败")
@@ -2632,7 +2596,7 @@ def preprocess_video(video_path, temp_dir, duration=None):
     return processed_path
 
 
-def preprocess_video_by_type(video_path, temp_dir, duration=None):
+def preprocess_video_by_type(video_path, temp_dir, duration=None, intermediate_profile=None, scale_factor=1.1):
     """
     根据视频时长类型进行预处理
     
@@ -2640,6 +2604,8 @@ def preprocess_video_by_type(video_path, temp_dir, duration=None):
         video_path: 视频文件路径
         temp_dir: 临时目录路径
         duration: 视频时长（秒），如果为None则自动获取
+        intermediate_profile: 中间文件编码档位（见intermediate_codec），为None时使用当前设置
+        scale_factor: 去水印缩放系数（与单次渲染和流式管道模式使用同一设置）
         
     返回:
         预处理后的视频路径，失败返回None
@@ -2658,59 +2624,90 @@ def preprocess_video_by_type(video_path, temp_dir, duration=None):
     
     print(f"视频时长: {duration}秒")
     
+    # 查找预处理缓存（短视频的缓存结果包含正放倒放）
+    reverse_effect = duration < 9.0
+    intermediate_profile = get_intermediate_profile(intermediate_profile)
+    cache_key = make_preprocess_cache_key(video_path, scale_factor=scale_factor, reverse_effect=reverse_effect,
+                                          intermediate_profile=intermediate_profile)
+    cached_path = fetch_preprocess_cache(cache_key, temp_dir, intermediate_suffix(intermediate_profile))
+    if cached_path:
+        print(f"预处理完成（使用缓存）: {cached_path}")
+        return cached_path
+    
     # 对所有视频都进行水印处理（缩放裁剪去水印）
-    print(f"进行水印处理，缩放系数: 1.1")
-    processed_path = process_normal_video(video_path, temp_dir, scale_factor=1.1)
+    print(f"进行水印处理，缩放系数: {scale_factor}，中间文件档位: {intermediate_profile}")
+    processed_path = process_normal_video(video_path, temp_dir, scale_factor=scale_factor,
+                                          intermediate_profile=intermediate_profile)
     
     if not processed_path:
         print("水印处理失败")
         return None
     
+    # 水印处理或正放倒放失败时的回退结果不写入缓存
+    cacheable = str(processed_path) != str(video_path)
+    
     # 如果是短视频，需要进行正放+倒放处理
-    if duration < 9.0:
+    if reverse_effect:
         print(f"短视频: 将进行正放+倒放处理")
         # 将已处理过水印的视频进行正放+倒放处理
-        reversed_path = temp_dir / "forward_reverse.mp4"
-        if process_short_video_reverse_effect(processed_path, reversed_path, temp_dir):
-            processed_path = reversed_path
+        reversed_path = intermediate_path(temp_dir, "forward_reverse", intermediate_profile)
+        reversed_result = process_short_video_reverse_effect(processed_path, reversed_path, temp_dir,
+                                                             intermediate_profile=intermediate_profile)
+        if reversed_result:
+            processed_path = reversed_result
+        else:
+            cacheable = False
+    
+    if cacheable:
+        store_preprocess_cache(cache_key, processed_path)
     
     print(f"预处理完成: {processed_path}")
     return processed_path
 
 
-def process_folder_videos(folder_path, temp_dir, transition_duration=0.3):
+def preprocess_video_for_kind(video_path, kind, temp_dir, intermediate_profile=None, scale_factor=1.1):
     """
-    处理文件夹中的所有视频文件，按文件名排序后拼接成一个视频，每两个视频之间添加叠化转场
+    按任务类型进行基于文件的预处理
     
     参数:
-        folder_path: 包含视频文件的文件夹路径
+        video_path: 原始视频路径（folder时为文件夹路径）
+        kind: 任务类型 folder（拼接文件夹中的视频）/ short（正放倒放）/ long（仅去水印）
         temp_dir: 临时目录路径
-        transition_duration: 转场持续时间（秒），默认0.3秒
+        intermediate_profile: 中间文件编码档位（见intermediate_codec），为None时使用当前设置
+        scale_factor: 去水印缩放系数（与单次渲染和流式管道模式使用同一设置）
         
     返回:
-        拼接后的视频路径，失败返回None
+        预处理后的视频路径，失败返回None
     """
-    from pathlib import Path
-    import os
-    import subprocess
-    
-    print(f"开始处理文件夹中的视频: {folder_path}")
-    print(f"转场持续时间: {transition_duration}秒")
+    # 各预处理函数使用 temp_dir / 文件名 拼接路径，调用方可能传入字符串
+    temp_dir = Path(temp_dir)
+    if kind == 'folder':
+        return process_folder_videos(video_path, temp_dir, intermediate_profile=intermediate_profile,
+                                     scale_factor=scale_factor)
+    if kind == 'short':
+        return preprocess_video_by_type(video_path, temp_dir, intermediate_profile=intermediate_profile,
+                                        scale_factor=scale_factor)
+    return preprocess_video_without_reverse(video_path, temp_dir, intermediate_profile=intermediate_profile,
+                                            scale_factor=scale_factor)
+
+
+def _list_folder_videos(folder_path):
+    """
+    获取文件夹中的所有视频文件，按文件名排序
     
+    返回:
+        视频文件路径列表，不是有效文件夹或没有视频时返回None
+    """
     # 支持的视频扩展名
     video_extensions = {'.mp4', '.mov', '.avi', '.wmv', '.mkv'}
     
-    # 获取文件夹中的所有视频文件并按文件名排序
-    video_files = []
     folder_path_obj = Path(folder_path)
-    
     if not folder_path_obj.exists() or not folder_path_obj.is_dir():
         print(f"错误: 指定的路径不是有效文件夹: {folder_path}")
         return None
     
-    for file_path in folder_path_obj.iterdir():
-        if file_path.is_file() and file_path.suffix.lower() in video_extensions:
-            video_files.append(file_path)
+    video_files = [file_path for file_path in folder_path_obj.iterdir()
+                   if file_path.is_file() and file_path.suffix.lower() in video_extensions]
     
     # 按文件名排序
     video_files.sort(key=lambda x: x.name)
@@ -2722,12 +2719,42 @@ def process_folder_videos(folder_path, temp_dir, transition_duration=0.3):
     print(f"找到 {len(video_files)} 个视频文件:")
     for i, video_file in enumerate(video_files):
         print(f"  {i+1}. {video_file.name}")
+    return video_files
+
+
+def process_folder_videos(folder_path, temp_dir, transition_duration=0.3, intermediate_profile=None, scale_factor=1.1):
+    """
+    处理文件夹中的所有视频文件，按文件名排序后拼接成一个视频，每两个视频之间添加叠化转场
+    
+    参数:
+        folder_path: 包含视频文件的文件夹路径
+        temp_dir: 临时目录路径
+        transition_duration: 转场持续时间（秒），默认0.3秒
+        intermediate_profile: 中间文件编码档位（见intermediate_codec），为None时使用当前设置
+        scale_factor: 去水印缩放系数（与单次渲染和流式管道模式使用同一设置）
+        
+    返回:
+        拼接后的视频路径，失败返回None
+    """
+    from pathlib import Path
+    import os
+    import subprocess
+    
+    print(f"开始处理文件夹中的视频: {folder_path}")
+    print(f"转场持续时间: {transition_duration}秒")
+    
+    folder_path_obj = Path(folder_path)
+    video_files = _list_folder_videos(folder_path)
+    if not video_files:
+        return None
     
     # 如果只有一个视频文件，直接返回该文件路径（但仍需要进行水印处理，但不进行正放倒放处理）
     if len(video_files) == 1:
         print("只有一个视频文件，进行水印处理后返回（不进行正放倒放处理）")
         # 对于文件夹中的单个视频，不进行正放倒放处理
-        return preprocess_video_without_reverse(str(video_files[0]), temp_dir)
+        return preprocess_video_without_reverse(str(video_files[0]), temp_dir,
+                                                intermediate_profile=intermediate_profile,
+                                                scale_factor=scale_factor)
     
     # 对文件夹中的每个视频先进行预处理（仅水印处理，不进行正放倒放处理）
     processed_videos = []
@@ -2738,7 +2765,9 @@ def process_folder_videos(folder_path, temp_dir, transition_duration=0.3):
             width, height, duration = video_info
             print(f"处理视频: {video_file.name}, 时长: {duration:.2f}秒")
             # 对每个视频进行预处理（仅水印处理，不进行正放倒放处理）
-            processed_video = preprocess_video_without_reverse(str(video_file), temp_dir)
+            processed_video = preprocess_video_without_reverse(str(video_file), temp_dir,
+                                                               intermediate_profile=intermediate_profile,
+                                                               scale_factor=scale_factor)
             if processed_video:
                 processed_videos.append(processed_video)
             else:
@@ -2751,89 +2780,35 @@ def process_folder_videos(folder_path, temp_dir, transition_duration=0.3):
     print(f"准备拼接 {len(processed_videos)} 个预处理后的视频文件")
     
     # 使用ffmpeg拼接视频，添加叠化转场
-    output_path = temp_dir / f"{folder_path_obj.name}_merged.mp4"
+    output_path = intermediate_path(temp_dir, f"{folder_path_obj.name}_merged", intermediate_profile)
     print(f"拼接后的视频将保存到: {output_path}")
     
+    # 获取每个视频的时长，以便正确计算转场偏移
+    graph = FilterGraph()
+    clips = []
+    video_durations = []
+    for video_path in processed_videos:
+        # 使用缓存的媒体探测获取视频时长
+        duration = get_audio_duration(video_path)
+        if duration:
+            print(f"获取视频时长成功: {video_path} -> {duration:.2f}秒")
+        else:
+            # 如果获取失败，使用默认值5秒
+            print(f"获取视频时长失败 {video_path}，使用默认值5秒")
+            duration = 5.0
+        video_durations.append(duration)
+        clips.append(graph.input(video_path).video)
+    
     # 构建带有叠化转场的拼接命令
-    if len(processed_videos) == 2:
-        # 两个视频的简单情况
-        print("处理两个视频的拼接")
-        # 获取第一个视频的时长，以便正确设置转场偏移
-        first_video_duration = 5.0  # 默认值
-        try:
-            duration_cmd = [
-                'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-                '-of', 'default=noprint_wrappers=1:nokey=1', processed_videos[0]
-            ]
-            result = subprocess.run(duration_cmd, capture_output=True, text=True, check=True)
-            first_video_duration = float(result.stdout.strip())
-            print(f"获取第一个视频时长成功: {processed_videos[0]} -> {first_video_duration:.2f}秒")
-        except Exception as e:
-            print(f"获取第一个视频时长失败，使用默认值5秒: {e}")
-        
-        # 正确设置转场偏移，使其在第一个视频结束时开始
-        filter_complex = f"[0:v][1:v]xfade=transition=fade:duration={transition_duration}:offset={first_video_duration-transition_duration}[vout]"
-        print(f"滤镜命令: {filter_complex}")
-    else:
-        # 多个视频的情况 - 构建正确的xfade链
-        filter_complex_parts = []
-        
-        # 首先获取每个视频的时长，以便正确计算转场偏移
-        video_durations = []
-        for video_path in processed_videos:
-            # 使用ffprobe获取视频时长
-            duration_cmd = [
-                'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-                '-of', 'default=noprint_wrappers=1:nokey=1', video_path
-            ]
-            try:
-                result = subprocess.run(duration_cmd, capture_output=True, text=True, check=True)
-                duration = float(result.stdout.strip())
-                video_durations.append(duration)
-                print(f"获取视频时长成功: {video_path} -> {duration:.2f}秒")
-            except Exception as e:
-                print(f"获取视频时长失败 {video_path}: {e}")
-                # 如果获取失败，使用默认值5秒
-                video_durations.append(5.0)
-        
-        # 计算累积时间偏移
-        cumulative_offset = 0.0
-        print(f"开始计算转场偏移...")
-        
-        # 对于多个视频，需要链式应用xfade
-        for i in range(len(processed_videos) - 1):
-            if i == 0:
-                # 第一个xfade
-                filter_complex_parts.append(f"[0:v][1:v]xfade=transition=fade:duration={transition_duration}:offset={cumulative_offset}[tmp0]")
-                print(f"第1个转场: 偏移={cumulative_offset:.2f}秒")
-            else:
-                # 后续的xfade，使用前一个结果
-                filter_complex_parts.append(f"[tmp{i-1}][{i+1}:v]xfade=transition=fade:duration={transition_duration}:offset={cumulative_offset}[tmp{i}]")
-                print(f"第{i+1}个转场: 偏移={cumulative_offset:.2f}秒")
-            
-            # 更新累积偏移：前一个视频的时长减去转场时间
-            cumulative_offset += video_durations[i] - transition_duration
-            print(f"  更新累积偏移: {cumulative_offset:.2f}秒 (前一个视频时长: {video_durations[i]:.2f}秒)")
-        
-        # 最后一个tmp是最终输出
-        filter_complex = ";".join(filter_complex_parts)
-        # 将最后一个tmp替换为vout
-        filter_complex = filter_complex.replace(f"[tmp{len(processed_videos)-2}]", "[vout]")
-        print(f"完整滤镜命令: {filter_complex}")
-    
-    # 构建完整的ffmpeg命令
-    cmd = [
-        'ffmpeg', '-y'
-    ]
+    merged_video, _ = build_xfade_chain(graph, clips, video_durations, transition_duration)
+    filter_complex = graph.render({'vout': merged_video})
+    print(f"完整滤镜命令: {filter_complex}")
     
-    # 添加所有输入文件
-    for video_path in processed_videos:
-        cmd.extend(['-i', str(video_path)])
+    # 构建完整的ffmpeg命令（包含所有输入文件）
+    cmd = ['ffmpeg', '-y'] + graph.input_args()
     
     # 添加滤镜
-    cmd.extend([
-        '-filter_complex', filter_complex,
-        '-map', '[vout]',
+    folder_encode_args = intermediate_encode_args([
         '-c:v', 'libx264',
         '-pix_fmt', 'yuv420p',
         '-profile:v', 'main',
@@ -2844,9 +2819,15 @@ def process_folder_videos(folder_path, temp_dir, transition_duration=0.3):
         '-movflags', '+faststart',
         '-brand', 'mp42',
         '-tag:v', 'avc1',
+    ], intermediate_profile, with_audio=False)
+    cmd.extend([
+        '-filter_complex', filter_complex,
+        '-map', '[vout]'
+    ] + folder_encode_args + [
         '-an',  # 不要音频
         str(output_path)
     ])
+    cmd = _apply_thread_budget(cmd)
     
     print(f"执行拼接命令: {' '.join(cmd)}")
     
@@ -2882,20 +2863,12 @@ def process_folder_videos(folder_path, temp_dir, transition_duration=0.3):
             'ffmpeg', '-y',
             '-f', 'concat',
             '-safe', '0',
-            '-i', str(concat_file),
-            '-c:v', 'libx264',
-            '-pix_fmt', 'yuv420p',
-            '-profile:v', 'main',
-            '-level', '3.1',
-            '-preset', 'ultrafast',
-            '-crf', '23',
-            '-b:v', '4M',
-            '-movflags', '+faststart',
-            '-brand', 'mp42',
-            '-tag:v', 'avc1',
+            '-i', str(concat_file)
+        ] + folder_encode_args + [
             '-an',
             str(output_path)
         ]
+        simple_concat_cmd = _apply_thread_budget(simple_concat_cmd)
         
         try:
             subprocess.run(simple_concat_cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
@@ -3089,8 +3062,8 @@ def process_image_for_overlay(image_path, output_path, size=(420, 420)):
         # 确保输出目录存在
         ensure_dir(Path(output_path).parent)
         
-        # 保存处理后的图片
-        new_img.save(output_path)
+        # 裁剪掉透明边缘后保存，偏移记录在图片中，叠加时按偏移调整位置
+        save_trimmed_png(new_img, output_path)
         
         # 验证处理后的图片
         processed_img = Image.open(output_path)
@@ -3109,6 +3082,90 @@ from pathlib import Path
 from PIL import Image, ImageDraw, ImageFont
 
 
+def _stroke_mask(mask, radius):
+    """
+    由文字蒙版生成圆形描边的alpha蒙版
+
+    在半径内每个偏移位置重复绘制文本时，像素覆盖率为 1 - Π(1 - m)；取对数后变为圆形区域内的求和，
+    先用前缀和得到各半宽的水平区间和，再按圆内每行的半宽在垂直方向累加，只需约 2*radius 次数组运算
+    """
+    import numpy as np
+
+    coverage = np.asarray(mask, dtype=np.float64) / 255.0
+    log_clear = np.log1p(-np.minimum(coverage, 0.999999))  # log(1 - m)
+    height, width = log_clear.shape
+
+    # 水平前缀和（两侧补radius列0，便于计算越界的区间和）
+    padded = np.pad(log_clear, ((0, 0), (radius, radius)))
+    prefix = np.zeros((height, width + 2 * radius + 1))
+    np.cumsum(padded, axis=1, out=prefix[:, 1:])
+
+    window_sums = {}
+    total = np.zeros_like(log_clear)
+    for dy in range(-radius, radius + 1):
+        half_width = math.isqrt(radius * radius - dy * dy)
+        row = window_sums.get(half_width)
+        if row is None:
+            # 水平方向 [x - half_width, x + half_width] 的区间和
+            row = (prefix[:, radius + half_width + 1:radius + half_width + 1 + width]
+                   - prefix[:, radius - half_width:radius - half_width + width])
+            window_sums[half_width] = row
+        if dy >= 0:
+            total[dy:] += row[:height - dy]
+        else:
+            total[:dy] += row[-dy:]
+
+    alpha = np.rint(255.0 * -np.expm1(total))
+    return Image.fromarray(alpha.astype(np.uint8))
+
+
+def _draw_text_stroke(image, position, text, font, stroke_color, radius):
+    """
+    在image上绘制文本描边（圆形描边，半径为radius）
+
+    只光栅化一次文字蒙版并由其计算描边，且只在文本所在区域内合成，
+    效果等同于在半径范围内的每个偏移位置重复绘制文本
+    """
+    x, y = position
+    left, top, right, bottom = ImageDraw.Draw(image).textbbox((x, y), text, font=font)
+    if right <= left or bottom <= top:
+        return
+
+    # 描边区域（文本边界加上描边半径）
+    region_left = left - radius
+    region_top = top - radius
+    region_size = (right - left + 2 * radius, bottom - top + 2 * radius)
+
+    stroke_color = tuple(stroke_color)
+    if len(stroke_color) == 3:
+        stroke_color = stroke_color + (255,)
+
+    try:
+        mask = Image.new('L', region_size, 0)
+        ImageDraw.Draw(mask).text((x - region_left, y - region_top), text, font=font, fill=255)
+        alpha = _stroke_mask(mask, radius)
+        if stroke_color[3] < 255:
+            alpha = alpha.point(lambda value: value * stroke_color[3] // 255)
+        stroke_layer = Image.new('RGBA', region_size, stroke_color)
+        stroke_layer.putalpha(alpha)
+    except ImportError:
+        # 没有NumPy时使用Pillow自带的描边
+        stroke_layer = Image.new('RGBA', region_size, (0, 0, 0, 0))
+        ImageDraw.Draw(stroke_layer).text((x - region_left, y - region_top), text, font=font,
+                                          fill=stroke_color, stroke_width=radius, stroke_fill=stroke_color)
+
+    # 裁掉超出画布的部分后合成到主图像
+    crop_left = max(0, -region_left)
+    crop_top = max(0, -region_top)
+    crop_right = min(region_size[0], image.width - region_left)
+    crop_bottom = min(region_size[1], image.height - region_top)
+    if crop_right <= crop_left or crop_bottom <= crop_top:
+        return
+    if (crop_left, crop_top, crop_right, crop_bottom) != (0, 0) + region_size:
+        stroke_layer = stroke_layer.crop((crop_left, crop_top, crop_right, crop_bottom))
+    image.alpha_composite(stroke_layer, dest=(region_left + crop_left, region_top + crop_top))
+
+
 def create_subtitle_image(text, style=None, width=1080, height=500, font_size=70, 
                          output_path=None, subtitle_width=500):
     """
@@ -3150,25 +3207,8 @@ def create_subtitle_image(text, style=None, width=1080, height=500, font_size=70
         
         # 如果是"random"样式，先随机选择一个实际样式
         if style == "random":
-            # 从配置文件中动态获取所有可用的样式
-            style_config_parser = load_style_config()
-            available_styles = []
-            
-            try:
-                # 检查style_config_parser是否有sections方法
-                if hasattr(style_config_parser, 'sections') and callable(getattr(style_config_parser, 'sections', None)):
-                    # ConfigParser 对象
-                    for section in style_config_parser.sections():  # type: ignore
-                        if section.startswith("styles."):
-                            style_name = section.replace("styles.", "")
-                            available_styles.append(style_name)
-                else:
-                    # 如果不是 ConfigParser 对象，使用默认样式列表
-                    print("配置文件加载失败，使用默认样式列表")
-                    available_styles = []
-            except Exception as e:
-                print(f"处理样式配置时出错: {e}，使用默认样式列表")
-                available_styles = []
+            # 从样式注册表获取所有可用的样式
+            available_styles = list_style_names()
             
             # 如果没有找到任何样式，使用默认样式列表
             if not available_styles:
@@ -3235,9 +3275,9 @@ def create_subtitle_image(text, style=None, width=1080, height=500, font_size=70
         # 根据文字类型选择合适的字体
         if is_chinese_text:
             # 中文文本，优先使用中文字体
-            font_config = load_style_config()
-            if font_config and 'font_paths' in font_config and 'chinese' in font_config['font_paths']:
-                chinese_font_path = font_config['font_paths']['chinese']
+            font_paths = get_font_paths()
+            if 'chinese' in font_paths:
+                chinese_font_path = font_paths['chinese']
                 print(f"检测到中文，使用中文字体: {chinese_font_path}")
                 font_path = chinese_font_path
             else:
@@ -3256,19 +3296,38 @@ def create_subtitle_image(text, style=None, width=1080, height=500, font_size=70
                         break
         elif is_thai_text:
             # 泰文文本，使用泰文字体
-            font_config = load_style_config()
-            if font_config and 'font_paths' in font_config and 'thai' in font_config['font_paths']:
-                thai_font_path = font_config['font_paths']['thai']
+            font_paths = get_font_paths()
+            if 'thai' in font_paths:
+                thai_font_path = font_paths['thai']
                 print(f"检测到泰文，使用泰文字体: {thai_font_path}")
                 font_path = thai_font_path
             
         # 查找字体文件
         font_file = find_font_file(font_path)
+        
+        # 查找字幕图片缓存（文本、解析后的样式、字体文件内容和尺寸都相同时复用已渲染的图片）
+        cache_key = None
+        if font_file:
+            font_hash = file_content_hash(font_file)
+            if font_hash:
+                resolved_style = {
+                    'text_color': text_color, 'stroke_color': stroke_color, 'stroke_width': stroke_width,
+                    'shadow': shadow, 'shadow_color': shadow_color, 'shadow_offset': shadow_offset
+                }
+                cache_key = make_image_cache_key(
+                    'subtitle', text=text, style=resolved_style, font_hash=font_hash,
+                    font_size=custom_font_size, width=width, height=height, subtitle_width=subtitle_width
+                )
+                cached_path = fetch_cached_image(cache_key, output_path)
+                if cached_path:
+                    print(f"字幕图片已保存（使用缓存）: {output_path}")
+                    return output_path
+        
         if font_file:
             print(f"找到字体文件: {font_file}")
             try:
                 # 加载字体
-                font = ImageFont.truetype(font_file, custom_font_size)
+                font = load_font(font_file, custom_font_size)
                 print(f"成功加载字体 {font_file}，大小: {custom_font_size}")
             except Exception as e:
                 print(f"加载字体失败: {e}")
@@ -3302,16 +3361,16 @@ def create_subtitle_image(text, style=None, width=1080, height=500, font_size=70
                 try:
                     fb_font_file = find_font_file(fb_font)
                     if fb_font_file:
-                        font = ImageFont.truetype(fb_font_file, custom_font_size)
+                        font = load_font(fb_font_file, custom_font_size)
                         print(f"使用备用字体: {fb_font_file}, 大小: {custom_font_size}")
                         break
                     elif Path(fb_font).exists():
-                        font = ImageFont.truetype(fb_font, custom_font_size)
+                        font = load_font(fb_font, custom_font_size)
                         print(f"使用备用字体: {fb_font}, 大小: {custom_font_size}")
                         break
                     elif fb_font in ["Arial", "Helvetica"]:
                         # 尝试使用系统字体
-                        font = ImageFont.truetype(fb_font, custom_font_size)
+                        font = load_font(fb_font, custom_font_size)
                         print(f"使用系统字体: {fb_font}, 大小: {custom_font_size}")
                         break
                 except Exception as e:
@@ -3422,29 +3481,19 @@ def create_subtitle_image(text, style=None, width=1080, height=500, font_size=70
                     shadow_y = y + 4
                 draw.text((shadow_x, shadow_y), line, font=font, fill=shadow_color)
             
-            # 创建一个临时图像用于描边，确保尺寸与主图像匹配
-            stroke_img = Image.new('RGBA', (image_width, image_height), (0, 0, 0, 0))
-            stroke_draw = ImageDraw.Draw(stroke_img)
-            
             # 确保stroke_width是整数类型
             stroke_width_int = int(stroke_width) if isinstance(stroke_width, (int, float)) else 2
             
-            # 使用描边绘制文本，增加描边范围以确保完整显示
-            for dx in range(-stroke_width_int-3, stroke_width_int + 4):  # 增加描边范围
-                for dy in range(-stroke_width_int-3, stroke_width_int + 4):  # 增加描边范围
-                    if dx*dx + dy*dy <= (stroke_width_int+2)*(stroke_width_int+2):  # 调整描边范围计算
-                        stroke_draw.text((x + dx, y + dy), line, font=font, fill=stroke_color)
-            
-            # 将描边图像合并到主图像
-            image = Image.alpha_composite(image, stroke_img)
-            draw = ImageDraw.Draw(image)
+            # 描边半径比描边宽度多2像素，确保完整显示；只在当前行的区域内合成
+            _draw_text_stroke(image, (x, y), line, font, stroke_color, stroke_width_int + 2)
             
             # 绘制主文本
             draw.text((x, y), line, font=font, fill=text_color)
         
-        # 保存图片
-        image.save(output_path)
+        # 裁剪到文字（含描边和阴影）的外接矩形后保存，偏移记录在图片中，叠加时按偏移调整位置
+        save_trimmed_png(image, output_path)
         print(f"字幕图片已保存: {output_path}")
+        store_cached_image(cache_key, output_path)
         
         return output_path
     except Exception as e:
@@ -3456,12 +3505,18 @@ def create_subtitle_image(text, style=None, width=1080, height=500, font_size=70
 
 # 主函数用于测试
 if __name__ == "__main__":
+    # --no-cache 参数跳过预处理缓存和配音缓存
+    args = [arg for arg in sys.argv[1:] if arg != "--no-cache"]
+    if len(args) != len(sys.argv) - 1:
+        set_preprocess_cache(enabled=False)
+        set_tts_cache(enabled=False)
+    
     # 如果有命令行参数，处理指定视频
-    if len(sys.argv) > 1:
-        video_path = sys.argv[1]
+    if len(args) > 0:
+        video_path = args[0]
         output_path = None
-        if len(sys.argv) > 2:
-            output_path = sys.argv[2]
+        if len(args) > 1:
+            output_path = args[1]
             
         process_video(video_path, output_path)
     else:
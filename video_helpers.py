@@ -66,27 +66,9 @@ def process_style_and_language(style, subtitle_lang):
     """处理样式和语言选择"""
     # 如果是"random"样式，先随机选择一个实际样式
     if style == "random":
-        # 从配置文件中动态获取所有可用的样式
-        from utils import load_style_config
-        style_config_parser = load_style_config()
-        available_styles = []
-        
-        try:
-            # 检查style_config_parser是否有sections方法
-            if hasattr(style_config_parser, 'sections') and callable(getattr(style_config_parser, 'sections', None)):
-                # ConfigParser 对象
-                sections = style_config_parser.sections()  # type: ignore
-                for section in sections:
-                    if section.startswith("styles."):
-                        style_name = section.replace("styles.", "")
-                        available_styles.append(style_name)
-            else:
-                # 如果不是 ConfigParser 对象，使用默认样式列表
-                print("配置文件加载失败，使用默认样式列表")
-                available_styles = []
-        except Exception as e:
-            print(f"处理样式配置时出错: {e}，使用默认样式列表")
-            available_styles = []
+        # 从样式注册表获取所有可用的样式
+        from style_registry import list_style_names
+        available_styles = list_style_names()
         
         # 如果没有找到任何样式，使用默认样式列表
         if not available_styles:
@@ -270,14 +252,9 @@ def process_gif(gif_path, temp_dir, scale_factor=1.0, loop_count=-1, video_durat
         # 如果提供了视频时长，计算需要的循环次数
         if video_duration is not None:
             # 获取原始GIF的持续时间
-            gif_info_cmd = [
-                'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-                '-of', 'default=noprint_wrappers=1:nokey=1', str(gif_path)
-            ]
-            
             try:
-                result = subprocess.run(gif_info_cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-                gif_duration = float(result.stdout.decode().strip())
+                from utils import get_audio_duration
+                gif_duration = get_audio_duration(gif_path) or 0
                 print(f"原始GIF时长: {gif_duration} 秒")
                 
                 # 计算需要循环的次数